@@ -0,0 +1,70 @@
+#!/usr/bin/env python3
+#
+# Copyright (c) 2019 Roberto Riggio
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied. See the License for the
+# specific language governing permissions and limitations
+# under the License.
+
+"""Multicast group rate selection.
+
+Every LVAPStats module keeps the rates its LVAP can receive reliably as a
+bitmask (bit n set for rate n). The rate of a group is then the highest
+bit set in the AND of the masks of its receivers or, if they have no
+reliable rate in common, the lowest of their highest rates.
+"""
+
+from functools import reduce
+
+
+def select_mcs(receptors):
+    """Return the rate of a group of LVAPStats modules (0 if unknown)."""
+
+    known = [receptor for receptor in receptors if receptor.mcs_mask]
+
+    if not known:
+        return 0
+
+    if all(receptor.mcs_quality for receptor in known):
+
+        common = reduce(lambda x, y: x & y,
+                        (receptor.mcs_mask for receptor in known))
+
+        if common:
+            return common.bit_length() - 1
+
+    return min(receptor.mcs_mask.bit_length() for receptor in known) - 1
+
+
+class GroupMCS:
+    """The rate of a multicast group, cached until a receiver changes.
+
+    Attributes:
+        mcs: the rate selected the last time
+    """
+
+    def __init__(self):
+
+        self.mcs = 0
+        self.__key = None
+
+    def get(self, receptors):
+        """Return the rate of a group of LVAPStats modules."""
+
+        key = tuple((receptor.module_id, receptor.mcs_version)
+                    for receptor in receptors)
+
+        if key != self.__key:
+            self.__key = key
+            self.mcs = select_mcs(receptors)
+
+        return self.mcs
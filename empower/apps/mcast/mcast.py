@@ -33,7 +33,7 @@ from empower.core.transmissionpolicy import TX_MCAST
 from empower.core.transmissionpolicy import TX_MCAST_DMS
 from empower.core.transmissionpolicy import TX_MCAST_LEGACY
 from empower.datatypes.etheraddress import EtherAddress
-import sys
+from empower.apps.mcast.groupmcs import GroupMCS
 
 TX_MCAST_SDNPLAY = 0x3
 TX_MCAST_SDNPLAY_H = "sdnplay"
@@ -59,8 +59,7 @@ class MCastManager(EmpowerApp):
 
         # app parameters
         self.receptors = {}
-        self.receptors_mcses = {}
-        self.receptors_quality = {}
+        self.group_mcs = GroupMCS()
         self.prob_threshold = 90.0
         self.mcast_addr = EtherAddress("01:00:5e:00:c8:dd")
         self.current = 0
@@ -90,12 +89,13 @@ class MCastManager(EmpowerApp):
             if demo_mode == TX_MCAST[TX_MCAST_DMS]:
                 txp.mcast = TX_MCAST_DMS
             elif demo_mode == TX_MCAST[TX_MCAST_LEGACY]:
-                txp.mcast = TX_MCAST_LEGACY
                 mcs_type = BT_HT20
                 if mcs_type == BT_HT20:
-                    txp.ht_mcs = [min(block.ht_supports)]
+                    txp.update(mcast=TX_MCAST_LEGACY,
+                               ht_mcs=[min(block.ht_supports)])
                 else:
-                    txp.mcs = [min(block.supports)]
+                    txp.update(mcast=TX_MCAST_LEGACY,
+                               mcs=[min(block.supports)])
 
         if demo_mode != TX_MCAST_SDNPLAY_H:
             self.status['MCS'] = "None"
@@ -105,7 +105,8 @@ class MCastManager(EmpowerApp):
         """Called when an LVAP joins a tenant."""
 
         self.receptors[lvap.addr] = \
-            self.lvap_stats(lvap=lvap.addr, every=self.every)
+            self.lvap_stats(lvap=lvap.addr, every=self.every,
+                            prob_threshold=self.prob_threshold)
 
     def lvap_leave(self, lvap):
         """Called when an LVAP leaves the network."""
@@ -113,65 +114,9 @@ class MCastManager(EmpowerApp):
         if lvap.addr in self.receptors:
             del self.receptors[lvap.addr]
 
-        if lvap.addr in self.receptors_mcses:
-            del self.receptors_mcses[lvap.addr]
-
-        if lvap.addr in self.receptors_quality:
-            del self.receptors_quality[lvap.addr]
-
-    def compute_receptors_mcs(self):
-        """ New stats available. """
-
-        for value in self.receptors.values():
-            highest_prob = 0
-            information = value.to_dict()
-
-            if not information["rates"]:
-                continue
-
-            lvap = information["lvap"]
-            keys = [float(i) for i in information["rates"].keys()]
-            best_mcs = min(list(map(int, keys)))
-
-            if lvap in self.receptors_mcses:
-                del self.receptors_mcses[lvap]
-
-            self.receptors_mcses[lvap] = []
-
-            for mcs, stats in information["rates"].items():
-                if stats["prob"] >= self.prob_threshold:
-                    self.receptors_mcses[lvap].append(int(float(mcs)))
-                elif stats["prob"] > highest_prob:
-                    best_mcs = int(float(mcs))
-                    highest_prob = stats["prob"]
-
-            if not self.receptors_mcses[lvap]:
-                self.receptors_quality[lvap] = False
-                self.receptors_mcses[lvap].append(best_mcs)
-            else:
-                self.receptors_quality[lvap] = True
-
     def calculate_mcs(self):
 
-        self.compute_receptors_mcs()
-        if not self.receptors_mcses:
-            return 0
-
-        if False not in self.receptors_quality.values():
-            mcses = []
-            for rates in self.receptors_mcses.values():
-                mcses.append(rates)
-
-            mcs_intersection = list(set.intersection(*map(set, mcses)))
-            if mcs_intersection:
-                mcs = max(mcs_intersection)
-                return mcs
-
-        mcs = sys.maxsize
-        for rates in self.receptors_mcses.values():
-            mcs = min(max(rates), mcs)
-
-        return mcs
+        return self.group_mcs.get(list(self.receptors.values()))
 
     def get_next_phase(self):
         """Get next mcast phase to be scheduled."""
@@ -217,12 +162,11 @@ class MCastManager(EmpowerApp):
                 # compute MCS
                 mcs = max(self.calculate_mcs(), min(block.supports))
                 self.status['MCS'] = mcs
-                txp.mcast = TX_MCAST_LEGACY
 
                 if mcs_type == BT_HT20:
-                    txp.ht_mcs = [mcs]
+                    txp.update(mcast=TX_MCAST_LEGACY, ht_mcs=[mcs])
                 else:
-                    txp.mcs = [mcs]
+                    txp.update(mcast=TX_MCAST_LEGACY, mcs=[mcs])
 
                 # assign MCS
                 self.log.info("Block %s setting mcast address %s to %s MCS %d",
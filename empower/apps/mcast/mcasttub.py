@@ -33,10 +33,11 @@ from empower.core.transmissionpolicy import TX_MCAST
 from empower.core.transmissionpolicy import TX_MCAST_DMS
 from empower.core.transmissionpolicy import TX_MCAST_DMS_H
 from empower.core.transmissionpolicy import TX_MCAST_LEGACY
+from empower.core.tracewriter import get_writer
 from empower.datatypes.etheraddress import EtherAddress
+from empower.apps.mcast.groupmcs import GroupMCS
 from empower.main import RUNTIME
 import struct
-import sys
 import math
 
 TX_MCAST_SDNPLAY = 0x3
@@ -57,14 +58,16 @@ class MCastTub(EmpowerApp):
 
     """
 
+    # the snr and air handover schemes run in the process pool
+    OFFLOAD = True
+
     def __init__(self, **kwargs):
 
         super().__init__(**kwargs)
 
         # app parameters
         self.receptors = {}
-        self.receptors_mcses = {}
-        self.receptors_quality = {}
+        self.group_mcs = GroupMCS()
         self.prob_threshold = 90.0
         self.mcast_addr = EtherAddress("01:00:5e:00:c8:dd")
         self.current = 0
@@ -82,6 +85,7 @@ class MCastTub(EmpowerApp):
         #["cd", "snr", "air"]
         self._scheme = "cd"
         self.aps_clients_matrix = {}
+        self.writer = get_writer()
 
     @property
     def snr(self):
@@ -259,12 +263,13 @@ class MCastTub(EmpowerApp):
             if mode == TX_MCAST[TX_MCAST_DMS]:
                 txp.mcast = TX_MCAST_DMS
             elif mode == TX_MCAST[TX_MCAST_LEGACY]:
-                txp.mcast = TX_MCAST_LEGACY
                 mcs_type = BT_HT20
                 if mcs_type == BT_HT20:
-                    txp.ht_mcs = [min(block.ht_supports)]
+                    txp.update(mcast=TX_MCAST_LEGACY,
+                               ht_mcs=[min(block.ht_supports)])
                 else:
-                    txp.mcs = [min(block.supports)]
+                    txp.update(mcast=TX_MCAST_LEGACY,
+                               mcs=[min(block.supports)])
 
         if mode != TX_MCAST_SDNPLAY_H:
             self.status['MCS'] = "None"
@@ -313,16 +318,16 @@ class MCastTub(EmpowerApp):
 
         text_name = lvap.addr.to_str() + lvap.blocks[0].addr.to_str()
         text_name = text_name+".txt"
-        with open(text_name, "a") as text_file:
-            print("%.2f,%.2f,%.2f,%.2f,%.2f,%.2f" % \
-                (stats.tx_bytes_per_second[0], stats.tx_packets_per_second[0], \
-                    stats.tx_bytes[0], stats.tx_packets[0], cnt['tx_bytes_c'], cnt['tx_packets_c']), file=text_file)
+        self.writer.write(text_name, "%.2f,%.2f,%.2f,%.2f,%.2f,%.2f\n" % \
+            (stats.tx_bytes_per_second[0], stats.tx_packets_per_second[0], \
+                stats.tx_bytes[0], stats.tx_packets[0], cnt['tx_bytes_c'], cnt['tx_packets_c']))
 
     def lvap_join(self, lvap):
         """Called when an LVAP joins a tenant."""
 
         self.receptors[lvap.addr] = \
-            self.lvap_stats(lvap=lvap.addr, every=self.every)
+            self.lvap_stats(lvap=lvap.addr, every=self.every,
+                            prob_threshold=self.prob_threshold)
 
         self.ucqm_data[lvap.blocks[0].addr.to_str() + lvap.addr.to_str()] = \
             {
@@ -360,14 +365,10 @@ class MCastTub(EmpowerApp):
 
         text_name = lvap.addr.to_str() + lvap.blocks[0].addr.to_str()
         text_name = text_name+".txt"
-        with open(text_name, "w") as text_file:
-            print("tx_bytes_per_second, tx_packets_per_second, tx_bytes, tx_packets, tx_bytes_c, tx_packets_c", \
-                file=text_file)
+        self.writer.truncate(text_name, "tx_bytes_per_second, tx_packets_per_second, tx_bytes, tx_packets, tx_bytes_c, tx_packets_c\n")
 
         hofile = "HO_"+lvap.addr.to_str()+".txt"
-        with open(text_name, "w") as text_file:
-            print("source, destination, mode", \
-                file=text_file)
+        self.writer.truncate(text_name, "source, destination, mode\n")
 
     def lvap_leave(self, lvap):
         """Called when an LVAP leaves the network."""
@@ -375,12 +376,6 @@ class MCastTub(EmpowerApp):
         if lvap.addr in self.receptors:
             del self.receptors[lvap.addr]
 
-        if lvap.addr in self.receptors_mcses:
-            del self.receptors_mcses[lvap.addr]
-
-        if lvap.addr in self.receptors_quality:
-            del self.receptors_quality[lvap.addr]
-
     def wtp_up(self, wtp):
         """Called when a new WTP connects to the controller."""
 
@@ -460,59 +455,9 @@ class MCastTub(EmpowerApp):
 
         return capacity
 
-    def compute_receptors_mcs(self):
-        """ New stats available. """
-
-        for value in self.receptors.values():
-            highest_prob = 0
-            information = value.to_dict()
-
-            if not information["rates"]:
-                continue
-
-            lvap = information["lvap"]
-            keys = [float(i) for i in information["rates"].keys()]
-            best_mcs = min(list(map(int, keys)))
-
-            if lvap in self.receptors_mcses:
-                del self.receptors_mcses[lvap]
-
-            self.receptors_mcses[lvap] = []
-
-            for mcs, stats in information["rates"].items():
-                if stats["prob"] >= self.prob_threshold:
-                    self.receptors_mcses[lvap].append(int(float(mcs)))
-                elif stats["prob"] > highest_prob:
-                    best_mcs = int(float(mcs))
-                    highest_prob = stats["prob"]
-
-            if not self.receptors_mcses[lvap]:
-                self.receptors_quality[lvap] = False
-                self.receptors_mcses[lvap].append(best_mcs)
-            else:
-                self.receptors_quality[lvap] = True
-
     def calculate_mcs(self):
 
-        self.compute_receptors_mcs()
-        if not self.receptors_mcses:
-            return 0
-
-        if False not in self.receptors_quality.values():
-            mcses = []
-            for rates in self.receptors_mcses.values():
-                mcses.append(rates)
-
-            mcs_intersection = list(set.intersection(*map(set, mcses)))
-            if mcs_intersection:
-                mcs = max(mcs_intersection)
-                return mcs
-
-        mcs = sys.maxsize
-        for rates in self.receptors_mcses.values():
-            mcs = min(max(rates), mcs)
-
-        return mcs
+        return self.group_mcs.get(list(self.receptors.values()))
 
     def get_next_phase(self):
         """Get next mcast phase to be scheduled."""
@@ -566,69 +511,110 @@ class MCastTub(EmpowerApp):
 
         return True
 
-    def sort_by_snr(self, lvap):
-        """Return list sorted by rssi for the specific address."""
+    def snapshot(self):
+        """Return the inputs of the snr and air handover schemes."""
 
-        print(self.blocks())
-        candidate_block = None
-        highest_capacity = 0
+        if self.demo_mode != TX_MCAST[TX_MCAST_DMS] and \
+           self.demo_mode != TX_MCAST[TX_MCAST_LEGACY]:
+            return None
 
-        for block in self.blocks():
-            
-            key = block.addr.to_str() + lvap.addr.to_str()
-
-            if key in self.ucqm_data:
-                print(self.ucqm_data[key])
-                print("key %s, value %d. current %d" % (key, self.ucqm_data[key]['snr'], highest_capacity))
-                if self.ucqm_data[key]['snr'] > highest_capacity:
-                    highest_capacity = self.ucqm_data[key]['snr']
-                    candidate_block = block
+        if self.scheme == "snr":
+            metric = 'snr'
+        elif self.scheme == "air":
+            metric = 'capacity'
+        else:
+            return None
 
-        if not candidate_block or candidate_block == lvap.blocks[0]:
-            return
+        blocks = tuple(block.addr.to_str() for block in self.blocks())
 
-        hofile = "HO_"+lvap.addr.to_str()+".txt"
-        with open(hofile, "a") as text_file:
-            print("%s, %s, %s" % (lvap.blocks[0].addr.to_str(), candidate_block.addr.to_str(), "snr"), \
-                file=text_file)
-        if lvap.addr in self.aps_clients_matrix[lvap.blocks[0].addr]:
-            self.aps_clients_matrix[lvap.blocks[0].addr].remove(lvap.addr)
-        self.aps_clients_matrix[candidate_block.addr].append(lvap.addr)
-        
-        lvap.blocks = candidate_block
+        lvaps = tuple((lvap.addr.to_str(), lvap.blocks[0].addr.to_str())
+                      for lvap in self.lvaps())
 
-    def sort_by_air(self, lvap):
-        """Return list sorted by rssi for the specific address."""
+        metrics = tuple((key, value[metric])
+                        for key, value in self.ucqm_data.items())
 
-        candidate_block = None
-        highest_capacity = 0
+        clients = tuple((block.to_str(), tuple(lvap.to_str() for lvap in value))
+                        for block, value in self.aps_clients_matrix.items())
 
-        for block in self.blocks():
-            key = block.addr.to_str() + lvap.addr.to_str()
+        return (self.scheme, blocks, lvaps, metrics, clients)
+
+    @staticmethod
+    def compute(snapshot):
+        """Return the handovers of the snr and air schemes.
 
-            if key in self.ucqm_data:
-                length = 1
-                if block == lvap.blocks[0]:
-                    length = len(self.aps_clients_matrix[block.addr])
+        With the snr scheme every LVAP is moved to the block with the
+        highest snr, with the air scheme to the block with the highest
+        capacity per client. The LVAPs are processed in order, and every
+        handover is taken into account when evaluating the next LVAPs.
+
+        Returns:
+            A list of (lvap, source block, destination block, scheme)
+        """
+
+        scheme, blocks, lvaps, metrics, clients = snapshot
+
+        metrics = dict(metrics)
+        clients = {block: list(value) for block, value in clients}
+        handovers = []
+
+        for lvap, serving in lvaps:
+
+            candidate_block = None
+            highest_capacity = 0
+
+            for block in blocks:
+
+                key = block + lvap
+
+                if key not in metrics:
+                    continue
+
+                if scheme == "snr":
+                    capacity = metrics[key]
                 else:
-                    length = 1 + len(self.aps_clients_matrix[block.addr])
+                    length = len(clients.get(block, []))
+                    if block != serving:
+                        length += 1
+                    capacity = metrics[key] / max(length, 1)
 
-                if self.ucqm_data[key]['capacity']/length > highest_capacity:
-                    highest_capacity = self.ucqm_data[key]['capacity']/length
+                if capacity > highest_capacity:
+                    highest_capacity = capacity
                     candidate_block = block
 
-        if not candidate_block or candidate_block == lvap.blocks[0]:
-            return
+            if not candidate_block or candidate_block == serving:
+                continue
 
-        hofile = "HO_"+lvap.addr.to_str()+".txt"
-        with open(hofile, "a") as text_file:
-            print("%s, %s, %s" % (lvap.blocks[0].addr.to_str(), candidate_block.addr.to_str(), "air"), \
-                file=text_file)
-        if lvap.addr in self.aps_clients_matrix[lvap.blocks[0].addr]:
-            self.aps_clients_matrix[lvap.blocks[0].addr].remove(lvap.addr)
-        self.aps_clients_matrix[candidate_block.addr].append(lvap.addr)
-        
-        lvap.blocks = candidate_block
+            if lvap in clients.get(serving, []):
+                clients[serving].remove(lvap)
+            clients.setdefault(candidate_block, []).append(lvap)
+
+            handovers.append((lvap, serving, candidate_block, scheme))
+
+        return handovers
+
+    def apply(self, decisions):
+        """Carry out the handovers of the snr and air schemes."""
+
+        blocks = {block.addr.to_str(): block for block in self.blocks()}
+        lvaps = {lvap.addr.to_str(): lvap for lvap in self.lvaps()}
+
+        for lvap, serving, candidate, scheme in decisions:
+
+            # skip the LVAPs that have left or moved in the meantime
+            if lvap not in lvaps or candidate not in blocks or \
+                    lvaps[lvap].blocks[0].addr.to_str() != serving:
+                continue
+
+            lvap = lvaps[lvap]
+            candidate_block = blocks[candidate]
+
+            hofile = "HO_"+lvap.addr.to_str()+".txt"
+            self.writer.write(hofile, "%s, %s, %s\n" % (serving, candidate, scheme))
+            if lvap.addr in self.aps_clients_matrix[lvap.blocks[0].addr]:
+                self.aps_clients_matrix[lvap.blocks[0].addr].remove(lvap.addr)
+            self.aps_clients_matrix[candidate_block.addr].append(lvap.addr)
+
+            lvap.blocks = candidate_block
 
     def loop(self):
         """ Periodic job. """
@@ -650,12 +636,8 @@ class MCastTub(EmpowerApp):
 
                 pass
 
-            elif self.scheme == "snr":
-                for lvap in self.lvaps():
-                    self.sort_by_snr(lvap)
-            elif self.scheme == "air":
-                for lvap in self.lvaps():
-                    self.sort_by_air(lvap)
+            elif self.scheme == "snr" or self.scheme == "air":
+                self.apply(self.compute(self.snapshot()))
         else:
 
             if self.scheme == "mc":
@@ -688,12 +670,11 @@ class MCastTub(EmpowerApp):
                         # compute MCS
                         mcs = max(self.calculate_mcs(), min(block.supports))
                         self.status['MCS'] = mcs
-                        txp.mcast = TX_MCAST_LEGACY
 
                         if mcs_type == BT_HT20:
-                            txp.ht_mcs = [mcs]
+                            txp.update(mcast=TX_MCAST_LEGACY, ht_mcs=[mcs])
                         else:
-                            txp.mcs = [mcs]
+                            txp.update(mcast=TX_MCAST_LEGACY, mcs=[mcs])
 
                         # assign MCS
                         self.log.info("Block %s setting mcast address %s to %s MCS %d",
@@ -18,6 +18,9 @@
 """Wifi stats Poller App."""
 
 from empower.core.app import EmpowerApp
+from empower.core.recorder import Recorder
+from empower.core.recorder import STRING
+from empower.core.recorder import to_timestamp
 from empower.core.resourcepool import BT_HT20
 from empower.datatypes.etheraddress import EtherAddress
 from empower.main import RUNTIME
@@ -26,6 +29,22 @@ import time
 from datetime import datetime, date, time, timedelta
 import os
 
+WIFI_STATS = ["rx_utlization", "tx_utlization"]
+
+BIN_COUNTERS = ["rx_bytes", "tx_bytes", "rx_pkts", "tx_pkts",
+                "rx_bytes_per_second", "tx_bytes_per_second",
+                "rx_pkts_per_second", "tx_pkts_per_second"]
+
+LVAP_STATS = ["rate", "throughput", "prob", "cur_prob", "attempts",
+              "success", "cur_attempts", "cur_success", "hist_attempts",
+              "hist_success", "attempts_bytes", "success_bytes",
+              "cur_attempts_bytes", "cur_success_bytes",
+              "hist_attempts_bytes", "hist_success_bytes"]
+
+# the run parameters prepended to every line of the csv files
+RUN_FIELDS = ["scheme", "number", "bandwidth", "pkt_size", "mcs_version",
+              "stations"]
+
 
 class AggregationPoller(EmpowerApp):
     """WiFi Stats Poller Apps.
@@ -44,9 +63,12 @@ class AggregationPoller(EmpowerApp):
         super().__init__(**kwargs)
 
         # app parameters
-        self.wifi_stats_data = {}
-        self.bin_counter_data = {}
-        self.lvap_stats_data = {}
+        self.wifi_stats_data = \
+            Recorder([(name, 'd') for name in WIFI_STATS])
+        self.bin_counter_data = \
+            Recorder([("lvap", STRING)] + [(name, 'd') for name in BIN_COUNTERS])
+        self.lvap_stats_data = \
+            Recorder([("lvap", STRING)] + [(name, 'd') for name in LVAP_STATS])
 
         self._save_data = False
         self._scheme = None
@@ -109,78 +131,56 @@ class AggregationPoller(EmpowerApp):
     def wifi_callback(self, stats):
         """ New stats available. """
 
-        for i, j in enumerate(stats.wifi_stats["tx"]):
-            if j["time"].strftime('%Y-%m-%d %H:%M:%S.%f')[:-3] not in self.wifi_stats_data:
-                self.wifi_stats_data[j["time"].strftime('%Y-%m-%d %H:%M:%S.%f')[:-3]] = {}
-            self.wifi_stats_data[j["time"].strftime('%Y-%m-%d %H:%M:%S.%f')[:-3]]["rx_utlization"] = stats.wifi_stats["rx"][i]["fields"]["value"]
-            self.wifi_stats_data[j["time"].strftime('%Y-%m-%d %H:%M:%S.%f')[:-3]]["tx_utlization"] = j["fields"]["value"]
-
-    def counters_callback(self, stats):
-        """ New stats available. """
+        last = self.wifi_stats_data.timestamps[-1] \
+            if self.wifi_stats_data else None
 
-        lvap = RUNTIME.lvaps[stats.lvap]
+        for i, j in enumerate(stats.wifi_stats["tx"]):
 
-        if stats.lvap.to_str() not in self.bin_counter_data:
-            self.bin_counter_data[stats.lvap.to_str()] = {}
+            # samples already recorded by a previous callback
+            if last is not None and to_timestamp(j["time"]) <= last:
+                continue
 
-        cnt = self.bin_counter_data[stats.lvap.to_str()]
+            self.wifi_stats_data.append(j["time"],
+                                        stats.wifi_stats["rx"][i]["fields"]["value"],
+                                        j["fields"]["value"])
 
-        cnt[stats.timestamp.strftime('%Y-%m-%d %H:%M:%S.%f')[:-3]] = {}
-        cnt[stats.timestamp.strftime('%Y-%m-%d %H:%M:%S.%f')[:-3]]["rx_bytes"] = stats.rx_bytes[0]
-        cnt[stats.timestamp.strftime('%Y-%m-%d %H:%M:%S.%f')[:-3]]["tx_bytes"] = stats.tx_bytes[0]
-        cnt[stats.timestamp.strftime('%Y-%m-%d %H:%M:%S.%f')[:-3]]["rx_pkts"] = stats.rx_packets[0]
-        cnt[stats.timestamp.strftime('%Y-%m-%d %H:%M:%S.%f')[:-3]]["tx_pkts"] = stats.tx_packets[0]
+    def counters_callback(self, stats):
+        """ New stats available. """
 
         if not stats.tx_bytes_per_second or not stats.rx_bytes_per_second:
-            cnt[stats.timestamp.strftime('%Y-%m-%d %H:%M:%S.%f')[:-3]]["rx_bytes_per_second"] = 0
-            cnt[stats.timestamp.strftime('%Y-%m-%d %H:%M:%S.%f')[:-3]]["tx_bytes_per_second"] = 0
+            bytes_per_second = (0, 0)
         else:
-            cnt[stats.timestamp.strftime('%Y-%m-%d %H:%M:%S.%f')[:-3]]["rx_bytes_per_second"] = stats.rx_bytes_per_second[0]
-            cnt[stats.timestamp.strftime('%Y-%m-%d %H:%M:%S.%f')[:-3]]["tx_bytes_per_second"] = stats.tx_bytes_per_second[0]
+            bytes_per_second = (stats.rx_bytes_per_second[0], stats.tx_bytes_per_second[0])
 
         if not stats.tx_packets_per_second or not stats.rx_packets_per_second:
-            cnt[stats.timestamp.strftime('%Y-%m-%d %H:%M:%S.%f')[:-3]]["rx_pkts_per_second"] = 0
-            cnt[stats.timestamp.strftime('%Y-%m-%d %H:%M:%S.%f')[:-3]]["tx_pkts_per_second"] = 0
+            pkts_per_second = (0, 0)
         else:
-            cnt[stats.timestamp.strftime('%Y-%m-%d %H:%M:%S.%f')[:-3]]["rx_pkts_per_second"] = stats.rx_packets_per_second[0]
-            cnt[stats.timestamp.strftime('%Y-%m-%d %H:%M:%S.%f')[:-3]]["tx_pkts_per_second"] = stats.tx_packets_per_second[0]
+            pkts_per_second = (stats.rx_packets_per_second[0], stats.tx_packets_per_second[0])
+
+        self.bin_counter_data.append(stats.timestamp, stats.lvap.to_str(),
+                                     stats.rx_bytes[0], stats.tx_bytes[0],
+                                     stats.rx_packets[0], stats.tx_packets[0],
+                                     *bytes_per_second, *pkts_per_second)
 
     def lvap_stats_callback(self, stats):
         """ New stats available. """
 
-        lvap = stats.lvap
-
-        if stats.lvap.to_str() not in self.lvap_stats_data:
-            self.lvap_stats_data[stats.lvap.to_str()] = {}
-
-        cnt = self.lvap_stats_data[stats.lvap.to_str()]
-        cnt[stats.timestamp.strftime('%Y-%m-%d %H:%M:%S.%f')[:-3]] = {}
-
-        for mcs, value in stats.rates.items():
-            cnt[stats.timestamp.strftime('%Y-%m-%d %H:%M:%S.%f')[:-3]]["rate"] = mcs
-            cnt[stats.timestamp.strftime('%Y-%m-%d %H:%M:%S.%f')[:-3]]["throughput"] = value["throughput"]
-            cnt[stats.timestamp.strftime('%Y-%m-%d %H:%M:%S.%f')[:-3]]["prob"] = value["prob"]
-            cnt[stats.timestamp.strftime('%Y-%m-%d %H:%M:%S.%f')[:-3]]["cur_prob"] = value["cur_prob"]
-            cnt[stats.timestamp.strftime('%Y-%m-%d %H:%M:%S.%f')[:-3]]["attempts"] = value["attempts"]
-            cnt[stats.timestamp.strftime('%Y-%m-%d %H:%M:%S.%f')[:-3]]["success"] = value["success"]
-            cnt[stats.timestamp.strftime('%Y-%m-%d %H:%M:%S.%f')[:-3]]["cur_attempts"] = value["cur_attempts"]
-            cnt[stats.timestamp.strftime('%Y-%m-%d %H:%M:%S.%f')[:-3]]["cur_success"] = value["cur_success"]
-            cnt[stats.timestamp.strftime('%Y-%m-%d %H:%M:%S.%f')[:-3]]["hist_attempts"] = value["hist_attempts"]
-            cnt[stats.timestamp.strftime('%Y-%m-%d %H:%M:%S.%f')[:-3]]["hist_success"] = value["hist_success"]
-            cnt[stats.timestamp.strftime('%Y-%m-%d %H:%M:%S.%f')[:-3]]["attempts_bytes"] = value["attempts_bytes"]
-            cnt[stats.timestamp.strftime('%Y-%m-%d %H:%M:%S.%f')[:-3]]["success_bytes"] = value["success_bytes"]
-            cnt[stats.timestamp.strftime('%Y-%m-%d %H:%M:%S.%f')[:-3]]["cur_attempts_bytes"] = value["cur_attempts_bytes"]
-            cnt[stats.timestamp.strftime('%Y-%m-%d %H:%M:%S.%f')[:-3]]["cur_success_bytes"] = value["cur_success_bytes"]
-            cnt[stats.timestamp.strftime('%Y-%m-%d %H:%M:%S.%f')[:-3]]["hist_attempts_bytes"] = value["hist_attempts_bytes"]
-            cnt[stats.timestamp.strftime('%Y-%m-%d %H:%M:%S.%f')[:-3]]["hist_success_bytes"] = value["hist_success_bytes"]
+        if not stats.rates:
+            return
+
+        # only the last rate is recorded
+        mcs, value = list(stats.rates.items())[-1]
+
+        self.lvap_stats_data.append(stats.timestamp, stats.lvap.to_str(), mcs,
+                                    *[value[name] for name in LVAP_STATS[1:]])
 
     def to_dict(self):
         """ Return a JSON-serializable."""
 
         out = super().to_dict()
 
-        out['wifi_stats_data'] = self.wifi_stats_data
-        out['bin_counter_data'] = self.bin_counter_data
+        out['wifi_stats_data'] = self.wifi_stats_data.to_dict()
+        out['bin_counter_data'] = self.bin_counter_data.to_dict()
 
         return out
 
@@ -201,53 +201,35 @@ class AggregationPoller(EmpowerApp):
         if save is False:
             return
 
-        text_name = self.wtp_addr + "_wifi_stats.csv"
+        now = datetime.utcnow()
+        initial_time = datetime.strptime(self.initial_time, '%Y-%m-%d %H:%M:%S.%f')
 
-        now = datetime.utcnow().strftime('%Y-%m-%d %H:%M:%S.%f')[:-3]
-        now_parsed = datetime.strptime(now, '%Y-%m-%d %H:%M:%S.%f')
-        initial_time_parsed = datetime.strptime(self.initial_time, '%Y-%m-%d %H:%M:%S.%f')
+        constants = {field: getattr(self, field) for field in RUN_FIELDS}
 
-        for time, value in self.wifi_stats_data.items():
-            time_parsed = datetime.strptime(time, '%Y-%m-%d %H:%M:%S.%f')
+        self.wifi_stats_data.export(self.wtp_addr + "_wifi_stats.csv",
+                                    start=initial_time, end=now,
+                                    fields=RUN_FIELDS + ["timestamp"] + WIFI_STATS,
+                                    fmt="%s, %d, %s, %d, %d, %d, %s, %.2f, %.2f",
+                                    constants=constants)
 
-            if time_parsed >= initial_time_parsed and time_parsed < now_parsed:
-                with open(text_name, "a") as text_file:
-                    print("%s, %d, %s, %d, %d, %d, %s, %.2f, %.2f" % \
-                    (self.scheme, self.number, self.bandwidth, self.pkt_size, self.mcs_version, self.stations, time, value["rx_utlization"], value["tx_utlization"]), file=text_file)
+        self.wifi_stats_data.clear()
 
-        self.wifi_stats_data = {}
+        self.bin_counter_data.export(self.wtp_addr + "_bin_counters.csv",
+                                     start=initial_time, end=now,
+                                     fields=["lvap"] + RUN_FIELDS + ["timestamp"] + BIN_COUNTERS,
+                                     fmt="%s, %s, %d, %s, %d, %d, %d, %s" + ", %.2f" * len(BIN_COUNTERS),
+                                     constants=constants)
 
-        text_name = self.wtp_addr + "_bin_counters.csv"
+        self.bin_counter_data.clear()
 
-        for lvap, value in self.bin_counter_data.items():
-            for time, stats in value.items():
-                time_parsed = datetime.strptime(time, '%Y-%m-%d %H:%M:%S.%f')
+        self.lvap_stats_data.export(self.wtp_addr + "_lvap_stats.csv",
+                                    start=initial_time, end=now,
+                                    fields=["lvap"] + RUN_FIELDS + ["timestamp"] + LVAP_STATS,
+                                    fmt="%s, %s, %d, %s, %d, %d, %d, %s" + ", %.2f" * len(LVAP_STATS),
+                                    constants=constants)
 
-                if time_parsed >= initial_time_parsed and time_parsed < now_parsed:
-                    print("%s, %s, %d, %s, %d, %d, %d, %s, %.2f, %.2f, %.2f, %.2f, %.2f, %.2f, %.2f, %.2f" % \
-                        (lvap, self.scheme, self.number, self.bandwidth, self.pkt_size, self.mcs_version, self.stations, time,
-                            stats["rx_bytes"], stats["tx_bytes"], stats["rx_pkts"], stats["tx_pkts"], stats["rx_bytes_per_second"], stats["tx_bytes_per_second"], stats["rx_pkts_per_second"], stats["tx_pkts_per_second"]))
-                    with open(text_name, "a") as text_file:
-                        print("%s, %s, %d, %s, %d, %d, %d, %s, %.2f, %.2f, %.2f, %.2f, %.2f, %.2f, %.2f, %.2f" % \
-                        (lvap, self.scheme, self.number, self.bandwidth, self.pkt_size, self.mcs_version, self.stations, time,
-                            stats["rx_bytes"], stats["tx_bytes"], stats["rx_pkts"], stats["tx_pkts"], stats["rx_bytes_per_second"], stats["tx_bytes_per_second"], stats["rx_pkts_per_second"], stats["tx_pkts_per_second"]), file=text_file)
+        self.lvap_stats_data.clear()
 
-        self.bin_counter_data = {}
-
-        text_name = self.wtp_addr + "_lvap_stats.csv"
-
-        for lvap, value in self.lvap_stats_data.items():
-            for time, stats in value.items():
-                time_parsed = datetime.strptime(time, '%Y-%m-%d %H:%M:%S.%f')
-
-                if time_parsed >= initial_time_parsed and time_parsed < now_parsed:
-                    with open(text_name, "a") as text_file:
-                        print("%s, %s, %d, %s, %d, %d, %d, %s, %.2f, %.2f, %.2f, %.2f, %.2f, %.2f, %.2f, %.2f, %.2f, %.2f, %.2f, %.2f, %.2f, %.2f, %.2f, %.2f" % \
-                        (lvap, self.scheme, self.number, self.bandwidth, self.pkt_size, self.mcs_version, self.stations, time, 
-                            stats["rate"], stats["throughput"], stats["prob"], stats["cur_prob"], stats["attempts"], stats["success"], stats["cur_attempts"], stats["cur_success"], stats["hist_attempts"], stats["hist_success"], stats["attempts_bytes"], stats["success_bytes"], stats["cur_attempts_bytes"], stats["cur_success_bytes"], stats["hist_attempts_bytes"], stats["hist_success_bytes"]), file=text_file)
-
-        self.lvap_stats_data = {}
-            
     @property
     def scheme(self):
         """Get scheme mode."""
@@ -18,6 +18,9 @@
 """Wifi stats Poller App."""
 
 from empower.core.app import EmpowerApp
+from empower.core.recorder import Recorder
+from empower.core.recorder import STRING
+from empower.core.tracewriter import get_writer
 from empower.core.resourcepool import BT_HT20
 from empower.datatypes.etheraddress import EtherAddress
 from empower.main import RUNTIME
@@ -26,12 +29,21 @@ from empower.apps.pollers.platform_m5p_model import PlatformM5PModel
 from empower.apps.pollers.ns3_m5p_model import SimulatorM5PModel
 from empower.apps.pollers.platform_rf_model import PlatformRFModel
 from empower.apps.pollers.ns3_rf_model import SimulatorRFModel
+from empower.apps.pollers.rf_registry import PLATFORM_RF
+from empower.apps.pollers.rf_registry import SIMULATOR_RF
+from empower.apps.pollers.rf_registry import get_registry
+from empower.apps.pollers.m5p_tree import PLATFORM_M5P
+from empower.apps.pollers.m5p_tree import SIMULATOR_M5P
+from empower.apps.pollers.m5p_tree import get_trees
+
+import tornado.ioloop
+
+from functools import partial
 
 import time
 from datetime import datetime, date, time, timedelta
 from statistics import mean
 import os
-from copy import copy
 
 PHY_RATE = {0: 6500000,
             1: 13500000,
@@ -42,6 +54,27 @@ PHY_RATE = {0: 6500000,
             6: 58500000,
             7: 65000000}
 
+# the schemes using the random forest models, with their model set
+RF_SCHEMES = {"RF_Platform": PLATFORM_RF,
+              "RF_NS3": SIMULATOR_RF}
+
+# the schemes using the M5P models, with their model set
+M5P_SCHEMES = {"M5P_Platform": PLATFORM_M5P,
+               "M5P_NS3": SIMULATOR_M5P}
+
+MODEL_SCHEMES = set(RF_SCHEMES) | set(M5P_SCHEMES)
+
+# the statistics recorded for every lvap
+DUMP_STATS = ["mcs", "minstrel_throughput", "success_ratio", "success_ratio_per",
+              "last_attempts_bytes", "last_success_bytes",
+              "success_tx_channel_utilization", "hist_attempts", "hist_success",
+              "hist_attempts_bytes", "hist_success_bytes", "hist_rtx",
+              "hist_rtx_bytes", "global_channel_utilization",
+              "success_tx_global_channel_utilization"]
+
+# the run parameters prepended to every line of the csv files
+RUN_FIELDS = ["scheme", "number", "bandwidth", "pkt_size", "stations"]
+
 
 class AggregationPollerValidation(EmpowerApp):
     """WiFi Stats Poller Apps.
@@ -49,6 +82,8 @@ class AggregationPollerValidation(EmpowerApp):
     Command Line Parameters:
         tenant_id: tenant id
         every: loop period in ms (optional, default 5000ms)
+        model_dir: directory with the RF and M5P models (optional, default
+            the directory of this app)
 
     Example:
         ./empower-runtime.py apps.pollers.wifistatspoller \
@@ -57,12 +92,16 @@ class AggregationPollerValidation(EmpowerApp):
 
     def __init__(self, **kwargs):
 
+        self.model_dir = None
+        self.registry = None
+
         super().__init__(**kwargs)
 
         # app parameters
         self.wifi_stats_data = {}
         self.lvap_stats_data = {}
-        self.dump_data = {}
+        self.dump_data = \
+            Recorder([("lvap", STRING)] + [(name, 'd') for name in DUMP_STATS])
 
         self._save_data = False
         self._scheme = "NO_AGGREGATION"
@@ -81,6 +120,10 @@ class AggregationPollerValidation(EmpowerApp):
 
         self.platform_model = {}
 
+        # lvaps waiting to be scored by the RF models, per wtp
+        self.rf_pending = {}
+        self.rf_scoring = set()
+
         self.individual_results = {}
         self.individual_results_cum = {}
         self.bin_counter_data = {}
@@ -303,11 +346,8 @@ class AggregationPollerValidation(EmpowerApp):
             value["success_tx_global_channel_utilization"] = success_tx_global_channel_utilization
 
         # To dump file for further analysis
-        if stats.lvap.to_str() not in self.dump_data:
-            self.dump_data[stats.lvap.to_str()] = {}
-
-        data = self.dump_data[stats.lvap.to_str()]
-        data[stats.timestamp.strftime('%Y-%m-%d %H:%M:%S.%f')[:-3]] = copy(cnt)
+        self.dump_data.append(stats.timestamp, stats.lvap.to_str(),
+                              *[cnt[name] for name in DUMP_STATS])
 
         if stats.lvap.to_str() != "18:5E:0F:E3:B8:45" and self.scheme != "A-MSDU" and self.scheme != "NO_AGGREGATION":
             if self.bin_counter_data[stats.lvap.to_str()]["tx_bytes_per_second"] < 100:
@@ -316,22 +356,24 @@ class AggregationPollerValidation(EmpowerApp):
             # ML model execution. The reason to be done here is because we are sure that the statistic information is updated.
             mcs_length_combination = {}
             if stats.lvap.to_str() in self.platform_model:
-                self.platform_model[stats.lvap.to_str()].mcs = best_mcs%8
+                self.platform_model[stats.lvap.to_str()].cur_mcs = best_mcs%8
                 self.platform_model[stats.lvap.to_str()].last_mcs = self.last_mcs[stats.lvap.to_str()]
                 self.platform_model[stats.lvap.to_str()].last_length = self.last_length[stats.lvap.to_str()]
                 self.platform_model[stats.lvap.to_str()].statistics = cnt
 
-                mcs_length_combination = self.platform_model[stats.lvap.to_str()].estimate_optimal_length()
+                # all the lvaps of a wtp are scored in a single batch
+                self.score_lvap(lvap, best_mcs%8)
+                mcs_length_combination = None
             else:
                 print("There is no model??")
                 if self.scheme == "M5P_Platform":
-                    self.platform_model[stats.lvap.to_str()] = PlatformM5PModel(None, None, best_mcs%8, cnt)
+                    self.platform_model[stats.lvap.to_str()] = PlatformM5PModel(None, None, best_mcs%8, cnt, self.registry)
                 elif self.scheme == "M5P_NS3":
-                    self.platform_model[stats.lvap.to_str()] = SimulatorM5PModel(None, None, best_mcs%8, cnt)
+                    self.platform_model[stats.lvap.to_str()] = SimulatorM5PModel(None, None, best_mcs%8, cnt, self.registry)
                 elif self.scheme == "RF_Platform":
-                    self.platform_model[stats.lvap.to_str()] = PlatformRFModel(None, None, best_mcs%8, cnt)
+                    self.platform_model[stats.lvap.to_str()] = PlatformRFModel(None, None, best_mcs%8, cnt, self.registry)
                 elif self.scheme == "RF_NS3":
-                    self.platform_model[stats.lvap.to_str()] = SimulatorRFModel(None, None, best_mcs%8, cnt)
+                    self.platform_model[stats.lvap.to_str()] = SimulatorRFModel(None, None, best_mcs%8, cnt, self.registry)
 
                 # print("*******prev stats", self.platform_model[stats.lvap.to_str()].previous_statistics)
                 mcs_length_combination = self.platform_model[stats.lvap.to_str()].estimate_optimal_length()
@@ -341,24 +383,8 @@ class AggregationPollerValidation(EmpowerApp):
                 self.last_mcs[stats.lvap.to_str()] = 0
                 self.last_length[stats.lvap.to_str()] = 0
 
-            print("++++++ Attention ++++++")
-            print("Change in lvap ", stats.lvap.to_str())
-            print("New MCS", best_mcs%8)
-            print("New value ", mcs_length_combination)
-
-            if self.last_length[stats.lvap.to_str()] != mcs_length_combination["length"]:
-                self.update_counters(stats.lvap.to_str())
-                txp = lvap.blocks[0].tx_policies[EtherAddress(lvap.addr)]
-                txp.max_amsdu_len = mcs_length_combination["length"]
-                print(txp)
-            
-            self.last_length[stats.lvap.to_str()] = mcs_length_combination["length"]
-            self.last_mcs[stats.lvap.to_str()] = best_mcs%8
-
-            # MCS and lengths are stored for the plots
-            if mcs_length_combination["length"] not in self.hist_length[stats.lvap.to_str()]:
-                self.hist_length[stats.lvap.to_str()][mcs_length_combination["length"]] = 0
-            self.hist_length[stats.lvap.to_str()][mcs_length_combination["length"]] += 1
+            if mcs_length_combination is not None:
+                self.set_length(lvap, best_mcs%8, mcs_length_combination)
 
         self.hist_mcs[stats.lvap.to_str()][(best_mcs%8)] += 1
 
@@ -417,6 +443,114 @@ class AggregationPollerValidation(EmpowerApp):
         self.individual_results[stats.lvap.to_str()]["hist_rtx"] = temp_counter["hist_rtx"]
         self.individual_results[stats.lvap.to_str()]["hist_rtx_bytes"] = temp_counter["hist_rtx_bytes"]
 
+    def set_length(self, lvap, mcs, mcs_length_combination):
+        """Apply the frame length selected for an LVAP."""
+
+        print("++++++ Attention ++++++")
+        print("Change in lvap ", lvap.addr.to_str())
+        print("New MCS", mcs)
+        print("New value ", mcs_length_combination)
+
+        if self.last_length[lvap.addr.to_str()] != mcs_length_combination["length"]:
+            self.update_counters(lvap.addr.to_str())
+            txp = lvap.blocks[0].tx_policies[EtherAddress(lvap.addr)]
+            txp.max_amsdu_len = mcs_length_combination["length"]
+            print(txp)
+
+        self.last_length[lvap.addr.to_str()] = mcs_length_combination["length"]
+        self.last_mcs[lvap.addr.to_str()] = mcs
+
+        # MCS and lengths are stored for the plots
+        if mcs_length_combination["length"] not in self.hist_length[lvap.addr.to_str()]:
+            self.hist_length[lvap.addr.to_str()][mcs_length_combination["length"]] = 0
+        self.hist_length[lvap.addr.to_str()][mcs_length_combination["length"]] += 1
+
+    def score_lvap(self, lvap, mcs):
+        """Queue an LVAP for the next batch of its WTP."""
+
+        wtp = lvap.blocks[0].radio.addr
+
+        self.rf_pending.setdefault(wtp, {})[lvap.addr.to_str()] = (lvap, mcs)
+
+        if wtp in self.rf_scoring:
+            return
+
+        self.rf_scoring.add(wtp)
+
+        tornado.ioloop.IOLoop.current().add_callback(self.score_wtp, wtp)
+
+    def score_wtp(self, wtp):
+        """Score all the queued LVAPs of a WTP in one batch."""
+
+        pending = self.rf_pending.pop(wtp, {})
+        scheduled = False
+
+        try:
+
+            if not pending or self.scheme not in MODEL_SCHEMES:
+                return
+
+            batch = []
+            rows = []
+
+            for lvap_addr_str, (lvap, mcs) in pending.items():
+
+                model = self.platform_model.get(lvap_addr_str)
+
+                # the models are dropped when the scheme changes
+                if not model:
+                    continue
+
+                batch.append((lvap_addr_str, lvap, mcs))
+                rows.append((mcs, model.features_row()))
+
+            if not batch:
+                return
+
+            future = self.registry.predict_batch_async(rows)
+
+            tornado.ioloop.IOLoop.current().add_future(
+                future, partial(self.wtp_scored, wtp, batch))
+
+            scheduled = True
+
+        finally:
+            # otherwise the lvaps of the wtp would never be scored again
+            if not scheduled:
+                self.rf_scoring.discard(wtp)
+
+    def wtp_scored(self, wtp, batch, future):
+        """Select the frame length of the LVAPs scored in a batch."""
+
+        self.rf_scoring.discard(wtp)
+
+        try:
+            results = future.result()
+        except Exception as ex:
+            self.log.exception("Length estimation failed: %s", ex)
+            results = []
+
+        try:
+
+            for (lvap_addr_str, lvap, mcs), expected in zip(batch, results):
+
+                model = self.platform_model.get(lvap_addr_str)
+
+                # the lvap left or the scheme changed while scoring
+                if lvap.addr not in RUNTIME.lvaps or not model or \
+                        self.scheme not in MODEL_SCHEMES:
+                    continue
+
+                self.set_length(lvap, mcs, model.select_length(expected))
+
+        finally:
+
+            # lvaps queued while the batch was being scored
+            if self.rf_pending.get(wtp):
+                self.rf_scoring.add(wtp)
+                tornado.ioloop.IOLoop.current().add_callback(self.score_wtp,
+                                                             wtp)
+
     def update_counters(self, lvap_addr_str):
         self.individual_results_cum[lvap_addr_str]["hist_attempts"] += self.individual_results[lvap_addr_str]["hist_attempts"]
         self.individual_results_cum[lvap_addr_str]["hist_attempts_bytes"] += self.individual_results[lvap_addr_str]["hist_attempts_bytes"]
@@ -468,52 +602,39 @@ class AggregationPollerValidation(EmpowerApp):
 
         self._save_data = save
 
-        text_name = "validation_results.csv"
-        now = datetime.utcnow().strftime('%Y-%m-%d %H:%M:%S.%f')[:-3]
-        now_parsed = datetime.strptime(now, '%Y-%m-%d %H:%M:%S.%f')
-        initial_time_parsed = datetime.strptime(self.initial_time, '%Y-%m-%d %H:%M:%S.%f')
-
-        for lvap, value in self.dump_data.items():
-            for time, stats in value.items():
-                time_parsed = datetime.strptime(time, '%Y-%m-%d %H:%M:%S.%f')
-
-                if time_parsed >= initial_time_parsed and time_parsed < now_parsed:
-                    with open(text_name, "a") as text_file:
-                        print("%s, %s, %d, %s, %d, %d, %s, %.2f, %.2f, %.2f, %.2f, %.2f, %.2f, %.7f, %.2f, %.2f, %.2f, %.2f, %.2f, %.2f, %.2f, %.7f" % \
-                        (lvap, self.scheme, self.number, self.bandwidth, self.pkt_size, self.stations, time, 
-                            stats["mcs"], stats["minstrel_throughput"], stats["success_ratio"], stats["success_ratio_per"], stats["last_attempts_bytes"], stats["last_success_bytes"],
-                            stats["success_tx_channel_utilization"], stats["hist_attempts"], stats["hist_success"], stats["hist_attempts_bytes"], stats["hist_success_bytes"],
-                            stats["hist_rtx"], stats["hist_rtx_bytes"], stats["global_channel_utilization"], stats["success_tx_global_channel_utilization"]), file=text_file)
+        now = datetime.utcnow()
+        initial_time = datetime.strptime(self.initial_time, '%Y-%m-%d %H:%M:%S.%f')
 
-        text_name = "length_distribution.csv"
+        self.dump_data.export("validation_results.csv",
+                              start=initial_time, end=now,
+                              fields=["lvap"] + RUN_FIELDS + ["timestamp"] + DUMP_STATS,
+                              fmt="%s, %s, %d, %s, %d, %d, %s, %.2f, %.2f, %.2f, %.2f, %.2f, %.2f, %.7f, %.2f, %.2f, %.2f, %.2f, %.2f, %.2f, %.2f, %.7f",
+                              constants={field: getattr(self, field) for field in RUN_FIELDS})
 
-        for lvap, value in self.hist_length.items():
-            for size, times in value.items():
-                with open(text_name, "a") as text_file:
-                    print("%s, %s, %d, %s, %d, %d, %d, %d" % \
-                    (lvap, self.scheme, self.number, self.bandwidth, self.pkt_size, self.stations, size, times), file=text_file)
+        writer = get_writer()
 
-        text_name = "mcs_distribution.csv"
+        writer.writelines("length_distribution.csv",
+                          ["%s, %s, %d, %s, %d, %d, %d, %d\n" % \
+                           (lvap, self.scheme, self.number, self.bandwidth, self.pkt_size, self.stations, size, times)
+                           for lvap, value in self.hist_length.items()
+                           for size, times in value.items()])
 
-        for lvap, value in self.hist_mcs.items():
-            for mcsi, times in value.items():
-                with open(text_name, "a") as text_file:
-                    print("%s, %s, %d, %s, %d, %d, %d, %d" % \
-                    (lvap, self.scheme, self.number, self.bandwidth, self.pkt_size, self.stations, mcsi, times), file=text_file)
+        writer.writelines("mcs_distribution.csv",
+                          ["%s, %s, %d, %s, %d, %d, %d, %d\n" % \
+                           (lvap, self.scheme, self.number, self.bandwidth, self.pkt_size, self.stations, mcsi, times)
+                           for lvap, value in self.hist_mcs.items()
+                           for mcsi, times in value.items()])
 
         for lvap in list(RUNTIME.lvaps.values()):
             if self.scheme == "A-MSDU" or self.scheme == "NO_AGGREGATION":
                 self.update_counters(lvap.addr.to_str())
 
-        text_name = "validation_individual_results.csv"
-
-        for lvap, value in self.individual_results_cum.items():
-            # for mcsi, times in value.items():
-            with open(text_name, "a") as text_file:
-                print("%s, %s, %d, %s, %d, %d, %f, %f, %f, %f, %f, %f, %f, %f" % \
-                (lvap, self.scheme, self.number, self.bandwidth, self.pkt_size, self.stations, value["hist_success_ratio_per"],\
-                value["hist_attempts"], value["hist_attempts_bytes"], value["hist_success"], value["hist_success_bytes"], value["hist_rtx"],\
-                value["hist_rtx_bytes"], value["global_channel_utilization"]),file=text_file)
+        writer.writelines("validation_individual_results.csv",
+                          ["%s, %s, %d, %s, %d, %d, %f, %f, %f, %f, %f, %f, %f, %f\n" % \
+                           (lvap, self.scheme, self.number, self.bandwidth, self.pkt_size, self.stations, value["hist_success_ratio_per"],\
+                           value["hist_attempts"], value["hist_attempts_bytes"], value["hist_success"], value["hist_success_bytes"], value["hist_rtx"],\
+                           value["hist_rtx_bytes"], value["global_channel_utilization"])
+                           for lvap, value in self.individual_results_cum.items()])
         
         # self.lvap_stats_data = {}
             
@@ -527,7 +648,14 @@ class AggregationPollerValidation(EmpowerApp):
     def scheme(self, scheme):
         """Set the scheme."""
 
+        # the models are loaded and validated before switching scheme
+        if scheme in RF_SCHEMES:
+            self.registry = get_registry(RF_SCHEMES[scheme], self.model_dir)
+        elif scheme in M5P_SCHEMES:
+            self.registry = get_trees(M5P_SCHEMES[scheme], self.model_dir)
+
         self._scheme = scheme
+        self.platform_model = {}
 
         # Individual and global results are stored for the plots
         for lvap in list(RUNTIME.lvaps.values()):
@@ -659,7 +787,8 @@ class AggregationPollerValidation(EmpowerApp):
         self._initial_time = self._initial_time.strftime('%Y-%m-%d %H:%M:%S.%f')[:-3]
 
 
-def launch(tenant_id, every=1000):
+def launch(tenant_id, every=1000, model_dir=None):
     """ Initialize the module. """
 
-    return AggregationPollerValidation(tenant_id=tenant_id, every=every)
\ No newline at end of file
+    return AggregationPollerValidation(tenant_id=tenant_id, every=every,
+                                       model_dir=model_dir)
\ No newline at end of file
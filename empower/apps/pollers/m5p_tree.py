@@ -0,0 +1,515 @@
+#!/usr/bin/env python3
+#
+# Copyright (c) 2019 Roberto Riggio
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied. See the License for the
+# specific language governing permissions and limitations
+# under the License.
+
+"""Table-driven evaluator for the M5P frame length selection models.
+
+There is one M5P model tree for every (mcs, length) pair, predicting the
+throughput expected when sending frames of that length at that MCS. A tree
+is stored as an ordered list of rules:
+
+    {"if": [[feature, low, high], ...],
+     "coefficients": {feature: coefficient, ...},
+     "intercept": intercept}
+
+The first rule whose conditions are all met (low < value <= high, where a
+null bound is unbounded) gives the expected throughput as a linear function
+of the features. The last rule of a tree has no conditions.
+
+The trees of a model set are stored in <name>.json. They are evaluated with
+NumPy for all the candidate lengths and many feature rows at once.
+
+The JSON files can be generated from model classes encoding every tree as a
+mcs<N>_<LENGTH>() method made of an if/elif/else chain of linear formulas:
+
+    python -m empower.apps.pollers.m5p_tree <source.py> <class> <name.json>
+
+The generated trees are checked against the methods of the class over a
+grid of inputs built around the split thresholds.
+"""
+
+import ast
+import importlib.util
+import itertools
+import json
+import os
+import sys
+
+from concurrent.futures import Future
+
+import numpy as np
+
+# the directory containing the model sets
+MODELS_DIR = os.path.dirname(os.path.abspath(__file__))
+
+MCS = range(8)
+
+LENGTHS = [550, 1024, 2048, 3839]
+
+PLATFORM_M5P = "platformm5p"
+SIMULATOR_M5P = "simulatorm5p"
+
+# the model inputs
+FEATURES = {
+    PLATFORM_M5P: ["last_attempts_bytes", "success_ratio",
+                   "global_channel_utilization"],
+    SIMULATOR_M5P: ["success_tx_global_channel_utilization",
+                    "success_ratio_per"],
+}
+
+TREES = {}
+
+
+class M5PTrees:
+    """M5P model set.
+
+    Attributes:
+        name: the name of the model set
+        features: the names of the model inputs
+        trees: the rules of every tree, keyed on the (mcs, length) tuple
+    """
+
+    def __init__(self, name, features, trees):
+
+        self.name = name
+        self.features = list(features)
+        self.trees = {}
+
+        # the rules of the trees of an mcs, padded to the same length
+        self.__lows = {}
+        self.__highs = {}
+        self.__coefficients = {}
+        self.__intercepts = {}
+
+        for mcs in MCS:
+
+            if any((mcs, length) not in trees for length in LENGTHS):
+                raise ValueError("Missing %s trees for mcs %u" % (name, mcs))
+
+            self.trees.update({(mcs, length): trees[(mcs, length)]
+                               for length in LENGTHS})
+
+            self.__compile(mcs)
+
+    def __compile(self, mcs):
+        """Build the rule tables of an MCS."""
+
+        size = max(len(self.trees[(mcs, length)]) for length in LENGTHS)
+        shape = (len(LENGTHS), size, len(self.features))
+
+        # padding rules never match
+        lows = np.full(shape, np.inf)
+        highs = np.full(shape, np.inf)
+        coefficients = np.zeros(shape)
+        intercepts = np.zeros(shape[:2])
+
+        for index, length in enumerate(LENGTHS):
+
+            rules = self.trees[(mcs, length)]
+
+            if not rules or rules[-1]["if"]:
+                raise ValueError("No default rule in %s tree mcs%u_%u" %
+                                 (self.name, mcs, length))
+
+            for position, rule in enumerate(rules):
+
+                lows[index, position, :] = -np.inf
+
+                for feature, low, high in rule["if"]:
+                    column = self.features.index(feature)
+                    if low is not None:
+                        lows[index, position, column] = \
+                            max(lows[index, position, column], low)
+                    if high is not None:
+                        highs[index, position, column] = \
+                            min(highs[index, position, column], high)
+
+                for feature, value in rule["coefficients"].items():
+                    column = self.features.index(feature)
+                    coefficients[index, position, column] = value
+
+                intercepts[index, position] = rule["intercept"]
+
+        self.__lows[mcs] = lows
+        self.__highs[mcs] = highs
+        self.__coefficients[mcs] = coefficients
+        self.__intercepts[mcs] = intercepts
+
+    def evaluate(self, mcs, data):
+        """Return the expected throughput of every length for every row.
+
+        Args:
+            mcs: the MCS
+            data: an array with one row per sample, ordered as self.features
+
+        Returns:
+            An array with one row per sample and one column per length
+        """
+
+        data = np.asarray(data, dtype=float).reshape(-1, len(self.features))
+        samples = data[:, None, None, :]
+
+        # the first matching rule of every tree, for every sample
+        matches = np.all((samples > self.__lows[mcs]) &
+                         (samples <= self.__highs[mcs]), axis=3)
+        rules = matches.argmax(axis=2)
+
+        trees = np.arange(len(LENGTHS))
+        coefficients = self.__coefficients[mcs][trees, rules]
+        intercepts = self.__intercepts[mcs][trees, rules]
+
+        return np.einsum('sf,slf->sl', data, coefficients) + intercepts
+
+    def predict(self, mcs, row):
+        """Return the expected throughput of every length for one row."""
+
+        return self.evaluate(mcs, [row])[0].tolist()
+
+    def predict_batch(self, rows):
+        """Score a batch of feature rows.
+
+        Args:
+            rows: a list of (mcs, features) tuples, where features is a list
+                ordered as self.features
+
+        Returns:
+            A list with, for every row, the throughput expected with each of
+            the frame lengths in LENGTHS
+        """
+
+        results = [None] * len(rows)
+        groups = {}
+
+        for index, (mcs, _) in enumerate(rows):
+            groups.setdefault(mcs, []).append(index)
+
+        for mcs, indexes in groups.items():
+
+            scores = self.evaluate(mcs, [rows[index][1] for index in indexes])
+
+            for position, index in enumerate(indexes):
+                results[index] = scores[position].tolist()
+
+        return results
+
+    def predict_batch_async(self, rows):
+        """Score a batch of feature rows.
+
+        The trees are cheap enough to be evaluated in the IOLoop, the
+        returned Future is already resolved.
+        """
+
+        future = Future()
+        future.set_result(self.predict_batch(rows))
+
+        return future
+
+    def to_dict(self):
+        """Return a JSON-serializable dictionary."""
+
+        trees = {}
+
+        for (mcs, length), rules in sorted(self.trees.items()):
+            trees.setdefault(str(mcs), {})[str(length)] = rules
+
+        return {'features': self.features, 'trees': trees}
+
+    @classmethod
+    def from_dict(cls, name, data):
+        """Build a model set from its dictionary representation."""
+
+        trees = {(int(mcs), int(length)): rules
+                 for mcs, lengths in data['trees'].items()
+                 for length, rules in lengths.items()}
+
+        return cls(name, data['features'], trees)
+
+
+def dumps(trees):
+    """Return the JSON representation of a model set, one rule per line."""
+
+    data = trees.to_dict()
+    lines = ['{', ' "features": %s,' % json.dumps(data['features']),
+             ' "trees": {']
+
+    for mcs_index, (mcs, lengths) in enumerate(data['trees'].items()):
+
+        lines.append('  "%s": {' % mcs)
+
+        for length_index, (length, rules) in enumerate(lengths.items()):
+
+            lines.append('   "%s": [' % length)
+            lines.append(",\n".join('    %s' % json.dumps(rule)
+                                    for rule in rules))
+            lines.append('   ]' + (',' if length_index < len(lengths) - 1
+                                   else ''))
+
+        lines.append('  }' + (',' if mcs_index < len(data['trees']) - 1
+                              else ''))
+
+    lines.extend([' }', '}', ''])
+
+    return "\n".join(lines)
+
+
+def get_trees(name, models_dir=None):
+    """Return the model set, loading it the first time it is requested."""
+
+    path = os.path.join(models_dir or MODELS_DIR, "%s.json" % name)
+
+    if path not in TREES:
+        with open(path) as models:
+            TREES[path] = M5PTrees.from_dict(name, json.load(models))
+
+    return TREES[path]
+
+
+def _linear(node, features):
+    """Return the coefficients and the intercept of a linear expression."""
+
+    if isinstance(node, ast.Constant) and isinstance(node.value, (int, float)):
+        return {}, node.value
+
+    if isinstance(node, ast.Attribute) and node.attr in features:
+        return {node.attr: 1}, 0
+
+    if isinstance(node, ast.UnaryOp) and isinstance(node.op, ast.USub):
+        coefficients, intercept = _linear(node.operand, features)
+        return {k: -v for k, v in coefficients.items()}, -intercept
+
+    if isinstance(node, ast.BinOp) and isinstance(node.op, (ast.Add, ast.Sub)):
+
+        left, left_intercept = _linear(node.left, features)
+        right, right_intercept = _linear(node.right, features)
+        sign = 1 if isinstance(node.op, ast.Add) else -1
+
+        for feature, value in right.items():
+            left[feature] = left.get(feature, 0) + sign * value
+
+        return left, left_intercept + sign * right_intercept
+
+    if isinstance(node, ast.BinOp) and isinstance(node.op, ast.Mult):
+
+        left, left_intercept = _linear(node.left, features)
+        right, right_intercept = _linear(node.right, features)
+
+        if left and right:
+            raise ValueError("Non linear term at line %u" % node.lineno)
+
+        if left:
+            left, right = right, left
+            left_intercept, right_intercept = right_intercept, left_intercept
+
+        return ({k: left_intercept * v for k, v in right.items()},
+                left_intercept * right_intercept)
+
+    raise ValueError("Unsupported expression at line %u" % node.lineno)
+
+
+def _conditions(node, features):
+    """Return the [feature, low, high] conditions of a test."""
+
+    tests = node.values if isinstance(node, ast.BoolOp) and \
+        isinstance(node.op, ast.And) else [node]
+
+    conditions = []
+
+    for test in tests:
+
+        if not isinstance(test, ast.Compare) or len(test.ops) != 1 or \
+                not isinstance(test.left, ast.Attribute) or \
+                test.left.attr not in features:
+            raise ValueError("Unsupported condition at line %u" %
+                             test.lineno)
+
+        _, bound = _linear(test.comparators[0], features)
+
+        if isinstance(test.ops[0], ast.Gt):
+            conditions.append([test.left.attr, bound, None])
+        elif isinstance(test.ops[0], ast.LtE):
+            conditions.append([test.left.attr, None, bound])
+        else:
+            raise ValueError("Unsupported comparison at line %u" %
+                             test.lineno)
+
+    return conditions
+
+
+def _rule(conditions, statements, features):
+    """Return the rule assigning expected_th in a branch."""
+
+    if len(statements) != 1 or not isinstance(statements[0], ast.Assign):
+        raise ValueError("Unsupported branch at line %u" %
+                         statements[0].lineno)
+
+    coefficients, intercept = _linear(statements[0].value, features)
+
+    return {"if": conditions,
+            "coefficients": coefficients,
+            "intercept": intercept}
+
+
+def _parse_method(method, features):
+    """Return the rules of a mcs<N>_<LENGTH>() method."""
+
+    rules = []
+    default = None
+
+    for statement in method.body:
+
+        if isinstance(statement, ast.Assign):
+            default = _rule([], [statement], features)
+
+        elif isinstance(statement, ast.If):
+
+            branch = statement
+
+            while True:
+
+                rules.append(_rule(_conditions(branch.test, features),
+                                   branch.body, features))
+
+                if len(branch.orelse) == 1 and \
+                        isinstance(branch.orelse[0], ast.If):
+                    branch = branch.orelse[0]
+                    continue
+
+                if branch.orelse:
+                    default = _rule([], branch.orelse, features)
+
+                break
+
+        elif not isinstance(statement, ast.Return):
+            raise ValueError("Unsupported statement at line %u" %
+                             statement.lineno)
+
+    if default is None:
+        raise ValueError("No default value in %s" % method.name)
+
+    rules.append(default)
+
+    return rules
+
+
+def parse_trees(source, class_name, name):
+    """Build a model set from the mcs<N>_<LENGTH>() methods of a class."""
+
+    features = FEATURES[name]
+    trees = {}
+
+    for node in ast.walk(ast.parse(source)):
+
+        if not isinstance(node, ast.ClassDef) or node.name != class_name:
+            continue
+
+        for method in node.body:
+
+            if not isinstance(method, ast.FunctionDef) or \
+                    not method.name.startswith("mcs"):
+                continue
+
+            mcs, length = method.name[3:].split("_")
+            trees[(int(mcs), int(length))] = _parse_method(method, features)
+
+    return M5PTrees(name, features, trees)
+
+
+def verify(trees, model_class, points=3):
+    """Compare a model set against the methods of a model class.
+
+    Every tree is evaluated over a grid made of the split thresholds of the
+    tree, the values just around them, and a few values outside of them.
+
+    Returns:
+        A list of (mcs, length, inputs, expected, actual) mismatches
+    """
+
+    mismatches = []
+
+    for (mcs, length), rules in sorted(trees.trees.items()):
+
+        values = {feature: {0.0} for feature in trees.features}
+
+        for rule in rules:
+            for feature, low, high in rule["if"]:
+                for bound in (low, high):
+                    if bound is None:
+                        continue
+                    delta = max(abs(bound) * 1e-6, 1e-6)
+                    values[feature].update(bound + delta * step for step
+                                           in range(-points, points + 1))
+
+        for feature in trees.features:
+            top = max(abs(x) for x in values[feature]) or 1
+            values[feature].update((-top, 2 * top))
+
+        grid = list(itertools.product(*[sorted(values[feature])
+                                        for feature in trees.features]))
+
+        actual = trees.evaluate(mcs, grid)[:, LENGTHS.index(length)]
+
+        model = model_class.__new__(model_class)
+        method = getattr(model, "mcs%u_%u" % (mcs, length))
+
+        for row, value in zip(grid, actual):
+
+            for feature, x in zip(trees.features, row):
+                setattr(model, feature, x)
+
+            expected = method()['expected_th']
+
+            if abs(expected - value) > 1e-9 * max(1, abs(expected)):
+                mismatches.append((mcs, length, row, expected, value))
+
+    return mismatches
+
+
+def main(argv):
+    """Generate the JSON model set from a model class."""
+
+    if len(argv) != 4:
+        print("Usage: %s <source.py> <class> <name.json>" % argv[0])
+        return 1
+
+    source, class_name, output = argv[1:]
+    name = os.path.splitext(os.path.basename(output))[0]
+
+    with open(source) as model_file:
+        trees = parse_trees(model_file.read(), class_name, name)
+
+    spec = importlib.util.spec_from_file_location("m5p_source", source)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+
+    mismatches = verify(trees, getattr(module, class_name))
+
+    for mismatch in mismatches[:20]:
+        print("mcs%u_%u%s: expected %r, got %r" % mismatch)
+
+    if mismatches:
+        print("%u mismatches, %s not written" % (len(mismatches), output))
+        return 1
+
+    with open(output, "w") as models:
+        models.write(dumps(trees))
+
+    print("Wrote %u trees to %s" % (len(trees.trees), output))
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv))
@@ -1,13 +1,15 @@
 #!/usr/bin/env python
 
-from sklearn.externals import joblib
-import pandas as pd
-import os
 from copy import copy
 
+from empower.apps.pollers.rf_registry import SIMULATOR_RF
+from empower.apps.pollers.rf_registry import LENGTHS
+from empower.apps.pollers.rf_registry import get_registry
+
 class SimulatorRFModel:
 
-	def __init__(self, last_mcs, last_length, cur_mcs, statistics):
+	def __init__(self, last_mcs, last_length, cur_mcs, statistics, registry=None):
+		self.registry = registry or get_registry(SIMULATOR_RF)
 		self.max_length_th = dict()
 		self.candidates = []
 
@@ -89,69 +91,20 @@ class SimulatorRFModel:
 		self.success_tx_global_channel_utilization = statistics["success_tx_global_channel_utilization"]
 		self.success_ratio_per = statistics["success_ratio_per"]
 
+	def features_row(self):
+		"""Return the model inputs."""
+
+		return [self.success_tx_global_channel_utilization,self.success_ratio_per]
+
 	def estimate_optimal_length(self):
+		"""Score the current statistics and return the best length."""
 
-		self.candidates = []
-		len_1 = None
-		len_2 = None
-		len_3 = None
-		len_4 = None
-
-		X_data = [self.success_tx_global_channel_utilization,self.success_ratio_per]
-		X_test = pd.DataFrame([X_data], columns=self.features)
-
-		if self.cur_mcs == 0:
-			len_1 = joblib.load('/home/estefania/5G-EmPOWER/empower-runtime/empower/apps/pollers/simulatorrf/mcs0_550.pkl')
-			len_2 = joblib.load('/home/estefania/5G-EmPOWER/empower-runtime/empower/apps/pollers/simulatorrf/mcs0_1024.pkl')
-			len_3 = joblib.load('/home/estefania/5G-EmPOWER/empower-runtime/empower/apps/pollers/simulatorrf/mcs0_2048.pkl')
-			len_4 = joblib.load('/home/estefania/5G-EmPOWER/empower-runtime/empower/apps/pollers/simulatorrf/mcs0_3839.pkl')
-
-		elif self.cur_mcs == 1:
-			len_1 = joblib.load('/home/estefania/5G-EmPOWER/empower-runtime/empower/apps/pollers/simulatorrf/mcs1_550.pkl')
-			len_2 = joblib.load('/home/estefania/5G-EmPOWER/empower-runtime/empower/apps/pollers/simulatorrf/mcs1_1024.pkl')
-			len_3 = joblib.load('/home/estefania/5G-EmPOWER/empower-runtime/empower/apps/pollers/simulatorrf/mcs1_2048.pkl')
-			len_4 = joblib.load('/home/estefania/5G-EmPOWER/empower-runtime/empower/apps/pollers/simulatorrf/mcs1_3839.pkl')
-
-		elif self.cur_mcs == 2:
-			len_1 = joblib.load('/home/estefania/5G-EmPOWER/empower-runtime/empower/apps/pollers/simulatorrf/mcs2_550.pkl')
-			len_2 = joblib.load('/home/estefania/5G-EmPOWER/empower-runtime/empower/apps/pollers/simulatorrf/mcs2_1024.pkl')
-			len_3 = joblib.load('/home/estefania/5G-EmPOWER/empower-runtime/empower/apps/pollers/simulatorrf/mcs2_2048.pkl')
-			len_4 = joblib.load('/home/estefania/5G-EmPOWER/empower-runtime/empower/apps/pollers/simulatorrf/mcs2_3839.pkl')
-
-		elif self.cur_mcs == 3:
-			len_1 = joblib.load('/home/estefania/5G-EmPOWER/empower-runtime/empower/apps/pollers/simulatorrf/mcs3_550.pkl')
-			len_2 = joblib.load('/home/estefania/5G-EmPOWER/empower-runtime/empower/apps/pollers/simulatorrf/mcs3_1024.pkl')
-			len_3 = joblib.load('/home/estefania/5G-EmPOWER/empower-runtime/empower/apps/pollers/simulatorrf/mcs3_2048.pkl')
-			len_4 = joblib.load('/home/estefania/5G-EmPOWER/empower-runtime/empower/apps/pollers/simulatorrf/mcs3_3839.pkl')
-
-		elif self.cur_mcs == 4:
-			len_1 = joblib.load('/home/estefania/5G-EmPOWER/empower-runtime/empower/apps/pollers/simulatorrf/mcs4_550.pkl')
-			len_2 = joblib.load('/home/estefania/5G-EmPOWER/empower-runtime/empower/apps/pollers/simulatorrf/mcs4_1024.pkl')
-			len_3 = joblib.load('/home/estefania/5G-EmPOWER/empower-runtime/empower/apps/pollers/simulatorrf/mcs4_2048.pkl')
-			len_4 = joblib.load('/home/estefania/5G-EmPOWER/empower-runtime/empower/apps/pollers/simulatorrf/mcs4_3839.pkl')
-
-		elif self.cur_mcs == 5:
-			len_1 = joblib.load('/home/estefania/5G-EmPOWER/empower-runtime/empower/apps/pollers/simulatorrf/mcs5_550.pkl')
-			len_2 = joblib.load('/home/estefania/5G-EmPOWER/empower-runtime/empower/apps/pollers/simulatorrf/mcs5_1024.pkl')
-			len_3 = joblib.load('/home/estefania/5G-EmPOWER/empower-runtime/empower/apps/pollers/simulatorrf/mcs5_2048.pkl')
-			len_4 = joblib.load('/home/estefania/5G-EmPOWER/empower-runtime/empower/apps/pollers/simulatorrf/mcs5_3839.pkl')
-
-		elif self.cur_mcs == 6:
-			len_1 = joblib.load('/home/estefania/5G-EmPOWER/empower-runtime/empower/apps/pollers/simulatorrf/mcs6_550.pkl')
-			len_2 = joblib.load('/home/estefania/5G-EmPOWER/empower-runtime/empower/apps/pollers/simulatorrf/mcs6_1024.pkl')
-			len_3 = joblib.load('/home/estefania/5G-EmPOWER/empower-runtime/empower/apps/pollers/simulatorrf/mcs6_2048.pkl')
-			len_4 = joblib.load('/home/estefania/5G-EmPOWER/empower-runtime/empower/apps/pollers/simulatorrf/mcs6_3839.pkl')
-
-		elif self.cur_mcs == 7:
-			len_1 = joblib.load('/home/estefania/5G-EmPOWER/empower-runtime/empower/apps/pollers/simulatorrf/mcs7_550.pkl')
-			len_2 = joblib.load('/home/estefania/5G-EmPOWER/empower-runtime/empower/apps/pollers/simulatorrf/mcs7_1024.pkl')
-			len_3 = joblib.load('/home/estefania/5G-EmPOWER/empower-runtime/empower/apps/pollers/simulatorrf/mcs7_2048.pkl')
-			len_4 = joblib.load('/home/estefania/5G-EmPOWER/empower-runtime/empower/apps/pollers/simulatorrf/mcs7_3839.pkl')
-
-		self.candidates.append(len_1.predict(X_test).tolist()[0])
-		self.candidates.append(len_2.predict(X_test).tolist()[0])
-		self.candidates.append(len_3.predict(X_test).tolist()[0])
-		self.candidates.append(len_4.predict(X_test).tolist()[0])
+		return self.select_length(self.registry.predict(self.cur_mcs, self.features_row()))
+
+	def select_length(self, expected):
+		"""Return the best length given the throughput expected with each length."""
+
+		self.candidates = list(expected)
 
 		if self.last_length:
 			if not self.previous_statistics:
@@ -193,14 +146,7 @@ class SimulatorRFModel:
 			backup_candidates = copy(self.candidates)
 			self.candidates = []
 			for index, value in enumerate(backup_candidates):
-				if (index == 0):
-					self.candidates.append({'length': 550, 'expected_th': value})
-				elif (index == 1):
-					self.candidates.append({'length': 1024, 'expected_th': value})
-				elif (index == 2):
-					self.candidates.append({'length': 2048, 'expected_th': value})
-				elif (index == 3):
-					self.candidates.append({'length': 3839, 'expected_th': value})
+				self.candidates.append({'length': LENGTHS[index], 'expected_th': value})
 
 		max_index = 0
 		if self.candidates:
@@ -0,0 +1,183 @@
+#!/usr/bin/env python3
+#
+# Copyright (c) 2019 Roberto Riggio
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied. See the License for the
+# specific language governing permissions and limitations
+# under the License.
+
+"""Registry of the random forest frame length selection models.
+
+There is one model for every (mcs, length) pair, predicting the throughput
+expected when sending frames of that length at that MCS. The models are
+loaded and validated once, when the registry is created, and then kept in
+memory. Several LVAPs can be scored in a single batch: the feature rows are
+grouped by MCS and every model is called once for the whole group.
+"""
+
+import os
+
+from concurrent.futures import ThreadPoolExecutor
+
+import pandas as pd
+import tornado.ioloop
+
+try:
+    import joblib
+except ImportError:
+    from sklearn.externals import joblib
+
+import empower.logger
+
+# the directory containing the model sets
+MODELS_DIR = os.path.dirname(os.path.abspath(__file__))
+
+MCS = range(8)
+
+LENGTHS = [550, 1024, 2048, 3839]
+
+PLATFORM_RF = "platformrf"
+SIMULATOR_RF = "simulatorrf"
+
+# the model inputs, the order matches the one used for the training
+FEATURES = {
+    PLATFORM_RF: ["minstrel_throughput", "success_ratio",
+                  "last_attempts_bytes", "global_channel_utilization"],
+    SIMULATOR_RF: ["success_tx_global_channel_utilization",
+                   "success_ratio_per"],
+}
+
+REGISTRIES = {}
+
+
+class RFModelRegistry:
+    """Random forest model set.
+
+    Attributes:
+        name: the name of the model set (the models subdirectory)
+        path: the directory with the models
+        features: the names of the model inputs
+        models: the models, keyed on the (mcs, length) tuple
+    """
+
+    def __init__(self, name, models_dir=None):
+
+        if name not in FEATURES:
+            raise ValueError("Invalid model set %s" % name)
+
+        self.name = name
+        self.path = os.path.join(models_dir or MODELS_DIR, name)
+        self.features = FEATURES[name]
+        self.models = {}
+        self.__executor = ThreadPoolExecutor(1)
+        self.log = empower.logger.get_logger()
+
+        self.load()
+
+    def load(self):
+        """Load and validate all the models of the set."""
+
+        models = {}
+        errors = []
+
+        for mcs in MCS:
+            for length in LENGTHS:
+
+                filename = \
+                    os.path.join(self.path, "mcs%u_%u.pkl" % (mcs, length))
+
+                try:
+                    model = joblib.load(filename)
+                except Exception as ex:
+                    errors.append("%s: %s" % (filename, ex))
+                    continue
+
+                if not hasattr(model, "predict"):
+                    errors.append("%s: not a predictor" % filename)
+                    continue
+
+                inputs = getattr(model, "n_features_in_",
+                                 getattr(model, "n_features_",
+                                         len(self.features)))
+
+                if inputs != len(self.features):
+                    errors.append("%s: %u features, expected %u" %
+                                  (filename, inputs, len(self.features)))
+                    continue
+
+                models[(mcs, length)] = model
+
+        if errors:
+            raise ValueError("Invalid %s models:\n%s" %
+                             (self.name, "\n".join(errors)))
+
+        self.models = models
+
+        self.log.info("Loaded %u %s models from %s", len(models), self.name,
+                      self.path)
+
+    def predict(self, mcs, row):
+        """Return the expected throughput of every length for one row."""
+
+        return self.predict_batch([(mcs, row)])[0]
+
+    def predict_batch(self, rows):
+        """Score a batch of feature rows.
+
+        Args:
+            rows: a list of (mcs, features) tuples, where features is a list
+                ordered as self.features
+
+        Returns:
+            A list with, for every row, the throughput expected with each of
+            the frame lengths in LENGTHS
+        """
+
+        results = [None] * len(rows)
+        groups = {}
+
+        for index, (mcs, _) in enumerate(rows):
+            groups.setdefault(mcs, []).append(index)
+
+        for mcs, indexes in groups.items():
+
+            data = pd.DataFrame([rows[index][1] for index in indexes],
+                                columns=self.features)
+
+            scores = [self.models[(mcs, length)].predict(data).tolist()
+                      for length in LENGTHS]
+
+            for position, index in enumerate(indexes):
+                results[index] = [score[position] for score in scores]
+
+        return results
+
+    def predict_batch_async(self, rows):
+        """Score a batch of feature rows outside of the IOLoop.
+
+        Returns:
+            A Future resolved with the result of predict_batch()
+        """
+
+        return tornado.ioloop.IOLoop.current().run_in_executor(
+            self.__executor, self.predict_batch, rows)
+
+
+def get_registry(name, models_dir=None):
+    """Return the model set, loading it the first time it is requested."""
+
+    path = os.path.join(models_dir or MODELS_DIR, name)
+
+    if path not in REGISTRIES:
+        REGISTRIES[path] = RFModelRegistry(name, models_dir)
+
+    return REGISTRIES[path]
@@ -17,9 +17,34 @@
 
 """Survey App."""
 
+import numpy as np
+
 from empower.core.app import EmpowerApp
 from empower.core.app import DEFAULT_PERIOD
 from empower.core.resourcepool import BANDS
+from empower.core.tracewriter import get_writer
+from empower.lvapp.summary.summary import FRAME_DTYPE
+from empower.lvapp.summary.summary import FramesView
+from empower.lvapp.summary.summary import to_address
+
+LINE = "%u,%g,%s,%d,%u,%s,%s,%s,%s,%s\n"
+
+
+def format_frame(frame):
+    """Return a frame as a CSV line."""
+
+    return LINE % (frame['tsft'], frame['rate'], frame['rtype'],
+                   frame['rssi'], frame['length'], frame['type'],
+                   frame['subtype'], frame['ra'], frame['ta'], frame['seq'])
+
+
+def load_frames(filename):
+    """Return the frames stored in a binary frame log.
+
+    The log is a sequence of FRAME_DTYPE records in native byte order.
+    """
+
+    return np.fromfile(filename, dtype=FRAME_DTYPE)
 
 
 class Survey(EmpowerApp):
@@ -28,6 +53,8 @@ class Survey(EmpowerApp):
     Command Line Parameters:
         tenant_id: tenant id
         every: loop period in ms (optional, default 5000ms)
+        binary: write binary frame logs instead of CSV files (optional,
+            default False)
 
     Example:
         ./empower-runtime.py apps.survey.survey \
@@ -35,8 +62,22 @@ class Survey(EmpowerApp):
     """
 
     def __init__(self, **kwargs):
+        self._binary = False
         super().__init__(**kwargs)
         self.links = {}
+        self.writer = get_writer()
+
+    @property
+    def binary(self):
+        """Return the binary parameter."""
+
+        return self._binary
+
+    @binary.setter
+    def binary(self, value):
+        """Set the binary parameter."""
+
+        self._binary = str(value).lower() in ("true", "1")
 
     def wtp_up(self, wtp):
         """New WTP."""
@@ -49,6 +90,7 @@ class Survey(EmpowerApp):
 
         out = super().to_dict()
         out['links'] = self.links
+        out['binary'] = self.binary
         return out
 
     def summary_callback(self, summary):
@@ -57,48 +99,47 @@ class Survey(EmpowerApp):
         self.log.info("New summary from %s addr %s frames %u", summary.block,
                       summary.addr, len(summary.frames))
 
-        # per block log
-        filename = "survey_%s_%u_%s.csv" % (summary.block.addr,
-                                            summary.block.channel,
-                                            BANDS[summary.block.band])
-
-        for frame in summary.frames:
-
-            line = "%u,%g,%s,%d,%u,%s,%s,%s,%s,%s\n" % \
-                (frame['tsft'], frame['rate'], frame['rtype'], frame['rssi'],
-                 frame['length'], frame['type'], frame['subtype'],
-                 frame['ra'], frame['ta'], frame['seq'])
+        block = "%s_%u_%s" % (summary.block.addr, summary.block.channel,
+                              BANDS[summary.block.band])
 
-            with open(filename, 'a') as file_d:
-                file_d.write(line)
+        frames = summary.frames
 
-        # per link log
-        for frame in summary.frames:
+        for addr, rssis in summary.rssi_histograms().items():
 
-            link = "%s_%s_%u_%s" % (frame['ta'], summary.block.addr,
-                                    summary.block.channel,
-                                    BANDS[summary.block.band])
-
-            filename = "link_%s.csv" % link
+            link = "%s_%s" % (addr, block)
 
             if link not in self.links:
                 self.links[link] = {}
 
-            if frame['rssi'] not in self.links[link]:
-                self.links[link][frame['rssi']] = 0
+            for rssi, count in rssis.items():
+                if rssi not in self.links[link]:
+                    self.links[link][rssi] = 0
+                self.links[link][rssi] += count
+
+        # per block log
+        if self.binary:
+            self.writer.write("survey_%s.bin" % block, frames.tobytes())
+        else:
+            lines = [format_frame(frame) for frame in FramesView(frames)]
+            self.writer.writelines("survey_%s.csv" % block, lines)
+
+        # per link log
+        transmitters, inverse = np.unique(frames['ta'], return_inverse=True)
 
-            self.links[link][frame['rssi']] += 1
+        for index, addr in enumerate(transmitters.tolist()):
 
-            line = "%u,%g,%s,%d,%u,%s,%s,%s,%s,%s\n" % \
-                (frame['tsft'], frame['rate'], frame['rtype'], frame['rssi'],
-                 frame['length'], frame['type'], frame['subtype'],
-                 frame['ra'], frame['ta'], frame['seq'])
+            selected = np.flatnonzero(inverse.ravel() == index)
+            filename = "link_%s_%s" % (to_address(addr), block)
 
-            with open(filename, 'a') as file_d:
-                file_d.write(line)
+            if self.binary:
+                self.writer.write(filename + ".bin",
+                                  frames[selected].tobytes())
+            else:
+                self.writer.writelines(filename + ".csv",
+                                       [lines[i] for i in selected])
 
 
-def launch(tenant_id, every=DEFAULT_PERIOD):
+def launch(tenant_id, every=DEFAULT_PERIOD, binary=False):
     """ Initialize the module. """
 
-    return Survey(tenant_id=tenant_id, every=every)
+    return Survey(tenant_id=tenant_id, every=every, binary=binary)
@@ -0,0 +1,431 @@
+#!/usr/bin/env python3
+#
+# Copyright (c) 2017, Estefanía Coronado
+# All rights reserved.
+#
+# Redistribution and use in source and binary forms, with or without
+# modification, are permitted provided that the following conditions are met:
+#    * Redistributions of source code must retain the above copyright
+#      notice, this list of conditions and the following disclaimer.
+#    * Redistributions in binary form must reproduce the above copyright
+#      notice, this list of conditions and the following disclaimer in the
+#      documentation and/or other materials provided with the distribution.
+#    * Neither the name of the CREATE-NET nor the
+#      names of its contributors may be used to endorse or promote products
+#      derived from this software without specific prior written permission.
+#
+# THIS SOFTWARE IS PROVIDED BY CREATE-NET ''AS IS'' AND ANY
+# EXPRESS OR IMPLIED WARRANTIES, INCLUDING, BUT NOT LIMITED TO, THE IMPLIED
+# WARRANTIES OF MERCHANTABILITY AND FITNESS FOR A PARTICULAR PURPOSE ARE
+# DISCLAIMED. IN NO EVENT SHALL CREATE-NET BE LIABLE FOR ANY
+# DIRECT, INDIRECT, INCIDENTAL, SPECIAL, EXEMPLARY, OR CONSEQUENTIAL DAMAGES
+# (INCLUDING, BUT NOT LIMITED TO, PROCUREMENT OF SUBSTITUTE GOODS OR SERVICES;
+# LOSS OF USE, DATA, OR PROFITS; OR BUSINESS INTERRUPTION) HOWEVER CAUSED AND
+# ON ANY THEORY OF LIABILITY, WHETHER IN CONTRACT, STRICT LIABILITY, OR TORT
+# (INCLUDING NEGLIGENCE OR OTHERWISE) ARISING IN ANY WAY OUT OF THE USE OF THIS
+# SOFTWARE, EVEN IF ADVISED OF THE POSSIBILITY OF SUCH DAMAGE.
+
+"""Incrementally maintained state of the wifi load balancing scheduler.
+
+Blocks and stations are given a dense index the first time they are seen.
+The RSSI of every (station, block) pair is kept in a NumPy matrix, the
+conflicts between blocks in adjacency sets, and, for every block, the
+running channel utilization, the utilization of the block plus its
+co-channel conflicting blocks (the conflict occupancy), and the traffic of
+the stations it serves. Every update only touches the entries it changes,
+so the cost of a scheduling decision depends on the size of the block
+being evaluated and not on the size of the network.
+
+Run this module to benchmark the scheduler on a synthetic network:
+
+    python3 -m empower.apps.wifiloadbalancing.schedulerstate \
+        --blocks 200 --stations 5000
+"""
+
+import argparse
+import random
+import time
+
+import numpy as np
+
+# candidates with a lower RSSI are never selected
+RSSI_THRESHOLD = -85
+
+INITIAL_SIZE = 64
+
+
+def _grow(values, size, fill):
+    """Return a copy of an array with a larger first dimension."""
+
+    out = np.full((size,) + values.shape[1:], fill, dtype=values.dtype)
+    out[:len(values)] = values
+
+    return out
+
+
+class SchedulerState:
+    """Incrementally maintained scheduler state.
+
+    Blocks and stations can be identified by any hashable key (the app
+    uses the resource blocks and the LVAP addresses).
+
+    Attributes:
+        blocks: the index of every block
+        stations: the index of every station
+        neighbours: the indexes of the conflicting blocks of every block
+        heard: the indexes of the blocks hearing every station
+        served: the indexes of the stations served by every block
+        rssi: the RSSI matrix (stations x blocks), NaN if unknown
+        utilization: the channel utilization of every block
+        occupancy: the conflict occupancy of every block
+        traffic: the tx and rx bytes per second of every station
+        block_traffic: the tx and rx bytes per second of every block
+        serving: the index of the serving block of every station (or -1)
+        channel: the channel of every block
+    """
+
+    def __init__(self):
+
+        self.blocks = {}
+        self.block_keys = []
+        self.stations = {}
+        self.station_keys = []
+        self.neighbours = []
+        self.heard = []
+        self.served = []
+
+        self.rssi = np.full((INITIAL_SIZE, INITIAL_SIZE), np.nan)
+        self.utilization = np.zeros(INITIAL_SIZE)
+        self.occupancy = np.zeros(INITIAL_SIZE)
+        self.block_traffic = np.zeros((INITIAL_SIZE, 2))
+        self.channel = np.zeros(INITIAL_SIZE, dtype=int)
+        self.traffic = np.zeros((INITIAL_SIZE, 2))
+        self.serving = np.full(INITIAL_SIZE, -1, dtype=int)
+
+        self.total_utilization = 0.0
+
+    def __grow_blocks(self):
+        """Double the capacity of the block arrays."""
+
+        size = 2 * len(self.utilization)
+
+        rssi = np.full((self.rssi.shape[0], size), np.nan)
+        rssi[:, :self.rssi.shape[1]] = self.rssi
+        self.rssi = rssi
+
+        self.utilization = _grow(self.utilization, size, 0)
+        self.occupancy = _grow(self.occupancy, size, 0)
+        self.block_traffic = _grow(self.block_traffic, size, 0)
+        self.channel = _grow(self.channel, size, 0)
+
+    def __grow_stations(self):
+        """Double the capacity of the station arrays."""
+
+        size = 2 * len(self.serving)
+
+        self.rssi = _grow(self.rssi, size, np.nan)
+        self.traffic = _grow(self.traffic, size, 0)
+        self.serving = _grow(self.serving, size, -1)
+
+    def add_block(self, block, channel):
+        """Add a block and return its index."""
+
+        if block in self.blocks:
+            return self.blocks[block]
+
+        index = len(self.block_keys)
+
+        if index == len(self.utilization):
+            self.__grow_blocks()
+
+        self.blocks[block] = index
+        self.block_keys.append(block)
+        self.neighbours.append(set())
+        self.served.append(set())
+
+        self.utilization[index] = 0
+        self.occupancy[index] = 0
+        self.block_traffic[index] = 0
+        self.channel[index] = channel
+
+        return index
+
+    def add_station(self, station, block):
+        """Add a station served by a block (forgetting the blocks it heard).
+
+        Returns:
+            The station index
+        """
+
+        if station in self.stations:
+            index = self.stations[station]
+            self.__detach(index)
+            self.rssi[index, :] = np.nan
+        else:
+            index = len(self.station_keys)
+            if index == len(self.serving):
+                self.__grow_stations()
+            self.stations[station] = index
+            self.station_keys.append(station)
+            self.heard.append(set())
+
+        self.traffic[index] = 0
+        self.heard[index] = {self.blocks[block]}
+        self.__attach(index, self.blocks[block])
+
+        return index
+
+    def __attach(self, index, block_index):
+        """Make a block the serving block of a station."""
+
+        self.serving[index] = block_index
+        self.served[block_index].add(index)
+        self.block_traffic[block_index] += self.traffic[index]
+
+    def __detach(self, index):
+        """Remove a station from its serving block."""
+
+        block_index = self.serving[index]
+
+        if block_index < 0:
+            return
+
+        self.served[block_index].discard(index)
+        self.block_traffic[block_index] -= self.traffic[index]
+        self.serving[index] = -1
+
+    def nb_stations(self, block):
+        """Return the number of stations served by a block."""
+
+        return len(self.served[self.blocks[block]])
+
+    def move_station(self, station, block):
+        """Move a station to a new serving block, resetting its traffic."""
+
+        index = self.stations[station]
+
+        self.__detach(index)
+        self.traffic[index] = 0
+        self.__attach(index, self.blocks[block])
+
+    def set_traffic(self, station, tx_bytes, rx_bytes):
+        """Set the bytes per second sent and received by a station."""
+
+        index = self.stations[station]
+        delta = np.array([tx_bytes, rx_bytes]) - self.traffic[index]
+
+        self.traffic[index] += delta
+
+        if self.serving[index] >= 0:
+            self.block_traffic[self.serving[index]] += delta
+
+    def get_traffic(self, block):
+        """Return the bytes per second sent and received by a block."""
+
+        return float(self.block_traffic[self.blocks[block]].sum())
+
+    def set_rssi(self, station, block, rssi):
+        """Set the RSSI of a station at a block.
+
+        The first time a station is heard by a block, the block conflicts
+        with all the other blocks hearing the same station.
+        """
+
+        index = self.stations[station]
+        block_index = self.blocks[block]
+
+        self.rssi[index, block_index] = np.nan if rssi is None else rssi
+
+        heard = self.heard[index]
+
+        if block_index in heard:
+            return
+
+        for other in heard:
+            self.add_conflict(block_index, other)
+
+        heard.add(block_index)
+
+    def clear_rssi(self, station, block):
+        """Forget the RSSI of a station at a block."""
+
+        if station in self.stations:
+            self.rssi[self.stations[station], self.blocks[block]] = np.nan
+
+    def add_conflict(self, first, second):
+        """Add a conflict between two blocks (by index)."""
+
+        if first == second or second in self.neighbours[first]:
+            return
+
+        self.neighbours[first].add(second)
+        self.neighbours[second].add(first)
+
+        if self.channel[first] == self.channel[second]:
+            self.occupancy[first] += self.utilization[second]
+            self.occupancy[second] += self.utilization[first]
+
+    def get_conflicts(self, block):
+        """Return the blocks conflicting with a block."""
+
+        return [self.block_keys[index]
+                for index in self.neighbours[self.blocks[block]]]
+
+    def set_utilization(self, block, utilization):
+        """Set the channel utilization of a block."""
+
+        index = self.blocks[block]
+        delta = utilization - self.utilization[index]
+
+        if not delta:
+            return
+
+        self.utilization[index] = utilization
+        self.occupancy[index] += delta
+        self.total_utilization += delta
+
+        channel = self.channel[index]
+
+        for neighbour in self.neighbours[index]:
+            if self.channel[neighbour] == channel:
+                self.occupancy[neighbour] += delta
+
+    def get_utilization(self, block):
+        """Return the channel utilization of a block."""
+
+        return float(self.utilization[self.blocks[block]])
+
+    def global_utilization(self):
+        """Return the average channel utilization."""
+
+        if not self.block_keys:
+            return 0
+
+        return float(self.total_utilization / len(self.block_keys))
+
+    def candidates(self, block):
+        """Return the handover candidates for the stations of a block.
+
+        A candidate is a (station, target block) pair where the target
+        block hears the station with an RSSI of at least RSSI_THRESHOLD and
+        has a channel utilization not higher than the one of the block.
+        The metric of a candidate is the RSSI magnitude times the conflict
+        occupancy of the target block.
+
+        Returns:
+            The stations, the target blocks, the metrics, and the
+            utilization of the target blocks, as arrays of indexes and
+            values sorted by metric and then by utilization
+        """
+
+        index = self.blocks[block]
+        nb_blocks = len(self.block_keys)
+
+        rows = np.fromiter(self.served[index], dtype=int,
+                           count=len(self.served[index]))
+
+        rssi = self.rssi[rows, :nb_blocks]
+        utilization = self.utilization[:nb_blocks]
+
+        with np.errstate(invalid='ignore'):
+            valid = (rssi >= RSSI_THRESHOLD) & \
+                (utilization <= utilization[index])
+
+        valid[:, index] = False
+
+        stations, targets = np.nonzero(valid)
+        stations = rows[stations]
+
+        metrics = np.abs(self.rssi[stations, targets]) * \
+            self.occupancy[targets]
+        utilization = self.utilization[targets]
+
+        order = np.lexsort((utilization, metrics))
+
+        return stations[order], targets[order], metrics[order], \
+            utilization[order]
+
+    def to_dict(self):
+        """Return a JSON-serializable dictionary."""
+
+        return {'blocks': len(self.block_keys),
+                'stations': len(self.station_keys),
+                'conflicts': sum(len(n) for n in self.neighbours) // 2,
+                'global_utilization': self.global_utilization()}
+
+
+def benchmark(nb_blocks=200, nb_stations=5000, nb_heard=4, nb_updates=10000,
+              seed=0):
+    """Run the scheduler on a synthetic network.
+
+    Returns:
+        A dictionary with the time spent (in ms) building the state, per
+        update, and per scheduling decision
+    """
+
+    rand = random.Random(seed)
+    state = SchedulerState()
+    out = {}
+
+    start = time.perf_counter()
+
+    for block in range(nb_blocks):
+        state.add_block(block, rand.choice([1, 6, 11, 36, 40, 44, 48]))
+
+    for station in range(nb_stations):
+        serving = rand.randrange(nb_blocks)
+        state.add_station(station, serving)
+        state.set_rssi(station, serving, rand.uniform(-80, -30))
+        for block in rand.sample(range(nb_blocks), nb_heard):
+            state.set_rssi(station, block, rand.uniform(-95, -40))
+
+    for block in range(nb_blocks):
+        state.set_utilization(block, rand.uniform(0, 100))
+
+    out['build'] = (time.perf_counter() - start) * 1000
+
+    start = time.perf_counter()
+
+    for _ in range(nb_updates):
+        station = rand.randrange(nb_stations)
+        state.set_traffic(station, rand.uniform(0, 1e6), rand.uniform(0, 1e6))
+        state.set_rssi(station, rand.randrange(nb_blocks),
+                       rand.uniform(-95, -40))
+        state.set_utilization(rand.randrange(nb_blocks),
+                              rand.uniform(0, 100))
+
+    out['update'] = (time.perf_counter() - start) * 1000 / nb_updates
+
+    start = time.perf_counter()
+
+    for block in range(nb_blocks):
+        stations, targets, _, _ = state.candidates(block)
+        if len(stations):
+            state.move_station(state.station_keys[stations[0]],
+                               state.block_keys[targets[0]])
+
+    out['decision'] = (time.perf_counter() - start) * 1000 / nb_blocks
+
+    return out
+
+
+def main():
+    """Benchmark the scheduler on a synthetic network."""
+
+    parser = argparse.ArgumentParser(description=main.__doc__)
+    parser.add_argument("--blocks", type=int, default=200)
+    parser.add_argument("--stations", type=int, default=5000)
+    parser.add_argument("--heard", type=int, default=4)
+    parser.add_argument("--updates", type=int, default=10000)
+    args = parser.parse_args()
+
+    out = benchmark(args.blocks, args.stations, args.heard, args.updates)
+
+    print("blocks %u stations %u" % (args.blocks, args.stations))
+    print("build: %.2f ms" % out['build'])
+    print("update: %.4f ms" % out['update'])
+    print("decision: %.4f ms" % out['decision'])
+
+
+if __name__ == "__main__":
+    main()
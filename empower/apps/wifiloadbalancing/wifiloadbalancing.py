@@ -28,14 +28,15 @@
 """Simple wifi load balancing management app."""
 
 from empower.core.app import EmpowerApp
+from empower.core.eventbus import EV_LVAP_JOIN
+from empower.core.eventbus import EV_WTP_UP
 from empower.core.resourcepool import BT_HT20
 from empower.datatypes.etheraddress import EtherAddress
 from empower.main import RUNTIME
 
-from functools import reduce
-from collections import Counter
+from empower.apps.wifiloadbalancing.schedulerstate import SchedulerState
+
 import time
-import sys
 
 RSSI_LIMIT = 10
 
@@ -60,20 +61,18 @@ class WifiLoadBalancing(EmpowerApp):
 
         # app parameters
         self.ucqm_data = {}
-        self.conflict_aps = {}
-        self.aps_clients_matrix = {}
-        self.clients_aps_matrix = {}
+
+        # conflicts, utilization, traffic, and rssi of blocks and stations
+        self.state = SchedulerState()
 
         self.handover_data = {}
         self.unsuccessful_handovers = {}
-        self.aps_channel_utilization = {}
         self.scheduling_attempts = {}
-        self.aps_counters = {}
         self.last_handover_time = 0
 
         # register lvap join/leave events
-        self.lvapjoin(callback=self.lvap_join_callback)
-        self.wtpup(callback=self.wtp_up_callback)
+        self.subscribe(EV_LVAP_JOIN, self.lvap_join_callback)
+        self.subscribe(EV_WTP_UP, self.wtp_up_callback)
 
     def lvap_join_callback(self, lvap):
         """Called when a new LVAP joins the network."""
@@ -90,14 +89,7 @@ class WifiLoadBalancing(EmpowerApp):
                 'active': 1
             }
 
-        self.aps_clients_matrix[lvap.blocks[0].addr].append(lvap)
-        self.clients_aps_matrix[lvap.addr] = []
-        self.clients_aps_matrix[lvap.addr].append(lvap.blocks[0])
-        self.aps_counters[lvap.blocks[0].addr][lvap.addr] = \
-            {
-                'tx_bytes_per_second': 0,
-                'rx_bytes_per_second': 0
-            }
+        self.state.add_station(lvap.addr, lvap.blocks[0])
 
     def wtp_up_callback(self, wtp):
         """Called when a new WTP connects to the controller."""
@@ -112,11 +104,8 @@ class WifiLoadBalancing(EmpowerApp):
                            every=self.every,
                            callback=self.wifi_stats_callback)
 
-            self.conflict_aps[block.addr] = []
-            self.aps_clients_matrix[block.addr] = []
-            self.aps_channel_utilization[block.addr] = 0
+            self.state.add_block(block, block.channel)
             self.scheduling_attempts[block.addr] = 0
-            self.aps_counters[block.addr] = {}
 
     def counters_callback(self, stats):
         """ New stats available. """
@@ -126,32 +115,35 @@ class WifiLoadBalancing(EmpowerApp):
         if not stats.tx_bytes_per_second or not stats.rx_bytes_per_second:
             return
 
-        cnt = self.aps_counters[lvap.blocks[0].addr][lvap.addr]
+        if lvap.addr not in self.state.stations:
+            return
 
-        cnt['tx_bytes_per_second'] = stats.tx_bytes_per_second[0]
-        cnt['rx_bytes_per_second'] = stats.rx_bytes_per_second[0]
+        self.state.set_traffic(lvap.addr, stats.tx_bytes_per_second[0],
+                               stats.rx_bytes_per_second[0])
 
     def wifi_stats_callback(self, stats):
         """ New stats available. """
 
         # If there are no clients attached, it is not necessary to check the
         # channel utilization
-        if not self.aps_clients_matrix[stats.block.addr]:
-            self.aps_channel_utilization[stats.block.addr] = 0
+        nb_stations = self.state.nb_stations(stats.block)
+
+        if not nb_stations:
+            self.state.set_utilization(stats.block, 0)
             return
 
-        bytes_per_second = reduce(lambda x, y: dict((k, v + y[k]) for k, v in x.items()), self.aps_counters[stats.block.addr].values())
         if (stats.tx_per_second + stats.rx_per_second) == 0:
-            if (bytes_per_second['tx_bytes_per_second'] + bytes_per_second['rx_bytes_per_second']) == 0:
-                self.aps_channel_utilization[stats.block.addr] = 0
+            if self.state.get_traffic(stats.block) == 0:
+                self.state.set_utilization(stats.block, 0)
             return
 
-        previous_utilization = self.aps_channel_utilization[stats.block.addr]
-        self.aps_channel_utilization[stats.block.addr] = (stats.tx_per_second + stats.rx_per_second)
+        previous_utilization = self.state.get_utilization(stats.block)
+        current_utilization = stats.tx_per_second + stats.rx_per_second
+        self.state.set_utilization(stats.block, current_utilization)
         average_utilization = self.estimate_global_channel_utilization()
-        channel_utilization_difference = self.evalute_channel_utilization_difference(previous_utilization, self.aps_channel_utilization[stats.block.addr], average_utilization)
+        channel_utilization_difference = self.evalute_channel_utilization_difference(previous_utilization, current_utilization, average_utilization)
 
-        if channel_utilization_difference is True and len(self.aps_clients_matrix[stats.block.addr]) > 1:
+        if channel_utilization_difference is True and nb_stations > 1:
             self.scheduling_attempts[stats.block.addr] += 1
         if (time.time() - self.last_handover_time) < 5 or len(self.handover_data) != 0:
             return
@@ -185,65 +177,35 @@ class WifiLoadBalancing(EmpowerApp):
                 else:
                     self.ucqm_data[key]['rssi'] = lvap['mov_rssi']
                     self.ucqm_data[key]['active'] = active_flag
-                # Conversion of the data structure to obtain the conflict APs
-                if poller.block not in self.clients_aps_matrix[lvap['addr']]:
-                    self.clients_aps_matrix[lvap['addr']].append(poller.block)
+                # the block conflicts with all the blocks hearing the lvap
+                if lvap['addr'] in self.state.stations:
+                    self.state.set_rssi(lvap['addr'], poller.block,
+                                        lvap['mov_rssi'])
             elif key in self.ucqm_data:
                 del self.ucqm_data[key]
-
-        self.conflict_graph()
-
-    def conflict_graph(self):
-
-        initial_conflict_graph = self.conflict_aps
-
-        for wtp_list in self.clients_aps_matrix.values():
-            for wtp in wtp_list:
-                for conflict_wtp in wtp_list:
-                    if conflict_wtp != wtp and (conflict_wtp not in self.conflict_aps[wtp.addr]):
-                        self.conflict_aps[wtp.addr].append(conflict_wtp)
+                self.state.clear_rssi(lvap['addr'], poller.block)
 
     def evaluate_lvap_scheduling(self, block):
 
-        ap_candidates = {}
-        best_metric = sys.maxsize
         new_wtp = None
         new_lvap = None
 
-        for sta in self.aps_clients_matrix[block.addr]:
-            for wtp in self.clients_aps_matrix[sta.addr]:
-                key = wtp.addr.to_str() + sta.addr.to_str()
-                if wtp == block or self.aps_channel_utilization[wtp.addr] > self.aps_channel_utilization[block.addr] or \
-                    self.ucqm_data[key]['rssi'] < -85:
+        # candidates sorted by metric and then by channel utilization
+        stations, wtps, _, _ = self.state.candidates(block)
+
+        for sta, wtp in zip(stations.tolist(), wtps.tolist()):
+            sta = self.state.station_keys[sta]
+            wtp = self.state.block_keys[wtp]
+            key = wtp.addr.to_str() + sta.to_str()
+            if key in self.unsuccessful_handovers:
+                self.unsuccessful_handovers[key]['handover_retries'] += 1
+                if self.unsuccessful_handovers[key]['handover_retries'] < 5:
                     continue
-                if key in self.unsuccessful_handovers:
-                    self.unsuccessful_handovers[key]['handover_retries'] += 1
-                    if self.unsuccessful_handovers[key]['handover_retries'] < 5:
-                        continue
-                    del self.unsuccessful_handovers[key]
-
-                conflict_occupancy = self.aps_channel_utilization[wtp.addr]
-                for neighbour in self.conflict_aps[wtp.addr]:
-                    if neighbour.channel == wtp.channel:
-                        conflict_occupancy += self.aps_channel_utilization[neighbour.addr]
-                wtp_info = \
-                    {
-                        'wtp': wtp,
-                        #'metric' : abs(self.ucqm_data[key]['rssi']) * self.aps_channel_utilization[wtp.addr],
-                        'metric': abs(self.ucqm_data[key]['rssi']) * conflict_occupancy,
-                        'rssi': self.ucqm_data[key]['rssi']
-                    }
-                ap_candidates[sta.addr] = []
-                ap_candidates[sta.addr].append(wtp_info)
-
-        ### Evaluation
-        for sta, wtps in ap_candidates.items():
-            for ap in wtps:
-                if (ap['metric'] < best_metric) or \
-                    (ap['metric'] == best_metric and self.aps_channel_utilization[ap['wtp'].addr] < self.aps_channel_utilization[new_wtp.addr]):
-                    best_metric = ap['metric']
-                    new_wtp = ap['wtp']
-                    new_lvap = RUNTIME.lvaps[sta]
+                del self.unsuccessful_handovers[key]
+
+            if new_wtp is None:
+                new_wtp = wtp
+                new_lvap = RUNTIME.lvaps[sta]
 
         if new_wtp is None or new_lvap is None:
             return
@@ -260,29 +222,17 @@ class WifiLoadBalancing(EmpowerApp):
                 }
             self.transfer_block_data(block, new_wtp, new_lvap)
         except ValueError:
-            self.log.info("Handover already in progress for lvap %s" % lvap.addr.to_str())
+            self.log.info("Handover already in progress for lvap %s" % new_lvap.addr.to_str())
             return
 
     def transfer_block_data(self, src_block, dst_block, lvap):
 
         self.scheduling_attempts[lvap.blocks[0].addr] = 0
-        self.aps_clients_matrix[src_block.addr].remove(lvap)
-        self.aps_clients_matrix[dst_block.addr].append(lvap)
-
-        del self.aps_counters[src_block.addr][lvap.addr]
-        self.aps_counters[dst_block.addr][lvap.addr] = \
-            {
-                'tx_bytes_per_second': 0,
-                'rx_bytes_per_second': 0
-            }
+        self.state.move_station(lvap.addr, dst_block)
 
     def estimate_global_channel_utilization(self):
 
-        utilization = 0
-        for value in self.aps_channel_utilization.values():
-            utilization += value
-
-        return (utilization/len(self.aps_channel_utilization))
+        return self.state.global_utilization()
 
     def check_handover_performance(self):
 
@@ -342,12 +292,16 @@ class WifiLoadBalancing(EmpowerApp):
 
         out = super().to_dict()
 
+        state = self.state
+        blocks = state.block_keys
+        stations = state.station_keys
+
         out['conflict_aps'] = \
-            {str(k): (''.join(block.addr.to_str()) for block in v) for k, v in self.conflict_aps.items()}
+            {str(blocks[k].addr): (blocks[block].addr.to_str() for block in v) for k, v in enumerate(state.neighbours)}
         out['aps_clients_matrix'] = \
-            {str(k): (''.join(lvap.addr.to_str()) for lvap in v) for k, v in self.aps_clients_matrix.items()}
+            {str(blocks[k].addr): (stations[lvap].to_str() for lvap in v) for k, v in enumerate(state.served)}
         out['clients_aps_matrix'] = \
-            {str(k): (''.join(block.addr.to_str()) for block in v) for k, v in self.clients_aps_matrix.items()}
+            {str(stations[k]): (blocks[block].addr.to_str() for block in v) for k, v in enumerate(state.heard)}
         out['handover_data'] = \
             {str(k): {'old_ap':v['old_ap'].addr, 'handover_ap':v['handover_ap'].addr,  \
                         'previous_channel_utilization':v['previous_channel_utilization'], \
@@ -356,8 +310,9 @@ class WifiLoadBalancing(EmpowerApp):
             {str(k): {'old_ap':v['old_ap'].addr, 'handover_ap':v['handover_ap'].addr, 'rssi':v['rssi'], \
                         'previous_channel_utilization':v['previous_channel_utilization'], 'handover_retries':v['handover_retries']} \
                         for k, v in self.unsuccessful_handovers.items()}
+        out['scheduler'] = state.to_dict()
         out['aps_channel_utilization'] = \
-            {str(k): v for k, v in self.aps_channel_utilization.items()}
+            {str(block.addr): state.get_utilization(block) for block in blocks}
         out['scheduling_attempts'] = \
             {str(k): v for k, v in self.scheduling_attempts.items()}
         out['ucqm_data'] = \
@@ -17,8 +17,8 @@
 
 """EmPOWER Account Class."""
 
-from empower.persistence import Session
 from empower.persistence.persistence import TblAccount
+from empower.persistence.worker import Update
 
 ROLE_ADMIN = "admin"
 ROLE_USER = "user"
@@ -74,53 +74,41 @@ class Account:
         """Get email."""
         return self._email
 
+    def __update(self, **values):
+        """Post an update of this account to the persistence worker."""
+
+        from empower.main import RUNTIME
+
+        return RUNTIME.persistence.submit(Update(TblAccount, values,
+                                                 username=self.username))
+
     @password.setter
     def password(self, password):
         """Set name."""
 
-        session = Session()
-        account = session.query(TblAccount) \
-                         .filter(TblAccount.username == self.username) \
-                         .first()
-        account.password = password
-        session.commit()
         self._password = password
+        self.__update(password=password)
 
     @name.setter
     def name(self, name):
         """Set name."""
 
-        session = Session()
-        account = session.query(TblAccount) \
-                         .filter(TblAccount.username == self.username) \
-                         .first()
-        account.name = name
-        session.commit()
         self._name = name
+        self.__update(name=name)
 
     @surname.setter
     def surname(self, surname):
         """Set surname."""
 
-        session = Session()
-        account = Session().query(TblAccount) \
-                           .filter(TblAccount.username == self.username) \
-                           .first()
-        account.surname = surname
-        session.commit()
         self._surname = surname
+        self.__update(surname=surname)
 
     @email.setter
     def email(self, email):
         """Set email."""
 
-        session = Session()
-        account = Session().query(TblAccount) \
-                           .filter(TblAccount.username == self.username) \
-                           .first()
-        account.email = email
-        session.commit()
         self._email = email
+        self.__update(email=email)
 
     def __str__(self):
         return str(self.username)
@@ -17,13 +17,17 @@
 
 """EmPOWER base app class."""
 
+import time
+
 import tornado.ioloop
 import empower.logger
 
+from empower.core.metrics import M_APP_LOOP
+from empower.core.eventbus import EVENTS
+from empower.core.offload import OffloadedLoop
 from empower.core.resourcepool import ResourcePool
 from empower.core.cellpool import CellPool
 from empower.lvapp.lvappserver import LVAPPServer
-from empower.lvapp import PT_LVAP_JOIN
 
 from empower.main import RUNTIME
 
@@ -33,19 +37,20 @@ DEFAULT_PERIOD = 5000
 class EmpowerApp:
     """EmpowerApp base app class."""
 
+    # run the control loop in the process pool (see empower.core.offload)
+    OFFLOAD = False
+
     def __init__(self, tenant_id, **kwargs):
 
         self.__tenant_id = tenant_id
         self.__every = DEFAULT_PERIOD
         self.log = empower.logger.get_logger()
         self.worker = None
+        self.offloaded = OffloadedLoop(self) if self.OFFLOAD else None
 
         for param in kwargs:
             setattr(self, param, kwargs[param])
 
-        # uncommen the following lines after updating the event handling
-        #self._register_lvapp_event(PT_LVAP_JOIN, self.lvap_join)
-
     @classmethod
     def _register_lvapp_event(cls, message, handler):
         server = RUNTIME.components[LVAPPServer.__module__]
@@ -60,8 +65,22 @@ class EmpowerApp:
         output['every'] = self.every
         output['tenant_id'] = self.tenant_id
 
+        if self.offloaded:
+            output['offloaded'] = self.offloaded.to_dict()
+
         return output
 
+    def subscribe(self, event, callback, **kwargs):
+        """Subscribe to a runtime event (see empower.core.eventbus).
+
+        The events about LVAPs, UEs, and LVNFs are limited to the ones of
+        this tenant. The subscription is removed when the app is stopped.
+        """
+
+        return RUNTIME.events.subscribe(event, callback,
+                                        tenant_id=self.tenant_id,
+                                        owner=self, **kwargs)
+
     def ue_leave(self, ue):
         """Called when a UE leaves a tenant."""
 
@@ -153,10 +172,14 @@ class EmpowerApp:
         self.__every = int(value)
 
     def start(self):
-        """Start control loop."""
+        """Subscribe to the app events and start control loop."""
+
+        for event in EVENTS:
+            if getattr(type(self), event) is not getattr(EmpowerApp, event):
+                self.subscribe(event, getattr(self, event))
 
         self.worker = \
-            tornado.ioloop.PeriodicCallback(self.loop, self.every)
+            tornado.ioloop.PeriodicCallback(self.__loop, self.every)
         self.worker.start()
 
     def stop(self):
@@ -164,11 +187,47 @@ class EmpowerApp:
 
         self.worker.stop()
 
+        RUNTIME.events.unsubscribe_all(self)
+
+        if self.offloaded:
+            self.offloaded.stop()
+
+    def __loop(self):
+        """Run the control loop and record its duration."""
+
+        start = time.perf_counter()
+
+        try:
+            if self.offloaded:
+                self.offloaded.run()
+            else:
+                self.loop()
+        finally:
+            labels = (("app", self.__module__),
+                      ("tenant", str(self.tenant_id)))
+            RUNTIME.metrics.observe_since(M_APP_LOOP, labels, start)
+
     def loop(self):
         """Control loop."""
 
         pass
 
+    def snapshot(self):
+        """Return the inputs of the offloaded control loop."""
+
+        return None
+
+    @staticmethod
+    def compute(snapshot):
+        """Return the decisions of the offloaded control loop."""
+
+        return None
+
+    def apply(self, decisions):
+        """Apply the decisions of the offloaded control loop."""
+
+        pass
+
     def vbses(self):
         """Return VBSPs in this tenant."""
 
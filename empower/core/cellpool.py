@@ -82,6 +82,9 @@ class Cell:
         self.ue_measurements = {}
         self.cell_measurements = {}
 
+        # the RAN MAC slices acknowledged by the eNB, keyed on (plmn_id, dscp)
+        self.slices = {}
+
     @property
     def features(self):
         """Get the features."""
@@ -18,8 +18,8 @@
 """EmPOWER Runtime."""
 
 from random import randint
+from uuid import uuid4
 
-import pkgutil
 import socket
 import fcntl
 import struct
@@ -30,13 +30,17 @@ from construct import Struct
 from construct import UBInt16
 from construct import Bytes
 
-from sqlalchemy.exc import IntegrityError
-
 from empower.datatypes.etheraddress import EtherAddress
 from empower.datatypes.dscp import DSCP
 from empower.persistence import Session
 from empower.persistence.persistence import TblTenant
 from empower.persistence.persistence import TblAccount
+from empower.persistence.persistence import TblSlice
+from empower.persistence.persistence import TblSliceBelongs
+from empower.persistence.persistence import TblTrafficRule
+from empower.persistence.worker import PersistenceWorker
+from empower.persistence.worker import Insert
+from empower.persistence.worker import Delete
 from empower.core.account import Account
 from empower.core.account import ROLE_ADMIN
 from empower.core.account import ROLE_USER
@@ -44,6 +48,13 @@ from empower.core.tenant import Tenant
 from empower.core.acl import ACL
 from empower.persistence.persistence import TblAllow
 from empower.core.tenant import T_TYPES
+from empower.core.manifestindex import ManifestIndex
+from empower.core.metrics import Metrics
+from empower.core.eventbus import EventBus
+from empower.core.vap import CHANGED as VAP_CHANGED
+from empower.core.loopmonitor import LoopMonitor
+from empower.core.snapshot import RuntimeSnapshot
+from empower.core.slicesync import SliceSync
 
 import empower.logger
 import empower.apps
@@ -103,6 +114,10 @@ class EmpowerRuntime:
         self.vbses = {}
         self.datapaths = {}
         self.allowed = {}
+        self.registrations = {}
+        self.manifests = ManifestIndex()
+        self.metrics = Metrics()
+        self.events = EventBus()
         self.log = empower.logger.get_logger()
 
         self.log.info("Starting EmPOWER Runtime")
@@ -115,14 +130,43 @@ class EmpowerRuntime:
         self.log.info("Loading EmPOWER Runtime defaults")
         self.__load_accounts()
         self.__load_tenants()
+        self.__load_traffic_rules()
         self.__load_acl()
 
+        # all the writes to the db go through the persistence worker
+        self.persistence = PersistenceWorker()
+        self.persistence.start()
+
+        # slice changes are pushed to the devices in the background
+        self.slice_sync = SliceSync()
+
+        # measure the IOLoop lag and report blocking calls
+        self.loop_monitor = LoopMonitor()
+        self.loop_monitor.start()
+
+        # preload the state saved before the last shutdown
+        self.snapshot = RuntimeSnapshot()
+        self.snapshot.start()
+
         if options.ctrl_adv:
             self.__ifname = options.ctrl_adv_iface
             self.__ctrl_ip = options.ctrl_ip
             self.__ctrl_port = options.ctrl_port
             self.__start_adv()
 
+    def stop(self):
+        """Save runtime state and stop background workers."""
+
+        self.log.info("Stopping EmPOWER Runtime")
+
+        self.snapshot.stop()
+        self.persistence.stop()
+        self.loop_monitor.stop()
+
+        for component in self.components.values():
+            if hasattr(component, "stop"):
+                component.stop()
+
     def __start_adv(self):
         """Star ctrl advertising."""
 
@@ -182,6 +226,18 @@ class EmpowerRuntime:
                        tenant.bssid_type,
                        tenant.plmn_id)
 
+    def __load_traffic_rules(self):
+        """Load traffic rules."""
+
+        for rule in Session().query(TblTrafficRule).all():
+
+            tenant = self.tenants[rule.tenant_id]
+
+            tenant.traffic_rules[rule.match] = {'match': rule.match,
+                                                'label': rule.label,
+                                                'priority': rule.priority,
+                                                'dscp': rule.dscp}
+
     def __load_acl(self):
         """ Load ACL list. """
 
@@ -265,64 +321,70 @@ class EmpowerRuntime:
 
         return components
 
-    @classmethod
-    def __walk_module(cls, package, results):
+    def __walk_module(self, package, results):
+        """Add the manifests of the components in package to results.
 
-        pkgs = pkgutil.walk_packages(package.__path__)
+        Manifests are read from the index, components are imported only when
+        they are launched.
+        """
 
-        for _, module_name, is_pkg in pkgs:
+        results.update(self.manifests.walk(package))
 
-            __import__(package.__name__ + "." + module_name)
+    def add_allowed(self, sta_addr, label=None):
+        """ Add entry to ACL. """
 
-            if not is_pkg:
-                continue
+        if sta_addr in self.allowed:
+            raise ValueError("Address already defined %s" % sta_addr)
 
-            if not hasattr(package, module_name):
-                continue
+        acl = ACL(sta_addr, label)
+        self.allowed[sta_addr] = acl
 
-            module = getattr(package, module_name)
+        self.persistence.submit(Insert(TblAllow, [{'addr': sta_addr,
+                                                   'label': label}]))
 
-            if not hasattr(module, "MANIFEST"):
-                continue
+        return acl
 
-            manifest = getattr(module, "MANIFEST")
+    def add_allowed_batch(self, entries):
+        """Add a batch of entries to the ACL.
 
-            name = manifest['name']
-            results[name] = manifest
+        Args:
+            entries, a list of (sta_addr, label) tuples
 
-    def add_allowed(self, sta_addr, label=None):
-        """ Add entry to ACL. """
+        Returns:
+            A list with one result per entry, either the new ACL object or
+            the exception describing why the entry was rejected.
+        """
 
-        allow = Session().query(TblAllow) \
-                         .filter(TblAllow.addr == sta_addr) \
-                         .first()
-        if allow:
-            raise ValueError("Address already defined %s" % sta_addr)
+        results = []
+        rows = []
 
-        session = Session()
-        session.add(TblAllow(addr=sta_addr, label=label))
-        session.commit()
+        for sta_addr, label in entries:
 
-        acl = ACL(sta_addr, label)
-        self.allowed[sta_addr] = acl
+            if sta_addr in self.allowed:
+                msg = "Address already defined %s" % sta_addr
+                results.append(ValueError(msg))
+                continue
 
-        return acl
+            acl = ACL(sta_addr, label)
+            self.allowed[sta_addr] = acl
+
+            rows.append({'addr': sta_addr, 'label': label})
+            results.append(acl)
+
+        self.persistence.submit(Insert(TblAllow, rows))
+
+        return results
 
     def remove_allowed(self, sta_addr):
         """ Remove entry from ACL. """
 
-        allow = Session().query(TblAllow) \
-                         .filter(TblAllow.addr == sta_addr) \
-                         .first()
-        if not allow:
+        if sta_addr not in self.allowed:
             raise KeyError("Address not found %s" % sta_addr)
 
-        session = Session()
-        session.delete(allow)
-        session.commit()
-
         del self.allowed[sta_addr]
 
+        return self.persistence.submit(Delete(TblAllow, addr=sta_addr))
+
     def is_allowed(self, src):
         """ Check if station is allowed. """
 
@@ -337,23 +399,21 @@ class EmpowerRuntime:
         if role not in [ROLE_ADMIN, ROLE_USER]:
             raise ValueError("Invalid role %s" % role)
 
-        session = Session()
-        account = TblAccount(username=username,
-                             password=password,
-                             role=role,
-                             name=name,
-                             surname=surname,
-                             email=email)
-
-        session.add(account)
-        session.commit()
+        self.accounts[username] = Account(username,
+                                          password,
+                                          name,
+                                          surname,
+                                          email,
+                                          role)
+
+        row = {'username': username,
+               'password': password,
+               'role': role,
+               'name': name,
+               'surname': surname,
+               'email': email}
 
-        self.accounts[account.username] = Account(account.username,
-                                                  account.password,
-                                                  account.name,
-                                                  account.surname,
-                                                  account.email,
-                                                  account.role)
+        return self.persistence.submit(Insert(TblAccount, [row]))
 
     def remove_account(self, username):
         """Remove an account."""
@@ -361,22 +421,21 @@ class EmpowerRuntime:
         if username == 'root':
             raise ValueError("Cannot removed root account")
 
-        account = Session().query(TblAccount) \
-                           .filter(TblAccount.username == str(username)) \
-                           .first()
-        if not account:
+        if username not in self.accounts:
             raise KeyError(username)
 
-        session = Session()
-        session.delete(account)
-        session.commit()
-
         del self.accounts[username]
+
+        future = self.persistence.submit(Delete(TblAccount,
+                                                username=str(username)))
+
         to_be_deleted = [x.tenant_id for x in self.tenants.values()
                          if x.owner == username]
 
         for tenant_id in to_be_deleted:
-            self.remove_tenant(tenant_id)
+            future = self.remove_tenant(tenant_id)
+
+        return future
 
     def register_app(self, name, init_method, params):
         """Register new app."""
@@ -395,6 +454,9 @@ class EmpowerRuntime:
 
         self.tenants[tenant_id].components[name] = init_method(**params)
 
+        self.registrations[(tenant_id, name)] = \
+            {k: v for k, v in params.items() if k != 'tenant_id'}
+
         if hasattr(self.tenants[tenant_id].components[name], "start"):
             self.tenants[tenant_id].components[name].start()
 
@@ -409,6 +471,8 @@ class EmpowerRuntime:
 
         self.components[name] = init_method(**params)
 
+        self.registrations[(None, name)] = dict(params)
+
         if hasattr(self.components[name], "start"):
             self.components[name].start()
 
@@ -434,6 +498,8 @@ class EmpowerRuntime:
 
         del tenant.components[app_id]
 
+        self.registrations.pop((tenant_id, app_id), None)
+
     def unregister(self, name):
         """Unregister module."""
 
@@ -451,6 +517,8 @@ class EmpowerRuntime:
 
         del self.components[name]
 
+        self.registrations.pop((None, name), None)
+
     def get_account(self, username):
         """Load user credential from the username."""
 
@@ -486,40 +554,41 @@ class EmpowerRuntime:
         if bssid_type not in T_TYPES:
             raise ValueError("Invalid bssid_type %s" % bssid_type)
 
-        session = Session()
+        tenant_names = [tenant.tenant_name for tenant in self.tenants.values()]
 
-        if tenant_id:
-            request = TblTenant(tenant_id=tenant_id,
-                                tenant_name=tenant_name,
-                                owner=owner,
-                                desc=desc,
-                                bssid_type=bssid_type,
-                                plmn_id=plmn_id)
-        else:
-            request = TblTenant(owner=owner,
-                                tenant_name=tenant_name,
-                                desc=desc,
-                                bssid_type=bssid_type,
-                                plmn_id=plmn_id)
-
-        session.add(request)
-        session.commit()
+        if tenant_name in tenant_names:
+            raise ValueError("Tenant name %s exists" % tenant_name)
+
+        if owner not in self.accounts:
+            raise KeyError(owner)
 
-        self.tenants[request.tenant_id] = \
-            Tenant(request.tenant_id,
-                   request.tenant_name,
+        if not tenant_id:
+            tenant_id = uuid4()
+
+        self.tenants[tenant_id] = \
+            Tenant(tenant_id,
+                   tenant_name,
                    self.accounts[owner].username,
                    desc,
-                   request.bssid_type,
-                   request.plmn_id)
+                   bssid_type,
+                   plmn_id)
+
+        row = {'tenant_id': tenant_id,
+               'tenant_name': tenant_name,
+               'owner': owner,
+               'desc': desc,
+               'bssid_type': bssid_type,
+               'plmn_id': plmn_id}
+
+        self.persistence.submit(Insert(TblTenant, [row]))
 
         # create default queue
         dscp = DSCP()
         descriptor = {}
 
-        self.tenants[request.tenant_id].add_slice(dscp, descriptor)
+        self.tenants[tenant_id].add_slice(dscp, descriptor)
 
-        return request.tenant_id
+        return tenant_id
 
     def remove_tenant(self, tenant_id):
         """Delete existing Tenant."""
@@ -537,16 +606,28 @@ class EmpowerRuntime:
         for lvap_addr in list(tenant.lvaps):
             self.remove_lvap(lvap_addr)
 
+        # stop the apps of this tenant
+        for name, app in list(tenant.components.items()):
+
+            self.log.info("Unregistering: %s (%s)", name, tenant_id)
+
+            if hasattr(app, "stop"):
+                app.stop()
+
+            del tenant.components[name]
+            self.registrations.pop((tenant_id, name), None)
+
+        # the vaps of this tenant are dropped from the snapshot
+        VAP_CHANGED.update(tenant.vaps.values())
+
         # remove tenant
         del self.tenants[tenant_id]
 
-        tenant = Session().query(TblTenant) \
-                          .filter(TblTenant.tenant_id == tenant_id) \
-                          .first()
-
-        session = Session()
-        session.delete(tenant)
-        session.commit()
+        future = self.persistence.submit(
+            Delete(TblTrafficRule, tenant_id=tenant_id),
+            Delete(TblSliceBelongs, tenant_id=tenant_id),
+            Delete(TblSlice, tenant_id=tenant_id),
+            Delete(TblTenant, tenant_id=tenant_id))
 
         # remove running modules
         for component in self.components.values():
@@ -563,6 +644,8 @@ class EmpowerRuntime:
             for module_id in to_be_removed:
                 component.remove_module(module_id)
 
+        return future
+
     def load_tenant(self, tenant_name):
         """Load tenant from network name (SSID)."""
 
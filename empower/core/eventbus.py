@@ -0,0 +1,288 @@
+#!/usr/bin/env python3
+#
+# Copyright (c) 2019 Roberto Riggio
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied. See the License for the
+# specific language governing permissions and limitations
+# under the License.
+
+"""Runtime event bus.
+
+Apps and modules subscribe to the events they are interested in (LVAP, UE
+and LVNF join/leave, LVAP handovers, WTP, VBS and CPP up/down), optionally
+restricted to a tenant, a device, or a resource block. Subscriptions are
+indexed by event and tenant, so publishing an event only visits the
+subscribers that can match it.
+
+Events about LVAPs, UEs and LVNFs belong to the tenant of the entity, while
+devices are shared by all the tenants, so device events are delivered to the
+subscribers of every tenant.
+
+Batch subscribers are not called for every event: the events published
+during an IOLoop iteration are queued and delivered with a single call at
+the next iteration (e.g. the 100 LVAP_LEAVE events raised when a WTP goes
+down).
+"""
+
+import time
+
+import tornado.ioloop
+
+import empower.logger
+
+from empower.core.metrics import M_EVENT
+
+EV_LVAP_JOIN = "lvap_join"
+EV_LVAP_LEAVE = "lvap_leave"
+EV_LVAP_HANDOVER = "lvap_handover"
+EV_UE_JOIN = "ue_join"
+EV_UE_LEAVE = "ue_leave"
+EV_LVNF_JOIN = "lvnf_join"
+EV_LVNF_LEAVE = "lvnf_leave"
+EV_WTP_UP = "wtp_up"
+EV_WTP_DOWN = "wtp_down"
+EV_VBS_UP = "vbs_up"
+EV_VBS_DOWN = "vbs_down"
+EV_CPP_UP = "cpp_up"
+EV_CPP_DOWN = "cpp_down"
+
+# events about tenant entities, the other ones are about devices
+TENANT_EVENTS = [EV_LVAP_JOIN, EV_LVAP_LEAVE, EV_LVAP_HANDOVER, EV_UE_JOIN,
+                 EV_UE_LEAVE, EV_LVNF_JOIN, EV_LVNF_LEAVE]
+
+DEVICE_EVENTS = [EV_WTP_UP, EV_WTP_DOWN, EV_VBS_UP, EV_VBS_DOWN, EV_CPP_UP,
+                 EV_CPP_DOWN]
+
+EVENTS = TENANT_EVENTS + DEVICE_EVENTS
+
+
+def _device(obj):
+    """Return the device an event refers to."""
+
+    for attr in ("wtp", "vbs", "cpp"):
+        device = getattr(obj, attr, None)
+        if device:
+            return device
+
+    return obj
+
+
+def _blocks(obj):
+    """Return the resource blocks an event refers to."""
+
+    blocks = getattr(obj, "blocks", None)
+
+    if blocks is None:
+        blocks = getattr(obj, "supports", [])
+
+    return blocks() if callable(blocks) else blocks
+
+
+class Subscription:
+    """An event subscription.
+
+    Attributes:
+        event: the event type
+        callback: the function called with the event arguments, or with a
+            list of argument tuples for batch subscriptions
+        tenant_id: only deliver events of this tenant (None for all)
+        device: only deliver events about this WTP, VBS or CPP
+        block: only deliver events about this resource block
+        batch: deliver the events of an IOLoop iteration in a single call
+        owner: the app or module that made the subscription
+    """
+
+    def __init__(self, event, callback, tenant_id=None, device=None,
+                 block=None, batch=False, owner=None):
+
+        self.event = event
+        self.callback = callback
+        self.tenant_id = tenant_id
+        self.device = device
+        self.block = block
+        self.batch = batch
+        self.owner = owner
+        self.delivered = 0
+        self.pending = []
+
+    def match(self, obj):
+        """Return True if the event about obj passes the filters."""
+
+        if self.device and _device(obj) != self.device:
+            return False
+
+        if self.block and self.block not in _blocks(obj):
+            return False
+
+        return True
+
+    def to_dict(self):
+        """Return a JSON-serializable dictionary."""
+
+        return {'event': self.event,
+                'callback': getattr(self.callback, "__qualname__",
+                                    str(self.callback)),
+                'tenant_id': self.tenant_id,
+                'device': self.device.addr if self.device else None,
+                'block': self.block,
+                'batch': self.batch,
+                'delivered': self.delivered,
+                'pending': len(self.pending)}
+
+
+class EventBus:
+    """Runtime event bus."""
+
+    def __init__(self):
+
+        # event -> tenant_id (None for all tenants) -> subscriptions
+        self.subscriptions = {event: {} for event in EVENTS}
+        self.published = {event: 0 for event in EVENTS}
+        self.__pending = []
+        self.log = empower.logger.get_logger()
+
+    def subscribe(self, event, callback, tenant_id=None, device=None,
+                  block=None, batch=False, owner=None):
+        """Subscribe to an event.
+
+        Args:
+            event: the event type (one of EVENTS)
+            callback: the function to call
+            tenant_id: only deliver events of this tenant
+            device: only deliver events about this WTP, VBS or CPP
+            block: only deliver events about this resource block
+            batch: deliver the events of an IOLoop iteration in a single
+                call, with a list of argument tuples
+            owner: the app or module making the subscription
+
+        Returns:
+            The Subscription, to be passed to unsubscribe()
+        """
+
+        if event not in self.subscriptions:
+            raise KeyError("Invalid event %s" % event)
+
+        subscription = Subscription(event, callback, tenant_id, device,
+                                    block, batch, owner)
+
+        self.subscriptions[event].setdefault(tenant_id, []) \
+            .append(subscription)
+
+        return subscription
+
+    def unsubscribe(self, subscription):
+        """Remove a subscription."""
+
+        scopes = self.subscriptions[subscription.event]
+        scope = scopes.get(subscription.tenant_id, [])
+
+        if subscription in scope:
+            scope.remove(subscription)
+
+        if not scope:
+            scopes.pop(subscription.tenant_id, None)
+
+        subscription.pending = []
+
+    def unsubscribe_all(self, owner):
+        """Remove all the subscriptions of an app or module."""
+
+        for scopes in self.subscriptions.values():
+            for scope in list(scopes.values()):
+                for subscription in \
+                        [sub for sub in scope if sub.owner is owner]:
+                    self.unsubscribe(subscription)
+
+    def publish(self, event, obj, *args):
+        """Deliver an event to its subscribers.
+
+        Args:
+            event: the event type
+            obj: the LVAP, UE, LVNF, WTP, VBS, or CPP the event is about
+            args: the other arguments of the callbacks
+        """
+
+        from empower.main import RUNTIME
+
+        start = time.perf_counter()
+
+        self.published[event] += 1
+
+        scopes = self.subscriptions[event]
+
+        candidates = list(scopes.get(None, []))
+
+        if event in TENANT_EVENTS:
+            tenant = getattr(obj, "tenant", None)
+            if tenant and tenant.tenant_id in RUNTIME.tenants:
+                candidates += scopes.get(tenant.tenant_id, [])
+        else:
+            # the subscribers of removed tenants are skipped
+            for tenant_id, scope in scopes.items():
+                if tenant_id is not None and tenant_id in RUNTIME.tenants:
+                    candidates += scope
+
+        for subscription in candidates:
+
+            if not subscription.match(obj):
+                continue
+
+            if subscription.batch:
+                self.__enqueue(subscription, (obj,) + args)
+                continue
+
+            self.__deliver(subscription, obj, *args)
+
+        labels = (("event", event),)
+        RUNTIME.metrics.observe_since(M_EVENT, labels, start)
+
+    def __enqueue(self, subscription, args):
+        """Queue an event for a batch subscription."""
+
+        if not self.__pending:
+            tornado.ioloop.IOLoop.current().add_callback(self.flush)
+
+        if not subscription.pending:
+            self.__pending.append(subscription)
+
+        subscription.pending.append(args)
+
+    def __deliver(self, subscription, *args):
+        """Call a subscriber, logging its exceptions."""
+
+        subscription.delivered += 1
+
+        try:
+            subscription.callback(*args)
+        except Exception as ex:
+            self.log.exception(ex)
+
+    def flush(self):
+        """Deliver the queued events to the batch subscribers."""
+
+        pending, self.__pending = self.__pending, []
+
+        for subscription in pending:
+
+            events, subscription.pending = subscription.pending, []
+
+            if events:
+                self.__deliver(subscription, events)
+
+    def to_dict(self):
+        """Return a JSON-serializable dictionary."""
+
+        return {event: {'published': self.published[event],
+                        'subscriptions': [sub.to_dict()
+                                          for scope in scopes.values()
+                                          for sub in scope]}
+                for event, scopes in self.subscriptions.items()}
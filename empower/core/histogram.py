@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+#
+# Copyright (c) 2019 Roberto Riggio
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied. See the License for the
+# specific language governing permissions and limitations
+# under the License.
+
+"""Fixed-bucket latency histogram."""
+
+from bisect import bisect_left
+
+# default bucket upper bounds (in ms)
+DEFAULT_BOUNDS = [1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000]
+
+
+class Histogram:
+    """Fixed-bucket histogram.
+
+    Samples are counted in the first bucket whose upper bound is greater or
+    equal than the sample, the last bucket has no upper bound. Percentiles
+    are estimated by interpolating within the buckets.
+
+    Attributes:
+        bounds: the upper bounds of the buckets
+        counts: the number of samples in every bucket
+        count: the number of samples
+        sum: the sum of the samples
+        max: the largest sample
+    """
+
+    def __init__(self, bounds=None):
+
+        self.bounds = sorted(bounds) if bounds else list(DEFAULT_BOUNDS)
+        self.counts = [0] * (len(self.bounds) + 1)
+        self.count = 0
+        self.sum = 0
+        self.max = 0
+
+    def observe(self, value):
+        """Add a sample."""
+
+        self.counts[bisect_left(self.bounds, value)] += 1
+        self.count += 1
+        self.sum += value
+
+        if value > self.max:
+            self.max = value
+
+    def reset(self):
+        """Remove all the samples."""
+
+        self.counts = [0] * (len(self.bounds) + 1)
+        self.count = 0
+        self.sum = 0
+        self.max = 0
+
+    def percentile(self, pct):
+        """Return an estimate of the pct-th percentile (0 if empty)."""
+
+        if not self.count:
+            return 0
+
+        rank = self.count * pct / 100
+        seen = 0
+
+        for index, count in enumerate(self.counts):
+
+            if not count or seen + count < rank:
+                seen += count
+                continue
+
+            lower = self.bounds[index - 1] if index > 0 else 0
+            upper = self.bounds[index] if index < len(self.bounds) \
+                else self.max
+
+            # the largest sample is a tighter bound for the last buckets
+            upper = min(upper, self.max)
+            lower = min(lower, upper)
+
+            return lower + (upper - lower) * (rank - seen) / count
+
+        return self.max
+
+    def to_dict(self):
+        """Return a JSON-serializable dictionary."""
+
+        buckets = [{'le': bound, 'count': count}
+                   for bound, count in zip(self.bounds, self.counts)]
+        buckets.append({'le': '+Inf', 'count': self.counts[-1]})
+
+        return {'count': self.count,
+                'sum': round(self.sum, 3),
+                'avg': round(self.sum / self.count, 3) if self.count else 0,
+                'max': round(self.max, 3),
+                'p50': round(self.percentile(50), 3),
+                'p90': round(self.percentile(90), 3),
+                'p99': round(self.percentile(99), 3),
+                'buckets': buckets}
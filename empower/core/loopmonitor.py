@@ -0,0 +1,199 @@
+#!/usr/bin/env python3
+#
+# Copyright (c) 2019 Roberto Riggio
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied. See the License for the
+# specific language governing permissions and limitations
+# under the License.
+
+"""IOLoop health monitor.
+
+A callback scheduled every LAG_INTERVAL ms measures how late the IOLoop runs
+it (the scheduling lag). A watchdog thread checks that the callback keeps
+running: if the IOLoop has been blocked for more than STALL_THRESHOLD ms the
+stack of the main thread is captured and logged together with the app or
+module that owns the blocking call.
+"""
+
+import sys
+import threading
+import time
+import traceback
+
+from collections import deque
+
+import tornado.ioloop
+
+import empower.logger
+
+from empower.core.metrics import M_LOOP_LAG
+from empower.core.metrics import M_LOOP_STALL
+
+LAG_INTERVAL = 100
+
+STALL_THRESHOLD = 250
+
+# frames in these modules do not identify the owner of a blocking call
+GENERIC_MODULES = ("empower.core.app", "empower.core.module",
+                   "empower.core.metrics", "empower.core.loopmonitor")
+
+
+def find_owner(frame):
+    """Return the app or module running in a frame (or one of its callers).
+
+    Apps are preferred to any other EmPOWER module, inner frames to outer
+    ones. Returns None if no EmPOWER frame is found.
+    """
+
+    owner = None
+
+    while frame:
+
+        name = frame.f_globals.get('__name__', '')
+        code = frame.f_code
+        location = "%s:%s" % (name, getattr(code, 'co_qualname',
+                                            code.co_name))
+
+        if name.startswith("empower.apps."):
+            return location
+
+        if not owner and name.startswith("empower.") and \
+                name not in GENERIC_MODULES:
+            owner = location
+
+        frame = frame.f_back
+
+    return owner
+
+
+class LoopMonitor(threading.Thread):
+    """IOLoop health monitor.
+
+    Must be created in the thread running the IOLoop.
+
+    Attributes:
+        interval: the lag measurement period (in ms)
+        threshold: the blocking time after which a stack is captured (in ms)
+        stalls: the most recent stalls
+    """
+
+    def __init__(self, interval=LAG_INTERVAL, threshold=STALL_THRESHOLD):
+
+        super().__init__(name="loopmonitor", daemon=True)
+
+        self.interval = interval
+        self.threshold = threshold
+        self.stalls = deque(maxlen=20)
+        self.lag = None
+
+        self.__ident = threading.get_ident()
+        self.__beat = time.monotonic()
+        self.__expected = None
+        self.__stall = None
+        self.__timeout = None
+        self.__stopped = threading.Event()
+        self.log = empower.logger.get_logger()
+
+    def start(self):
+        """Start measuring the lag and the watchdog thread."""
+
+        self.__tick()
+
+        super().start()
+
+    def stop(self):
+        """Stop the monitor."""
+
+        self.__stopped.set()
+
+        if self.__timeout:
+            tornado.ioloop.IOLoop.instance().remove_timeout(self.__timeout)
+            self.__timeout = None
+
+    def __tick(self):
+        """Measure the scheduling lag (runs in the IOLoop)."""
+
+        now = time.monotonic()
+
+        self.__beat = now
+
+        if self.__expected:
+
+            # the monitor is started by the runtime constructor, before
+            # RUNTIME is set, so the histogram is fetched at the first lag
+            if not self.lag:
+                from empower.main import RUNTIME
+                self.lag = RUNTIME.metrics.histogram(M_LOOP_LAG, ())
+
+            self.lag.observe(max(0, now - self.__expected) * 1000)
+
+        stall, self.__stall = self.__stall, None
+
+        if stall:
+            self.__stall_over(stall, now)
+
+        self.__expected = now + self.interval / 1000
+        self.__timeout = tornado.ioloop.IOLoop.instance().call_later(
+            self.interval / 1000, self.__tick)
+
+    def __stall_over(self, stall, now):
+        """Record a stall once the IOLoop is running again."""
+
+        from empower.main import RUNTIME
+
+        stall['duration'] = int((now - stall['since']) * 1000)
+        del stall['since']
+
+        labels = (("owner", stall['owner'] or "unknown"),)
+        RUNTIME.metrics.observe(M_LOOP_STALL, labels, stall['duration'])
+
+        self.stalls.append(stall)
+
+        self.log.warning("IOLoop was blocked for %ums by %s",
+                         stall['duration'], stall['owner'])
+
+    def run(self):
+        """Watchdog thread: capture the stack of a blocked IOLoop."""
+
+        while not self.__stopped.wait(self.interval / 1000):
+
+            since = self.__beat + self.interval / 1000
+            blocked = (time.monotonic() - since) * 1000
+
+            if blocked < self.threshold or self.__stall:
+                continue
+
+            frame = sys._current_frames().get(self.__ident)
+
+            if not frame:
+                continue
+
+            stack = traceback.format_stack(frame)
+            owner = find_owner(frame)
+
+            del frame
+
+            self.__stall = {'since': since,
+                            'timestamp': time.time(),
+                            'owner': owner,
+                            'stack': stack}
+
+            self.log.warning("IOLoop blocked for more than %ums by %s:\n%s",
+                             blocked, owner, "".join(stack))
+
+    def to_dict(self):
+        """Return a JSON-serializable dictionary."""
+
+        return {'interval': self.interval,
+                'threshold': self.threshold,
+                'lag': self.lag.to_dict() if self.lag else None,
+                'stalls': list(self.stalls)}
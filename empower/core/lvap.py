@@ -37,6 +37,14 @@ PROCESS_RUNNING = "running"
 # del lvap message(s) sent, no status(es) received
 PROCESS_REMOVING = "removing"
 
+# the attributes saved in the runtime snapshot
+SNAPSHOT_FIELDS = {'_assoc_id', '_supported_band', '_bssid', '_ssid',
+                   '_encap', 'authentication_state', 'association_state',
+                   '_networks', '_downlink', '_uplink', '_state'}
+
+# the addresses of the LVAPs changed since the last snapshot
+CHANGED = set()
+
 
 class LVAP:
     """ The EmPOWER Light Virtual Access Point
@@ -141,6 +149,13 @@ class LVAP:
         # target blocks to be used for handover
         self.target_blocks = None
 
+        # source blocks to be released once the target blocks are up
+        # (make-before-break handover)
+        self.release_blocks = None
+
+        # pending del lvap transactions on the released blocks
+        self.releasing = []
+
         # migration sats
         self._timer = None
 
@@ -150,9 +165,21 @@ class LVAP:
         # logger :)
         self.log = empower.logger.get_logger()
 
+    def __setattr__(self, name, value):
+
+        if name in SNAPSHOT_FIELDS:
+            CHANGED.add(self.addr)
+
+        super().__setattr__(name, value)
+
     def handle_del_lvap_response(self, xid, _):
         """Received as result of a del lvap command."""
 
+        # the source blocks of a make-before-break handover
+        if xid in self.releasing:
+            self.releasing.remove(xid)
+            return
+
         if xid not in self.pending:
             self.log.error("Xid %u not in pending list, ignoring", xid)
             return
@@ -196,6 +223,11 @@ class LVAP:
         # all blocks add, transition to running state
         self.state = PROCESS_RUNNING
 
+        # the target blocks are up, release the source blocks
+        if self.release_blocks:
+            self.__release(self.release_blocks)
+            self.release_blocks = None
+
         # this add was the result of a handover, trigger event
         if self.state == PROCESS_RUNNING \
                 and self.source_blocks \
@@ -259,6 +291,49 @@ class LVAP:
         # reset target blocks
         self.target_blocks = None
 
+    def _running_spawning(self):
+
+        # make-before-break, the lvap is added on the target blocks while
+        # still running on the source blocks
+        self._timer = time.time()
+
+        # set new state
+        self._state = PROCESS_SPAWNING
+
+        # the source blocks are released when the target blocks are up
+        self.release_blocks = self.source_blocks
+
+        # reset uplink and downlink
+        self._downlink = None
+        self._uplink = []
+
+        # Set downlink block if different.
+        self.__assign_downlink(self.target_blocks[0])
+
+        # set uplink blocks
+        self.__assign_uplink(self.target_blocks[1:])
+
+        # reset target blocks
+        self.target_blocks = None
+
+    def __release(self, blocks):
+        """Send del lvap messages to the source blocks of a handover."""
+
+        csa_switch_channel = 0
+
+        if blocks[0].channel != self.blocks[0].channel:
+            csa_switch_channel = self.blocks[0].channel
+
+        for index, block in enumerate(blocks):
+
+            if not block.radio.connection:
+                continue
+
+            xid = block.radio.connection.send_del_lvap(
+                self.addr, csa_switch_channel if index == 0 else 0)
+
+            self.releasing.append(xid)
+
     def _spawning_running(self):
 
         # set new state
@@ -425,11 +500,42 @@ class LVAP:
             blocks: A list of ResourceBlocks or a ResourceBlock
         """
 
+        self.handover(blocks)
+
+    def can_make_before_break(self, blocks):
+        """Return True if the LVAP can be added on blocks before being removed
+        from the current blocks, i.e. if no WTP is both source and target."""
+
+        if self.state != PROCESS_RUNNING or not self.blocks[0]:
+            return False
+
+        sources = set(block.radio.addr for block in self.blocks)
+        targets = set(block.radio.addr for block in blocks)
+
+        return not sources & targets
+
+    def handover(self, blocks, make_before_break=False):
+        """Move the LVAP to a list of blocks.
+
+        By default the LVAP is removed from the current blocks before being
+        added to the new ones (break-before-make). With make_before_break the
+        LVAP is added to the new blocks first and it is removed from the
+        current blocks when all the new blocks have answered, provided that
+        the source and the target blocks are on different WTPs.
+
+        Args:
+            blocks: A list of ResourceBlocks or a ResourceBlock
+            make_before_break: add the new blocks before removing the old ones
+
+        Returns:
+            True if the handover has been started
+        """
+
         if self.pending:
             raise ValueError("Handover in progress")
 
         if not blocks:
-            return
+            return False
 
         if isinstance(blocks, list):
             pool = blocks
@@ -451,7 +557,7 @@ class LVAP:
 
             # if not ignore request
             if bssid not in self.tenant.vaps:
-                return
+                return False
 
             # otherwise reset lvap
             self._ssid = None
@@ -467,9 +573,15 @@ class LVAP:
         if self.state is None:
             self.state = PROCESS_SPAWNING
         elif self.state == PROCESS_RUNNING:
-            self.state = PROCESS_REMOVING
+            if make_before_break and self.can_make_before_break(pool):
+                self.state = PROCESS_SPAWNING
+            else:
+                self.state = PROCESS_REMOVING
         else:
             IOError("Setting blocks on invalid state: %s" % self.state)
+            return False
+
+        return True
 
     def __assign_downlink(self, dl_block):
         """Set the downlink block."""
@@ -487,7 +599,7 @@ class LVAP:
             txp.set_ht_mcs([0, 1, 2, 3, 4, 5, 6, 7,
                             8, 9, 10, 11, 12, 13, 14, 15])
         else:
-            txp.set_ht_mcs = ([])
+            txp.set_ht_mcs([])
 
         dl_block.radio.connection.send_set_transmission_policy(txp)
 
@@ -508,6 +620,8 @@ class LVAP:
             # save block into the list
             self._uplink.append(block)
 
+        CHANGED.add(self.addr)
+
     @property
     def wtp(self):
         """Return the wtp on which this LVAP is scheduled on."""
@@ -0,0 +1,184 @@
+#!/usr/bin/env python3
+#
+# Copyright (c) 2019 Roberto Riggio
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied. See the License for the
+# specific language governing permissions and limitations
+# under the License.
+
+"""EmPOWER manifest index.
+
+Components are listed by reading the MANIFEST dictionary defined in the
+init file of their package. Instead of importing every package, the
+MANIFEST is extracted from the source file and cached in a persistent
+index keyed on the file path. An entry is reused as long as the file
+mtime and size are unchanged, or as long as its SHA1 digest matches. The
+component is imported only when it is actually launched.
+"""
+
+import ast
+import copy
+import hashlib
+import importlib
+import json
+import os
+import pkgutil
+
+import empower.logger
+
+from empower.settings import MANIFEST_INDEX_PATH
+
+
+class ManifestIndex:
+    """Persistent index of the components manifests.
+
+    Attributes:
+        path: the file where the index is saved
+        entries: the index entries, keyed on the init file path
+    """
+
+    def __init__(self, path=MANIFEST_INDEX_PATH):
+
+        self.path = path
+        self.entries = {}
+        self.dirty = False
+        self.log = empower.logger.get_logger()
+
+        self.__load()
+
+    def __load(self):
+        """Load index from file."""
+
+        if not self.path or not os.path.exists(self.path):
+            return
+
+        try:
+            with open(self.path) as index:
+                self.entries = json.load(index)
+        except (OSError, ValueError) as ex:
+            self.log.warning("Unable to load manifest index: %s", ex)
+            self.entries = {}
+
+    def save(self):
+        """Save index to file (only if it has changed)."""
+
+        if not self.dirty or not self.path:
+            return
+
+        tmp = self.path + ".tmp"
+
+        try:
+            with open(tmp, "w") as index:
+                json.dump(self.entries, index)
+            os.replace(tmp, self.path)
+            self.dirty = False
+        except OSError as ex:
+            self.log.warning("Unable to save manifest index: %s", ex)
+
+    def walk(self, package):
+        """Return the manifests of the sub-packages of a package.
+
+        Only the package passed as argument is imported.
+
+        Args:
+            package, a python package
+
+        Returns:
+            A dictionary of manifests keyed on the component name
+        """
+
+        results = {}
+
+        for _, module_name, is_pkg in pkgutil.iter_modules(package.__path__):
+
+            if not is_pkg:
+                continue
+
+            name = package.__name__ + "." + module_name
+
+            for path in package.__path__:
+                filename = os.path.join(path, module_name, "__init__.py")
+                if os.path.exists(filename):
+                    break
+            else:
+                continue
+
+            manifest = self.__lookup(name, filename)
+
+            if not manifest:
+                continue
+
+            results[manifest['name']] = copy.deepcopy(manifest)
+
+        self.save()
+
+        return results
+
+    def __lookup(self, name, filename):
+        """Return the manifest defined in filename."""
+
+        stat = os.stat(filename)
+        entry = self.entries.get(filename)
+
+        if entry and entry['mtime'] == stat.st_mtime and \
+                entry['size'] == stat.st_size:
+            return entry['manifest']
+
+        with open(filename, "rb") as source:
+            data = source.read()
+
+        digest = hashlib.sha1(data).hexdigest()
+
+        if not entry or entry['sha1'] != digest:
+            entry = {'sha1': digest, 'manifest': self.__parse(name, data)}
+
+        entry['mtime'] = stat.st_mtime
+        entry['size'] = stat.st_size
+
+        self.entries[filename] = entry
+        self.dirty = True
+
+        return entry['manifest']
+
+    def __parse(self, name, data):
+        """Extract the MANIFEST from the source of a module.
+
+        If the MANIFEST is not a literal, then the module is imported.
+        """
+
+        try:
+            tree = ast.parse(data)
+        except SyntaxError as ex:
+            self.log.warning("Unable to parse %s: %s", name, ex)
+            return None
+
+        for node in tree.body:
+
+            if not isinstance(node, ast.Assign):
+                continue
+
+            targets = [x.id for x in node.targets if isinstance(x, ast.Name)]
+
+            if "MANIFEST" not in targets:
+                continue
+
+            try:
+                return ast.literal_eval(node.value)
+            except ValueError:
+                break
+        else:
+            return None
+
+        self.log.info("Importing %s to read its MANIFEST", name)
+        module = importlib.import_module(name)
+
+        return getattr(module, "MANIFEST", None)
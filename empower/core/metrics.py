@@ -0,0 +1,254 @@
+#!/usr/bin/env python3
+#
+# Copyright (c) 2019 Roberto Riggio
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied. See the License for the
+# specific language governing permissions and limitations
+# under the License.
+
+"""Runtime performance metrics.
+
+The time spent handling protocol messages, module responses, module
+callbacks, and app loops, as well as the IOLoop scheduling lag, is recorded
+in fixed-bucket histograms (one for every label set) and exported in the
+Prometheus text format.
+
+Run this module to measure the cost of the instrumentation:
+
+    python3 -m empower.core.metrics --message-us 51
+"""
+
+import argparse
+import time
+
+from empower.core.histogram import Histogram
+
+# bucket upper bounds (in ms)
+DURATION_BOUNDS = [0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 25, 50, 100, 250,
+                   500, 1000, 2500, 5000, 10000]
+
+M_MESSAGE = "empower_message_duration_seconds"
+M_RESPONSE = "empower_module_response_duration_seconds"
+M_CALLBACK = "empower_module_callback_duration_seconds"
+M_APP_LOOP = "empower_app_loop_duration_seconds"
+M_APP_OFFLOAD = "empower_app_offload_duration_seconds"
+M_EVENT = "empower_event_duration_seconds"
+M_LOOP_LAG = "empower_ioloop_lag_seconds"
+M_LOOP_STALL = "empower_ioloop_stall_seconds"
+
+# mean time spent handling a HELLO (in us), with 100 agents sending 5000
+# HELLO/s, used as the reference for the instrumentation overhead
+MESSAGE_TIME = 51
+
+FAMILIES = {
+    M_MESSAGE: "Time spent handling a protocol message.",
+    M_RESPONSE: "Time spent handling a module response.",
+    M_CALLBACK: "Time spent in a module callback.",
+    M_APP_LOOP: "Time spent in an app control loop.",
+    M_APP_OFFLOAD: "Time to compute an app control loop in the process pool.",
+    M_EVENT: "Time spent delivering a runtime event to its subscribers.",
+    M_LOOP_LAG: "Delay of the IOLoop in running a scheduled callback.",
+    M_LOOP_STALL: "Time the IOLoop was blocked, per owning app or module.",
+}
+
+
+def _escape(value):
+    """Escape a Prometheus label value."""
+
+    return str(value).replace('\\', '\\\\').replace('"', '\\"') \
+        .replace('\n', '\\n')
+
+
+def _format_labels(labels, extra=None):
+    """Return the Prometheus representation of a label set."""
+
+    pairs = list(labels)
+
+    if extra:
+        pairs.append(extra)
+
+    if not pairs:
+        return ""
+
+    return "{%s}" % ",".join('%s="%s"' % (k, _escape(v)) for k, v in pairs)
+
+
+def _format_value(value):
+    """Return the Prometheus representation of a sample value."""
+
+    return repr(float(value))
+
+
+class Metrics:
+    """Runtime performance metrics.
+
+    Attributes:
+        histograms: the duration histograms (in ms), keyed on the
+          (family, labels) tuple, where labels is a tuple of (name, value)
+          pairs
+    """
+
+    def __init__(self):
+
+        self.histograms = {}
+
+    def histogram(self, family, labels):
+        """Return the histogram of a label set (creating it if needed)."""
+
+        try:
+            return self.histograms[(family, labels)]
+        except KeyError:
+            hist = Histogram(DURATION_BOUNDS)
+            self.histograms[(family, labels)] = hist
+            return hist
+
+    def observe(self, family, labels, value):
+        """Add a sample (in ms)."""
+
+        self.histogram(family, labels).observe(value)
+
+    def observe_since(self, family, labels, start):
+        """Add the time elapsed since start (from time.perf_counter())."""
+
+        value = (time.perf_counter() - start) * 1000
+
+        try:
+            hist = self.histograms[(family, labels)]
+        except KeyError:
+            hist = Histogram(DURATION_BOUNDS)
+            self.histograms[(family, labels)] = hist
+
+        hist.observe(value)
+
+    def reset(self):
+        """Remove all the samples."""
+
+        for hist in self.histograms.values():
+            hist.reset()
+
+    def to_prometheus(self):
+        """Return the metrics in the Prometheus text format."""
+
+        lines = []
+
+        for family in sorted(FAMILIES):
+
+            entries = sorted((labels, hist) for (name, labels), hist
+                             in self.histograms.items() if name == family)
+
+            if not entries:
+                continue
+
+            lines.append("# HELP %s %s" % (family, FAMILIES[family]))
+            lines.append("# TYPE %s histogram" % family)
+
+            for labels, hist in entries:
+
+                cumulative = 0
+
+                for bound, count in zip(hist.bounds, hist.counts):
+                    cumulative += count
+                    le = ("le", _format_value(bound / 1000))
+                    lines.append("%s_bucket%s %u" %
+                                 (family, _format_labels(labels, le),
+                                  cumulative))
+
+                lines.append("%s_bucket%s %u" %
+                             (family, _format_labels(labels, ("le", "+Inf")),
+                              hist.count))
+                lines.append("%s_sum%s %s" %
+                             (family, _format_labels(labels),
+                              _format_value(hist.sum / 1000)))
+                lines.append("%s_count%s %u" %
+                             (family, _format_labels(labels), hist.count))
+
+        return "\n".join(lines) + "\n"
+
+    def to_dict(self):
+        """Return a JSON-serializable dictionary."""
+
+        out = {}
+
+        for (family, labels), hist in self.histograms.items():
+            entry = dict(labels)
+            entry.update(hist.to_dict())
+            out.setdefault(family, []).append(entry)
+
+        return out
+
+
+def benchmark(nb_samples=200000, nb_runs=5):
+    """Measure the cost of the instrumentation.
+
+    Returns:
+        A dictionary with the time (in us, best of nb_runs) of a
+        Histogram.observe() call and of the instrumentation of a message
+        (timestamp, label set, and Metrics.observe_since() call)
+    """
+
+    metrics = Metrics()
+    hist = Histogram(DURATION_BOUNDS)
+
+    # the message type names are not interned in the runtime
+    name = "".join(["hel", "lo"])
+
+    # typical handling times (in ms), spread over the first buckets
+    values = [0.03, 0.06, 0.2, 1.2] * (nb_samples // 4)
+
+    def run(func):
+        best = None
+        for _ in range(nb_runs):
+            start = time.perf_counter()
+            func()
+            elapsed = time.perf_counter() - start
+            best = elapsed if best is None else min(best, elapsed)
+        return best * 1e6 / len(values)
+
+    def empty():
+        for _ in values:
+            pass
+
+    def observe():
+        for value in values:
+            hist.observe(value)
+
+    def message():
+        for _ in values:
+            start = time.perf_counter()
+            labels = (("protocol", "lvapp"), ("type", name))
+            metrics.observe_since(M_MESSAGE, labels, start)
+
+    loop = run(empty)
+
+    return {'observe': run(observe) - loop,
+            'message': run(message) - loop}
+
+
+def main():
+    """Measure the cost of the instrumentation."""
+
+    parser = argparse.ArgumentParser(description=main.__doc__)
+    parser.add_argument("--samples", type=int, default=200000)
+    parser.add_argument("--message-us", type=float, default=MESSAGE_TIME,
+                        help="mean time spent handling a message (in us)")
+    args = parser.parse_args()
+
+    out = benchmark(args.samples)
+
+    print("Histogram.observe: %.3f us" % out['observe'])
+    print("per message: %.3f us" % out['message'])
+    print("overhead: %.1f%% of %.0f us" %
+          (out['message'] * 100 / args.message_us, args.message_us))
+
+
+if __name__ == "__main__":
+    main()
@@ -18,9 +18,11 @@
 """EmPOWER Primitive Base Class."""
 
 import json
+import time
 import types
 import xmlrpc.client
 
+from collections import deque
 from multiprocessing.pool import ThreadPool
 
 import tornado.web
@@ -31,12 +33,30 @@ from tornado.ioloop import IOLoop
 import empower.logger
 
 from empower.core.utils import get_module
+from empower.core.histogram import Histogram
+from empower.core.metrics import M_CALLBACK
+from empower.core.metrics import M_RESPONSE
 from empower.core.jsonserializer import EmpowerEncoder
 from empower.main import RUNTIME
 
 
 _WORKERS = ThreadPool(10)
 
+# requests not answered within this time are dropped (in ms)
+REQUEST_TIMEOUT = 2000
+
+# adaptive polling: period bounds (in ms)
+ADAPTIVE = "adaptive"
+ADAPTIVE_MIN_EVERY = 1000
+ADAPTIVE_MAX_EVERY = 10000
+
+# adaptive polling: the period is lengthened by ADAPTIVE_INCREASE when the
+# change between two responses is below ADAPTIVE_STABLE tolerances and
+# shortened by ADAPTIVE_DECREASE when it is above one tolerance
+ADAPTIVE_STABLE = 0.5
+ADAPTIVE_INCREASE = 1.5
+ADAPTIVE_DECREASE = 0.5
+
 
 def exec_xmlrpc(callback, args=()):
     """Execute XML-RPC call."""
@@ -70,6 +90,9 @@ class Module:
         worker: the module worker responsible for reating new module instances.
         tenant_id: The tenant's Id for convenience (UUID)
         callback: Module callback (FunctionType)
+        outstanding: the requests waiting for a response, as (seq, device
+          address, timestamp) tuples in the order they were sent
+        rtt: the request round-trip-time histogram (in ms)
     """
 
     MODULE_NAME = None
@@ -83,6 +106,14 @@ class Module:
         self.worker = None
         self.__callback = None
         self.__periodic = None
+        self.seq = 0
+        self.outstanding = deque()
+        self.sent = 0
+        self.received = 0
+        self.skipped = 0
+        self.timeouts = 0
+        self.saved = 0
+        self.rtt = Histogram()
         self.log = empower.logger.get_logger()
 
     def unload(self):
@@ -115,6 +146,7 @@ class Module:
             return
 
         callback = self.callback
+        start = time.perf_counter()
 
         try:
 
@@ -137,6 +169,9 @@ class Module:
 
             self.log.exception(ex)
 
+        labels = (("module", self.module_type),)
+        RUNTIME.metrics.observe_since(M_CALLBACK, labels, start)
+
     def as_json(self):
         """Return a JSON representation of the object."""
 
@@ -194,6 +229,87 @@ class Module:
 
         pass
 
+    @property
+    def request_timeout(self):
+        """Return the time after which a request is dropped (in ms)."""
+
+        return REQUEST_TIMEOUT
+
+    def request_sent(self, addr):
+        """Record a request sent to a device.
+
+        Args:
+            addr: the address of the device
+
+        Returns:
+            The request sequence number
+        """
+
+        self.seq += 1
+        self.sent += 1
+        self.outstanding.append((self.seq, addr, time.time()))
+
+        return self.seq
+
+    def response_received(self, addr):
+        """Match a response with the oldest request sent to a device.
+
+        Args:
+            addr: the address of the device
+
+        Returns:
+            The round-trip-time in ms or None if no request was outstanding
+        """
+
+        for entry in self.outstanding:
+
+            if entry[1] != addr:
+                continue
+
+            self.outstanding.remove(entry)
+            self.received += 1
+
+            rtt = (time.time() - entry[2]) * 1000
+            self.rtt.observe(rtt)
+
+            if self.worker:
+                self.worker.record_rtt(addr, rtt)
+
+            return rtt
+
+        return None
+
+    def expire_requests(self):
+        """Drop the requests not answered in time."""
+
+        deadline = time.time() - self.request_timeout / 1000
+
+        while self.outstanding and self.outstanding[0][2] < deadline:
+
+            seq, addr, _ = self.outstanding.popleft()
+
+            self.timeouts += 1
+            self.log.warning("%s request %u to %s timed out (id=%u)",
+                             self.MODULE_NAME, seq, addr, self.module_id)
+
+    def is_busy(self):
+        """Return True if a request is still waiting for a response."""
+
+        self.expire_requests()
+
+        return bool(self.outstanding)
+
+    def requests_to_dict(self):
+        """Return the request bookkeeping as a JSON-serializable dict."""
+
+        return {'sent': self.sent,
+                'received': self.received,
+                'outstanding': len(self.outstanding),
+                'skipped': self.skipped,
+                'timeouts': self.timeouts,
+                'saved': int(self.saved),
+                'rtt': self.rtt.to_dict()}
+
     @property
     def tenant_id(self):
         """Return tenant id."""
@@ -212,7 +328,8 @@ class Module:
         out = {'id': self.module_id,
                'module_type': self.module_type,
                'tenant_id': self.tenant_id,
-               'callback': self.callback}
+               'callback': self.callback,
+               'requests': self.requests_to_dict()}
 
         return out
 
@@ -252,11 +369,42 @@ class ModuleTrigger(Module):
 
 
 class ModulePeriodic(Module):
-    """Module Scheduled object."""
+    """Module Scheduled object.
+
+    A new request is not sent while the previous one is outstanding, so a
+    slow device is polled at the rate at which it answers. Requests are
+    dropped after two periods (and no less than REQUEST_TIMEOUT ms).
+
+    With every='adaptive' the period starts at min_every and is adjusted
+    after every response according to how much the metric returned by
+    sample() changed: a change is significant if it is larger than
+    ADAPTIVE_DELTA + ADAPTIVE_RATIO * |previous value|. Modules whose
+    sample() returns None are polled every min_every ms.
+
+    Attributes:
+        adaptive: True if the period is adjusted to the signal variability
+        min_every: the shortest adaptive period (in ms)
+        max_every: the longest adaptive period (in ms)
+    """
+
+    # the absolute and relative change of the sampled metric that is
+    # considered significant
+    ADAPTIVE_DELTA = 1.0
+    ADAPTIVE_RATIO = 0.0
+
+    # if True sample() returns counters and their rates are compared
+    ADAPTIVE_COUNTERS = False
 
     def __init__(self):
         super().__init__()
         self.__every = 5000
+        self.__periodic = None
+        self.__timeout = None
+        self.__sample = None
+        self.__counters = None
+        self.adaptive = False
+        self.min_every = ADAPTIVE_MIN_EVERY
+        self.max_every = ADAPTIVE_MAX_EVERY
 
     @property
     def every(self):
@@ -268,8 +416,44 @@ class ModulePeriodic(Module):
     def every(self, value):
         """Set every."""
 
+        if value == ADAPTIVE:
+            self.adaptive = True
+            self.__every = self.min_every
+            return
+
+        self.adaptive = False
         self.__every = int(value)
 
+    @property
+    def min_every(self):
+        """Return the shortest adaptive period."""
+
+        return self.__min_every
+
+    @min_every.setter
+    def min_every(self, value):
+        """Set the shortest adaptive period."""
+
+        if int(value) <= 0:
+            raise ValueError("Invalid min_every %s" % value)
+
+        self.__min_every = int(value)
+
+    @property
+    def max_every(self):
+        """Return the longest adaptive period."""
+
+        return self.__max_every
+
+    @max_every.setter
+    def max_every(self, value):
+        """Set the longest adaptive period."""
+
+        if int(value) <= 0:
+            raise ValueError("Invalid max_every %s" % value)
+
+        self.__max_every = int(value)
+
     def start(self):
         """Start worker."""
 
@@ -277,17 +461,124 @@ class ModulePeriodic(Module):
             self.run_once()
             return
 
+        if self.adaptive:
+
+            if self.min_every > self.max_every:
+                raise ValueError("min_every larger than max_every")
+
+            self.__every = self.min_every
+            self.__schedule()
+            return
+
         self.__periodic = \
-            tornado.ioloop.PeriodicCallback(self.run_once, self.every)
+            tornado.ioloop.PeriodicCallback(self.poll, self.every)
         self.__periodic.start()
 
+    def __schedule(self):
+        """Schedule the next adaptive poll."""
+
+        self.__timeout = \
+            IOLoop.instance().call_later(self.every / 1000, self.__tick)
+
+    def __tick(self):
+        """Adaptive periodic task."""
+
+        # requests a fixed poller at min_every would have sent meanwhile
+        self.saved += self.every / self.min_every - 1
+
+        self.poll()
+        self.__schedule()
+
+    def poll(self):
+        """Periodic task, skipped while a request is outstanding."""
+
+        if self.is_busy():
+            self.skipped += 1
+            return
+
+        self.run_once()
+
+    def sample(self):
+        """Return the metric driving the adaptive period.
+
+        Returns:
+            A dictionary of numeric values (or of counters if
+            ADAPTIVE_COUNTERS is True) or None if not supported
+        """
+
+        return None
+
+    def adapt(self):
+        """Adjust the adaptive period after a response."""
+
+        if not self.adaptive:
+            return
+
+        sample = self.sample()
+
+        if sample is None:
+            return
+
+        if self.ADAPTIVE_COUNTERS:
+
+            now = time.time()
+            last, self.__counters = self.__counters, (now, sample)
+
+            if not last or now <= last[0]:
+                return
+
+            sample = {k: (v - last[1].get(k, 0)) / (now - last[0])
+                      for k, v in sample.items()}
+
+        previous, self.__sample = self.__sample, sample
+
+        if previous is None:
+            return
+
+        change = 0
+
+        for key in set(previous) | set(sample):
+
+            prev = previous.get(key, 0)
+            tolerance = self.ADAPTIVE_DELTA + self.ADAPTIVE_RATIO * abs(prev)
+            change = max(change, abs(sample.get(key, 0) - prev) / tolerance)
+
+        every = self.every
+
+        if change < ADAPTIVE_STABLE:
+            every = min(int(every * ADAPTIVE_INCREASE), self.max_every)
+        elif change > 1:
+            every = max(int(every * ADAPTIVE_DECREASE), self.min_every)
+
+        if every != self.every:
+            self.log.info("%s period %ums -> %ums (id=%u, change=%.2f)",
+                          self.MODULE_NAME, self.every, every,
+                          self.module_id, change)
+            self.__every = every
+
+    def handle_callback(self, serializable):
+        """Adjust the adaptive period and call the callback."""
+
+        self.adapt()
+
+        super().handle_callback(serializable)
+
+    @property
+    def request_timeout(self):
+        """Return the time after which a request is dropped (in ms)."""
+
+        return max(REQUEST_TIMEOUT, 2 * self.every)
+
     def stop(self):
         """Stop worker."""
 
-        if self.every == -1:
-            return
+        if self.__timeout:
+            IOLoop.instance().remove_timeout(self.__timeout)
+            self.__timeout = None
 
-        self.__periodic.stop()
+        if self.__periodic:
+            self.__periodic.stop()
+            self.__periodic = None
 
     def to_dict(self):
         """Return JSON-serializable representation of the object."""
@@ -296,12 +587,25 @@ class ModulePeriodic(Module):
                'module_type': self.module_type,
                'tenant_id': self.tenant_id,
                'every': self.every,
-               'callback': self.callback}
+               'callback': self.callback,
+               'requests': self.requests_to_dict()}
+
+        if self.adaptive:
+            out['adaptive'] = {'min_every': self.min_every,
+                               'max_every': self.max_every}
 
         return out
 
     def __eq__(self, other):
 
+        if isinstance(other, ModulePeriodic) and \
+                (self.adaptive or other.adaptive):
+            return self.module_type == other.module_type and \
+                self.tenant_id == other.tenant_id and \
+                self.adaptive == other.adaptive and \
+                self.min_every == other.min_every and \
+                self.max_every == other.max_every
+
         if isinstance(other, Module):
             return self.module_type == other.module_type and \
                 self.tenant_id == other.tenant_id and \
@@ -317,6 +621,8 @@ class ModuleWorker:
 
     Attributes:
         modules: dictionary of modules currently active in this tenant
+        rtt: the request round-trip-time histograms (in ms), keyed on the
+          device address
     """
 
     def __init__(self, server, module, pt_type, pt_packet):
@@ -324,6 +630,7 @@ class ModuleWorker:
         self.__module_id = 0
         self.modules = {}
         self.module = module
+        self.rtt = {}
 
         self.pt_type = pt_type
         self.pt_packet = pt_packet
@@ -422,7 +729,44 @@ class ModuleWorker:
 
         del self.modules[module_id]
 
+    def record_rtt(self, addr, rtt):
+        """Record the round-trip-time of a request to a device."""
+
+        if addr not in self.rtt:
+            self.rtt[addr] = Histogram()
+
+        self.rtt[addr].observe(rtt)
+
+    def dispatch_response(self, module, message):
+        """Pass a response to a module and record the processing time."""
+
+        start = time.perf_counter()
+
+        module.handle_response(message)
+
+        labels = (("module", self.module.MODULE_NAME),)
+        RUNTIME.metrics.observe_since(M_RESPONSE, labels, start)
+
     def handle_packet(self, pnfdev, message):
         """Handle response message."""
 
         pass
+
+    def to_dict(self):
+        """Return JSON-serializable representation of the object."""
+
+        requests = [module.requests_to_dict()
+                    for module in self.modules.values()]
+
+        def total(key):
+            return sum(x[key] for x in requests)
+
+        return {'module_type': self.module.MODULE_NAME,
+                'modules': len(self.modules),
+                'sent': total('sent'),
+                'received': total('received'),
+                'outstanding': total('outstanding'),
+                'skipped': total('skipped'),
+                'timeouts': total('timeouts'),
+                'saved': total('saved'),
+                'rtt': {str(k): v.to_dict() for k, v in self.rtt.items()}}
@@ -0,0 +1,195 @@
+#!/usr/bin/env python3
+#
+# Copyright (c) 2019 Roberto Riggio
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied. See the License for the
+# specific language governing permissions and limitations
+# under the License.
+
+"""Process pool execution of app control loops.
+
+An app declares its loop as offloadable by setting OFFLOAD and by
+implementing three methods:
+
+    snapshot(): return the inputs of the loop as plain, picklable data (or
+        None to run loop() in the IOLoop instead)
+    compute(snapshot): a staticmethod returning the decisions, it runs in
+        a worker process (a fresh interpreter, not a fork of the
+        controller) and cannot access the runtime
+    apply(decisions): carry out the decisions (handovers, tx policy
+        changes, ...) in the IOLoop
+
+At most one iteration per app is in flight. If the previous iteration is
+still running when the next one is due, the new one is skipped. Decisions
+returned after the deadline (one loop period after the snapshot) are
+dropped, as they have been computed from stale inputs.
+"""
+
+import multiprocessing
+import time
+
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from functools import partial
+
+import tornado.ioloop
+
+import empower.logger
+
+from empower.core.metrics import M_APP_LOOP
+from empower.core.metrics import M_APP_OFFLOAD
+
+WORKERS = 2
+
+POOL = None
+
+
+def get_pool():
+    """Return the process pool, creating it the first time it is used."""
+
+    global POOL
+
+    if not POOL:
+
+        # the workers are not forked from the controller, as they would
+        # inherit its sockets, db connection, and the locks held by its
+        # threads: compute() is unpickled by name, importing the app module
+        try:
+            context = multiprocessing.get_context("forkserver")
+        except ValueError:
+            context = multiprocessing.get_context("spawn")
+
+        POOL = ProcessPoolExecutor(WORKERS, mp_context=context)
+
+    return POOL
+
+
+def reset_pool():
+    """Drop the process pool (e.g. after a worker died)."""
+
+    global POOL
+
+    if POOL:
+        POOL.shutdown(wait=False)
+        POOL = None
+
+
+class OffloadedLoop:
+    """The control loop of an app, run in the process pool.
+
+    Attributes:
+        app: the app
+        runs: the iterations whose decisions have been applied
+        skipped: the iterations skipped because the previous one was running
+        late: the iterations whose decisions arrived after the deadline
+        failed: the iterations that raised an exception
+    """
+
+    def __init__(self, app):
+
+        self.app = app
+        self.runs = 0
+        self.skipped = 0
+        self.late = 0
+        self.failed = 0
+
+        self.__future = None
+        self.__stopped = False
+        self.log = empower.logger.get_logger()
+
+    @property
+    def labels(self):
+        """Return the metric labels of the app."""
+
+        return (("app", self.app.__module__),
+                ("tenant", str(self.app.tenant_id)))
+
+    def run(self):
+        """Start an iteration (runs in the IOLoop)."""
+
+        if self.__future:
+            self.skipped += 1
+            self.log.warning("Skipping %s loop, previous iteration running",
+                             self.app.__module__)
+            return
+
+        snapshot = self.app.snapshot()
+
+        if snapshot is None:
+            self.app.loop()
+            return
+
+        start = time.perf_counter()
+        deadline = start + self.app.every / 1000
+
+        try:
+            self.__future = get_pool().submit(self.app.compute, snapshot)
+        except BrokenProcessPool:
+            reset_pool()
+            self.__future = get_pool().submit(self.app.compute, snapshot)
+
+        tornado.ioloop.IOLoop.current().add_future(
+            self.__future, partial(self.__done, start, deadline))
+
+    def __done(self, start, deadline, future):
+        """Apply the decisions of an iteration (runs in the IOLoop)."""
+
+        from empower.main import RUNTIME
+
+        self.__future = None
+
+        RUNTIME.metrics.observe_since(M_APP_OFFLOAD, self.labels, start)
+
+        if self.__stopped:
+            return
+
+        try:
+            decisions = future.result()
+        except BrokenProcessPool as ex:
+            self.failed += 1
+            self.log.error("Offloaded %s loop failed: %s",
+                           self.app.__module__, ex)
+            reset_pool()
+            return
+        except Exception as ex:
+            self.failed += 1
+            self.log.exception("Offloaded %s loop failed: %s",
+                               self.app.__module__, ex)
+            return
+
+        if time.perf_counter() > deadline:
+            self.late += 1
+            self.log.warning("Dropping late %s loop decisions",
+                             self.app.__module__)
+            return
+
+        applied = time.perf_counter()
+
+        try:
+            self.app.apply(decisions)
+            self.runs += 1
+        finally:
+            RUNTIME.metrics.observe_since(M_APP_LOOP, self.labels, applied)
+
+    def stop(self):
+        """Drop the decisions of the iteration in flight, if any."""
+
+        self.__stopped = True
+
+    def to_dict(self):
+        """Return a JSON-serializable dictionary."""
+
+        return {'runs': self.runs,
+                'skipped': self.skipped,
+                'late': self.late,
+                'failed': self.failed,
+                'running': self.__future is not None}
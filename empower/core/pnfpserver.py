@@ -30,7 +30,11 @@ from empower.restserver.apihandlers import EmpowerAPIHandler
 from empower.restserver.apihandlers import EmpowerAPIHandlerUsers
 from empower.persistence.persistence import TblSlice
 from empower.persistence.persistence import TblSliceBelongs
+from empower.persistence.worker import Insert
+from empower.persistence.worker import Delete
 from empower.restserver.validate import validate
+from empower.restserver.validate import apply_batch
+from empower.restserver.validate import batch_status
 
 from empower.main import RUNTIME
 
@@ -100,6 +104,63 @@ class BasePNFDevHandler(EmpowerAPIHandler):
         self.server.remove_pnfdev(EtherAddress(args[0]))
 
 
+class BasePNFDevBatchHandler(EmpowerAPIHandler):
+    """PNFDev batch handler. Used to add many PNFDevs at once."""
+
+    HANDLERS = []
+
+    SCHEMA = {
+        "addr": {"type": EtherAddress, "mandatory": True},
+        "label": {"type": str, "mandatory": False}
+    }
+
+    def initialize(self, server):
+        self.server = server
+
+    @validate(returncode=200,
+              input_schema={
+                  "version": {"type": float, "mandatory": True},
+                  "entries": {"type": list, "mandatory": True}
+              },
+              wait=True)
+    def post(self, *args, **kwargs):
+        """Add a batch of PNFDevs.
+
+        All the entries are validated first and then added in a single
+        transaction. One result is returned for each entry (in the same
+        order), with a status code and either the location of the new
+        PNFDev or an error message.
+
+        Request:
+
+            version: protocol version (1.0)
+            entries: the list of pnfdevs, each with the following fields
+                addr: the pnfdev address
+                label: a description for this pnfdev
+
+        Example URLs:
+
+            POST /api/v1/batch/<wtps|cpps|vbses>
+            {
+                "version": 1.0,
+                "entries": [
+                    {"addr": "00:0D:B9:2F:56:64", "label": "WTP 1"},
+                    {"addr": "00:0D:B9:2F:56:65", "label": "WTP 2"}
+                ]
+            }
+        """
+
+        def add_pnfdevs(entries):
+            return self.server.add_pnfdevs(
+                [(x['addr'], x.get('label', "Generic Device"))
+                 for x in entries])
+
+        results = apply_batch(self.SCHEMA, kwargs['entries'], add_pnfdevs)
+
+        return [batch_status(x, lambda y: "/api/v1/%s/%s" % (y.ALIAS, y.addr))
+                for x in results]
+
+
 class BaseTenantPNFDevHandler(EmpowerAPIHandlerUsers):
     """TenantPNFDevHandler Handler."""
 
@@ -232,29 +293,51 @@ class PNFPServer:
 
         self.pnfdevs[addr] = self.PNFDEV(addr, label)
 
-        session = Session()
-        session.add(self.TBL_PNFDEV(addr=addr, label=label))
-        session.commit()
+        RUNTIME.persistence.submit(Insert(self.TBL_PNFDEV,
+                                          [{'addr': addr, 'label': label}]))
 
         return self.pnfdevs[addr]
 
+    def add_pnfdevs(self, entries):
+        """Add a batch of PNFDevs.
+
+        Args:
+            entries, a list of (addr, label) tuples
+
+        Returns:
+            A list with one result per entry, either the new PNFDev or the
+            exception describing why the entry was rejected.
+        """
+
+        results = []
+        rows = []
+
+        for addr, label in entries:
+
+            if addr in self.pnfdevs:
+                msg = "Device address %s already present" % addr
+                results.append(ValueError(msg))
+                continue
+
+            self.pnfdevs[addr] = self.PNFDEV(addr, label)
+
+            rows.append({'addr': addr, 'label': label})
+            results.append(self.pnfdevs[addr])
+
+        RUNTIME.persistence.submit(Insert(self.TBL_PNFDEV, rows))
+
+        return results
+
     def remove_pnfdev(self, addr):
         """Remove PNFDev."""
 
         if addr not in self.pnfdevs:
             raise KeyError(addr)
 
-        pnfdev = self.pnfdevs[addr]
-
         del self.pnfdevs[addr]
 
-        pnfdev = Session().query(self.TBL_PNFDEV) \
-            .filter(self.TBL_PNFDEV.addr == addr) \
-            .first()
-
-        session = Session()
-        session.delete(pnfdev)
-        session.commit()
+        return RUNTIME.persistence.submit(Delete(TblSliceBelongs, addr=addr),
+                                          Delete(self.TBL_PNFDEV, addr=addr))
 
     def register_message(self, pt_type, parser, handler):
         """ Register new handler. This will be called after the default. """
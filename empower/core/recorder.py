@@ -0,0 +1,355 @@
+#!/usr/bin/env python3
+#
+# Copyright (c) 2019 Roberto Riggio
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied. See the License for the
+# specific language governing permissions and limitations
+# under the License.
+
+"""Columnar in-memory sample recorder.
+
+Samples are stored in typed arrays, one per column, with the timestamps
+stored as int64 microseconds since the epoch (UTC). String columns are
+dictionary encoded. A time range of samples can be selected and exported in
+a single write to a CSV file or to a columnar binary file, optionally on a
+background thread.
+
+The binary file is made of the MAGIC string, a 4 bytes big-endian header
+length, a JSON header with the name, type and length of every column and the
+dictionary of the string columns, and then the raw content of every column
+(native byte order, as in the header).
+"""
+
+import json
+import struct
+import sys
+
+from array import array
+from bisect import bisect_left
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from datetime import timedelta
+
+import empower.logger
+
+LOG = empower.logger.get_logger()
+
+MAGIC = b"EMPREC1\n"
+
+HEADER = struct.Struct("!I")
+
+EPOCH = datetime(1970, 1, 1)
+
+TIME_FORMAT = '%Y-%m-%d %H:%M:%S.%f'
+
+# dictionary encoded string column
+STRING = 's'
+
+# exports are run one at a time, in submission order
+EXPORTER = ThreadPoolExecutor(1)
+
+
+def to_timestamp(value):
+    """Return a naive UTC datetime as microseconds since the epoch."""
+
+    delta = value - EPOCH
+
+    return (delta.days * 86400 + delta.seconds) * 1000000 + delta.microseconds
+
+
+def from_timestamp(value):
+    """Return microseconds since the epoch as a naive UTC datetime."""
+
+    return EPOCH + timedelta(microseconds=value)
+
+
+def format_timestamp(value):
+    """Return microseconds since the epoch as a string (ms resolution)."""
+
+    return from_timestamp(value).strftime(TIME_FORMAT)[:-3]
+
+
+class Recorder:
+    """Columnar sample recorder.
+
+    Attributes:
+        columns: the names of the columns (timestamp excluded)
+        types: the array typecode of every column, or STRING
+        timestamps: the sample timestamps
+        data: the values of every column (the codes for string columns)
+        strings: the values of the string columns, in code order
+    """
+
+    def __init__(self, columns):
+
+        self.columns = [name for name, _ in columns]
+        self.types = dict(columns)
+        self.timestamps = None
+        self.data = None
+        self.strings = None
+        self.__codes = None
+        self.__sorted = True
+
+        self.clear()
+
+    def __len__(self):
+        return len(self.timestamps)
+
+    def append(self, timestamp, *values):
+        """Add a sample.
+
+        Args:
+            timestamp: a naive UTC datetime or microseconds since the epoch
+            values: the value of every column, in column order
+        """
+
+        if isinstance(timestamp, datetime):
+            timestamp = to_timestamp(timestamp)
+
+        if self.timestamps and timestamp < self.timestamps[-1]:
+            self.__sorted = False
+
+        self.timestamps.append(timestamp)
+
+        for name, value in zip(self.columns, values):
+
+            if name in self.__codes:
+                codes = self.__codes[name]
+                if value not in codes:
+                    codes[value] = len(codes)
+                    self.strings[name].append(value)
+                value = codes[value]
+
+            self.data[name].append(value)
+
+    def clear(self):
+        """Remove all the samples."""
+
+        self.timestamps = array('q')
+        self.data = {}
+        self.strings = {}
+        self.__codes = {}
+        self.__sorted = True
+
+        for name in self.columns:
+            if self.types[name] == STRING:
+                self.data[name] = array('i')
+                self.strings[name] = []
+                self.__codes[name] = {}
+            else:
+                self.data[name] = array(self.types[name])
+
+    def __range(self, start, end):
+        """Return the samples in [start, end) as a slice or index list."""
+
+        if isinstance(start, datetime):
+            start = to_timestamp(start)
+
+        if isinstance(end, datetime):
+            end = to_timestamp(end)
+
+        if self.__sorted:
+            low = 0 if start is None else bisect_left(self.timestamps, start)
+            high = len(self) if end is None \
+                else bisect_left(self.timestamps, end)
+            return slice(low, high)
+
+        return [index for index, timestamp in enumerate(self.timestamps)
+                if (start is None or timestamp >= start) and
+                (end is None or timestamp < end)]
+
+    def select(self, start=None, end=None):
+        """Return a new recorder with the samples in [start, end)."""
+
+        selection = self.__range(start, end)
+
+        out = Recorder([(name, self.types[name]) for name in self.columns])
+
+        if isinstance(selection, slice):
+            out.timestamps = self.timestamps[selection]
+            out.data = {name: column[selection]
+                        for name, column in self.data.items()}
+        else:
+            out.timestamps = array('q', (self.timestamps[index]
+                                         for index in selection))
+            out.data = {name: array(column.typecode, (column[index]
+                                                      for index in selection))
+                        for name, column in self.data.items()}
+
+        out.strings = {name: list(values)
+                       for name, values in self.strings.items()}
+        out.__codes = {name: dict(codes)
+                       for name, codes in self.__codes.items()}
+        out.__sorted = self.__sorted
+
+        return out
+
+    def column(self, name):
+        """Return the values of a column."""
+
+        if name == "timestamp":
+            return list(self.timestamps)
+
+        if name in self.strings:
+            values = self.strings[name]
+            return [values[code] for code in self.data[name]]
+
+        return self.data[name].tolist()
+
+    def rows(self):
+        """Return an iterator over the (timestamp, values...) samples."""
+
+        return zip(self.timestamps, *[self.column(name)
+                                      for name in self.columns])
+
+    def to_csv(self, path, fields=None, fmt=None, constants=None,
+               mode="a"):
+        """Write the samples to a CSV file with a single write.
+
+        Args:
+            path: the output file
+            fields: the fields of every line, in order: "timestamp", a
+                column name, or a key of constants (default: timestamp and
+                all the columns)
+            fmt: the format string of every line (default: the fields
+                separated by commas)
+            constants: values repeated on every line
+            mode: the file open mode
+        """
+
+        fields = fields or ["timestamp"] + self.columns
+        fmt = fmt or ", ".join(["%s"] * len(fields))
+        constants = constants or {}
+
+        values = []
+
+        for field in fields:
+            if field == "timestamp":
+                values.append([format_timestamp(timestamp)
+                               for timestamp in self.timestamps])
+            elif field in self.data:
+                values.append(self.column(field))
+            else:
+                values.append([constants[field]] * len(self))
+
+        lines = [fmt % row for row in zip(*values)]
+
+        if not lines:
+            return
+
+        with open(path, mode) as output:
+            output.write("\n".join(lines) + "\n")
+
+    def to_binary(self, path):
+        """Write the samples to a columnar binary file with a single write."""
+
+        header = {'length': len(self),
+                  'byteorder': sys.byteorder,
+                  'columns': [{'name': 'timestamp', 'type': 'q'}] +
+                             [{'name': name,
+                               'type': self.data[name].typecode,
+                               'strings': self.strings.get(name)}
+                              for name in self.columns]}
+
+        header = json.dumps(header).encode()
+
+        chunks = [MAGIC, HEADER.pack(len(header)), header,
+                  self.timestamps.tobytes()]
+        chunks.extend(self.data[name].tobytes() for name in self.columns)
+
+        with open(path, "wb") as output:
+            output.write(b"".join(chunks))
+
+    @classmethod
+    def from_binary(cls, path):
+        """Load a recorder from a columnar binary file."""
+
+        with open(path, "rb") as source:
+            content = source.read()
+
+        if not content.startswith(MAGIC):
+            raise ValueError("Invalid recorder file %s" % path)
+
+        offset = len(MAGIC)
+        size = HEADER.unpack_from(content, offset)[0]
+        offset += HEADER.size
+        header = json.loads(content[offset:offset + size].decode())
+        offset += size
+
+        columns = header['columns']
+
+        out = cls([(column['name'],
+                    STRING if column.get('strings') is not None
+                    else column['type']) for column in columns[1:]])
+
+        arrays = []
+
+        for column in columns:
+            values = array(column['type'])
+            end = offset + header['length'] * values.itemsize
+            values.frombytes(content[offset:end])
+            if header['byteorder'] != sys.byteorder:
+                values.byteswap()
+            arrays.append(values)
+            offset = end
+
+        out.timestamps = arrays[0]
+
+        for column, values in zip(columns[1:], arrays[1:]):
+            out.data[column['name']] = values
+            if column.get('strings') is not None:
+                out.strings[column['name']] = column['strings']
+                out.__codes[column['name']] = \
+                    {value: code for code, value
+                     in enumerate(column['strings'])}
+
+        out.__sorted = all(prev <= cur for prev, cur
+                           in zip(out.timestamps, out.timestamps[1:]))
+
+        return out
+
+    def export(self, path, binary=False, start=None, end=None, **kwargs):
+        """Export the samples in [start, end) on a background thread.
+
+        The samples are copied before returning, so the recorder can be
+        modified while the export is running. A failed export is logged.
+
+        Returns:
+            A concurrent.futures.Future resolved when the file is written
+        """
+
+        snapshot = self.select(start, end)
+
+        if binary:
+            future = EXPORTER.submit(snapshot.to_binary, path)
+        else:
+            future = EXPORTER.submit(snapshot.to_csv, path, **kwargs)
+
+        def done(future):
+            if future.exception():
+                LOG.error("Unable to export %s: %s", path, future.exception(),
+                          exc_info=future.exception())
+
+        future.add_done_callback(done)
+
+        return future
+
+    def to_dict(self):
+        """Return a JSON-serializable dictionary."""
+
+        out = {'timestamp': [format_timestamp(timestamp)
+                             for timestamp in self.timestamps]}
+
+        for name in self.columns:
+            out[name] = self.column(name)
+
+        return out
@@ -47,6 +47,24 @@ class TxPolicyProp(dict):
             dict.__setitem__(self, key, value)
             return dict.__getitem__(self, key)
 
+    def update_policies(self, addrs=None, **fields):
+        """Set the same fields on several policies of the block.
+
+        A single message per policy is sent at the end of the current IOLoop
+        iteration.
+
+        Args:
+            addrs: the destination addresses (default: all the policies
+                already defined on the block)
+            fields: the new values, keyed on the field name (e.g. mcast)
+        """
+
+        if addrs is None:
+            addrs = list(self.keys())
+
+        for addr in addrs:
+            self[addr].update(**fields)
+
 
 class ResourcePool(list):
     """ EmPOWER resource pool.
@@ -141,6 +159,9 @@ class ResourceBlock:
         self.wifi_stats = {}
         self.slice_stats = {}
 
+        # the slices acknowledged by the WTP, keyed on (ssid, dscp)
+        self.slices = {}
+
         if self.channel > 14:
             self.supports = [6.0, 9.0, 12.0, 18.0, 24.0, 36.0, 48.0, 54.0]
         else:
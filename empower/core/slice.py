@@ -372,6 +372,44 @@ class Slice:
 
                     self.lte['vbses'][vbs_addr]['static-properties']['period'] = period
 
+    def get_wifi_properties(self, wtp_addr):
+        """Return the WiFi static properties of the slice on a WTP."""
+
+        properties = dict(self.wifi['static-properties'])
+
+        if wtp_addr in self.wifi['wtps']:
+            properties.update(self.wifi['wtps'][wtp_addr]['static-properties'])
+
+        return properties
+
+    def get_wifi_digest(self, wtp_addr):
+        """Return the WiFi configuration of the slice on a WTP as a tuple."""
+
+        properties = self.get_wifi_properties(wtp_addr)
+
+        return (bool(properties['amsdu_aggregation']),
+                properties['quantum'],
+                properties['scheduler'],
+                properties['max_aggr_length'])
+
+    def get_lte_properties(self, vbs_addr):
+        """Return the LTE static properties of the slice on a VBS."""
+
+        properties = dict(self.lte['static-properties'])
+
+        if vbs_addr in self.lte['vbses'] and \
+                'static-properties' in self.lte['vbses'][vbs_addr]:
+            properties.update(self.lte['vbses'][vbs_addr]['static-properties'])
+
+        return properties
+
+    def get_lte_digest(self, vbs_addr):
+        """Return the LTE configuration of the slice on a VBS as a tuple."""
+
+        properties = self.get_lte_properties(vbs_addr)
+
+        return (properties['sched_id'], properties['rbgs'])
+
     def __repr__(self):
         return "%s:%s" % (self.tenant.tenant_name, self.dscp)
 
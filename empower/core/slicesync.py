@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+#
+# Copyright (c) 2019 Roberto Riggio
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied. See the License for the
+# specific language governing permissions and limitations
+# under the License.
+
+"""Slice propagation.
+
+Every WTP resource block keeps the configuration of the slices last
+acknowledged by the agent (reported with a STATUS_SLICE message or sent with
+a SET_SLICE message) in block.slices, and every eNB cell does the same for
+the RAN MAC slices in cell.slices. When a slice is added, changed, or
+removed, the devices of the tenant are queued and at most max_devices of
+them are synced at every IOLoop iteration. A device is only sent the slices
+whose configuration differs from the acknowledged one.
+
+The queue holds the tenant itself rather than its id: when a tenant is
+removed its slices are deleted and the tenant is dropped from the runtime
+before the queue is processed, and the deletes must still be sent.
+"""
+
+from collections import OrderedDict
+
+import tornado.ioloop
+
+import empower.logger
+
+MAX_DEVICES = 20
+
+
+class SliceSync:
+    """Slice propagation queue.
+
+    Attributes:
+        max_devices: the max number of devices synced per IOLoop iteration
+        queue: the (device, tenant) to be synced for every (device address,
+            tenant id, dscp) tuple
+        sent: the number of slice messages sent
+        skipped: the number of blocks/cells already in sync
+    """
+
+    def __init__(self, max_devices=MAX_DEVICES):
+
+        self.max_devices = max_devices
+        self.queue = OrderedDict()
+        self.sent = 0
+        self.skipped = 0
+        self.__scheduled = False
+        self.log = empower.logger.get_logger()
+
+    def schedule(self, tenant, dscp):
+        """Sync a slice on all the online devices of a tenant."""
+
+        for pnfdevs in (tenant.wtps, tenant.vbses):
+            for pnfdev in pnfdevs.values():
+                if pnfdev.is_online():
+                    key = (pnfdev.addr, tenant.tenant_id, dscp)
+                    self.queue[key] = (pnfdev, tenant)
+
+        self.__wakeup()
+
+    def __wakeup(self):
+
+        if not self.queue or self.__scheduled:
+            return
+
+        self.__scheduled = True
+
+        tornado.ioloop.IOLoop.instance().add_callback(self.__run)
+
+    def __run(self):
+        """Sync the next max_devices devices."""
+
+        self.__scheduled = False
+
+        for _ in range(min(self.max_devices, len(self.queue))):
+
+            (_, _, dscp), (pnfdev, tenant) = self.queue.popitem(last=False)
+
+            if not pnfdev.connection:
+                continue
+
+            try:
+                sent, skipped = pnfdev.connection.sync_slice(tenant, dscp)
+            except Exception as ex:
+                self.log.exception(ex)
+                continue
+
+            self.sent += sent
+            self.skipped += skipped
+
+        self.__wakeup()
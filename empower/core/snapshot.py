@@ -0,0 +1,577 @@
+#!/usr/bin/env python3
+#
+# Copyright (c) 2019 Roberto Riggio
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied. See the License for the
+# specific language governing permissions and limitations
+# under the License.
+
+"""EmPOWER runtime snapshot.
+
+The in-memory state of the runtime that is normally rebuilt from the agents
+status reports (LVAPs, VAPs, and transmission policies) and the list of
+registered components are periodically saved to a binary file. The file is a
+journal of (key, record) entries: at every period only the entries that
+changed since the previous period are appended as a single frame (a None
+record marks a deletion). The journal is compacted when it grows too large.
+The LVAPs, VAPs, and transmission policies record their own changes, so that
+only the modified entries are collected in the IOLoop. The file is written by
+a background thread.
+
+On startup the snapshot is preloaded. When a WTP reconnects, its LVAPs, VAPs
+and transmission policies are restored from the snapshot before the status
+requests are sent. Restored entries that are not reported by the agent are
+then pushed again by the LVAPP reconciliation engine.
+"""
+
+import os
+import pickle
+import struct
+
+from concurrent.futures import ThreadPoolExecutor
+from importlib import import_module
+from uuid import UUID
+
+import tornado.ioloop
+
+import empower.logger
+
+from empower.core.lvap import LVAP
+from empower.core.lvap import PROCESS_RUNNING
+from empower.core.lvap import CHANGED as LVAP_CHANGED
+from empower.core.vap import VAP
+from empower.core.vap import CHANGED as VAP_CHANGED
+from empower.core.transmissionpolicy import CHANGED as TXP_CHANGED
+from empower.datatypes.etheraddress import EtherAddress
+from empower.datatypes.ssid import SSID
+from empower.settings import SNAPSHOT_PATH
+from empower.settings import SNAPSHOT_PERIOD
+
+MAGIC = b"ESNP\x01"
+LENGTH = struct.Struct("!I")
+
+# compact the journal when it is this many times larger than the snapshot
+COMPACT_RATIO = 2
+
+R_LVAP = "lvap"
+R_VAP = "vap"
+R_TXP = "txp"
+R_COMPONENT = "component"
+
+
+def _block_key(block):
+    """Return the snapshot key of a resource block."""
+
+    return (block.radio.addr.to_raw(), block.hwaddr.to_raw(), block.channel,
+            block.band)
+
+
+def _raw(value):
+    """Return the raw representation of an address/ssid (or None)."""
+
+    return value.to_raw() if value else None
+
+
+def _load_block(block_key):
+    """Return the block matching a snapshot key (or None).
+
+    Only blocks of online WTPs are returned.
+    """
+
+    from empower.main import RUNTIME
+
+    addr, hwaddr, channel, band = block_key
+
+    wtp = RUNTIME.wtps.get(EtherAddress(addr))
+
+    if not wtp or not wtp.is_online():
+        return None
+
+    blocks = wtp.get_block(hwaddr, channel, band)
+
+    return blocks[0] if blocks else None
+
+
+class RuntimeSnapshot:
+    """Runtime snapshot.
+
+    Attributes:
+        path: the snapshot file
+        period: the snapshot period in ms
+        preloaded: the entries loaded at startup and not yet restored
+        written: the entries currently stored in the snapshot file
+        live: the entries of the current runtime state
+    """
+
+    def __init__(self, path=SNAPSHOT_PATH, period=SNAPSHOT_PERIOD):
+
+        self.path = path
+        self.period = period
+        self.preloaded = {}
+        self.written = {}
+        self.live = {}
+        self.__touched = set()
+        self.__journal = 0
+        self.__worker = None
+        self.__executor = ThreadPoolExecutor(1)
+        self.log = empower.logger.get_logger()
+
+        self.__load()
+
+    def start(self):
+        """Start periodic snapshots."""
+
+        self.__worker = \
+            tornado.ioloop.PeriodicCallback(self.save, self.period)
+
+        self.__worker.start()
+
+    def stop(self):
+        """Stop periodic snapshots and write pending changes."""
+
+        if self.__worker:
+            self.__worker.stop()
+
+        self.save()
+        self.__executor.shutdown(wait=True)
+
+    def __load(self):
+        """Load the snapshot file."""
+
+        if not self.path or not os.path.exists(self.path):
+            return
+
+        entries = {}
+        journal = 0
+
+        try:
+            with open(self.path, "rb") as snapshot:
+                if snapshot.read(len(MAGIC)) != MAGIC:
+                    self.log.warning("Invalid snapshot file %s", self.path)
+                    return
+                while True:
+                    header = snapshot.read(LENGTH.size)
+                    if len(header) < LENGTH.size:
+                        break
+                    length = LENGTH.unpack(header)[0]
+                    data = snapshot.read(length)
+                    if len(data) < length:
+                        raise EOFError("incomplete frame")
+                    for key, record in pickle.loads(data):
+                        journal += 1
+                        if record is None:
+                            entries.pop(key, None)
+                        else:
+                            entries[key] = record
+        except (OSError, EOFError, pickle.UnpicklingError, ValueError) as ex:
+            # a truncated tail is expected if the controller crashed while
+            # appending to the journal
+            self.log.warning("Snapshot %s truncated: %s", self.path, ex)
+
+        self.preloaded = entries
+        self.written = dict(entries)
+        self.__journal = journal
+
+        self.log.info("Loaded snapshot with %u entries", len(entries))
+
+    def collect(self):
+        """Return the snapshot entries changed since the last call.
+
+        Only the LVAPs, VAPs, and transmission policies that have been
+        modified (see their CHANGED sets) are visited.
+
+        Returns:
+            A dictionary mapping the changed keys on their new record (None
+            for the deleted entries)
+        """
+
+        from empower.main import RUNTIME
+
+        touched = self.__touched
+        self.__touched = set()
+
+        lvaps = set(LVAP_CHANGED)
+        LVAP_CHANGED.clear()
+
+        for addr in lvaps:
+
+            key = (R_LVAP, addr.to_raw())
+            lvap = RUNTIME.lvaps.get(addr)
+
+            if not lvap:
+                self.live.pop(key, None)
+                touched.add(key)
+                continue
+
+            # lvaps in the middle of an handover are saved at the next period
+            if lvap.state != PROCESS_RUNNING or not lvap.blocks[0]:
+                LVAP_CHANGED.add(addr)
+                continue
+
+            networks = tuple((bssid.to_raw(), ssid.to_raw())
+                             for bssid, ssid in lvap.networks)
+
+            self.live[key] = (lvap.assoc_id,
+                              lvap.supported_band,
+                              _raw(lvap.bssid),
+                              _raw(lvap.ssid),
+                              _raw(lvap.encap),
+                              lvap.authentication_state,
+                              lvap.association_state,
+                              networks,
+                              tuple(_block_key(x) for x in lvap.blocks))
+
+            touched.add(key)
+
+        # deleted objects are visited first, as they may have been replaced
+        # by new ones with the same key
+        vaps = sorted(VAP_CHANGED, key=self.__vap_alive)
+        VAP_CHANGED.clear()
+
+        for vap in vaps:
+
+            key = (R_VAP, vap.bssid.to_raw())
+
+            if self.__vap_alive(vap):
+                self.live[key] = (str(vap.tenant.tenant_id),
+                                  _block_key(vap.block))
+            else:
+                self.live.pop(key, None)
+
+            touched.add(key)
+
+        txps = sorted(TXP_CHANGED, key=self.__txp_alive)
+        TXP_CHANGED.clear()
+
+        for txp in txps:
+
+            key = (R_TXP, _block_key(txp.block), txp.addr.to_raw())
+
+            if self.__txp_alive(txp):
+                self.live[key] = (txp.no_ack,
+                                  txp.rts_cts,
+                                  txp.mcast,
+                                  tuple(sorted(txp.mcs)),
+                                  tuple(sorted(txp.ht_mcs)),
+                                  txp.ur_count,
+                                  txp.max_amsdu_len)
+            else:
+                self.live.pop(key, None)
+
+            touched.add(key)
+
+        # the registered components are few, they are always checked
+        components = set()
+
+        for (tenant_id, name), params in RUNTIME.registrations.items():
+
+            if tenant_id:
+                tenant = RUNTIME.tenants.get(tenant_id)
+                component = tenant.components.get(name) if tenant else None
+                tenant_id = str(tenant_id)
+            else:
+                component = RUNTIME.components.get(name)
+
+            if component is None:
+                continue
+
+            current = {k: getattr(component, k, v) for k, v in params.items()}
+
+            try:
+                pickle.dumps(current)
+            except (pickle.PicklingError, TypeError, AttributeError):
+                current = params
+
+            key = (R_COMPONENT, name, tenant_id)
+
+            self.live[key] = current
+            components.add(key)
+
+        for key in list(self.live):
+            if key[0] == R_COMPONENT and key not in components:
+                del self.live[key]
+
+        touched.update(components)
+        touched.update(key for key in self.written if key[0] == R_COMPONENT)
+
+        changes = {}
+
+        for key in touched:
+            record = self.live.get(key, self.preloaded.get(key))
+            if self.written.get(key) != record:
+                changes[key] = record
+
+        return changes
+
+    @classmethod
+    def __vap_alive(cls, vap):
+        """Return True if a VAP is still part of the runtime."""
+
+        from empower.main import RUNTIME
+
+        tenant = RUNTIME.tenants.get(vap.tenant.tenant_id)
+
+        return bool(tenant) and tenant.vaps.get(vap.bssid) is vap and \
+            hasattr(vap.block, "radio")
+
+    @classmethod
+    def __txp_alive(cls, txp):
+        """Return True if a policy belongs to a block of a connected WTP."""
+
+        from empower.main import RUNTIME
+
+        block = txp.block
+        wtp = RUNTIME.wtps.get(block.radio.addr)
+
+        if not wtp:
+            return False
+
+        blocks = wtp.get_block(block.hwaddr, block.channel, block.band)
+
+        return bool(blocks) and blocks[0].tx_policies.get(txp.addr) is txp
+
+    def save(self):
+        """Save the changes since the last snapshot.
+
+        The changes are collected in the IOLoop, the actual write is
+        performed by a background thread.
+        """
+
+        changes = self.collect()
+
+        if not changes:
+            return None
+
+        for key, record in changes.items():
+            if record is None:
+                self.written.pop(key, None)
+            else:
+                self.written[key] = record
+
+        self.__journal += len(changes)
+
+        if not os.path.exists(self.path) or \
+                self.__journal > COMPACT_RATIO * len(self.written):
+            self.__journal = len(self.written)
+            return self.__executor.submit(self.__compact, dict(self.written))
+
+        return self.__executor.submit(self.__append, list(changes.items()))
+
+    def __append(self, changes):
+        """Append the changes to the journal (runs in a background thread)."""
+
+        try:
+            with open(self.path, "ab") as snapshot:
+                snapshot.write(self.__encode(changes))
+                snapshot.flush()
+                os.fsync(snapshot.fileno())
+        except OSError as ex:
+            self.log.error("Unable to write snapshot: %s", ex)
+
+    def __compact(self, entries):
+        """Rewrite the snapshot file with the current entries only (runs in
+        a background thread)."""
+
+        tmp = self.path + ".tmp"
+
+        try:
+            with open(tmp, "wb") as snapshot:
+                snapshot.write(MAGIC)
+                snapshot.write(self.__encode(entries.items()))
+                snapshot.flush()
+                os.fsync(snapshot.fileno())
+            os.replace(tmp, self.path)
+        except OSError as ex:
+            self.log.error("Unable to write snapshot: %s", ex)
+
+    @classmethod
+    def __encode(cls, changes):
+        """Encode a list of (key, record) entries as a single frame."""
+
+        data = pickle.dumps(list(changes), protocol=pickle.HIGHEST_PROTOCOL)
+
+        return LENGTH.pack(len(data)) + data
+
+    def __unload(self, key):
+        """Remove and return a preloaded entry."""
+
+        self.__touched.add(key)
+
+        return self.preloaded.pop(key)
+
+    def restore_components(self):
+        """Launch the components registered before the restart.
+
+        Components already launched (e.g. from the command line) are skipped.
+        Runtime entries referring to unknown WTPs are dropped.
+        """
+
+        from empower.main import RUNTIME
+
+        components = [key for key in self.preloaded if key[0] == R_COMPONENT]
+
+        # system components first, then tenant apps
+        components.sort(key=lambda x: x[2] is not None)
+
+        for key in components:
+
+            _, name, tenant_id = key
+            params = dict(self.__unload(key))
+
+            try:
+
+                func = getattr(import_module(name), "launch")
+
+                if tenant_id:
+                    params['tenant_id'] = UUID(tenant_id)
+                    if name in RUNTIME.tenants[params['tenant_id']].components:
+                        continue
+                    RUNTIME.register_app(name, func, params)
+                else:
+                    if name in RUNTIME.components:
+                        continue
+                    RUNTIME.register(name, func, params)
+
+            except Exception as ex:
+                self.log.error("Unable to restore %s: %s", name, ex)
+
+        for key in list(self.preloaded):
+
+            if key[0] == R_LVAP:
+                addr = self.preloaded[key][8][0][0]
+            elif key[0] == R_VAP:
+                addr = self.preloaded[key][1][0]
+            else:
+                addr = key[1][0]
+
+            if EtherAddress(addr) not in RUNTIME.wtps:
+                self.__unload(key)
+
+    def restore_wtp(self, wtp):
+        """Restore the state of a WTP after its capabilities are known.
+
+        Must be called before the status requests are sent to the WTP.
+        """
+
+        addr = wtp.addr.to_raw()
+        restored_lvaps = []
+        restored_vaps = []
+
+        for key in list(self.preloaded):
+
+            if key[0] == R_TXP and key[1][0] == addr:
+                self.__restore_txp(key, self.__unload(key))
+
+        for key in list(self.preloaded):
+
+            if key[0] == R_LVAP and self.preloaded[key][8][0][0] == addr:
+                lvap = self.__restore_lvap(key, self.__unload(key))
+                if lvap:
+                    restored_lvaps.append(lvap.addr)
+
+            elif key[0] == R_VAP and self.preloaded[key][1][0] == addr:
+                vap = self.__restore_vap(key, self.__unload(key))
+                if vap:
+                    restored_vaps.append(vap.bssid)
+
+        if not restored_lvaps and not restored_vaps:
+            return
+
+        self.log.info("Restored %u LVAPs and %u VAPs on %s",
+                      len(restored_lvaps), len(restored_vaps), wtp.addr)
+
+    @classmethod
+    def __restore_txp(cls, key, record):
+
+        block = _load_block(key[1])
+
+        if not block:
+            return
+
+        txp = block.tx_policies[EtherAddress(key[2])]
+
+        txp.set_no_ack(record[0])
+        txp.set_rts_cts(record[1])
+        txp.set_mcast(record[2])
+        txp.set_mcs(record[3])
+        txp.set_ht_mcs(record[4])
+        txp.set_ur_count(record[5])
+        txp.set_max_amsdu_len(record[6])
+
+    @classmethod
+    def __restore_lvap(cls, key, record):
+
+        from empower.main import RUNTIME
+
+        sta = EtherAddress(key[1])
+
+        # the station showed up again in the meantime
+        if sta in RUNTIME.lvaps:
+            return None
+
+        assoc_id, supported_band, bssid, ssid, encap, auth, assoc, \
+            networks, blocks = record
+
+        blocks = [_load_block(x) for x in blocks]
+
+        if not blocks[0]:
+            return None
+
+        lvap = LVAP(sta, assoc_id=assoc_id, state=PROCESS_RUNNING)
+
+        lvap.supported_band = supported_band
+        lvap.bssid = EtherAddress(bssid) if bssid else None
+        lvap.encap = EtherAddress(encap) if encap else None
+        lvap.authentication_state = auth
+        lvap.association_state = assoc
+        lvap.networks = [(EtherAddress(x), SSID(y)) for x, y in networks]
+
+        # uplink blocks on WTPs that are not online yet are dropped
+        lvap._downlink = blocks[0]
+        lvap._uplink = [x for x in blocks[1:] if x]
+
+        if ssid:
+            lvap.ssid = SSID(ssid)
+            if lvap.tenant:
+                lvap.tenant.lvaps[sta] = lvap
+            else:
+                lvap.ssid = None
+
+        RUNTIME.lvaps[sta] = lvap
+
+        return lvap
+
+    @classmethod
+    def __restore_vap(cls, key, record):
+
+        from empower.main import RUNTIME
+
+        tenant_id = UUID(record[0])
+        bssid = EtherAddress(key[1])
+
+        if tenant_id not in RUNTIME.tenants:
+            return None
+
+        tenant = RUNTIME.tenants[tenant_id]
+
+        if bssid in tenant.vaps:
+            return None
+
+        block = _load_block(record[1])
+
+        if not block:
+            return None
+
+        vap = VAP(bssid, block, tenant)
+        tenant.vaps[bssid] = vap
+
+        return vap
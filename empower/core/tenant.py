@@ -19,18 +19,17 @@
 
 import json
 
-from sqlalchemy.exc import IntegrityError
-
 from empower.persistence.persistence import TblSlice
 from empower.persistence.persistence import TblSliceBelongs
 from empower.persistence.persistence import TblTrafficRule
+from empower.persistence.worker import Insert
+from empower.persistence.worker import Upsert
+from empower.persistence.worker import Delete
 from empower.core.slice import Slice
-from empower.persistence import Session
 from empower.core.utils import get_module
 from empower.datatypes.etheraddress import EtherAddress
+from empower.datatypes.dscp import DSCP
 from empower.core.trafficrule import TrafficRule
-from empower.vbsp import EP_OPERATION_SET
-from empower.vbsp import EP_OPERATION_ADD
 
 T_TYPE_SHARED = "shared"
 T_TYPE_UNIQUE = "unique"
@@ -83,8 +82,17 @@ class Tenant:
         self.lvnfs = {}
         self.vaps = {}
         self.slices = {}
+        self.traffic_rules = {}
         self.components = {}
 
+    @property
+    def persistence(self):
+        """Return the persistence worker. """
+
+        from empower.main import RUNTIME
+
+        return RUNTIME.persistence
+
     @property
     def wtps(self):
         """Return WTPs. """
@@ -177,25 +185,6 @@ class Tenant:
         endpoint.ports.clear()
         del self.endpoints[endpoint_id]
 
-    @property
-    def traffic_rules(self):
-        """Fetch traffic rule queues in this tenant."""
-
-        trs = \
-            Session().query(TblTrafficRule) \
-                     .filter(TblTrafficRule.tenant_id == self.tenant_id) \
-                     .all()
-
-        results = {}
-
-        for rule in trs:
-            results[rule.match] = {'match': rule.match,
-                                   'label': rule.label,
-                                   'priority': rule.priority,
-                                   'dscp': rule.dscp}
-
-        return results
-
     def add_traffic_rule(self, match, dscp, label, priority=0):
         """Add a new traffic rule to the Tenant.
 
@@ -204,12 +193,15 @@ class Tenant:
             dscp, a slice DSCP code
             label, a humand readable description of the rule
         Returns:
-            None
+            A future resolved when the rule has been saved in the db
 
         Raises:
-            Nones
+            ValueError, if the rule is already defined
         """
 
+        if match in self.traffic_rules:
+            raise ValueError("Duplicate (%s, %s)" % (self.tenant_id, match))
+
         trule = TrafficRule(tenant=self,
                             match=match,
                             dscp=dscp,
@@ -222,16 +214,18 @@ class Tenant:
         if ibnp_server:
             ibnp_server.add_traffic_rule(trule)
 
-        rule = TblTrafficRule(tenant_id=self.tenant_id, match=match,
-                              dscp=dscp, priority=priority, label=label)
+        self.traffic_rules[match] = {'match': match,
+                                     'label': label,
+                                     'priority': priority,
+                                     'dscp': dscp}
 
-        try:
-            session = Session()
-            session.add(rule)
-            session.commit()
-        except IntegrityError:
-            session.rollback()
-            raise ValueError("Duplicate (%s, %s)" % (self.tenant_id, match))
+        row = {'tenant_id': self.tenant_id,
+               'match': match,
+               'dscp': dscp,
+               'priority': priority,
+               'label': label}
+
+        return self.persistence.submit(Insert(TblTrafficRule, [row]))
 
     def del_traffic_rule(self, match):
         """Delete a traffic rule from this tenant.
@@ -240,18 +234,14 @@ class Tenant:
             match, a Match object
 
         Returns:
-            None
+            A future resolved when the rule has been removed from the db
 
         Raises:
-            None
+            KeyError, if the rule is not defined
         """
 
-        rule = Session().query(TblTrafficRule) \
-                        .filter(TblTrafficRule.tenant_id == self.tenant_id,
-                                TblTrafficRule.match == match) \
-                        .first()
-        if not rule:
-            raise KeyError(rule)
+        if match not in self.traffic_rules:
+            raise KeyError(match)
 
         # Send command to IBN
         from empower.ibnp.ibnpserver import IBNPServer
@@ -259,9 +249,43 @@ class Tenant:
         if ibnp_server:
             ibnp_server.del_traffic_rule(self.tenant_id, match)
 
-        session = Session()
-        session.delete(rule)
-        session.commit()
+        del self.traffic_rules[match]
+
+        return self.persistence.submit(Delete(TblTrafficRule,
+                                              tenant_id=self.tenant_id,
+                                              match=match))
+
+    def __slice_rows(self, slc):
+        """Return the db rows describing a slice."""
+
+        tbl_slc = {'tenant_id': self.tenant_id,
+                   'dscp': slc.dscp,
+                   'wifi': json.dumps(slc.wifi['static-properties']),
+                   'lte': json.dumps(slc.lte['static-properties'])}
+
+        belongs = []
+
+        for wtp_addr in slc.wifi['wtps']:
+
+            properties = \
+                json.dumps(slc.wifi['wtps'][wtp_addr]['static-properties'])
+
+            belongs.append({'tenant_id': self.tenant_id,
+                            'dscp': slc.dscp,
+                            'addr': wtp_addr,
+                            'properties': properties})
+
+        for vbs_addr in slc.lte['vbses']:
+
+            properties = \
+                json.dumps(slc.lte['vbses'][vbs_addr]['static-properties'])
+
+            belongs.append({'tenant_id': self.tenant_id,
+                            'dscp': slc.dscp,
+                            'addr': vbs_addr,
+                            'properties': properties})
+
+        return tbl_slc, belongs
 
     def add_slice(self, dscp, request):
         """Add a new slice to the Tenant.
@@ -271,84 +295,98 @@ class Tenant:
             request, the slice descriptor in json format
 
         Returns:
-            None
+            A future resolved when the slice has been saved in the db
 
         Raises:
             ValueError, if the dscp is not valid
         """
 
+        if DSCP(dscp) in self.slices:
+            raise ValueError("Slice %s already defined" % dscp)
+
         # create new instance
         slc = Slice(dscp, self, request)
 
         # descriptors has been parsed, now it is safe to write to the db
-        try:
+        tbl_slc, belongs = self.__slice_rows(slc)
 
-            session = Session()
+        future = self.persistence.submit(Insert(TblSlice, [tbl_slc]),
+                                         Insert(TblSliceBelongs, belongs))
 
-            tbl_slc = TblSlice(tenant_id=self.tenant_id,
-                               dscp=slc.dscp,
-                               wifi=json.dumps(slc.wifi['static-properties']),
-                               lte=json.dumps(slc.lte['static-properties']))
-
-            session.add(tbl_slc)
+        # store slice
+        self.slices[slc.dscp] = slc
 
-            for wtp_addr in slc.wifi['wtps']:
+        # create slice on WTPs and VBSes
+        self.__send_slice(slc)
 
-                properties = \
-                    json.dumps(slc.wifi['wtps'][wtp_addr]['static-properties'])
+        return future
 
-                belongs = TblSliceBelongs(tenant_id=self.tenant_id,
-                                          dscp=tbl_slc.dscp,
-                                          addr=wtp_addr,
-                                          properties=properties)
+    def add_slices(self, descriptors):
+        """Add a batch of slices to the Tenant.
 
-                session.add(belongs)
+        All the slices are parsed first, then the valid ones are saved in
+        the db in a single transaction and pushed to the WTPs and VBSes.
 
-            for vbs_addr in slc.lte['vbses']:
+        Args:
+            descriptors, a list of slice descriptors in json format
 
-                properties = \
-                    json.dumps(slc.lte['vbses'][vbs_addr]['static-properties'])
+        Returns:
+            A list with one result per descriptor, either the new Slice or
+            the exception describing why the descriptor was rejected.
+        """
 
-                belongs = TblSliceBelongs(tenant_id=self.tenant_id,
-                                          dscp=tbl_slc.dscp,
-                                          addr=vbs_addr,
-                                          properties=properties)
+        results = []
+        slices = []
+        tbl_slcs = []
+        belongs = []
 
-                session.add(belongs)
+        for descriptor in descriptors:
 
-            session.commit()
+            try:
 
-        except IntegrityError:
-            session.rollback()
-            raise ValueError()
+                if 'dscp' not in descriptor:
+                    raise ValueError("missing dscp element")
 
-        # store slice
-        self.slices[dscp] = slc
+                dscp = DSCP(descriptor['dscp'])
 
-        # create slice on WTPs
-        for wtp_addr in self.wtps:
+                if dscp in self.slices or \
+                        dscp in [slc.dscp for slc in slices]:
+                    raise ValueError("Slice %s already defined" % dscp)
 
-            wtp = self.wtps[wtp_addr]
+                slc = Slice(dscp, self, descriptor)
 
-            if not wtp.is_online():
+            except (KeyError, ValueError, TypeError) as ex:
+                results.append(ex)
                 continue
 
-            for block in wtp.supports:
-                wtp.connection.send_set_slice(block, slc)
+            tbl_slc, slc_belongs = self.__slice_rows(slc)
+            tbl_slcs.append(tbl_slc)
+            belongs += slc_belongs
 
-        # create slice on VBSes
-        for vbs_addr in self.vbses:
+            slices.append(slc)
+            results.append(slc)
 
-            vbs = self.vbses[vbs_addr]
+        self.persistence.submit(Insert(TblSlice, tbl_slcs),
+                                Insert(TblSliceBelongs, belongs))
 
-            if not vbs.is_online():
-                continue
+        # store slices in one pass, then push them to the WTPs and VBSes
+        self.slices.update({slc.dscp: slc for slc in slices})
+
+        for slc in slices:
+            self.__send_slice(slc)
 
-            for cell in vbs.cells.values():
-                vbs.connection.\
-                    send_add_set_ran_mac_slice_request(cell,
-                                                       slc,
-                                                       EP_OPERATION_ADD)
+        return results
+
+    def __send_slice(self, slc):
+        """Push a slice to the WTPs and to the VBSes.
+
+        Only the blocks and the cells where the slice configuration differs
+        from the acknowledged one are sent a message.
+        """
+
+        from empower.main import RUNTIME
+
+        RUNTIME.slice_sync.schedule(self, slc.dscp)
 
     def set_slice(self, dscp, request):
         """Update a slice in the Tenant.
@@ -358,122 +396,35 @@ class Tenant:
             request, the slice descriptor in json format
 
         Returns:
-            None
+            A future resolved when the slice has been saved in the db
 
         Raises:
             ValueError, if the dscp is not valid
+            KeyError, if the slice is not defined
         """
 
+        if DSCP(dscp) not in self.slices:
+            raise KeyError(dscp)
+
         # create new instance
         slc = Slice(dscp, self, request)
-        tenant_id = self.tenant_id
-
-        # update db
-        try:
-
-            session = Session()
-
-            tbl_slice = Session().query(TblSlice) \
-                                 .filter(TblSlice.tenant_id == tenant_id) \
-                                 .filter(TblSlice.dscp == slc.dscp) \
-                                 .first()
-
-            tbl_slice.wifi = json.dumps(slc.wifi['static-properties'])
-            tbl_slice.lte = json.dumps(slc.lte['static-properties'])
-
-            for wtp_addr in slc.wifi['wtps']:
 
-                properties = \
-                    json.dumps(slc.wifi['wtps'][wtp_addr]['static-properties'])
+        # update db, the belongs are replaced in the same transaction
+        tbl_slc, belongs = self.__slice_rows(slc)
 
-                tbl_belongs = \
-                    Session().query(TblSliceBelongs) \
-                             .filter(TblSliceBelongs.tenant_id == tenant_id) \
-                             .filter(TblSliceBelongs.dscp == slc.dscp) \
-                             .filter(TblSliceBelongs.addr == wtp_addr) \
-                             .first()
-
-                if not tbl_belongs:
-
-                    belongs = TblSliceBelongs(tenant_id=self.tenant_id,
-                                              dscp=slc.dscp,
-                                              addr=wtp_addr,
-                                              properties=properties)
-
-                    session.add(belongs)
-
-                else:
-
-                    tbl_belongs.properties = properties
-
-            for vbs_addr in slc.lte['vbses']:
-
-                properties = \
-                    json.dumps(slc.lte['vbses'][vbs_addr]['static-properties'])
-
-                tbl_belongs = \
-                    Session().query(TblSliceBelongs) \
-                             .filter(TblSliceBelongs.tenant_id == tenant_id) \
-                             .filter(TblSliceBelongs.dscp == slc.dscp) \
-                             .filter(TblSliceBelongs.addr == vbs_addr) \
-                             .first()
-
-                if not tbl_belongs:
-
-                    belongs = TblSliceBelongs(tenant_id=self.tenant_id,
-                                              dscp=slc.dscp,
-                                              addr=vbs_addr,
-                                              properties=properties)
-
-                    session.add(belongs)
-
-                else:
-
-                    tbl_belongs.properties = properties
-
-            session.commit()
-
-        except IntegrityError:
-            session.rollback()
-            raise ValueError()
+        future = self.persistence.submit(Upsert(TblSlice, [tbl_slc]),
+                                         Delete(TblSliceBelongs,
+                                                tenant_id=self.tenant_id,
+                                                dscp=slc.dscp),
+                                         Insert(TblSliceBelongs, belongs))
 
         # store slice
-        self.slices[dscp] = slc
-
-        # create slice on WTPs
-        for wtp_addr in self.wtps:
-
-            wtp = self.wtps[wtp_addr]
-
-            if not wtp.is_online():
-                continue
-
-            for block in wtp.supports:
-                wtp.connection.send_set_slice(block, slc)
-
-        # create slice on VBSes
-        for vbs_addr in self.vbses:
-
-            vbs = self.vbses[vbs_addr]
-
-            if not vbs.is_online():
-                continue
-
-            current_rntis = []
+        self.slices[slc.dscp] = slc
 
-            # The UEs in the slice must be confirmed
+        # update slice on WTPs and VBSes
+        self.__send_slice(slc)
 
-            for ue in list(self.ues.values()):
-
-                if vbs == ue.vbs and dscp == ue.slice:
-                    current_rntis.append(ue.rnti)
-
-            for cell in vbs.cells.values():
-                vbs.connection.\
-                    send_add_set_ran_mac_slice_request(cell,
-                                                       slc,
-                                                       EP_OPERATION_SET,
-                                                       current_rntis)
+        return future
 
     def del_slice(self, dscp):
         """Del slice from.
@@ -482,84 +433,34 @@ class Tenant:
             dscp, a DSCP object
 
         Returns:
-            None
+            A future resolved when the slice has been removed from the db
 
         Raises:
-            ValueError, if the dscp is not valid
+            KeyError, if the slice is not defined
         """
 
         # fetch slice
         slc = self.slices[dscp]
-        tenant_id = self.tenant_id
 
         # delete it from the db
-        try:
-
-            session = Session()
-
-            rem = Session().query(TblSlice) \
-                           .filter(TblSlice.tenant_id == self.tenant_id) \
-                           .filter(TblSlice.dscp == dscp) \
-                           .first()
-
-            session.delete(rem)
-
-            for wtp_addr in slc.wifi['wtps']:
-
-                rem = \
-                    Session().query(TblSliceBelongs) \
-                             .filter(TblSliceBelongs.tenant_id == tenant_id) \
-                             .filter(TblSliceBelongs.dscp == slc.dscp) \
-                             .filter(TblSliceBelongs.addr == wtp_addr) \
-                             .first()
-
-                if rem:
-                    session.delete(rem)
-
-            for vbs_addr in slc.lte['vbses']:
-
-                rem = \
-                    Session().query(TblSliceBelongs) \
-                             .filter(TblSliceBelongs.tenant_id == tenant_id) \
-                             .filter(TblSliceBelongs.dscp == slc.dscp) \
-                             .filter(TblSliceBelongs.addr == vbs_addr) \
-                             .first()
-
-                if rem:
-                    session.delete(rem)
-
-            session.commit()
-
-        except IntegrityError:
-            session.rollback()
-            raise ValueError()
-
-        # delete it from the WTPs
-        for wtp_addr in self.wtps:
-
-            wtp = self.wtps[wtp_addr]
-
-            if not wtp.is_online():
-                continue
-
-            for block in wtp.supports:
-                wtp.connection.send_del_slice(block, self.tenant_name, dscp)
-
-        # delete it from the VBSes
-        for vbs_addr in self.vbses:
-
-            vbs = self.vbses[vbs_addr]
-
-            if not vbs.is_online():
-                continue
+        future = self.persistence.submit(Delete(TblSliceBelongs,
+                                                tenant_id=self.tenant_id,
+                                                dscp=slc.dscp),
+                                         Delete(TblSlice,
+                                                tenant_id=self.tenant_id,
+                                                dscp=slc.dscp))
+
+        # move the UEs to the default slice before removing the slice
+        for ue in list(self.ues.values()):
+            if ue.slice == dscp:
+                ue.slice = DSCP("0x00")
+
+        # remove slice, then delete it from the WTPs and VBSes
+        del self.slices[dscp]
 
-            for cell in vbs.cells.values():
-                vbs.connection.send_del_ran_mac_slice_request(cell,
-                                                              self.plmn_id,
-                                                              dscp)
+        self.__send_slice(slc)
 
-        # remove slice
-        del self.slices[dscp]
+        return future
 
     def __str__(self):
         return str(self.tenant_id)
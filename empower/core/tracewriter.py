@@ -0,0 +1,207 @@
+#!/usr/bin/env python3
+#
+# Copyright (c) 2019 Roberto Riggio
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied. See the License for the
+# specific language governing permissions and limitations
+# under the License.
+
+"""Buffered trace writer.
+
+Apps append lines (or binary records) to trace files without touching the
+disk: the data is buffered in memory and written by a background thread,
+every FLUSH_INTERVAL ms or as soon as more than MAX_BUFFER bytes are
+pending. The writer keeps the most recently used files open, up to
+MAX_FILES, closing the least recently used one when a new file is needed.
+"""
+
+import atexit
+import threading
+
+from collections import OrderedDict
+
+import empower.logger
+
+MAX_FILES = 64
+
+FLUSH_INTERVAL = 1000
+
+MAX_BUFFER = 1 << 20
+
+WRITER = None
+
+
+class TraceWriter(threading.Thread):
+    """Buffered trace writer.
+
+    Attributes:
+        max_files: the maximum number of files kept open
+        interval: the flush period (in ms)
+        max_buffer: the pending bytes that trigger an early flush
+    """
+
+    def __init__(self, max_files=MAX_FILES, interval=FLUSH_INTERVAL,
+                 max_buffer=MAX_BUFFER):
+
+        super().__init__(name="tracewriter", daemon=True)
+
+        self.max_files = max_files
+        self.interval = interval
+        self.max_buffer = max_buffer
+
+        self.__buffers = {}
+        self.__truncate = set()
+        self.__pending = 0
+        self.__files = OrderedDict()
+        self.__lock = threading.Lock()
+        self.__io_lock = threading.Lock()
+        self.__wakeup = threading.Event()
+        self.__stopped = threading.Event()
+        self.log = empower.logger.get_logger()
+
+    def write(self, path, data):
+        """Append a line (str) or a binary record (bytes) to a file."""
+
+        if isinstance(data, str):
+            data = data.encode()
+
+        with self.__lock:
+            self.__buffers.setdefault(path, []).append(data)
+            self.__pending += len(data)
+            full = self.__pending > self.max_buffer
+
+        if full:
+            self.__wakeup.set()
+
+    def writelines(self, path, lines):
+        """Append several lines (or binary records) to a file."""
+
+        if not lines:
+            return
+
+        if isinstance(lines[0], str):
+            self.write(path, "".join(lines))
+        else:
+            self.write(path, b"".join(lines))
+
+    def truncate(self, path, data=None):
+        """Empty a file, dropping the data still pending for it.
+
+        Args:
+            path: the file
+            data: the new content of the file (e.g. a CSV header)
+        """
+
+        with self.__lock:
+            dropped = self.__buffers.pop(path, [])
+            self.__pending -= sum(len(chunk) for chunk in dropped)
+            self.__truncate.add(path)
+
+        if data is not None:
+            self.write(path, data)
+
+    def flush(self):
+        """Write all the pending data to disk."""
+
+        with self.__lock:
+            buffers, self.__buffers = self.__buffers, {}
+            truncate, self.__truncate = self.__truncate, set()
+            self.__pending = 0
+
+        with self.__io_lock:
+
+            for path in truncate:
+                self.__close(path)
+                try:
+                    open(path, "wb").close()
+                except OSError as ex:
+                    self.log.error("Unable to truncate %s: %s", path, ex)
+
+            for path, chunks in buffers.items():
+                try:
+                    output = self.__open(path)
+                    output.write(b"".join(chunks))
+                    output.flush()
+                except OSError as ex:
+                    self.__close(path)
+                    self.log.error("Unable to write %s: %s", path, ex)
+
+    def __open(self, path):
+        """Return the handle of a file, opening it if needed."""
+
+        if path in self.__files:
+            self.__files.move_to_end(path)
+            return self.__files[path]
+
+        while len(self.__files) >= self.max_files:
+            _, output = self.__files.popitem(last=False)
+            output.close()
+
+        output = open(path, "ab")
+        self.__files[path] = output
+
+        return output
+
+    def __close(self, path):
+        """Close a file, if open."""
+
+        output = self.__files.pop(path, None)
+
+        if output:
+            output.close()
+
+    def run(self):
+        """Flush the pending data periodically."""
+
+        while not self.__stopped.is_set():
+
+            self.__wakeup.wait(self.interval / 1000)
+            self.__wakeup.clear()
+
+            self.flush()
+
+    def close(self):
+        """Flush the pending data, stop the thread, and close all the files."""
+
+        self.__stopped.set()
+        self.__wakeup.set()
+
+        self.flush()
+
+        with self.__io_lock:
+            for path in list(self.__files):
+                self.__close(path)
+
+    def to_dict(self):
+        """Return a JSON-serializable dictionary."""
+
+        with self.__io_lock:
+            files = list(self.__files)
+
+        return {'max_files': self.max_files,
+                'interval': self.interval,
+                'max_buffer': self.max_buffer,
+                'pending': self.__pending,
+                'files': files}
+
+
+def get_writer():
+    """Return the trace writer, starting it the first time it is requested."""
+
+    global WRITER
+
+    if not WRITER:
+        WRITER = TraceWriter()
+        WRITER.start()
+        atexit.register(WRITER.close)
+
+    return WRITER
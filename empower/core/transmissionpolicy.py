@@ -17,6 +17,8 @@
 
 """EmPOWER transmission policy class."""
 
+import tornado.ioloop
+
 TX_MCAST_LEGACY = 0x0
 TX_MCAST_DMS = 0x1
 TX_MCAST_UR = 0x2
@@ -33,6 +35,15 @@ REVERSE_TX_MCAST = {TX_MCAST_LEGACY_H: TX_MCAST_LEGACY,
                     TX_MCAST_DMS_H: TX_MCAST_DMS,
                     TX_MCAST_UR_H: TX_MCAST_UR}
 
+TX_POLICY_FIELDS = ['no_ack', 'rts_cts', 'mcast', 'mcs', 'ht_mcs', 'ur_count',
+                    'max_amsdu_len']
+
+# the attributes saved in the runtime snapshot
+SNAPSHOT_FIELDS = {'_' + field for field in TX_POLICY_FIELDS}
+
+# the policies changed since the last snapshot
+CHANGED = set()
+
 
 class TxPolicy:
     """Transmission policy.
@@ -48,6 +59,14 @@ class TxPolicy:
         mcast: the multicast mode (DMS, LEGACY, UR)
         mcs: the list of legacy MCSes
         ht_mcs: the list of HT MCSes
+
+    Setting a field does not send anything right away: all the changes made
+    to a policy in the same IOLoop iteration are sent as a single
+    SET_TRANSMISSION_POLICY message at the end of the iteration, and no
+    message is sent if the resulting policy is the one already on the WTP.
+    Several fields can be changed at once with update(), e.g.:
+
+        txp.update(mcast=TX_MCAST_LEGACY, ht_mcs=[mcs])
     """
 
     def __init__(self, addr, block):
@@ -61,6 +80,15 @@ class TxPolicy:
         self._ht_mcs = block.ht_supports
         self._ur_count = 3
         self._max_amsdu_len = 3839
+        self._synced = None
+        self._scheduled = False
+
+    def __setattr__(self, name, value):
+
+        if name in SNAPSHOT_FIELDS:
+            CHANGED.add(self)
+
+        super().__setattr__(name, value)
 
     def to_dict(self):
         """Return a json-frinedly representation of the object."""
@@ -83,6 +111,63 @@ class TxPolicy:
             (self.addr, self.no_ack, self.rts_cts, TX_MCAST[self.mcast],
              mcs, ht_mcs, self.ur_count, self.max_amsdu_len)
 
+    def digest(self):
+        """Return the effective policy as a hashable tuple."""
+
+        return (self._no_ack, self._rts_cts, self._mcast, frozenset(self._mcs),
+                frozenset(self._ht_mcs), self._ur_count, self._max_amsdu_len)
+
+    def update(self, **fields):
+        """Set several fields and send a single message.
+
+        Args:
+            fields: the new values, keyed on the field name (e.g. mcast)
+        """
+
+        for field in fields:
+            if field not in TX_POLICY_FIELDS:
+                raise KeyError("Invalid field %s" % field)
+
+        for field, value in fields.items():
+            getattr(self, "set_%s" % field)(value)
+
+        self.commit()
+
+    def commit(self):
+        """Send the policy at the end of the current IOLoop iteration."""
+
+        if self._scheduled:
+            return
+
+        self._scheduled = True
+
+        tornado.ioloop.IOLoop.instance().add_callback(self.flush)
+
+    def flush(self):
+        """Send the policy now, unless the WTP has it already.
+
+        Returns True if a message has been sent.
+        """
+
+        self._scheduled = False
+
+        if self.digest() == self._synced:
+            return False
+
+        connection = self.block.radio.connection
+
+        if not connection:
+            return False
+
+        connection.send_set_transmission_policy(self)
+
+        return True
+
+    def set_synced(self):
+        """Mark the current policy as the one configured on the WTP."""
+
+        self._synced = self.digest()
+
     @property
     def max_amsdu_len(self):
         """Get max_amsdu_len."""
@@ -95,7 +180,7 @@ class TxPolicy:
 
         self.set_max_amsdu_len(max_amsdu_len)
 
-        self.block.radio.connection.send_set_transmission_policy(self)
+        self.commit()
 
     def set_max_amsdu_len(self, max_amsdu_len):
         """Set max_amsdu_len without sending anything."""
@@ -114,7 +199,7 @@ class TxPolicy:
 
         self.set_ur_count(ur_count)
 
-        self.block.radio.connection.send_set_transmission_policy(self)
+        self.commit()
 
     def set_ur_count(self, ur_count):
         """Set ur_count without sending anything."""
@@ -133,7 +218,7 @@ class TxPolicy:
 
         self.set_mcast(mcast)
 
-        self.block.radio.connection.send_set_transmission_policy(self)
+        self.commit()
 
     def set_mcast(self, mcast):
         """Set the mcast mode without sending anything."""
@@ -152,7 +237,7 @@ class TxPolicy:
 
         self.set_mcs(mcs)
 
-        self.block.radio.connection.send_set_transmission_policy(self)
+        self.commit()
 
     def set_mcs(self, mcs):
         """Set the list of MCS without sending anything."""
@@ -174,7 +259,7 @@ class TxPolicy:
 
         self.set_ht_mcs(ht_mcs)
 
-        self.block.radio.connection.send_set_transmission_policy(self)
+        self.commit()
 
     def set_ht_mcs(self, ht_mcs):
         """Set the list of HT MCS without sending anything."""
@@ -196,7 +281,7 @@ class TxPolicy:
 
         self.set_no_ack(no_ack)
 
-        self.block.radio.connection.send_set_transmission_policy(self)
+        self.commit()
 
     def set_no_ack(self, no_ack):
         """Set the no ack flag without sending anything."""
@@ -215,7 +300,7 @@ class TxPolicy:
 
         self.set_rts_cts(rts_cts)
 
-        self.block.radio.connection.send_set_transmission_policy(self)
+        self.commit()
 
     def set_rts_cts(self, rts_cts):
         """Set rts_cts without sending anything."""
@@ -22,7 +22,6 @@ import time
 from empower.core.cellpool import Cell
 from empower.core.cellpool import CellPool
 from empower.datatypes.dscp import DSCP
-from empower.vbsp import EP_OPERATION_SET
 
 import empower.logger
 
@@ -207,24 +206,12 @@ class UE:
 
         self._slice = slice_id
 
-        for slc in self.tenant.slices.values():
-
-            rntis = list()
-
-            for ue in self.tenant.ues.values():
-
-                if self.vbs != ue.vbs:
-                    break
-
-                if slc.dscp == ue.slice:
-                    rntis.append(ue.rnti)
+        if not self.vbs.connection:
+            return
 
-            for cell in self.vbs.cells.values():
-                self.vbs.connection.\
-                    send_add_set_ran_mac_slice_request(cell,
-                                                       slc,
-                                                       EP_OPERATION_SET,
-                                                       rntis)
+        # update the rntis of the slices whose ue list has changed
+        for slc in list(self.tenant.slices.values()):
+            self.vbs.connection.sync_slice(self.tenant, slc.dscp)
 
     @property
     def vbs(self):
@@ -17,6 +17,9 @@
 
 """EmPOWER Virtual Access Point (VAP) class."""
 
+# the VAPs created or deleted since the last snapshot
+CHANGED = set()
+
 
 class VAP:
     """ The EmPOWER Virtual Access Point
@@ -35,6 +38,8 @@ class VAP:
         self.block = block
         self.tenant = tenant
 
+        CHANGED.add(self)
+
     @property
     def ssid(self):
         """ Get the SSID assigned to this LVAP. """
@@ -38,6 +38,9 @@ from empower.ibnp import PT_UPDATE_ENDPOINT
 from empower.ibnp import PT_REMOVE_ENDPOINT
 from empower.ibnp import PT_ADD_RULE
 from empower.ibnp import PT_REMOVE_RULE
+from empower.ibnp import PT_ADD_RULES
+from empower.ibnp import PT_REMOVE_RULES
+from empower.ibnp.rulecompiler import RuleCompiler
 
 from empower.core.utils import get_module
 from empower.lvapp.lvappserver import LVAPPServer
@@ -61,7 +64,10 @@ class IBNPMainHandler(tornado.websocket.WebSocketHandler):
 
         self.of_dpid = []
         self.dpid2ep = {}
-        self.of_rules = {}
+        self.compiler = RuleCompiler()
+
+        # set if the IBN accepts bulk rule messages
+        self.bulk = False
 
         # map from dscp values to tos
         self.dscp2tos = {'0x00': '0x00',
@@ -100,80 +106,35 @@ class IBNPMainHandler(tornado.websocket.WebSocketHandler):
 
     def send_add_tr(self, tr):
 
-        tenant_id = tr.tenant.tenant_id
-        tenant = RUNTIME.tenants[tenant_id]
-
-        for lvap in tenant.lvaps.values():
-
-            self._send_add_tr(tenant, lvap, tr.match, tr.dscp, tr.priority)
+        self._sync(self.compiler.datapaths(tr.tenant.tenant_id))
 
     def send_remove_tr(self, tenant_id, match):
 
-        tenant = RUNTIME.tenants[tenant_id]
-
-        if tenant_id not in self.of_rules:
-            return
-
-        tenant_rules = self.of_rules[tenant.tenant_id]
-
-        tr_rule_ids = [(match, _) for _match, _ in tenant_rules
-                       if _match == match]
-
-        for tr_rule_id in tr_rule_ids:
-
-            of_rule_id = tenant_rules[tr_rule_id]
-            self.send_remove_rule(of_rule_id)
-            del tenant_rules[tr_rule_id]
+        self._sync(self.compiler.datapaths(tenant_id))
 
     def _lvap_join(self, lvap):
 
-        tenant = lvap.tenant
-
-        if not self.server.connection:
+        if not lvap.tenant or not lvap.wtp or not lvap.wtp.datapath:
             return
 
-        if tenant.tenant_id not in self.server.rules:
-            return
-
-        tenant_rules = self.server.rules[tenant.tenant_id]
-
-        if lvap.tenant.tenant_id not in self.of_rules:
-            self.of_rules[tenant.tenant_id] = {}
-
-        tenant_of_rules = self.of_rules[tenant.tenant_id]
+        touched = self.compiler.add_station(lvap.wtp.datapath.dpid,
+                                            lvap.addr,
+                                            lvap.tenant.tenant_id)
 
-        for tr in tenant_rules.values():
-
-            if (tr.match, lvap.addr) in tenant_of_rules:
-                continue
-
-            self._send_add_tr(tenant=tenant,
-                              lvap=lvap,
-                              match=tr.match,
-                              dscp=tr.dscp,
-                              priority=tr.priority)
+        self._sync(touched)
 
     def _lvap_leave(self, lvap):
 
-        if lvap.tenant.tenant_id not in self.of_rules:
-            return
-
-        tenant_rules = self.of_rules[lvap.tenant.tenant_id]
-
-        tr_rule_ids = [(_, _lvap_addr) for _, _lvap_addr in tenant_rules
-                       if _lvap_addr == lvap.addr]
-
-        for tr_rule_id in tr_rule_ids:
+        dpid = self.compiler.remove_station(lvap.addr)
 
-            of_rule_id = tenant_rules[tr_rule_id]
-            self.send_remove_rule(of_rule_id)
-            del tenant_rules[tr_rule_id]
+        if dpid is not None:
+            self._sync([dpid])
 
     def _lvap_handover(self, lvap, _):
 
-        # ignore handover events if the lvap is not associated
+        # ignore handover events if the lvap is not associated, the rules
+        # of the source and of the target datapath are updated together
         if lvap.tenant:
-            self._lvap_leave(lvap)
             self._lvap_join(lvap)
 
     def _of_dp_join(self, dp):
@@ -183,6 +144,9 @@ class IBNPMainHandler(tornado.websocket.WebSocketHandler):
         if wtp_addr not in RUNTIME.wtps:
             return
 
+        # the datapath may have been restarted
+        self.compiler.reset(dp.dpid)
+
         for lvap in RUNTIME.lvaps.values():
 
             if lvap.wtp.addr != wtp_addr:
@@ -191,14 +155,48 @@ class IBNPMainHandler(tornado.websocket.WebSocketHandler):
             if lvap.tenant is None:
                 continue
 
-            self._lvap_join(lvap)
+            self.compiler.add_station(dp.dpid, lvap.addr,
+                                      lvap.tenant.tenant_id)
+
+        self._sync([dp.dpid])
+
+    def _sync(self, dpids):
+        """Send the rule changes needed by a set of datapaths."""
+
+        if not self.server.connection:
+            return
 
-    def _send_add_tr(self, tenant, lvap, match, dscp, priority):
+        add_rules = []
+        remove_rules = []
 
-        dp = lvap.wtp.datapath
+        for dpid in dpids:
 
-        if dp.dpid not in self.of_dpid:
-            return None
+            if dpid not in self.of_dpid:
+                continue
+
+            add, remove = self.compiler.diff(dpid, self.server.rules)
+
+            if not add and not remove:
+                continue
+
+            tr_ep = self._get_endpoint(RUNTIME.datapaths[dpid])
+
+            added = {}
+
+            for rule, tr in add.items():
+                added[rule] = uuid4()
+                add_rules.append(self._build_rule(tr_ep, rule, tr,
+                                                  added[rule]))
+
+            remove_rules.extend(remove.values())
+
+            self.compiler.commit(dpid, added, remove)
+
+        self.send_remove_rules(remove_rules)
+        self.send_add_rules(add_rules)
+
+    def _get_endpoint(self, dp):
+        """Return the endpoint used for the traffic rules of a datapath."""
 
         if dp.dpid not in self.dpid2ep:
 
@@ -228,31 +226,28 @@ class IBNPMainHandler(tornado.websocket.WebSocketHandler):
 
             self.dpid2ep[dp.dpid] = tr_ep
 
-        tr_ep = self.dpid2ep[dp.dpid]
+        return self.dpid2ep[dp.dpid]
 
-        of_rule_id = uuid4()
+    def _build_rule(self, tr_ep, rule, tr, of_rule_id):
+        """Return the OpenFlow rule implementing a compiled rule."""
 
-        sta_match = Match('%s,dl_dst=%s' % (str(match), lvap.addr))
+        station = rule[-1]
 
-        rule = {'version': '1.0',
+        if station:
+            match = Match('%s,dl_dst=%s' % (str(tr.match), station))
+        else:
+            match = tr.match
+
+        return {'version': '1.0',
                 'uuid': of_rule_id,
                 'ttp_uuid': tr_ep.uuid,
                 'ttp_vport': tr_ep.ports[1].virtual_port_id,
                 'stp_uuid': tr_ep.uuid,
                 'stp_vport': tr_ep.ports[0].virtual_port_id,
-                'match': sta_match.match,
+                'match': match.match,
                 'actions': [{'type': 'SET_NW_TOS',
-                             'nw_tos': self.dscp2tos[str(dscp)]}],
-                'priority': priority}
-
-        self.send_add_rule(rule)
-
-        tr_id = (match, lvap.addr)
-
-        if tenant.tenant_id not in self.of_rules:
-            self.of_rules[tenant.tenant_id] = {}
-
-        self.of_rules[tenant.tenant_id][tr_id] = of_rule_id
+                             'nw_tos': self.dscp2tos[str(tr.dscp)]}],
+                'priority': tr.priority}
 
     def open(self):
         """On socket opened."""
@@ -330,6 +325,7 @@ class IBNPMainHandler(tornado.websocket.WebSocketHandler):
 
         LOG.info("Hello from IBN seq %u", hello['seq'])
 
+        self.bulk = hello.get('bulk', False)
         self.server.period = hello['every']
         self.server.last_seen = hello['seq']
         self.server.last_seen_ts = time.time()
@@ -402,3 +398,29 @@ class IBNPMainHandler(tornado.websocket.WebSocketHandler):
         remove_rule = {'uuid': rule_uuid}
 
         self.send_message(PT_REMOVE_RULE, remove_rule)
+
+    def send_add_rules(self, rules):
+        """Send add Rules (one message if the IBN supports it)"""
+
+        if not rules:
+            return
+
+        if not self.bulk:
+            for rule in rules:
+                self.send_add_rule(rule)
+            return
+
+        self.send_message(PT_ADD_RULES, {'rules': rules})
+
+    def send_remove_rules(self, rule_uuids):
+        """Send remove Rules (one message if the IBN supports it)"""
+
+        if not rule_uuids:
+            return
+
+        if not self.bulk:
+            for rule_uuid in rule_uuids:
+                self.send_remove_rule(rule_uuid)
+            return
+
+        self.send_message(PT_REMOVE_RULES, {'uuids': rule_uuids})
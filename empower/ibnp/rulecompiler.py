@@ -0,0 +1,179 @@
+#!/usr/bin/env python3
+#
+# Copyright (c) 2018 Giovanni Baggio
+
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied. See the License for the
+# specific language governing permissions and limitations
+# under the License.
+
+"""Traffic rule compiler.
+
+Traffic rules are installed on the datapath of the WTPs serving the LVAPs of
+the tenant, one rule per traffic rule and per LVAP, extended with
+dl_dst=<station> so that the traffic of the other tenants (and of the
+stations not associated to any tenant) on the same datapath is not
+captured. Rules whose match already selects a destination address are
+installed as they are, only on the datapath serving that station.
+
+The compiler keeps track of the LVAPs served by every datapath and of the
+OpenFlow rules installed on it, and returns the rules to add and remove
+when something changes, so that only the difference is sent (e.g. on a
+handover only the rules of the LVAP are moved).
+"""
+
+from empower.datatypes.etheraddress import EtherAddress
+
+
+class RuleCompiler:
+    """Traffic rule compiler.
+
+    A rule is identified by the (tenant_id, match, dscp, priority, station)
+    tuple, where station is None for the rules whose match already selects
+    a destination address.
+
+    Attributes:
+        stations: the tenant of the LVAPs served by every datapath, as
+            {dpid: {lvap_addr: tenant_id}}
+        locations: the datapath serving every LVAP
+        installed: the OpenFlow rule id of the rules installed on every
+            datapath, as {dpid: {rule: of_rule_id}}
+    """
+
+    def __init__(self):
+
+        self.stations = {}
+        self.locations = {}
+        self.installed = {}
+
+    def add_station(self, dpid, lvap_addr, tenant_id):
+        """Record the datapath serving an LVAP.
+
+        Returns:
+            The datapaths whose rules must be updated
+        """
+
+        touched = {dpid}
+
+        if lvap_addr in self.locations:
+            touched.add(self.remove_station(lvap_addr))
+
+        self.stations.setdefault(dpid, {})[lvap_addr] = tenant_id
+        self.locations[lvap_addr] = dpid
+
+        return touched
+
+    def remove_station(self, lvap_addr):
+        """Forget an LVAP.
+
+        Returns:
+            The datapath that was serving the LVAP, or None
+        """
+
+        dpid = self.locations.pop(lvap_addr, None)
+
+        if dpid is None:
+            return None
+
+        stations = self.stations[dpid]
+        del stations[lvap_addr]
+
+        if not stations:
+            del self.stations[dpid]
+
+        return dpid
+
+    def datapaths(self, tenant_id=None):
+        """Return the datapaths serving LVAPs (of a tenant)."""
+
+        return [dpid for dpid, stations in self.stations.items()
+                if tenant_id is None or tenant_id in stations.values()]
+
+    def compile(self, dpid, rules):
+        """Return the rules that must be installed on a datapath.
+
+        Args:
+            dpid: the datapath
+            rules: the traffic rules of every tenant, as
+                {tenant_id: {match: traffic_rule}}
+
+        Returns:
+            A dictionary mapping every rule on the corresponding traffic rule
+        """
+
+        tenants = {}
+
+        for lvap_addr, tenant_id in self.stations.get(dpid, {}).items():
+            tenants.setdefault(tenant_id, []).append(lvap_addr)
+
+        out = {}
+
+        for tenant_id, lvaps in tenants.items():
+
+            for match, tr in rules.get(tenant_id, {}).items():
+
+                prefix = (tenant_id, match, tr.dscp, tr.priority)
+
+                if 'dl_dst' in match.match:
+                    if EtherAddress(match.match['dl_dst']) in lvaps:
+                        out[prefix + (None,)] = tr
+                else:
+                    for lvap_addr in lvaps:
+                        out[prefix + (lvap_addr,)] = tr
+
+        return out
+
+    def diff(self, dpid, rules):
+        """Return the changes needed to bring a datapath up to date.
+
+        Returns:
+            A (add, remove) tuple, where add maps the rules to install on
+            the corresponding traffic rule, and remove maps the rules to
+            uninstall on their OpenFlow rule id
+        """
+
+        desired = self.compile(dpid, rules)
+        installed = self.installed.get(dpid, {})
+
+        add = {rule: tr for rule, tr in desired.items()
+               if rule not in installed}
+
+        remove = {rule: of_rule_id for rule, of_rule_id in installed.items()
+                  if rule not in desired}
+
+        return add, remove
+
+    def commit(self, dpid, added, removed):
+        """Record the rules added to and removed from a datapath.
+
+        Args:
+            dpid: the datapath
+            added: the new rules, mapped on their OpenFlow rule id
+            removed: the uninstalled rules
+        """
+
+        installed = self.installed.setdefault(dpid, {})
+
+        for rule in removed:
+            installed.pop(rule, None)
+
+        installed.update(added)
+
+        if not installed:
+            del self.installed[dpid]
+
+    def reset(self, dpid=None):
+        """Forget the rules installed on a datapath (or on all of them)."""
+
+        if dpid is None:
+            self.installed = {}
+        else:
+            self.installed.pop(dpid, None)
@@ -0,0 +1,383 @@
+#!/usr/bin/env python3
+#
+# Copyright (c) 2019 Roberto Riggio
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied. See the License for the
+# specific language governing permissions and limitations
+# under the License.
+
+"""LVAPP message throughput benchmark.
+
+For every number of workers a runtime (REST server and LVAPP server only) is
+started in a temporary directory, a set of fake WTPs is registered, and every
+WTP floods the LVAPP port with HELLO messages. The benchmark waits until the
+runtime has processed the last HELLO of every WTP and reports the throughput
+and the CPU time spent per message by the runtime and by the workers (Linux
+only, read from /proc). The runtime is then stopped and its workers are
+checked to be gone.
+
+Run this module to compare the unsharded server with the sharded one:
+
+    python3 -m empower.lvapp.bench --workers 0 1 2 4
+"""
+
+import argparse
+import base64
+import json
+import os
+import signal
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+
+from contextlib import contextmanager
+
+from construct import Container
+
+from tornado import gen
+from tornado.httpclient import AsyncHTTPClient
+from tornado.httpclient import HTTPClientError
+from tornado.ioloop import IOLoop
+from tornado.iostream import StreamClosedError
+from tornado.tcpclient import TCPClient
+
+import empower
+
+from empower.lvapp import HELLO
+from empower.lvapp import PT_HELLO
+
+LVAPP_PORT = 4433
+REST_PORT = 8888
+
+# time given to the runtime to start (in s)
+START_TIMEOUT = 30
+
+# start a runtime whose database, manifest index, and snapshot are in the
+# deploy directory of the current (temporary) directory
+RUNTIME_MAIN = """
+import os
+import empower.settings as settings
+deploy = os.path.join(os.getcwd(), "deploy")
+settings.CONFIGDB_PATH = os.path.join(deploy, "empower.db")
+settings.CONFIGDB_ENGINE = "sqlite:///%s" % settings.CONFIGDB_PATH
+settings.MANIFEST_INDEX_PATH = os.path.join(deploy, "manifests.json")
+settings.SNAPSHOT_PATH = os.path.join(deploy, "snapshot.bin")
+from empower.main import main
+main()
+"""
+
+LOG_CONFIG = """
+[loggers]
+keys=root
+
+[handlers]
+keys=consoleHandler
+
+[formatters]
+keys=simpleFormatter
+
+[logger_root]
+level=WARNING
+handlers=consoleHandler
+
+[handler_consoleHandler]
+class=StreamHandler
+level=WARNING
+formatter=simpleFormatter
+args=(sys.stderr,)
+
+[formatter_simpleFormatter]
+format=%(asctime)s - %(name)s - %(levelname)s - %(message)s
+"""
+
+
+def wtp_addr(index):
+    """Return the address of a fake WTP."""
+
+    return bytes([0x00, 0x0D, 0x00, 0x00, index // 256, index % 256])
+
+
+def hello_message(index, seq, period=60000):
+    """Return a HELLO message of a fake WTP."""
+
+    return HELLO.build(Container(version=0, type=PT_HELLO, length=20,
+                                 seq=seq, wtp=wtp_addr(index),
+                                 period=period))
+
+
+def _cpu(pid):
+    """Return the CPU time (in s) spent by a process."""
+
+    with open("/proc/%u/stat" % pid) as stat:
+        fields = stat.read().rsplit(")", 1)[1].split()
+
+    return (int(fields[11]) + int(fields[12])) / os.sysconf("SC_CLK_TCK")
+
+
+def _children(pid):
+    """Return the pids of the children of a process."""
+
+    try:
+        with open("/proc/%u/task/%u/children" % (pid, pid)) as children:
+            return [int(child) for child in children.read().split()]
+    except OSError:
+        return []
+
+
+def _alive(pid):
+    """Return True if a process exists."""
+
+    try:
+        os.kill(pid, 0)
+    except OSError:
+        return False
+
+    return True
+
+
+def ports_in_use():
+    """Return the runtime ports that are already in use."""
+
+    out = []
+
+    for port in (LVAPP_PORT, REST_PORT):
+        with socket.socket() as sock:
+            if sock.connect_ex(("127.0.0.1", port)) == 0:
+                out.append(port)
+
+    return out
+
+
+@contextmanager
+def runtime(*argv):
+    """Run a runtime in a temporary directory and stop it on exit.
+
+    Args:
+        argv: the components to launch and their options
+
+    Yields:
+        The runtime process
+    """
+
+    root = os.path.dirname(os.path.dirname(os.path.abspath(empower.__file__)))
+
+    env = dict(os.environ)
+    env['PYTHONPATH'] = os.pathsep.join(
+        [root] + [path for path in [env.get('PYTHONPATH')] if path])
+
+    with tempfile.TemporaryDirectory() as tmp:
+
+        os.mkdir(os.path.join(tmp, "deploy"))
+
+        log_config = os.path.join(tmp, "logging.cfg")
+
+        with open(log_config, "w") as config:
+            config.write(LOG_CONFIG)
+
+        process = subprocess.Popen(
+            [sys.executable, "-c", RUNTIME_MAIN,
+             "--log-config=%s" % log_config] + list(argv),
+            cwd=tmp, env=env)
+
+        try:
+            yield process
+        finally:
+            process.send_signal(signal.SIGTERM)
+            process.wait()
+
+
+class RuntimeClient:
+    """REST client of a runtime started by runtime()."""
+
+    def __init__(self, pid, nb_wtps):
+
+        self.pid = pid
+        self.nb_wtps = nb_wtps
+        self.http = AsyncHTTPClient()
+        self.auth = "Basic " + base64.b64encode(b"root:root").decode()
+
+    @gen.coroutine
+    def api(self, path, data=None, method="GET"):
+        """Call the REST API and return the decoded reply."""
+
+        body = json.dumps(data) if data is not None else None
+
+        response = yield self.http.fetch(
+            "http://127.0.0.1:%u/api/v1/%s" % (REST_PORT, path),
+            method=method, body=body, headers={'Authorization': self.auth})
+
+        return json.loads(response.body) if response.body else None
+
+    @gen.coroutine
+    def wait_runtime(self):
+        """Wait for the REST server and the LVAPP workers to be up."""
+
+        deadline = time.time() + START_TIMEOUT
+
+        while True:
+            try:
+                yield self.api("wtps")
+                stream = yield TCPClient().connect("127.0.0.1", LVAPP_PORT)
+                stream.close()
+                return
+            except (ConnectionError, HTTPClientError, StreamClosedError):
+                if time.time() > deadline:
+                    raise
+                yield gen.sleep(0.2)
+
+    @gen.coroutine
+    def register_wtps(self):
+        """Add the fake WTPs to the runtime."""
+
+        entries = [{'addr': ":".join("%02x" % b for b in wtp_addr(index)),
+                    'label': "bench%u" % index}
+                   for index in range(self.nb_wtps)]
+
+        yield self.api("batch/wtps", {'version': 1.0, 'entries': entries},
+                       "POST")
+
+
+class Bench(RuntimeClient):
+    """Flood a runtime with HELLO messages."""
+
+    def __init__(self, pid, nb_wtps, nb_messages):
+
+        super().__init__(pid, nb_wtps)
+
+        self.nb_messages = nb_messages
+
+    @gen.coroutine
+    def drain(self, stream):
+        """Discard the messages sent by the runtime."""
+
+        try:
+            while True:
+                yield stream.read_bytes(65536, partial=True)
+        except StreamClosedError:
+            pass
+
+    @gen.coroutine
+    def run(self):
+        """Run the benchmark."""
+
+        yield self.wait_runtime()
+        yield self.register_wtps()
+
+        streams = []
+
+        for index in range(self.nb_wtps):
+            stream = yield TCPClient().connect("127.0.0.1", LVAPP_PORT)
+            stream.set_nodelay(True)
+            IOLoop.current().spawn_callback(self.drain, stream)
+            stream.write(hello_message(index, 1))
+            streams.append(stream)
+
+        # wait for the wtps to be online before flooding
+        while True:
+            wtps = yield self.api("wtps")
+            if all(wtp['last_seen'] == 1 for wtp in wtps):
+                break
+            yield gen.sleep(0.1)
+
+        last = self.nb_messages + 1
+
+        payloads = [b"".join(hello_message(index, seq)
+                             for seq in range(2, last + 1))
+                    for index in range(self.nb_wtps)]
+
+        workers = _children(self.pid)
+        workers_cpu = sum(_cpu(pid) for pid in workers)
+        runtime_cpu = _cpu(self.pid)
+        start = time.perf_counter()
+
+        for stream, payload in zip(streams, payloads):
+            stream.write(payload)
+
+        while True:
+            yield gen.sleep(0.05)
+            wtps = yield self.api("wtps")
+            if all(wtp['last_seen'] == last for wtp in wtps):
+                break
+
+        elapsed = time.perf_counter() - start
+        total = self.nb_wtps * self.nb_messages
+
+        runtime_cpu = _cpu(self.pid) - runtime_cpu
+        workers_cpu = sum(_cpu(pid) for pid in workers) - workers_cpu
+
+        for stream in streams:
+            stream.close()
+
+        return {'msg_per_s': total / elapsed,
+                'runtime_us_per_msg': runtime_cpu * 1e6 / total,
+                'workers_us_per_msg': workers_cpu * 1e6 / total
+                                      if workers else None}
+
+
+def benchmark(nb_workers, nb_wtps=40, nb_messages=2000):
+    """Flood a runtime with a number of LVAPP workers.
+
+    Returns:
+        A dictionary with the throughput (in messages/s), the CPU time spent
+        per message (in us) by the runtime and by the workers, and the
+        number of workers left running after the runtime has been stopped
+    """
+
+    with runtime("restserver.restserver", "lvapp.lvappserver",
+                 "--workers=%u" % nb_workers) as process:
+
+        out = IOLoop.current().run_sync(
+            Bench(process.pid, nb_wtps, nb_messages).run)
+
+        workers = _children(process.pid)
+
+    out['leftover_workers'] = len([pid for pid in workers if _alive(pid)])
+
+    return out
+
+
+def main():
+    """Compare the LVAPP throughput with different numbers of workers."""
+
+    parser = argparse.ArgumentParser(description=main.__doc__)
+    parser.add_argument("--workers", type=int, nargs="+", default=[0, 1, 2])
+    parser.add_argument("--wtps", type=int, default=40)
+    parser.add_argument("--messages", type=int, default=2000)
+    args = parser.parse_args()
+
+    busy = ports_in_use()
+
+    if busy:
+        parser.error("ports %s in use, stop the runtime" % busy)
+
+    print("%u wtps x %u hellos, %u cpus" %
+          (args.wtps, args.messages, os.cpu_count()))
+
+    print("workers  msg/s   runtime us/msg  workers us/msg  leftover",
+          flush=True)
+
+    for nb_workers in args.workers:
+
+        out = benchmark(nb_workers, args.wtps, args.messages)
+
+        workers = "%.1f" % out['workers_us_per_msg'] \
+            if out['workers_us_per_msg'] is not None else "-"
+
+        print("%-8u %-7u %-15.1f %-15s %u" %
+              (nb_workers, out['msg_per_s'], out['runtime_us_per_msg'],
+               workers, out['leftover_workers']), flush=True)
+
+
+if __name__ == "__main__":
+    main()
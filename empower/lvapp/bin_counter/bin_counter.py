@@ -87,6 +87,11 @@ class BinCounter(ModulePeriodic):
     MODULE_NAME = "bin_counter"
     REQUIRED = ['module_type', 'worker', 'tenant_id', 'lvap']
 
+    # adaptive polling: compare the byte rates of every bin
+    ADAPTIVE_COUNTERS = True
+    ADAPTIVE_DELTA = 10000
+    ADAPTIVE_RATIO = 0.25
+
     def __init__(self):
 
         super().__init__()
@@ -152,6 +157,19 @@ class BinCounter(ModulePeriodic):
 
         self._bins = bins
 
+    def sample(self):
+        """Return the TX/RX byte counters of every bin."""
+
+        sample = {}
+
+        for index, value in enumerate(self.tx_bytes):
+            sample[('tx', index)] = value
+
+        for index, value in enumerate(self.rx_bytes):
+            sample[('rx', index)] = value
+
+        return sample
+
     def to_dict(self):
         """ Return a JSON-serializable dictionary representing the Stats """
 
@@ -206,6 +224,8 @@ class BinCounter(ModulePeriodic):
         msg = STATS_REQUEST.build(stats_req)
         lvap.wtp.connection.stream.write(msg)
 
+        self.request_sent(lvap.wtp.addr)
+
     def fill_bytes_samples(self, data):
         """ Compute samples.
 
@@ -0,0 +1,318 @@
+#!/usr/bin/env python3
+#
+# Copyright (c) 2019 Roberto Riggio
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied. See the License for the
+# specific language governing permissions and limitations
+# under the License.
+
+"""WTP bring-up scheduler.
+
+When a WTP connects it goes through the CAPS and status phase: the CAPS
+request/response, the four status requests and the replies of the agent, and
+the VAPs and slices configuration. When hundreds of WTPs connect at the same
+time (e.g. after a controller restart) running this phase for all of them at
+once starves the IOLoop and the hello messages are processed too late.
+
+New WTPs are instead queued and admitted through a token bucket, and at most
+max_active WTPs run the CAPS and status phase at the same time. Hello messages
+are always processed immediately. A WTP leaves the status phase when it has
+been quiet for STATUS_QUIET ms (or after STATUS_MAX ms).
+"""
+
+import time
+
+from collections import OrderedDict
+from collections import deque
+
+import tornado.ioloop
+
+import empower.logger
+
+DEFAULT_RATE = 20
+DEFAULT_BURST = 20
+DEFAULT_MAX_ACTIVE = 10
+
+# time given to a WTP to answer the CAPS request (in ms)
+CAPS_TIMEOUT = 5000
+
+# a WTP is done with the status phase after this quiet period (in ms)
+STATUS_QUIET = 250
+
+# maximum duration of the status phase (in ms)
+STATUS_MAX = 3000
+
+PHASE_CAPS = "caps"
+PHASE_STATUS = "status"
+
+
+class BringUpScheduler:
+    """WTP bring-up scheduler.
+
+    Attributes:
+        rate: admission rate (WTPs per second)
+        burst: the token bucket size
+        max_active: max number of WTPs in the CAPS and status phase
+        queue: the WTPs waiting to be admitted, in arrival order
+        active: the WTPs in the CAPS and status phase
+    """
+
+    def __init__(self, rate=DEFAULT_RATE, burst=DEFAULT_BURST,
+                 max_active=DEFAULT_MAX_ACTIVE):
+
+        self.__rate = None
+        self.__burst = None
+        self.__max_active = None
+
+        self.rate = rate
+        self.burst = burst
+        self.max_active = max_active
+
+        self.tokens = self.burst
+        self.last_refill = time.time()
+
+        self.queue = OrderedDict()
+        self.active = {}
+
+        self.admitted = 0
+        self.completed = 0
+        self.timeouts = 0
+        self.waits = deque(maxlen=1000)
+        self.durations = deque(maxlen=1000)
+
+        self.__timer = None
+        self.log = empower.logger.get_logger()
+
+    @property
+    def rate(self):
+        """Return the admission rate."""
+
+        return self.__rate
+
+    @rate.setter
+    def rate(self, rate):
+        """Set the admission rate."""
+
+        if float(rate) <= 0:
+            raise ValueError("Invalid rate %s" % rate)
+
+        self.__rate = float(rate)
+
+    @property
+    def burst(self):
+        """Return the token bucket size."""
+
+        return self.__burst
+
+    @burst.setter
+    def burst(self, burst):
+        """Set the token bucket size."""
+
+        if int(burst) < 1:
+            raise ValueError("Invalid burst %s" % burst)
+
+        self.__burst = int(burst)
+
+    @property
+    def max_active(self):
+        """Return the max number of WTPs in the CAPS and status phase."""
+
+        return self.__max_active
+
+    @max_active.setter
+    def max_active(self, max_active):
+        """Set the max number of WTPs in the CAPS and status phase."""
+
+        if int(max_active) < 1:
+            raise ValueError("Invalid max_active %s" % max_active)
+
+        self.__max_active = int(max_active)
+
+    def enqueue(self, wtp):
+        """Queue a newly connected WTP."""
+
+        if wtp.addr in self.queue or wtp.addr in self.active:
+            return
+
+        self.queue[wtp.addr] = (wtp, time.time())
+
+        self.schedule()
+
+    def cancel(self, wtp):
+        """Remove a WTP from the scheduler (e.g. on disconnection)."""
+
+        self.queue.pop(wtp.addr, None)
+
+        if self.active.pop(wtp.addr, None):
+            self.schedule()
+
+    def caps_received(self, wtp):
+        """The WTP answered the CAPS request, start the status phase."""
+
+        if wtp.addr not in self.active:
+            return
+
+        entry = self.active[wtp.addr]
+        entry['phase'] = PHASE_STATUS
+        entry['last_seen'] = time.time()
+        entry['status_start'] = entry['last_seen']
+
+        self.__check_status(wtp.addr, entry)
+
+    def touch(self, wtp):
+        """A message was received from a WTP in the status phase."""
+
+        entry = self.active.get(wtp.addr)
+
+        if entry and entry['phase'] == PHASE_STATUS:
+            entry['last_seen'] = time.time()
+
+    def schedule(self):
+        """Admit as many WTPs as allowed by the bucket and the slots."""
+
+        self.__refill()
+
+        while self.queue and len(self.active) < self.max_active:
+
+            if self.tokens < 1:
+                self.__wait((1 - self.tokens) / self.rate)
+                return
+
+            _, (wtp, since) = self.queue.popitem(last=False)
+
+            if not wtp.connection:
+                continue
+
+            self.tokens -= 1
+            self.__admit(wtp, since)
+
+    def __refill(self):
+
+        now = time.time()
+
+        self.tokens = min(self.burst,
+                          self.tokens + (now - self.last_refill) * self.rate)
+
+        self.last_refill = now
+
+    def __wait(self, delay):
+        """Run the scheduler again after delay seconds."""
+
+        if self.__timer:
+            return
+
+        def wakeup():
+            self.__timer = None
+            self.schedule()
+
+        self.__timer = \
+            tornado.ioloop.IOLoop.instance().call_later(delay, wakeup)
+
+    def __admit(self, wtp, since):
+
+        now = time.time()
+
+        entry = {'wtp': wtp,
+                 'phase': PHASE_CAPS,
+                 'since': since,
+                 'admitted': now,
+                 'last_seen': now}
+
+        self.active[wtp.addr] = entry
+        self.admitted += 1
+        self.waits.append(now - since)
+
+        self.log.info("Admitting WTP %s (waited %ums, %u queued)", wtp.addr,
+                      (now - since) * 1000, len(self.queue))
+
+        wtp.connection.send_caps_request()
+
+        tornado.ioloop.IOLoop.instance().call_later(
+            CAPS_TIMEOUT / 1000, self.__check_caps, wtp.addr, entry)
+
+    def __check_caps(self, addr, entry):
+        """Re-queue a WTP that did not answer the CAPS request."""
+
+        if self.active.get(addr) is not entry:
+            return
+
+        if entry['phase'] != PHASE_CAPS:
+            return
+
+        self.log.warning("WTP %s did not answer CAPS request, requeueing",
+                         addr)
+
+        self.timeouts += 1
+
+        del self.active[addr]
+
+        if entry['wtp'].connection:
+            self.queue[addr] = (entry['wtp'], time.time())
+
+        self.schedule()
+
+    def __check_status(self, addr, entry):
+        """Release the slot once the WTP is quiet."""
+
+        if self.active.get(addr) is not entry:
+            return
+
+        now = time.time()
+
+        quiet = now - entry['last_seen'] >= STATUS_QUIET / 1000
+        expired = now - entry['status_start'] >= STATUS_MAX / 1000
+
+        if not quiet and not expired:
+            tornado.ioloop.IOLoop.instance().call_later(
+                STATUS_QUIET / 1000, self.__check_status, addr, entry)
+            return
+
+        del self.active[addr]
+
+        self.completed += 1
+        self.durations.append(now - entry['admitted'])
+
+        self.log.info("WTP %s bring-up completed in %ums", addr,
+                      (now - entry['admitted']) * 1000)
+
+        self.schedule()
+
+    def to_dict(self):
+        """Return a JSON-serializable dictionary."""
+
+        now = time.time()
+
+        queued = [{'wtp': addr, 'waiting': int((now - since) * 1000)}
+                  for addr, (_, since) in self.queue.items()]
+
+        active = [{'wtp': addr,
+                   'phase': entry['phase'],
+                   'elapsed': int((now - entry['admitted']) * 1000)}
+                  for addr, entry in self.active.items()]
+
+        def avg(values):
+            return int(sum(values) / len(values) * 1000) if values else 0
+
+        self.__refill()
+
+        return {'rate': self.rate,
+                'burst': self.burst,
+                'max_active': self.max_active,
+                'tokens': round(self.tokens, 2),
+                'queued': queued,
+                'active': active,
+                'admitted': self.admitted,
+                'completed': self.completed,
+                'timeouts': self.timeouts,
+                'avg_wait': avg(self.waits),
+                'max_wait': int(max(self.waits) * 1000) if self.waits else 0,
+                'avg_bring_up': avg(self.durations)}
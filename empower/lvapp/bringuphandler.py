@@ -0,0 +1,88 @@
+#!/usr/bin/env python3
+#
+# Copyright (c) 2019 Roberto Riggio
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied. See the License for the
+# specific language governing permissions and limitations
+# under the License.
+
+"""WTP bring-up Handler."""
+
+from empower.restserver.apihandlers import EmpowerAPIHandler
+from empower.restserver.validate import validate
+
+
+class BringUpHandler(EmpowerAPIHandler):
+    """Bring-up handler. Used to view and tune the WTP bring-up queue."""
+
+    HANDLERS = [r"/api/v1/bringup/?"]
+
+    @validate(returncode=200)
+    def get(self, *args, **kwargs):
+        """Get the bring-up queue.
+
+        Example URLs:
+            GET /api/v1/bringup
+
+            {
+                "rate": 20.0,
+                "burst": 20,
+                "max_active": 10,
+                "tokens": 0.4,
+                "queued": [
+                    {"wtp": "00:0D:B9:2F:56:64", "waiting": 1210}
+                ],
+                "active": [
+                    {"wtp": "00:0D:B9:2F:56:58", "phase": "status",
+                     "elapsed": 130}
+                ],
+                "admitted": 182,
+                "completed": 172,
+                "timeouts": 0,
+                "avg_wait": 3410,
+                "max_wait": 9120,
+                "avg_bring_up": 412
+            }
+        """
+
+        return self.server.bringup
+
+    @validate(returncode=204,
+              input_schema={
+                  "version": {"type": float, "mandatory": True},
+                  "rate": {"type": float, "mandatory": False},
+                  "burst": {"type": int, "mandatory": False},
+                  "max_active": {"type": int, "mandatory": False}
+              })
+    def put(self, *args, **kwargs):
+        """Set the bring-up parameters.
+
+        Request:
+            version: protocol version (1.0)
+            rate: admission rate in WTPs per second (optional)
+            burst: token bucket size (optional)
+            max_active: max number of WTPs in the CAPS and status phase
+              (optional)
+
+        Example URLs:
+            PUT /api/v1/bringup
+            {
+                "version": 1.0,
+                "max_active": 20
+            }
+        """
+
+        for param in ["rate", "burst", "max_active"]:
+            if param in kwargs:
+                setattr(self.server.bringup, param, kwargs[param])
+
+        self.server.bringup.schedule()
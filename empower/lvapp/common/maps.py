@@ -71,6 +71,9 @@ class Maps(ModulePeriodic):
     REQUIRED = ['module_type', 'worker', 'tenant_id', 'block']
     PT_REQUEST = None
 
+    # adaptive polling: compare the moving RSSI averages (in dB)
+    ADAPTIVE_DELTA = 3
+
     def __init__(self):
 
         super().__init__()
@@ -129,6 +132,11 @@ class Maps(ModulePeriodic):
 
             self._block = match[0]
 
+    def sample(self):
+        """Return the moving RSSI average of every station."""
+
+        return {addr: value['mov_rssi'] for addr, value in self.maps.items()}
+
     def to_dict(self):
         """ Return a JSON-serializable dictionary. """
 
@@ -175,6 +183,8 @@ class Maps(ModulePeriodic):
         msg = POLLER_REQUEST.build(req)
         wtp.connection.stream.write(msg)
 
+        self.request_sent(wtp.addr)
+
     def handle_response(self, response):
         """Handle an incoming poller response message.
         Args:
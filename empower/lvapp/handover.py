@@ -0,0 +1,311 @@
+#!/usr/bin/env python3
+#
+# Copyright (c) 2019 Roberto Riggio
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied. See the License for the
+# specific language governing permissions and limitations
+# under the License.
+
+"""Batched handover engine.
+
+Setting lvap.blocks moves a single LVAP and fails if the LVAP is already
+moving. The handover engine accepts batches of (lvap, blocks) requests and
+starts as many of them as allowed by the per-WTP concurrency limit: a
+handover counts against both its source and its target WTPs until the target
+WTP has answered with an ADD_LVAP_RESPONSE. When the source and the target
+blocks are on different WTPs the LVAP is added on the target before being
+removed from the source (make-before-break), otherwise the LVAP is removed
+first (break-before-make).
+
+The latency of every handover, from the request to the ADD_LVAP_RESPONSE, is
+recorded in a histogram per mode.
+"""
+
+import time
+
+from collections import Counter
+from collections import OrderedDict
+
+import tornado.ioloop
+
+import empower.logger
+
+from empower.core.histogram import Histogram
+from empower.core.lvap import PROCESS_RUNNING
+from empower.core.resourcepool import ResourceBlock
+from empower.datatypes.etheraddress import EtherAddress
+
+DEFAULT_MAX_PER_WTP = 4
+
+# a handover not completed within this time is dropped (in ms)
+HANDOVER_TIMEOUT = 5000
+
+# LVAPs moved outside of the engine are checked again after (in ms)
+RETRY_DELAY = 100
+
+MODE_MBB = "make_before_break"
+MODE_BBM = "break_before_make"
+
+
+class HandoverEngine:
+    """Batched handover engine.
+
+    Attributes:
+        max_per_wtp: max number of handovers in progress per WTP
+        timeout: time after which a handover is dropped (in ms)
+        queue: the handovers waiting to be started, keyed on the LVAP address
+        active: the handovers in progress, keyed on the LVAP address
+        latency: the request to ADD_LVAP_RESPONSE latency (in ms), per mode
+        waiting: the time spent in the queue (in ms)
+    """
+
+    def __init__(self, max_per_wtp=DEFAULT_MAX_PER_WTP,
+                 timeout=HANDOVER_TIMEOUT):
+
+        self.__max_per_wtp = None
+        self.max_per_wtp = max_per_wtp
+        self.timeout = timeout
+
+        self.queue = OrderedDict()
+        self.active = {}
+
+        self.submitted = 0
+        self.completed = 0
+        self.failed = 0
+        self.timeouts = 0
+
+        self.latency = {MODE_MBB: Histogram(), MODE_BBM: Histogram()}
+        self.waiting = Histogram()
+
+        self.__scheduled = False
+        self.__timer = None
+        self.log = empower.logger.get_logger()
+
+    @property
+    def max_per_wtp(self):
+        """Return the max number of handovers in progress per WTP."""
+
+        return self.__max_per_wtp
+
+    @max_per_wtp.setter
+    def max_per_wtp(self, max_per_wtp):
+        """Set the max number of handovers in progress per WTP."""
+
+        if int(max_per_wtp) < 1:
+            raise ValueError("Invalid max_per_wtp %s" % max_per_wtp)
+
+        self.__max_per_wtp = int(max_per_wtp)
+
+    def submit(self, handovers, make_before_break=True):
+        """Queue a batch of handovers.
+
+        A request for an LVAP that is already queued replaces the queued
+        one.
+
+        Args:
+            handovers: a list of (lvap, blocks) tuples, where blocks is a
+                ResourceBlock or a list of ResourceBlocks
+            make_before_break: add the LVAPs on the target blocks before
+                removing them from the source blocks (when possible)
+
+        Returns:
+            The list of the queued LVAPs
+        """
+
+        now = time.time()
+        queued = []
+
+        for lvap, blocks in handovers:
+
+            if isinstance(blocks, ResourceBlock):
+                blocks = [blocks]
+
+            if not blocks:
+                raise ValueError("No target blocks for LVAP %s" % lvap.addr)
+
+            for block in blocks:
+                if not isinstance(block, ResourceBlock):
+                    raise TypeError("Invalid type: %s" % type(block))
+
+            self.queue.pop(lvap.addr, None)
+
+            self.queue[lvap.addr] = {'lvap': lvap,
+                                     'blocks': list(blocks),
+                                     'make_before_break': make_before_break,
+                                     'requested': now}
+
+            self.submitted += 1
+            queued.append(lvap)
+
+        self.schedule()
+
+        return queued
+
+    def schedule(self):
+        """Start the queued handovers in the next IOLoop iteration."""
+
+        if not self.queue or self.__scheduled:
+            return
+
+        self.__scheduled = True
+
+        tornado.ioloop.IOLoop.instance().add_callback(self.__run)
+
+    def __run(self):
+        """Start as many queued handovers as allowed by the WTP limits."""
+
+        from empower.main import RUNTIME
+
+        self.__scheduled = False
+
+        busy = Counter()
+        retry = False
+
+        for request in self.active.values():
+            busy.update(request['wtps'])
+
+        for addr, request in list(self.queue.items()):
+
+            lvap = request['lvap']
+
+            # a handover of this lvap is still in progress
+            if addr in self.active:
+                continue
+
+            if lvap.pending:
+                retry = True
+                continue
+
+            if addr not in RUNTIME.lvaps:
+                del self.queue[addr]
+                self.failed += 1
+                continue
+
+            wtps = set(block.radio.addr for block in request['blocks'])
+            wtps.update(block.radio.addr for block in lvap.blocks if block)
+
+            if any(busy[wtp] >= self.max_per_wtp for wtp in wtps):
+                continue
+
+            del self.queue[addr]
+
+            now = time.time()
+
+            try:
+                started = lvap.handover(request['blocks'],
+                                        request['make_before_break'])
+            except (ValueError, TypeError, IOError) as ex:
+                self.log.warning("Handover of LVAP %s failed: %s", addr, ex)
+                started = False
+
+            if not started:
+                self.failed += 1
+                continue
+
+            request['started'] = now
+            request['wtps'] = wtps
+            request['mode'] = MODE_MBB if lvap.release_blocks else MODE_BBM
+
+            self.active[addr] = request
+            busy.update(wtps)
+
+            self.waiting.observe((now - request['requested']) * 1000)
+
+            tornado.ioloop.IOLoop.instance().call_later(
+                self.timeout / 1000, self.__check_timeout, addr, request)
+
+        if retry:
+            self.__wait(RETRY_DELAY / 1000)
+
+    def __wait(self, delay):
+        """Run the engine again after delay seconds."""
+
+        if self.__timer:
+            return
+
+        def wakeup():
+            self.__timer = None
+            self.schedule()
+
+        self.__timer = \
+            tornado.ioloop.IOLoop.instance().call_later(delay, wakeup)
+
+    def __check_timeout(self, addr, request):
+        """Drop a handover that did not complete in time."""
+
+        if self.active.get(addr) is not request:
+            return
+
+        self.log.warning("Handover of LVAP %s timed out", addr)
+
+        del self.active[addr]
+        self.timeouts += 1
+
+        self.schedule()
+
+    def handle_add_lvap_response(self, _, status):
+        """Complete the handover once the LVAP is running on the target."""
+
+        addr = EtherAddress(status.sta)
+        request = self.active.get(addr)
+
+        if not request:
+            return
+
+        lvap = request['lvap']
+
+        if lvap.pending or lvap.state != PROCESS_RUNNING:
+            return
+
+        del self.active[addr]
+        self.completed += 1
+
+        latency = (time.time() - request['requested']) * 1000
+        self.latency[request['mode']].observe(latency)
+
+        self.log.info("Handover of LVAP %s (%s) completed in %ums", addr,
+                      request['mode'], latency)
+
+        self.schedule()
+
+    def to_dict(self):
+        """Return a JSON-serializable dictionary."""
+
+        now = time.time()
+
+        active = [{'lvap': addr,
+                   'mode': request['mode'],
+                   'wtps': sorted(str(x) for x in request['wtps']),
+                   'elapsed': int((now - request['requested']) * 1000)}
+                  for addr, request in self.active.items()]
+
+        return {'max_per_wtp': self.max_per_wtp,
+                'timeout': self.timeout,
+                'queued': [str(x) for x in self.queue],
+                'active': active,
+                'submitted': self.submitted,
+                'completed': self.completed,
+                'failed': self.failed,
+                'timeouts': self.timeouts,
+                'waiting': self.waiting.to_dict(),
+                'latency': {k: v.to_dict() for k, v in self.latency.items()}}
+
+
+def handover(handovers, make_before_break=True):
+    """Queue a batch of (lvap, blocks) handovers on the LVAPP server."""
+
+    from empower.main import RUNTIME
+    from empower.lvapp.lvappserver import LVAPPServer
+
+    server = RUNTIME.components[LVAPPServer.__module__]
+
+    return server.handovers.submit(handovers, make_before_break)
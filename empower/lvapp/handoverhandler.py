@@ -0,0 +1,209 @@
+#!/usr/bin/env python3
+#
+# Copyright (c) 2019 Roberto Riggio
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied. See the License for the
+# specific language governing permissions and limitations
+# under the License.
+
+"""Handover engine Handler."""
+
+from empower.datatypes.etheraddress import EtherAddress
+from empower.core.resourcepool import ResourceBlock
+from empower.core.resourcepool import REVERSE_BANDS
+from empower.restserver.apihandlers import EmpowerAPIHandler
+from empower.restserver.validate import validate
+from empower.restserver.validate import apply_batch
+from empower.restserver.validate import batch_status
+
+from empower.main import RUNTIME
+
+
+class HandoverHandler(EmpowerAPIHandler):
+    """Handover handler. Used to move many LVAPs at once and to view the
+    handover latency."""
+
+    HANDLERS = [r"/api/v1/handovers/?"]
+
+    SCHEMA = {
+        "lvap": {"type": EtherAddress, "mandatory": True},
+        "wtp": {"type": EtherAddress, "mandatory": False},
+        "blocks": {"type": list, "mandatory": False}
+    }
+
+    @validate(returncode=200)
+    def get(self, *args, **kwargs):
+        """Get the handover engine status and latency histograms.
+
+        The latency is measured from the request to the ADD_LVAP_RESPONSE
+        from the target WTP, the waiting time is the time spent in the
+        queue (in ms).
+
+        Example URLs:
+            GET /api/v1/handovers
+
+            {
+                "max_per_wtp": 4,
+                "timeout": 5000,
+                "queued": ["60:F4:45:D0:3B:FC"],
+                "active": [
+                    {"lvap": "18:5E:0F:E3:B8:68",
+                     "mode": "make_before_break",
+                     "wtps": ["00:0D:B9:2F:56:58", "00:0D:B9:2F:56:64"],
+                     "elapsed": 12}
+                ],
+                "submitted": 52,
+                "completed": 50,
+                "failed": 0,
+                "timeouts": 0,
+                "waiting": {"count": 50, "p50": 3.2, ...},
+                "latency": {
+                    "make_before_break": {
+                        "count": 50,
+                        "sum": 812.4,
+                        "avg": 16.248,
+                        "max": 31.2,
+                        "p50": 14.1,
+                        "p90": 27.5,
+                        "p99": 30.9,
+                        "buckets": [{"le": 1, "count": 0}, ...]
+                    },
+                    "break_before_make": {"count": 0, ...}
+                }
+            }
+        """
+
+        return self.server.handovers
+
+    @validate(returncode=200,
+              input_schema={
+                  "version": {"type": float, "mandatory": True},
+                  "make_before_break": {"type": bool, "mandatory": False},
+                  "entries": {"type": list, "mandatory": True}
+              })
+    def post(self, *args, **kwargs):
+        """Queue a batch of handovers.
+
+        Every entry moves an LVAP either to a WTP (on the same channel and
+        band of the current downlink block) or to a list of blocks. One
+        result is returned for each entry (in the same order).
+
+        Request:
+            version: protocol version (1.0)
+            make_before_break: add the LVAPs on the target before removing
+              them from the source (optional, default true)
+            entries: the list of handovers, each with the following fields
+                lvap: the lvap address
+                wtp: the target wtp (optional)
+                blocks: the target blocks (optional)
+
+        Example URLs:
+            POST /api/v1/handovers
+            {
+                "version": 1.0,
+                "entries": [
+                    {"lvap": "18:5E:0F:E3:B8:68", "wtp": "00:0D:B9:2F:56:64"},
+                    {"lvap": "60:F4:45:D0:3B:FC",
+                     "blocks": [{"wtp": "00:0D:B9:2F:56:58",
+                                 "hwaddr": "04:F0:21:09:F9:93",
+                                 "channel": 36,
+                                 "band": "HT20"}]}
+                ]
+            }
+        """
+
+        make_before_break = kwargs.get('make_before_break', True)
+
+        def submit(entries):
+
+            results = []
+            handovers = []
+
+            for entry in entries:
+                try:
+                    lvap = RUNTIME.lvaps[entry['lvap']]
+                    handovers.append((lvap, self.__blocks(lvap, entry)))
+                    results.append(lvap)
+                except (KeyError, ValueError, TypeError) as ex:
+                    results.append(ex)
+
+            self.server.handovers.submit(handovers, make_before_break)
+
+            return results
+
+        results = apply_batch(self.SCHEMA, kwargs['entries'], submit)
+
+        return [batch_status(x, lambda y: "/api/v1/lvaps/%s" % y.addr)
+                for x in results]
+
+    @validate(returncode=204,
+              input_schema={
+                  "version": {"type": float, "mandatory": True},
+                  "max_per_wtp": {"type": int, "mandatory": False}
+              })
+    def put(self, *args, **kwargs):
+        """Set the handover engine parameters.
+
+        Request:
+            version: protocol version (1.0)
+            max_per_wtp: max number of handovers in progress per WTP
+
+        Example URLs:
+            PUT /api/v1/handovers
+            {
+                "version": 1.0,
+                "max_per_wtp": 8
+            }
+        """
+
+        if "max_per_wtp" in kwargs:
+            self.server.handovers.max_per_wtp = kwargs["max_per_wtp"]
+
+        self.server.handovers.schedule()
+
+    @classmethod
+    def __blocks(cls, lvap, entry):
+        """Return the target blocks of a handover entry."""
+
+        if "blocks" in entry:
+
+            pool = []
+
+            for block in entry["blocks"]:
+
+                wtp = RUNTIME.wtps[EtherAddress(block['wtp'])]
+                hwaddr = EtherAddress(block['hwaddr'])
+                channel = int(block['channel'])
+                band = REVERSE_BANDS[block['band']]
+
+                pool.append(ResourceBlock(wtp, hwaddr, channel, band))
+
+            return pool
+
+        if "wtp" in entry:
+
+            if not lvap.blocks[0]:
+                raise ValueError("LVAP %s has no downlink block" % lvap.addr)
+
+            wtp = RUNTIME.wtps[entry['wtp']]
+
+            pool = wtp.blocks() \
+                .filter_by_channel(lvap.blocks[0].channel) \
+                .filter_by_band(lvap.blocks[0].band) \
+                .first()
+
+            if not pool:
+                raise ValueError("No matching block on WTP %s" % wtp.addr)
+
+            return pool
+
+        raise ValueError("Either wtp or blocks must be specified")
@@ -45,6 +45,9 @@ from empower.main import RUNTIME
 PT_RATES_REQUEST = 0x30
 PT_RATES_RESPONSE = 0x31
 
+# rates with a delivery probability (in %) at least this high are eligible
+PROB_THRESHOLD = 90.0
+
 RATES_ENTRY = Sequence("rates",
                        UBInt8("rate"),
                        BitStruct("flags",
@@ -90,21 +93,33 @@ class LVAPStats(ModulePeriodic):
     MODULE_NAME = "lvap_stats"
     REQUIRED = ['module_type', 'worker', 'tenant_id', 'lvap']
 
+    # adaptive polling: compare the delivery probabilities (in %)
+    ADAPTIVE_DELTA = 10
+
     def __init__(self):
 
         super().__init__()
 
         # parameters
         self._lvap = None
+        self._prob_threshold = PROB_THRESHOLD
 
         # data structures
         self.rates = {}
         self.best_prob = None
         self.timestamp = None
 
+        # the eligible rates as a bitmask (bit n set for rate n), if no rate
+        # is eligible the bit of the most reliable rate is set and
+        # mcs_quality is False. mcs_version changes with the mask.
+        self.mcs_mask = 0
+        self.mcs_quality = False
+        self.mcs_version = 0
+
     def __eq__(self, other):
 
-        return super().__eq__(other) and self.lvap == other.lvap
+        return super().__eq__(other) and self.lvap == other.lvap and \
+            self.prob_threshold == other.prob_threshold
 
     @property
     def lvap(self):
@@ -118,6 +133,23 @@ class LVAPStats(ModulePeriodic):
 
         self._lvap = EtherAddress(value)
 
+    @property
+    def prob_threshold(self):
+        """Return the eligibility threshold."""
+
+        return self._prob_threshold
+
+    @prob_threshold.setter
+    def prob_threshold(self, value):
+        """Set the eligibility threshold."""
+
+        self._prob_threshold = float(value)
+
+    def sample(self):
+        """Return the delivery probability of every rate."""
+
+        return {rate: value['prob'] for rate, value in self.rates.items()}
+
     def to_dict(self):
         """ Return a JSON-serializable."""
 
@@ -126,6 +158,9 @@ class LVAPStats(ModulePeriodic):
         out['lvap'] = self.lvap
         out['best_prob'] = self.best_prob
         out['rates'] = {str(k): v for k, v in self.rates.items()}
+        out['prob_threshold'] = self.prob_threshold
+        out['mcs_mask'] = self.mcs_mask
+        out['mcs_quality'] = self.mcs_quality
 
         return out
 
@@ -164,6 +199,8 @@ class LVAPStats(ModulePeriodic):
         msg = RATES_REQUEST.build(rates_req)
         lvap.wtp.connection.stream.write(msg)
 
+        self.request_sent(lvap.wtp.addr)
+
     def handle_response(self, response):
         """Handle an incoming RATES_RESPONSE message.
         Args:
@@ -209,12 +246,39 @@ class LVAPStats(ModulePeriodic):
         self.best_prob = \
             max([k for k, v in self.rates.items() if v['prob'] == max_val])
 
+        self.update_mcs_mask()
+
         self.timestamp = datetime.utcnow()
 
         # call callback
         self.handle_callback(self)
 
 
+    def update_mcs_mask(self):
+        """Update the bitmask of the eligible rates."""
+
+        mask = 0
+        best_rate = int(min(self.rates))
+        highest_prob = 0
+
+        for rate, value in self.rates.items():
+            if value['prob'] >= self.prob_threshold:
+                mask |= 1 << int(rate)
+            elif value['prob'] > highest_prob:
+                best_rate = int(rate)
+                highest_prob = value['prob']
+
+        quality = bool(mask)
+
+        if not quality:
+            mask = 1 << best_rate
+
+        if mask != self.mcs_mask or quality != self.mcs_quality:
+            self.mcs_mask = mask
+            self.mcs_quality = quality
+            self.mcs_version += 1
+
+
 class LVAPStatsWorker(ModuleLVAPPWorker):
     """ Counter worker. """
 
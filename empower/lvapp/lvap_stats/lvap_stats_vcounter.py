@@ -75,6 +75,9 @@ class LVAPStats(ModulePeriodic):
     MODULE_NAME = "lvap_stats"
     REQUIRED = ['module_type', 'worker', 'tenant_id', 'lvap']
 
+    # adaptive polling: compare the delivery probabilities (in %)
+    ADAPTIVE_DELTA = 10
+
     def __init__(self):
 
         super().__init__()
@@ -102,6 +105,11 @@ class LVAPStats(ModulePeriodic):
 
         self._lvap = EtherAddress(value)
 
+    def sample(self):
+        """Return the delivery probability of every rate."""
+
+        return {rate: value['prob'] for rate, value in self.rates.items()}
+
     def to_dict(self):
         """ Return a JSON-serializable."""
 
@@ -148,6 +156,8 @@ class LVAPStats(ModulePeriodic):
         msg = RATES_REQUEST.build(rates_req)
         lvap.wtp.connection.stream.write(msg)
 
+        self.request_sent(lvap.wtp.addr)
+
     def handle_response(self, response):
         """Handle an incoming RATES_RESPONSE message.
         Args:
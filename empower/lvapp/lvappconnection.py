@@ -34,6 +34,9 @@ from empower.core.resourcepool import ResourceBlock
 from empower.core.datapath import Datapath
 from empower.core.networkport import NetworkPort
 from empower.core.utils import get_xid
+from empower.core.metrics import M_MESSAGE
+from empower.core.eventbus import EV_WTP_DOWN
+from empower.core.eventbus import EV_WTP_UP
 from empower.lvapp import HEADER
 from empower.lvapp import PT_VERSION
 from empower.lvapp import PT_BYE
@@ -60,6 +63,8 @@ from empower.lvapp import PT_ADD_VAP
 from empower.core.lvap import LVAP
 from empower.core.lvap import PROCESS_RUNNING
 from empower.core.vap import VAP
+from empower.core.vap import CHANGED as VAP_CHANGED
+from empower.core.transmissionpolicy import CHANGED as TXP_CHANGED
 from empower.lvapp import ADD_VAP
 from empower.lvapp import DEL_VAP
 from empower.lvapp import DEL_LVAP
@@ -75,6 +80,7 @@ from empower.lvapp import ASSOC_RESPONSE
 from empower.lvapp import DEL_SLICE
 from empower.core.tenant import T_TYPE_SHARED
 from empower.core.tenant import T_TYPE_UNIQUE
+from empower.lvapp.reconcile import slice_status_digest
 
 from empower.main import RUNTIME
 
@@ -191,47 +197,60 @@ class LVAPPConnection:
 
         if self.server.pt_types[msg_type]:
 
-            msg_name = self.server.pt_types[msg_type].name
+            start = time.perf_counter()
 
             msg = self.server.pt_types[msg_type].parse(self.__buffer)
-            addr = EtherAddress(msg.wtp)
+            self._handle_message(msg_type, msg)
 
-            try:
-                wtp = RUNTIME.wtps[addr]
-            except KeyError:
-                self.log.error("Unknown WTP (%s), closing connection", addr)
-                self.stream.close()
-                return
+            labels = (("protocol", "lvapp"),
+                      ("type", self.server.pt_types[msg_type].name))
+            RUNTIME.metrics.observe_since(M_MESSAGE, labels, start)
 
-            valid = [PT_HELLO]
-            if not wtp.connection and msg_type not in valid:
-                self.log.info("Got %s message from disconnected %s seq %u",
-                              msg_name,
-                              EtherAddress(addr),
-                              msg.seq)
-                return
+    def _handle_message(self, msg_type, msg):
+        """Dispatch a parsed message to its handlers."""
+
+        msg_name = self.server.pt_types[msg_type].name
+
+        addr = EtherAddress(msg.wtp)
+
+        try:
+            wtp = RUNTIME.wtps[addr]
+        except KeyError:
+            self.log.error("Unknown WTP (%s), closing connection", addr)
+            self.stream.close()
+            return
 
-            self.log.info("Got %s message from %s seq %u",
+        valid = [PT_HELLO]
+        if not wtp.connection and msg_type not in valid:
+            self.log.info("Got %s message from disconnected %s seq %u",
                           msg_name,
                           EtherAddress(addr),
                           msg.seq)
+            return
 
-            valid = [PT_HELLO, PT_CAPS_RESPONSE]
-            if not wtp.is_online() and msg_type not in valid:
-                self.log.info("WTP %s not ready", wtp.addr)
-                return
+        self.log.info("Got %s message from %s seq %u",
+                      msg_name,
+                      EtherAddress(addr),
+                      msg.seq)
 
-            handler_name = "_handle_%s" % self.server.pt_types[msg_type].name
+        self.server.bringup.touch(wtp)
 
-            self.log.info("handler name %s", handler_name)
+        valid = [PT_HELLO, PT_CAPS_RESPONSE]
+        if not wtp.is_online() and msg_type not in valid:
+            self.log.info("WTP %s not ready", wtp.addr)
+            return
 
-            if hasattr(self, handler_name):
-                handler = getattr(self, handler_name)
-                handler(wtp, msg)
+        handler_name = "_handle_%s" % self.server.pt_types[msg_type].name
 
-            if msg_type in self.server.pt_types_handlers:
-                for handler in self.server.pt_types_handlers[msg_type]:
-                    handler(wtp, msg)
+        self.log.info("handler name %s", handler_name)
+
+        if hasattr(self, handler_name):
+            handler = getattr(self, handler_name)
+            handler(wtp, msg)
+
+        if msg_type in self.server.pt_types_handlers:
+            for handler in self.server.pt_types_handlers[msg_type]:
+                handler(wtp, msg)
 
     def _wait(self):
         """ Wait for incoming packets on signalling channel """
@@ -247,6 +266,10 @@ class LVAPPConnection:
 
         self.log.info("WTP disconnected: %s", self.wtp.addr)
 
+        # remove from the bring-up queue
+        self.server.bringup.cancel(self.wtp)
+        self.server.reconciler.cancel(self.wtp)
+
         # remove hosted lvaps
         for lvap in list(RUNTIME.lvaps.values()):
             wtps = [x.radio for x in lvap.blocks]
@@ -260,6 +283,11 @@ class LVAPPConnection:
                 if vap.block.radio == self.wtp:
                     self.log.info("Deleting VAP: %s", vap.bssid)
                     del RUNTIME.tenants[tenant_id].vaps[vap.bssid]
+                    VAP_CHANGED.add(vap)
+
+        # the transmission policies of the wtp are dropped from the snapshot
+        for block in self.wtp.supports:
+            TXP_CHANGED.update(block.tx_policies.values())
 
         # reset state
         self.wtp.set_disconnected()
@@ -350,8 +378,8 @@ class LVAPPConnection:
             # change state
             wtp.set_connected()
 
-            # send caps request
-            self.send_caps_request()
+            # the caps request is sent once the wtp is admitted
+            self.server.bringup.enqueue(wtp)
 
         # Update WTP params
         wtp.period = hello.period
@@ -396,6 +424,10 @@ class LVAPPConnection:
         # set state to online
         wtp.set_online()
 
+        # restore the state saved before the last restart, the status
+        # replies are used to reconcile it with the agent
+        RUNTIME.snapshot.restore_wtp(wtp)
+
         # fetch active lvaps
         self.send_lvap_status_request()
 
@@ -408,55 +440,12 @@ class LVAPPConnection:
         # fetch active tramission policies
         self.send_transmission_policy_status_request()
 
-        # send vaps
-        self.update_vaps()
-
-        # send slices
-        self.update_slices()
-
-    def update_vaps(self):
-        """Update active VAPs."""
-
-        for tenant in RUNTIME.tenants.values():
-
-            # tenant does not use shared VAPs
-            if tenant.bssid_type == T_TYPE_UNIQUE:
-                continue
-
-            # wtp not in this tenant
-            if self.wtp.addr not in tenant.wtps:
-                continue
-
-            for block in self.wtp.supports:
-
-                bssid = tenant.generate_bssid(block.hwaddr)
-
-                # vap has already been created
-                if bssid in tenant.vaps:
-                    continue
-
-                vap = VAP(bssid, block, tenant)
-
-                self.send_add_vap(vap)
-                tenant.vaps[bssid] = vap
-
-    def update_slices(self):
-        """Update active Slices."""
+        # the wtp is now in the status phase
+        self.server.bringup.caps_received(wtp)
 
-        for tenant in RUNTIME.tenants.values():
-
-            # wtp not in this tenant
-            if self.wtp.addr not in tenant.wtps:
-                continue
-
-            # send slices configuration
-            for slc in tenant.slices.values():
-
-                if (not slc.wifi['wtps'] or slc.wifi['wtps'] and
-                        self.wtp.addr in slc.wifi['wtps']):
-
-                    for block in self.wtp.supports:
-                        self.wtp.connection.send_set_slice(block, slc)
+        # vaps, slices, lvaps, and tx policies that are not reported by the
+        # wtp are pushed once the status phase is over
+        self.server.reconciler.start(wtp)
 
     def _handle_probe_request(self, wtp, request):
         """Handle an incoming PROBE_REQUEST message.
@@ -719,7 +708,7 @@ class LVAPPConnection:
 
         if set_mask:
             lvap._downlink = valid[0]
-        else:
+        elif valid[0] not in lvap._uplink:
             lvap._uplink.append(valid[0])
 
         # if this is not a DL+UL block then stop here
@@ -776,6 +765,7 @@ class LVAPPConnection:
         tx_policy.set_ur_count(status.ur_mcast_count)
         tx_policy.set_max_amsdu_len(status.max_amsdu_len)
         tx_policy.set_no_ack(status.flags.no_ack)
+        tx_policy.set_synced()
 
         self.log.info("Tranmission policy status %s", tx_policy)
 
@@ -837,6 +827,9 @@ class LVAPPConnection:
                 slc.wifi['wtps'][wtp.addr] = {'static-properties': {}}
             slc.wifi['wtps'][wtp.addr]['static-properties']['max_aggr_length'] = status.max_aggr_length
 
+        # the configuration acknowledged by the wtp
+        valid[0].slices[(ssid, dscp)] = slice_status_digest(status)
+
         self.log.info("Slice %s updated", slc)
 
     def _handle_status_vap(self, wtp, status):
@@ -865,7 +858,7 @@ class LVAPPConnection:
 
         # If the VAP does not exists, then create a new one
         if bssid not in tenant.vaps:
-            vap = VAP(bssid, valid, tenant)
+            vap = VAP(bssid, valid[0], tenant)
             tenant.vaps[bssid] = vap
 
         vap = tenant.vaps[bssid]
@@ -979,6 +972,8 @@ class LVAPPConnection:
                         mcs=rates,
                         ht_mcs=ht_rates)
 
+        tx_policy.set_synced()
+
         return self.send_message(PT_SET_TRANSMISSION_POLICY, msg)
 
     def send_del_transmission_policy(self, tx_policy):
@@ -1037,9 +1032,7 @@ class LVAPPConnection:
     def send_bye_message_to_self(self):
         """Send a unsollicited BYE message to senf."""
 
-        for tenant in RUNTIME.tenants.values():
-            for app in tenant.components.values():
-                app.wtp_down(self.wtp)
+        RUNTIME.events.publish(EV_WTP_DOWN, self.wtp)
 
         for handler in self.server.pt_types_handlers[PT_BYE]:
             handler(self.wtp)
@@ -1047,9 +1040,7 @@ class LVAPPConnection:
     def send_register_message_to_self(self):
         """Send a unsollicited REGISTER message to senf."""
 
-        for tenant in RUNTIME.tenants.values():
-            for app in tenant.components.values():
-                app.wtp_up(self.wtp)
+        RUNTIME.events.publish(EV_WTP_UP, self.wtp)
 
         for handler in self.server.pt_types_handlers[PT_REGISTER]:
             handler(self.wtp)
@@ -1059,40 +1050,23 @@ class LVAPPConnection:
 
         ssid = slc.tenant.tenant_name
 
-        amsdu_aggregation = slc.wifi['static-properties']['amsdu_aggregation']
-        quantum = slc.wifi['static-properties']['quantum']
-        scheduler = slc.wifi['static-properties']['scheduler']
-        max_aggr_length = slc.wifi['static-properties']['max_aggr_length']
-
-        if self.wtp.addr in slc.wifi['wtps']:
-
-            static = slc.wifi['wtps'][self.wtp.addr]['static-properties']
-
-            if 'amsdu_aggregation' in static:
-                amsdu_aggregation = static['amsdu_aggregation']
+        properties = slc.get_wifi_properties(self.wtp.addr)
 
-            if 'quantum' in static:
-                quantum = static['quantum']
-
-            if 'scheduler' in static:
-                scheduler = static['scheduler']
-
-            if 'max_aggr_length' in static:
-                max_aggr_length = static['max_aggr_length']
-
-        flags = Container(amsdu_aggregation=amsdu_aggregation)
+        flags = Container(amsdu_aggregation=properties['amsdu_aggregation'])
 
         msg = Container(length=SET_SLICE.sizeof(),
                         flags=flags,
                         hwaddr=block.hwaddr.to_raw(),
                         channel=block.channel,
                         band=block.band,
-                        quantum=quantum,
-                        scheduler=scheduler,
+                        quantum=properties['quantum'],
+                        scheduler=properties['scheduler'],
                         dscp=slc.dscp.to_raw(),
-                        max_aggr_length=max_aggr_length,
+                        max_aggr_length=properties['max_aggr_length'],
                         ssid=ssid.to_raw())
 
+        block.slices[(ssid, slc.dscp)] = slc.get_wifi_digest(self.wtp.addr)
+
         return self.send_message(PT_SET_SLICE, msg)
 
     def send_del_slice(self, block, ssid, dscp):
@@ -1105,4 +1079,43 @@ class LVAPPConnection:
                         dscp=dscp.to_raw(),
                         ssid=ssid.to_raw())
 
+        block.slices.pop((ssid, dscp), None)
+
         return self.send_message(PT_DEL_SLICE, msg)
+
+    def sync_slice(self, tenant, dscp):
+        """Push a slice to the blocks where its configuration differs.
+
+        Returns:
+            A (sent, skipped) tuple with the number of messages sent and the
+            number of blocks already in sync
+        """
+
+        sent = 0
+        skipped = 0
+
+        key = (tenant.tenant_name, dscp)
+        slc = tenant.slices.get(dscp)
+        digest = slc.get_wifi_digest(self.wtp.addr) if slc else None
+
+        for block in self.wtp.supports:
+
+            if slc:
+
+                if block.slices.get(key) == digest:
+                    skipped += 1
+                    continue
+
+                self.send_set_slice(block, slc)
+
+            else:
+
+                if key not in block.slices:
+                    skipped += 1
+                    continue
+
+                self.send_del_slice(block, tenant.tenant_name, dscp)
+
+            sent += 1
+
+        return sent, skipped
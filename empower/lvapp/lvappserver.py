@@ -21,20 +21,39 @@ from tornado.tcpserver import TCPServer
 
 from empower.core.pnfpserver import BaseTenantPNFDevHandler
 from empower.core.pnfpserver import BasePNFDevHandler
+from empower.core.pnfpserver import BasePNFDevBatchHandler
 from empower.restserver.restserver import RESTServer
 from empower.core.pnfpserver import PNFPServer
 from empower.core.module import ModuleWorker
 from empower.lvapp.lvappconnection import LVAPPConnection
+from empower.lvapp.lvappshard import LVAPPShard
+from empower.lvapp.bringup import BringUpScheduler
+from empower.lvapp.bringup import DEFAULT_RATE
+from empower.lvapp.bringup import DEFAULT_BURST
+from empower.lvapp.bringup import DEFAULT_MAX_ACTIVE
+from empower.lvapp.reconcile import Reconciler
+from empower.lvapp.handover import HandoverEngine
 from empower.persistence.persistence import TblWTP
 from empower.core.wtp import WTP
+from empower.core.eventbus import EV_LVAP_LEAVE
+from empower.core.eventbus import EV_LVAP_JOIN
+from empower.core.eventbus import EV_LVAP_HANDOVER
 
 from empower.lvapp import PT_LVAP_LEAVE
 from empower.lvapp import PT_LVAP_JOIN
 from empower.lvapp import PT_LVAP_HANDOVER
+from empower.lvapp import PT_STATUS_LVAP
+from empower.lvapp import PT_STATUS_VAP
+from empower.lvapp import PT_STATUS_SLICE
+from empower.lvapp import PT_STATUS_TRANSMISSION_POLICY
+from empower.lvapp import PT_ADD_LVAP_RESPONSE
 from empower.lvapp import PT_TYPES
 from empower.lvapp import PT_TYPES_HANDLERS
 from empower.lvapp.lvaphandler import LVAPHandler
 from empower.lvapp.tenantlvaphandler import TenantLVAPHandler
+from empower.lvapp.bringuphandler import BringUpHandler
+from empower.lvapp.reconcilehandler import ReconcileHandler
+from empower.lvapp.handoverhandler import HandoverHandler
 
 from empower.main import RUNTIME
 
@@ -55,6 +74,12 @@ class WTPHandler(BasePNFDevHandler):
                 (r"/api/v1/wtps/([a-zA-Z0-9:]*)/?")]
 
 
+class WTPBatchHandler(BasePNFDevBatchHandler):
+    """WTP Batch Handler."""
+
+    HANDLERS = [r"/api/v1/batch/wtps/?"]
+
+
 class ModuleLVAPPWorker(ModuleWorker):
     """Module worker (LVAP Server version)."""
 
@@ -73,7 +98,8 @@ class ModuleLVAPPWorker(ModuleWorker):
         self.log.info("Received %s response (id=%u) from %s",
                       self.module.MODULE_NAME, message.module_id, pnfdev.addr)
 
-        module.handle_response(message)
+        module.response_received(pnfdev.addr)
+        self.dispatch_response(module, message)
 
 
 class LVAPPServer(PNFPServer, TCPServer):
@@ -82,25 +108,57 @@ class LVAPPServer(PNFPServer, TCPServer):
     PNFDEV = WTP
     TBL_PNFDEV = TblWTP
 
-    def __init__(self, port, pt_types, pt_types_handlers):
+    def __init__(self, port, pt_types, pt_types_handlers, bringup=None,
+                 workers=0):
 
         PNFPServer.__init__(self, port, pt_types, pt_types_handlers)
         TCPServer.__init__(self)
 
         self.connection = None
-
-        self.listen(self.port)
+        self.bringup = bringup if bringup else BringUpScheduler()
+        self.reconciler = Reconciler()
+        self.handovers = HandoverEngine()
+        self.shards = []
+
+        # status reports are compared with the desired state of the wtp
+        self.register_message(PT_STATUS_LVAP, None,
+                              self.reconciler.report_lvap)
+        self.register_message(PT_STATUS_VAP, None,
+                              self.reconciler.report_vap)
+        self.register_message(PT_STATUS_SLICE, None,
+                              self.reconciler.report_slice)
+        self.register_message(PT_STATUS_TRANSMISSION_POLICY, None,
+                              self.reconciler.report_txp)
+
+        # handovers are completed when the target wtp has answered
+        self.register_message(PT_ADD_LVAP_RESPONSE, None,
+                              self.handovers.handle_add_lvap_response)
+
+        # in sharded mode the connections are accepted and parsed by the
+        # worker processes, all bound to the same port with SO_REUSEPORT
+        if workers > 0:
+            self.shards = [LVAPPShard(self, i) for i in range(workers)]
+        else:
+            self.listen(self.port)
 
     def handle_stream(self, stream, address):
         self.log.info('Incoming connection from %r', address)
         self.connection = LVAPPConnection(stream, address, server=self)
 
+    def stop(self):
+        """Stop listening and terminate the worker processes."""
+
+        TCPServer.stop(self)
+
+        for shard in self.shards:
+            shard.stop()
+
+        self.shards = []
+
     def send_lvap_leave_message_to_self(self, lvap):
         """Send an LVAP_LEAVE message to self."""
 
-        for tenant in RUNTIME.tenants.values():
-            for app in tenant.components.values():
-                app.lvap_leave(lvap)
+        RUNTIME.events.publish(EV_LVAP_LEAVE, lvap)
 
         for handler in self.pt_types_handlers[PT_LVAP_LEAVE]:
             handler(lvap)
@@ -108,9 +166,7 @@ class LVAPPServer(PNFPServer, TCPServer):
     def send_lvap_join_message_to_self(self, lvap):
         """Send an LVAP_JOIN message to self."""
 
-        for tenant in RUNTIME.tenants.values():
-            for app in tenant.components.values():
-                app.lvap_join(lvap)
+        RUNTIME.events.publish(EV_LVAP_JOIN, lvap)
 
         for handler in self.pt_types_handlers[PT_LVAP_JOIN]:
             handler(lvap)
@@ -118,24 +174,31 @@ class LVAPPServer(PNFPServer, TCPServer):
     def send_lvap_handover_message_to_self(self, lvap, source_blocks):
         """Send an LVAP_HANDOVER message to self."""
 
-        for tenant in RUNTIME.tenants.values():
-            for app in tenant.components.values():
-                app.lvap_handover(lvap, source_blocks)
+        RUNTIME.events.publish(EV_LVAP_HANDOVER, lvap, source_blocks)
 
         for handler in self.pt_types_handlers[PT_LVAP_HANDOVER]:
             handler(lvap, source_blocks)
 
 
-def launch(port=DEFAULT_PORT):
+def launch(port=DEFAULT_PORT, bringup_rate=DEFAULT_RATE,
+           bringup_burst=DEFAULT_BURST, bringup_max=DEFAULT_MAX_ACTIVE,
+           workers=0):
     """Start LVAPP Server Module."""
 
-    server = LVAPPServer(int(port), PT_TYPES, PT_TYPES_HANDLERS)
+    bringup = BringUpScheduler(bringup_rate, bringup_burst, bringup_max)
+
+    server = LVAPPServer(int(port), PT_TYPES, PT_TYPES_HANDLERS, bringup,
+                         int(workers))
 
     rest_server = RUNTIME.components[RESTServer.__module__]
     rest_server.add_handler_class(TenantWTPHandler, server)
     rest_server.add_handler_class(WTPHandler, server)
+    rest_server.add_handler_class(WTPBatchHandler, server)
     rest_server.add_handler_class(LVAPHandler, server)
     rest_server.add_handler_class(TenantLVAPHandler, server)
+    rest_server.add_handler_class(BringUpHandler, server)
+    rest_server.add_handler_class(ReconcileHandler, server)
+    rest_server.add_handler_class(HandoverHandler, server)
 
     server.log.info("LVAP Server available at %u", server.port)
     return server
@@ -0,0 +1,279 @@
+#!/usr/bin/env python3
+#
+# Copyright (c) 2019 Roberto Riggio
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied. See the License for the
+# specific language governing permissions and limitations
+# under the License.
+
+"""LVAPP shard, i.e. the runtime side of a LVAPP worker process.
+
+A worker that exits is reaped and replaced, so that the SO_REUSEPORT group
+keeps its size. The replacement is started after a delay that is doubled
+every time a worker exits shortly after having been started.
+"""
+
+import socket
+import subprocess
+import sys
+import time
+
+import tornado.ioloop
+
+import empower.logger
+
+from empower.core.metrics import M_MESSAGE
+from empower.lvapp.lvappconnection import LVAPPConnection
+from empower.lvapp.lvappworker import Channel
+from empower.lvapp.lvappworker import EV_OPEN
+from empower.lvapp.lvappworker import EV_MESSAGE
+from empower.lvapp.lvappworker import EV_CLOSE
+from empower.lvapp.lvappworker import EV_WRITE
+from empower.lvapp.lvappworker import from_plain
+
+from empower.main import RUNTIME
+
+# time given to a worker to exit before it is killed (in s)
+STOP_TIMEOUT = 2
+
+# delay before a worker that exited is replaced, doubled up to
+# RESTART_MAX_DELAY while workers keep exiting early (in s)
+RESTART_DELAY = 1
+RESTART_MAX_DELAY = 60
+
+
+class ShardStream:
+    """Proxy for a stream owned by a worker process.
+
+    Implements the subset of the IOStream interface used by LVAPPConnection.
+    """
+
+    def __init__(self, shard, conn_id):
+
+        self.shard = shard
+        self.conn_id = conn_id
+        self.__closed = False
+        self.__close_callback = None
+
+    def set_nodelay(self, value):
+        """Nodelay is set by the worker."""
+
+        pass
+
+    def set_close_callback(self, callback):
+        """Set the close callback."""
+
+        self.__close_callback = callback
+
+    def closed(self):
+        """Return True if the stream is closed."""
+
+        return self.__closed
+
+    def write(self, data):
+        """Send data to the WTP."""
+
+        if self.__closed:
+            return
+
+        self.shard.channel.send((EV_WRITE, self.conn_id, bytes(data)))
+
+    def close(self):
+        """Close the stream."""
+
+        if self.__closed:
+            return
+
+        self.shard.channel.send((EV_CLOSE, self.conn_id))
+        self.on_close()
+
+    def on_close(self):
+        """The stream has been closed."""
+
+        if self.__closed:
+            return
+
+        self.__closed = True
+
+        if self.__close_callback:
+            self.__close_callback()
+
+
+class LVAPPShardConnection(LVAPPConnection):
+    """LVAPP Connection whose messages are parsed by a worker process."""
+
+    def _wait(self):
+        """Messages are pushed by the shard."""
+
+        pass
+
+    def handle_message(self, msg_type, msg):
+        """Handle a message parsed by the worker."""
+
+        start = time.perf_counter()
+
+        try:
+            self._handle_message(msg_type, msg)
+        except Exception as ex:
+            self.log.exception(ex)
+            self.stream.close()
+            return
+
+        labels = (("protocol", "lvapp"),
+                  ("type", self.server.pt_types[msg_type].name))
+        RUNTIME.metrics.observe_since(M_MESSAGE, labels, start)
+
+
+class LVAPPShard:
+    """A LVAPP worker process and its connections.
+
+    Attributes:
+        server: the LVAPP server
+        index: the shard index
+        process: the worker process
+        channel: the IPC channel to the worker
+        connections: the connections owned by the worker, keyed on the
+            connection id
+        restarts: the number of workers started to replace one that exited
+    """
+
+    def __init__(self, server, index):
+
+        self.server = server
+        self.index = index
+        self.connections = {}
+        self.stopped = False
+        self.restarts = 0
+        self.process = None
+        self.channel = None
+        self.log = empower.logger.get_logger()
+
+        self.__started = None
+        self.__delay = RESTART_DELAY
+        self.__timeout = None
+
+        self.__start()
+
+    def __start(self):
+        """Start a worker process."""
+
+        parent, child = socket.socketpair()
+
+        self.process = subprocess.Popen([sys.executable, "-m",
+                                         "empower.lvapp.lvappworker",
+                                         "--port", str(self.server.port),
+                                         "--fd", str(child.fileno())],
+                                        pass_fds=[child.fileno()])
+
+        child.close()
+        parent.setblocking(False)
+
+        self.__started = time.time()
+
+        self.channel = Channel(parent)
+        self.channel.start(self.handle_event, self.__on_close)
+
+        self.log.info("LVAPP worker %u started (pid %u)", self.index,
+                      self.process.pid)
+
+    def handle_event(self, event):
+        """Handle an event from the worker."""
+
+        if event[0] == EV_MESSAGE:
+
+            conn = self.connections.get(event[1])
+
+            if conn:
+                conn.handle_message(event[2], from_plain(event[3]))
+
+        elif event[0] == EV_OPEN:
+
+            self.log.info('Incoming connection from %r (worker %u)',
+                          event[2], self.index)
+
+            stream = ShardStream(self, event[1])
+            conn = LVAPPShardConnection(stream, event[2], server=self.server)
+
+            self.connections[event[1]] = conn
+            self.server.connection = conn
+
+        elif event[0] == EV_CLOSE:
+
+            conn = self.connections.pop(event[1], None)
+
+            if conn:
+                conn.stream.on_close()
+
+    def __on_close(self):
+        """The worker is gone, close all its connections and replace it."""
+
+        for conn in list(self.connections.values()):
+            conn.stream.on_close()
+
+        self.connections = {}
+
+        if self.stopped:
+            self.log.info("LVAPP worker %u stopped", self.index)
+            return
+
+        # the channel is closed, a worker still running is of no use
+        if self.process.poll() is None:
+            self.process.kill()
+
+        self.process.wait()
+
+        # the backoff is reset once a worker has been up long enough
+        if time.time() - self.__started > RESTART_MAX_DELAY:
+            self.__delay = RESTART_DELAY
+
+        self.log.error("LVAPP worker %u exited (code %d), restarting in %g s",
+                       self.index, self.process.returncode, self.__delay)
+
+        self.__timeout = tornado.ioloop.IOLoop.instance().call_later(
+            self.__delay, self.__restart)
+
+        self.__delay = min(self.__delay * 2, RESTART_MAX_DELAY)
+
+    def __restart(self):
+        """Replace the worker that exited."""
+
+        self.__timeout = None
+
+        if self.stopped:
+            return
+
+        self.restarts += 1
+
+        self.__start()
+
+    def stop(self):
+        """Stop the worker and wait for it to exit."""
+
+        if self.stopped:
+            return
+
+        self.stopped = True
+
+        if self.__timeout:
+            tornado.ioloop.IOLoop.instance().remove_timeout(self.__timeout)
+            self.__timeout = None
+
+        self.channel.stream.close()
+        self.process.terminate()
+
+        try:
+            self.process.wait(STOP_TIMEOUT)
+        except subprocess.TimeoutExpired:
+            self.log.warning("LVAPP worker %u not responding, killing it",
+                             self.index)
+            self.process.kill()
+            self.process.wait()
@@ -0,0 +1,256 @@
+#!/usr/bin/env python3
+#
+# Copyright (c) 2019 Roberto Riggio
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied. See the License for the
+# specific language governing permissions and limitations
+# under the License.
+
+"""LVAPP worker process.
+
+In sharded mode the LVAPPServer spawns a number of worker processes all
+listening on the LVAPP port with SO_REUSEPORT, so that the kernel spreads the
+incoming WTP connections among them. A worker owns the connections assigned
+to it: it reads and parses the incoming messages and forwards them to the
+runtime over a unix socket. The runtime sends back the messages to be written
+on the connections. The worker does not import the runtime.
+
+The IPC channel carries frames made of a 4 bytes length followed by a pickled
+list of events. Events from the worker to the runtime:
+
+    (EV_OPEN, conn_id, address)
+    (EV_MESSAGE, conn_id, msg_type, msg)
+    (EV_CLOSE, conn_id)
+
+Commands from the runtime to the worker:
+
+    (EV_WRITE, conn_id, data)
+    (EV_CLOSE, conn_id)
+
+Messages are sent as plain dicts and lists since construct containers cannot
+be pickled.
+
+The worker is started with:
+
+    python -m empower.lvapp.lvappworker --port <port> --fd <ipc socket fd>
+"""
+
+import argparse
+import logging
+import pickle
+import socket
+import struct
+
+import tornado.ioloop
+
+from construct import Container
+from tornado import gen
+from tornado.iostream import IOStream
+from tornado.iostream import StreamClosedError
+from tornado.netutil import bind_sockets
+from tornado.tcpserver import TCPServer
+
+import empower.logger
+
+from empower.lvapp import HEADER
+from empower.lvapp import PT_TYPES
+
+EV_OPEN = 0
+EV_MESSAGE = 1
+EV_CLOSE = 2
+EV_WRITE = 3
+
+FRAME = struct.Struct("!I")
+
+
+def to_plain(value):
+    """Convert a parsed message into plain dicts and lists."""
+
+    if isinstance(value, dict):
+        return {k: to_plain(v) for k, v in value.items()}
+
+    if isinstance(value, list):
+        return [to_plain(v) for v in value]
+
+    return value
+
+
+def from_plain(value):
+    """Convert plain dicts and lists back into a parsed message."""
+
+    if isinstance(value, dict):
+        return Container(**{k: from_plain(v) for k, v in value.items()})
+
+    if isinstance(value, list):
+        return [from_plain(v) for v in value]
+
+    return value
+
+
+class Channel:
+    """IPC channel between a worker and the runtime.
+
+    The events sent in the same IOLoop iteration are batched in a single
+    frame.
+    """
+
+    def __init__(self, sock):
+
+        self.stream = IOStream(sock)
+        self.pending = []
+        self.log = empower.logger.get_logger()
+
+    def send(self, event):
+        """Queue an event."""
+
+        self.pending.append(event)
+
+        if len(self.pending) == 1:
+            tornado.ioloop.IOLoop.current().add_callback(self.flush)
+
+    def flush(self):
+        """Write the pending events."""
+
+        if not self.pending or self.stream.closed():
+            return
+
+        data = pickle.dumps(self.pending, protocol=pickle.HIGHEST_PROTOCOL)
+        self.pending = []
+
+        self.stream.write(FRAME.pack(len(data)) + data)
+
+    @gen.coroutine
+    def start(self, callback, close_callback=None):
+        """Read frames and call callback for every event."""
+
+        while True:
+
+            try:
+                header = yield self.stream.read_bytes(FRAME.size)
+                data = yield self.stream.read_bytes(FRAME.unpack(header)[0])
+            except StreamClosedError:
+                break
+
+            for event in pickle.loads(data):
+                try:
+                    callback(event)
+                except Exception as ex:
+                    self.log.exception(ex)
+
+        if close_callback:
+            close_callback()
+
+
+class LVAPPWorker(TCPServer):
+    """Accept WTP connections and forward their messages to the runtime."""
+
+    def __init__(self, channel):
+
+        super().__init__()
+
+        self.channel = channel
+        self.streams = {}
+        self.next_id = 0
+        self.log = empower.logger.get_logger()
+
+    def handle_stream(self, stream, address):
+
+        self.next_id += 1
+        conn_id = self.next_id
+
+        self.log.info('Incoming connection from %r', address)
+
+        stream.set_nodelay(True)
+        stream.set_close_callback(lambda: self.__on_close(conn_id))
+
+        self.streams[conn_id] = stream
+        self.channel.send((EV_OPEN, conn_id, address))
+
+        self.__read(conn_id, stream)
+
+    @gen.coroutine
+    def __read(self, conn_id, stream):
+        """Read, parse and forward the messages of a connection."""
+
+        while True:
+
+            try:
+                buffer = yield stream.read_bytes(HEADER.sizeof())
+                hdr = HEADER.parse(buffer)
+                if hdr.length > len(buffer):
+                    buffer += \
+                        yield stream.read_bytes(hdr.length - len(buffer))
+            except StreamClosedError:
+                return
+
+            if hdr.type not in PT_TYPES:
+                self.log.error("Unknown message type %u", hdr.type)
+                continue
+
+            if not PT_TYPES[hdr.type]:
+                continue
+
+            try:
+                msg = PT_TYPES[hdr.type].parse(buffer)
+            except Exception as ex:
+                self.log.exception(ex)
+                stream.close()
+                return
+
+            self.channel.send((EV_MESSAGE, conn_id, hdr.type, to_plain(msg)))
+
+    def __on_close(self, conn_id):
+
+        del self.streams[conn_id]
+        self.channel.send((EV_CLOSE, conn_id))
+
+    def handle_command(self, command):
+        """Handle a command from the runtime."""
+
+        stream = self.streams.get(command[1])
+
+        if not stream or stream.closed():
+            return
+
+        if command[0] == EV_WRITE:
+            stream.write(command[2])
+        elif command[0] == EV_CLOSE:
+            stream.close()
+
+
+def main():
+    """Run a LVAPP worker."""
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--port", type=int, required=True)
+    parser.add_argument("--fd", type=int, required=True)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING)
+
+    sock = socket.socket(fileno=args.fd)
+    sock.setblocking(False)
+
+    channel = Channel(sock)
+    worker = LVAPPWorker(channel)
+    worker.add_sockets(bind_sockets(args.port, reuse_port=True))
+
+    loop = tornado.ioloop.IOLoop.current()
+
+    # the runtime is gone, exit
+    channel.start(worker.handle_command, loop.stop)
+
+    loop.start()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,415 @@
+#!/usr/bin/env python3
+#
+# Copyright (c) 2019 Roberto Riggio
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied. See the License for the
+# specific language governing permissions and limitations
+# under the License.
+
+"""WTP state reconciliation engine.
+
+When a WTP comes online the controller asks for the LVAPs, VAPs, slices and
+transmission policies currently configured on the agent. Every status
+response is reduced to a (key, digest) entry. Once the WTP has been quiet for
+STATUS_QUIET ms (or after STATUS_MAX ms) the desired state of the WTP is
+reduced to the same kind of entries and compared with the reported ones: only
+the entries that are missing or different are pushed to the agent. The
+digests of the whole desired and reported state are compared first, so a WTP
+that is in sync costs a single comparison.
+"""
+
+import hashlib
+import time
+
+from collections import deque
+
+import tornado.ioloop
+
+import empower.logger
+
+from empower.core.tenant import T_TYPE_UNIQUE
+from empower.core.vap import VAP
+from empower.datatypes.dscp import DSCP
+from empower.datatypes.ssid import SSID
+from empower.lvapp.bringup import STATUS_QUIET
+from empower.lvapp.bringup import STATUS_MAX
+
+R_VAP = "vap"
+R_TXP = "txp"
+R_LVAP = "lvap"
+R_SLICE = "slice"
+
+# entries are pushed in this order (e.g. tx policies before lvaps)
+PUSH_ORDER = [R_VAP, R_TXP, R_LVAP, R_SLICE]
+
+NULL_ADDR = b'\x00' * 6
+
+
+def _block_key(block):
+    """Return the key of a resource block (within a WTP)."""
+
+    return (block.hwaddr.to_raw(), block.channel, block.band)
+
+
+def _status_block_key(status):
+    """Return the key of the resource block in a status message."""
+
+    return (status.hwaddr, status.channel, status.band)
+
+
+def _raw(addr):
+    """Return the raw representation of an address (or all zeros)."""
+
+    return addr.to_raw() if addr else NULL_ADDR
+
+
+def lvap_digest(lvap, set_mask):
+    """Return the digest of an LVAP on one of its blocks."""
+
+    if not set_mask:
+        return (False,)
+
+    networks = tuple((bssid.to_raw(), str(ssid))
+                     for bssid, ssid in lvap.networks)
+
+    return (True,
+            lvap.assoc_id,
+            lvap.supported_band,
+            bool(lvap.authentication_state),
+            bool(lvap.association_state),
+            _raw(lvap.encap),
+            _raw(lvap.bssid),
+            str(lvap.ssid) if lvap.ssid else "",
+            networks)
+
+
+def lvap_status_digest(status):
+    """Return the digest of a STATUS_LVAP message."""
+
+    if not status.flags.set_mask:
+        return (False,)
+
+    networks = tuple((x.bssid, str(SSID(x.ssid))) for x in status.networks)
+
+    return (True,
+            status.assoc_id,
+            status.supported_band,
+            bool(status.flags.authenticated),
+            bool(status.flags.associated),
+            status.encap,
+            status.bssid,
+            str(SSID(status.ssid)),
+            networks)
+
+
+def txp_digest(txp):
+    """Return the digest of a transmission policy."""
+
+    return (bool(txp.no_ack),
+            txp.rts_cts,
+            txp.mcast,
+            tuple(sorted(int(x * 2) for x in txp.mcs)),
+            tuple(sorted(int(x) for x in txp.ht_mcs)),
+            txp.ur_count,
+            txp.max_amsdu_len)
+
+
+def txp_status_digest(status):
+    """Return the digest of a STATUS_TRANSMISSION_POLICY message."""
+
+    return (bool(status.flags.no_ack),
+            status.rts_cts,
+            status.tx_mcast,
+            tuple(sorted(status.mcs)),
+            tuple(sorted(status.ht_mcs)),
+            status.ur_mcast_count,
+            status.max_amsdu_len)
+
+
+def slice_digest(slc, wtp):
+    """Return the digest of a slice on a WTP."""
+
+    return slc.get_wifi_digest(wtp.addr)
+
+
+def slice_status_digest(status):
+    """Return the digest of a STATUS_SLICE message."""
+
+    return (bool(status.flags.amsdu_aggregation),
+            status.quantum,
+            status.scheduler,
+            status.max_aggr_length)
+
+
+def state_digest(entries):
+    """Return the digest of a set of (key, digest) entries."""
+
+    data = repr(sorted(entries.items(), key=repr)).encode()
+
+    return hashlib.sha1(data).hexdigest()
+
+
+class Reconciler:
+    """WTP state reconciliation engine.
+
+    Attributes:
+        sessions: the WTPs in the status phase, keyed on the WTP address
+        results: the last reconciliation results
+        reconciled: the number of reconciled WTPs
+        in_sync: the number of entries that did not need to be pushed
+        pushed: the number of entries pushed to the agents
+    """
+
+    def __init__(self):
+
+        self.sessions = {}
+        self.results = deque(maxlen=100)
+        self.reconciled = 0
+        self.in_sync = 0
+        self.pushed = 0
+        self.log = empower.logger.get_logger()
+
+    def start(self, wtp):
+        """Start collecting the status reports of a WTP."""
+
+        now = time.time()
+
+        session = {'wtp': wtp,
+                   'start': now,
+                   'last_seen': now,
+                   'reported': {}}
+
+        self.sessions[wtp.addr] = session
+
+        tornado.ioloop.IOLoop.instance().call_later(
+            STATUS_QUIET / 1000, self.__check, wtp.addr, session)
+
+    def cancel(self, wtp):
+        """Stop reconciling a WTP (e.g. on disconnection)."""
+
+        self.sessions.pop(wtp.addr, None)
+
+    def __report(self, wtp, key, digest):
+
+        session = self.sessions.get(wtp.addr)
+
+        if not session:
+            return
+
+        session['reported'][key] = digest
+        session['last_seen'] = time.time()
+
+    def report_lvap(self, wtp, status):
+        """Record a STATUS_LVAP message."""
+
+        key = (R_LVAP, status.sta, _status_block_key(status))
+        self.__report(wtp, key, lvap_status_digest(status))
+
+    def report_vap(self, wtp, status):
+        """Record a STATUS_VAP message."""
+
+        key = (R_VAP, status.bssid)
+        digest = (str(SSID(status.ssid)), _status_block_key(status))
+        self.__report(wtp, key, digest)
+
+    def report_slice(self, wtp, status):
+        """Record a STATUS_SLICE message."""
+
+        key = (R_SLICE, _status_block_key(status), str(SSID(status.ssid)),
+               DSCP(status.dscp).to_raw())
+        self.__report(wtp, key, slice_status_digest(status))
+
+    def report_txp(self, wtp, status):
+        """Record a STATUS_TRANSMISSION_POLICY message."""
+
+        key = (R_TXP, _status_block_key(status), status.sta)
+        self.__report(wtp, key, txp_status_digest(status))
+
+    def __check(self, addr, session):
+        """Reconcile the WTP once its status reports are over."""
+
+        if self.sessions.get(addr) is not session:
+            return
+
+        now = time.time()
+
+        quiet = now - session['last_seen'] >= STATUS_QUIET / 1000
+        expired = now - session['start'] >= STATUS_MAX / 1000
+
+        if not quiet and not expired:
+            tornado.ioloop.IOLoop.instance().call_later(
+                STATUS_QUIET / 1000, self.__check, addr, session)
+            return
+
+        del self.sessions[addr]
+
+        if session['wtp'].connection:
+            self.reconcile(session['wtp'], session)
+
+    @classmethod
+    def desired_state(cls, wtp):
+        """Return the desired state of a WTP.
+
+        Returns:
+            A dictionary mapping every entry key to a (digest, target)
+            tuple, where target is what must be pushed if the entry is
+            missing or different.
+        """
+
+        from empower.main import RUNTIME
+
+        desired = {}
+
+        blocks = {_block_key(x): x for x in wtp.supports}
+
+        for tenant in RUNTIME.tenants.values():
+
+            # shared vaps for the tenants including this wtp
+            if tenant.bssid_type != T_TYPE_UNIQUE and \
+                    wtp.addr in tenant.wtps:
+
+                for block in wtp.supports:
+
+                    bssid = tenant.generate_bssid(block.hwaddr)
+
+                    if bssid not in tenant.vaps:
+                        tenant.vaps[bssid] = VAP(bssid, block, tenant)
+
+            for vap in tenant.vaps.values():
+
+                if vap.block not in wtp.supports:
+                    continue
+
+                key = (R_VAP, vap.bssid.to_raw())
+                digest = (str(vap.ssid), _block_key(vap.block))
+                desired[key] = (digest, vap)
+
+            if wtp.addr not in tenant.wtps:
+                continue
+
+            for slc in tenant.slices.values():
+
+                if slc.wifi['wtps'] and wtp.addr not in slc.wifi['wtps']:
+                    continue
+
+                digest = slice_digest(slc, wtp)
+
+                for block_key, block in blocks.items():
+                    key = (R_SLICE, block_key, str(tenant.tenant_name),
+                           slc.dscp.to_raw())
+                    desired[key] = (digest, (block, slc))
+
+        for block_key, block in blocks.items():
+            for addr, txp in block.tx_policies.items():
+                key = (R_TXP, block_key, addr.to_raw())
+                desired[key] = (txp_digest(txp), txp)
+
+        for lvap in RUNTIME.lvaps.values():
+            for index, block in enumerate(lvap.blocks):
+
+                if not block or block not in wtp.supports:
+                    continue
+
+                set_mask = index == 0
+                key = (R_LVAP, lvap.addr.to_raw(), _block_key(block))
+                desired[key] = (lvap_digest(lvap, set_mask),
+                                (lvap, block, set_mask))
+
+        return desired
+
+    def reconcile(self, wtp, session):
+        """Push the missing and different entries to a WTP."""
+
+        start = time.time()
+
+        desired = self.desired_state(wtp)
+        reported = session['reported']
+
+        desired_digests = {k: v[0] for k, v in desired.items()}
+        local_digest = state_digest(desired_digests)
+
+        missing = []
+        different = []
+
+        if local_digest != state_digest(reported):
+
+            for key, (digest, _) in desired.items():
+
+                if key not in reported:
+                    missing.append(key)
+                elif reported[key] != digest:
+                    different.append(key)
+
+        push = missing + different
+        push.sort(key=lambda x: PUSH_ORDER.index(x[0]))
+
+        for key in push:
+            self.__push(wtp, key, desired[key][1], key in reported)
+
+        now = time.time()
+
+        result = {'wtp': wtp.addr,
+                  'digest': local_digest,
+                  'desired': len(desired),
+                  'reported': len(reported),
+                  'in_sync': len(desired) - len(push),
+                  'missing': len(missing),
+                  'different': len(different),
+                  'compute': int((now - start) * 1000),
+                  'duration': int((now - session['start']) * 1000)}
+
+        self.results.append(result)
+        self.reconciled += 1
+        self.in_sync += result['in_sync']
+        self.pushed += len(push)
+
+        self.log.info("WTP %s reconciled in %ums: %u entries, %u missing, "
+                      "%u different, %u messages saved", wtp.addr,
+                      result['duration'], len(desired), len(missing),
+                      len(different), result['in_sync'])
+
+        return result
+
+    @classmethod
+    def __push(cls, wtp, key, target, reported):
+        """Push an entry to the agent."""
+
+        connection = wtp.connection
+
+        if key[0] == R_VAP:
+            connection.send_add_vap(target)
+
+        elif key[0] == R_TXP:
+            connection.send_set_transmission_policy(target)
+
+        elif key[0] == R_LVAP:
+
+            lvap, block, set_mask = target
+            connection.send_add_lvap(lvap, block, set_mask)
+
+            # the lvap has been restored, notify the apps
+            if set_mask and not reported and lvap.ssid:
+                connection.server.send_lvap_join_message_to_self(lvap)
+
+        elif key[0] == R_SLICE:
+
+            block, slc = target
+            connection.send_set_slice(block, slc)
+
+    def to_dict(self):
+        """Return a JSON-serializable dictionary."""
+
+        return {'reconciled': self.reconciled,
+                'in_sync': self.in_sync,
+                'pushed': self.pushed,
+                'pending': [str(x) for x in self.sessions],
+                'results': list(self.results)}
@@ -0,0 +1,64 @@
+#!/usr/bin/env python3
+#
+# Copyright (c) 2019 Roberto Riggio
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied. See the License for the
+# specific language governing permissions and limitations
+# under the License.
+
+"""WTP reconciliation Handler."""
+
+from empower.restserver.apihandlers import EmpowerAPIHandler
+from empower.restserver.validate import validate
+
+
+class ReconcileHandler(EmpowerAPIHandler):
+    """Reconciliation handler. Used to view the WTP reconciliation stats."""
+
+    HANDLERS = [r"/api/v1/reconcile/?"]
+
+    @validate(returncode=200)
+    def get(self, *args, **kwargs):
+        """Get the reconciliation stats.
+
+        For every reconciled WTP the number of entries in its desired state
+        is reported along with the entries that were missing or different on
+        the agent. The in_sync entries are the messages saved with respect
+        to pushing the whole desired state. The duration is measured from
+        the CAPS response, the compute time is the time spent comparing
+        the states and sending the messages (in ms).
+
+        Example URLs:
+            GET /api/v1/reconcile
+
+            {
+                "reconciled": 1,
+                "in_sync": 170,
+                "pushed": 2,
+                "pending": [],
+                "results": [
+                    {
+                        "wtp": "00:0D:B9:2F:56:64",
+                        "digest": "2a4c6e35d4e2d7ba0b14c9a0e9de6fcb1a8fc3a4",
+                        "desired": 172,
+                        "reported": 170,
+                        "in_sync": 170,
+                        "missing": 2,
+                        "different": 0,
+                        "compute": 3,
+                        "duration": 412
+                    }
+                ]
+            }
+        """
+
+        return self.server.reconciler
@@ -81,6 +81,11 @@ class SliceStats(ModulePeriodic):
     MODULE_NAME = "slice_stats"
     REQUIRED = ['module_type', 'worker', 'tenant_id', 'block']
 
+    # adaptive polling: compare the byte rate
+    ADAPTIVE_COUNTERS = True
+    ADAPTIVE_DELTA = 10000
+    ADAPTIVE_RATIO = 0.25
+
     def __init__(self):
 
         super().__init__()
@@ -151,6 +156,14 @@ class SliceStats(ModulePeriodic):
 
             self._block = match[0]
 
+    def sample(self):
+        """Return the TX byte counter of the slice."""
+
+        if not self.slice_stats:
+            return None
+
+        return {'tx_bytes': self.slice_stats['tx_bytes']}
+
     def to_dict(self):
         """ Return a JSON-serializable."""
 
@@ -200,6 +213,8 @@ class SliceStats(ModulePeriodic):
         msg = SLICE_STATS_REQUEST.build(stats_req)
         wtp.connection.stream.write(msg)
 
+        self.request_sent(wtp.addr)
+
     def handle_response(self, response):
         """Handle an incoming STATS_RESPONSE message.
         Args:
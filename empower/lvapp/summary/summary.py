@@ -27,11 +27,12 @@ from construct import UBInt32
 from construct import UBInt64
 from construct import Bytes
 from construct import Sequence
-from construct import Array
 from construct import BitStruct
 from construct import Padding
 from construct import Bit
 
+import numpy as np
+
 from empower.core.app import EmpowerApp
 from empower.datatypes.etheraddress import EtherAddress
 from empower.lvapp import PT_VERSION
@@ -72,6 +73,7 @@ SUMMARY_ENTRY = Sequence("frames",
                          UBInt8("subtype"),
                          UBInt32("length"))
 
+# the frames are decoded in bulk by handle_response
 SUMMARY_TRIGGER = Struct("summary", UBInt8("version"),
                          UBInt8("type"),
                          UBInt32("length"),
@@ -79,7 +81,219 @@ SUMMARY_TRIGGER = Struct("summary", UBInt8("version"),
                          UBInt32("module_id"),
                          Bytes("wtp", 6),
                          UBInt16("nb_entries"),
-                         Array(lambda ctx: ctx.nb_entries, SUMMARY_ENTRY))
+                         Bytes("frames", lambda ctx: ctx.nb_entries *
+                               SUMMARY_ENTRY.sizeof()))
+
+# the layout of SUMMARY_ENTRY
+SUMMARY_ENTRY_DTYPE = np.dtype([('ra', 'u1', 6),
+                                ('ta', 'u1', 6),
+                                ('tsft', '>u8'),
+                                ('flags', '>u2'),
+                                ('seq', '>u2'),
+                                ('rssi', 'i1'),
+                                ('rate', 'u1'),
+                                ('type', 'u1'),
+                                ('subtype', 'u1'),
+                                ('length', '>u4')])
+
+# the mcs bit of the flags field
+FLAG_MCS = 0x0200
+
+# a decoded frame, ra and ta are the addresses as integers and rate is the
+# MCS index for HT frames and the rate in Mbps for legacy frames
+FRAME_DTYPE = np.dtype([('tsft', 'u8'),
+                        ('rate', 'f4'),
+                        ('ht', '?'),
+                        ('rssi', 'i1'),
+                        ('length', 'u4'),
+                        ('type', 'u1'),
+                        ('subtype', 'u1'),
+                        ('ra', 'u8'),
+                        ('ta', 'u8'),
+                        ('seq', 'u2')])
+
+FRAME_TYPES = {0x00: "MNGT", 0x04: "CTRL", 0x08: "DATA"}
+
+FRAME_SUBTYPES = {
+    0x00: {0x00: "ASSOCREQ", 0x10: "ASSOCRESP", 0x20: "AUTHREQ",
+           0x30: "AUTHRESP", 0x40: "PROBEREQ", 0x50: "PROBERESP",
+           0x80: "BEACON", 0x90: "ATIM", 0xA0: "DISASSOC", 0xB0: "AUTH",
+           0xC0: "DEAUTH", 0xD0: "ACTION"},
+    0x04: {},
+    0x08: {0x00: "DATA", 0x40: "DATA", 0x80: "QOS", 0xC0: "QOSNULL"},
+}
+
+# HT20 rates (in Mbps, long guard interval) by MCS index
+HT20_RATES = [6.5, 13.0, 19.5, 26.0, 39.0, 52.0, 58.5, 65.0,
+              13.0, 26.0, 39.0, 52.0, 78.0, 104.0, 117.0, 130.0]
+
+
+def _to_int(addresses):
+    """Return an array of 6 bytes addresses as unsigned integers."""
+
+    padded = np.zeros((len(addresses), 8), dtype='u1')
+    padded[:, 2:] = addresses
+
+    return padded.view('>u8').ravel().astype('u8')
+
+
+def decode_frames(data):
+    """Return the SUMMARY_ENTRY records in data as a FRAME_DTYPE array."""
+
+    entries = np.frombuffer(data, dtype=SUMMARY_ENTRY_DTYPE)
+
+    frames = np.empty(len(entries), dtype=FRAME_DTYPE)
+
+    frames['tsft'] = entries['tsft']
+    frames['ht'] = (entries['flags'] & FLAG_MCS) != 0
+    frames['rate'] = np.where(frames['ht'], entries['rate'],
+                              entries['rate'] / 2)
+    frames['rssi'] = entries['rssi']
+    frames['length'] = entries['length']
+    frames['type'] = entries['type']
+    frames['subtype'] = entries['subtype']
+    frames['ra'] = _to_int(entries['ra'])
+    frames['ta'] = _to_int(entries['ta'])
+    frames['seq'] = entries['seq']
+
+    return frames
+
+
+def frame_type(pt_type, pt_subtype):
+    """Return the names of a frame type and subtype."""
+
+    if pt_type not in FRAME_TYPES:
+        return "DATA (%s)" % pt_type, "UNKN (%s)" % pt_subtype
+
+    name = FRAME_TYPES[pt_type]
+
+    if pt_subtype in FRAME_SUBTYPES[pt_type]:
+        return name, FRAME_SUBTYPES[pt_type][pt_subtype]
+
+    if pt_type == 0x00:
+        return name, "MNGT (%s)" % pt_subtype
+
+    return name, "UNKN (%s)" % pt_subtype
+
+
+def to_address(value):
+    """Return an integer address as an EtherAddress."""
+
+    return EtherAddress(int(value).to_bytes(6, 'big'))
+
+
+def frame_to_dict(frame):
+    """Return a FRAME_DTYPE record as a dictionary."""
+
+    pt_type, pt_subtype = frame_type(int(frame['type']),
+                                     int(frame['subtype']))
+
+    if frame['ht']:
+        rate = int(frame['rate'])
+        rtype = "HT"
+    else:
+        rate = float(frame['rate'])
+        rtype = "LE"
+
+    return {'ra': to_address(frame['ra']),
+            'ta': to_address(frame['ta']),
+            'tsft': int(frame['tsft']),
+            'seq': int(frame['seq']),
+            'rssi': int(frame['rssi']),
+            'rate': rate,
+            'rtype': rtype,
+            'type': pt_type,
+            'subtype': pt_subtype,
+            'length': int(frame['length'])}
+
+
+class FramesView:
+    """Read-only sequence of frame dictionaries over a FRAME_DTYPE array.
+
+    The dictionaries are built only when the frames are accessed.
+    """
+
+    def __init__(self, frames):
+        self.frames = frames
+
+    def __len__(self):
+        return len(self.frames)
+
+    def __getitem__(self, index):
+
+        if isinstance(index, slice):
+            return FramesView(self.frames[index])
+
+        return frame_to_dict(self.frames[index])
+
+    def __iter__(self):
+        return (frame_to_dict(frame) for frame in self.frames)
+
+
+def rssi_histograms(frames):
+    """Return the RSSI histogram of every transmitter.
+
+    Returns:
+        A dictionary mapping the transmitter address to a dictionary
+        mapping every RSSI value to the number of frames received with it
+    """
+
+    out = {}
+
+    if not len(frames):
+        return out
+
+    keys, counts = np.unique(frames[['ta', 'rssi']], return_counts=True)
+
+    for (ta, rssi), count in zip(keys.tolist(), counts.tolist()):
+        out.setdefault(to_address(ta), {})[rssi] = count
+
+    return out
+
+
+def airtime(frames):
+    """Return the frames, bytes, and airtime (in us) spent at every rate.
+
+    The airtime is the transmission time of the frame payloads, without
+    preambles and inter-frame spaces.
+
+    Returns:
+        A dictionary mapping "LE" (legacy rates, in Mbps) and "HT" (MCS
+        indexes) to a dictionary mapping every rate to the frames, bytes,
+        and airtime sent at that rate
+    """
+
+    out = {'LE': {}, 'HT': {}}
+
+    if not len(frames):
+        return out
+
+    mbps = frames['rate'].astype('f8')
+
+    mcs = frames['ht'] & (frames['rate'] < len(HT20_RATES))
+    mbps[mcs] = np.take(HT20_RATES, frames['rate'][mcs].astype('i8'))
+
+    valid = mbps > 0
+    usecs = np.zeros(len(frames))
+    usecs[valid] = frames['length'][valid] * 8 / mbps[valid]
+
+    keys, inverse = np.unique(frames[['ht', 'rate']], return_inverse=True)
+    inverse = inverse.ravel()
+
+    nb_frames = np.bincount(inverse, minlength=len(keys))
+    nb_bytes = np.bincount(inverse, weights=frames['length'],
+                           minlength=len(keys))
+    nb_usecs = np.bincount(inverse, weights=usecs, minlength=len(keys))
+
+    for index, (ht, rate) in enumerate(keys.tolist()):
+        rate = int(rate) if ht else rate
+        out["HT" if ht else "LE"][rate] = \
+            {'frames': int(nb_frames[index]),
+             'bytes': int(nb_bytes[index]),
+             'airtime': float(nb_usecs[index])}
+
+    return out
+
 
 DEL_SUMMARY = Struct("del_summary", UBInt8("version"),
                      UBInt8("type"),
@@ -105,7 +319,7 @@ class Summary(ModuleScheduled):
         self._period = 2000
 
         # data structures
-        self.frames = []
+        self.frames = np.empty(0, dtype=FRAME_DTYPE)
 
     def __eq__(self, other):
 
@@ -205,7 +419,7 @@ class Summary(ModuleScheduled):
         out['addr'] = self.addr
         out['block'] = self.block
         out['limit'] = self.limit
-        out['frames'] = self.frames
+        out['frames'] = FramesView(self.frames)
 
         return out
 
@@ -257,90 +471,20 @@ class Summary(ModuleScheduled):
             None
         """
 
-        self.frames = []
-
-        for recv in response.frames:
-
-            if recv[3].mcs:
-                rate = int(recv[6])
-            else:
-                rate = float(recv[6]) / 2
-
-            if recv[3].mcs:
-                rtype = "HT"
-            else:
-                rtype = "LE"
-
-            if recv[7] == 0x00:
-                pt_type = "MNGT"
-            elif recv[7] == 0x04:
-                pt_type = "CTRL"
-            elif recv[7] == 0x08:
-                pt_type = "DATA"
-            else:
-                pt_type = "DATA (%s)" % recv[7]
-
-            if pt_type == "MNGT":
-
-                if recv[8] == 0x00:
-                    pt_subtype = "ASSOCREQ"
-                elif recv[8] == 0x10:
-                    pt_subtype = "ASSOCRESP"
-                elif recv[8] == 0x20:
-                    pt_subtype = "AUTHREQ"
-                elif recv[8] == 0x30:
-                    pt_subtype = "AUTHRESP"
-                elif recv[8] == 0x40:
-                    pt_subtype = "PROBEREQ"
-                elif recv[8] == 0x50:
-                    pt_subtype = "PROBERESP"
-                elif recv[8] == 0x80:
-                    pt_subtype = "BEACON"
-                elif recv[8] == 0x90:
-                    pt_subtype = "ATIM"
-                elif recv[8] == 0xA0:
-                    pt_subtype = "DISASSOC"
-                elif recv[8] == 0xb0:
-                    pt_subtype = "AUTH"
-                elif recv[8] == 0xc0:
-                    pt_subtype = "DEAUTH"
-                elif recv[8] == 0xd0:
-                    pt_subtype = "ACTION"
-                else:
-                    pt_subtype = "MNGT (%s)" % recv[8]
-
-            elif pt_type == "CTRL":
-
-                pt_subtype = "UNKN (%s)" % recv[8]
-
-            elif pt_type == "DATA":
-
-                if recv[8] == 0x00:
-                    pt_subtype = "DATA"
-                elif recv[8] == 0x40:
-                    pt_subtype = "DATA"
-                elif recv[8] == 0x80:
-                    pt_subtype = "QOS"
-                elif recv[8] == 0xC0:
-                    pt_subtype = "QOSNULL"
-                else:
-                    pt_subtype = "UNKN (%s)" % recv[8]
-
-            frame = {'ra': EtherAddress(recv[0]),
-                     'ta': EtherAddress(recv[1]),
-                     'tsft': recv[2],
-                     'seq': recv[4],
-                     'rssi': recv[5],
-                     'rate': rate,
-                     'rtype': rtype,
-                     'type': pt_type,
-                     'subtype': pt_subtype,
-                     'length': recv[9]}
-
-            self.frames.append(frame)
+        self.frames = decode_frames(response.frames)
 
         self.handle_callback(self)
 
+    def rssi_histograms(self):
+        """Return the RSSI histogram of every transmitter."""
+
+        return rssi_histograms(self.frames)
+
+    def airtime(self):
+        """Return the frames, bytes, and airtime spent at every rate."""
+
+        return airtime(self.frames)
+
 
 class SummaryWorker(ModuleLVAPPWorker):
     """ Summary worker. """
@@ -0,0 +1,324 @@
+#!/usr/bin/env python3
+#
+# Copyright (c) 2019 Roberto Riggio
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied. See the License for the
+# specific language governing permissions and limitations
+# under the License.
+
+"""Swarm of fake LVAPP agents, used to check the WTP bring-up scheduler.
+
+A runtime (REST server and LVAPP server only) is started in a temporary
+directory with the given bring-up parameters, then all the fake WTPs connect
+at the same time. Every agent sends a HELLO per second, answers the CAPS
+request, and answers the LVAP status request with the status of its
+stations. The swarm records when every CAPS request is received (i.e. when
+the WTP is admitted) and polls the scheduler for the number of WTPs in the
+CAPS and status phase. It then checks that:
+
+    bucket: no interval between two admissions holds more than
+        burst + rate * interval admissions (plus one for the jitter)
+    max_active: no more than max_active WTPs were in the bring-up phase
+
+Run this module to check the scheduler:
+
+    python3 -m empower.lvapp.swarm --wtps 200 --rate 20 --max-active 10
+"""
+
+import argparse
+import struct
+import sys
+import time
+
+from construct import Container
+
+from tornado import gen
+from tornado.ioloop import IOLoop
+from tornado.iostream import StreamClosedError
+from tornado.tcpclient import TCPClient
+
+from empower.datatypes.ssid import SSID
+from empower.lvapp import CAPS_RESPONSE
+from empower.lvapp import HEADER
+from empower.lvapp import PT_CAPS_REQUEST
+from empower.lvapp import PT_CAPS_RESPONSE
+from empower.lvapp import PT_LVAP_STATUS_REQUEST
+from empower.lvapp import PT_STATUS_LVAP
+from empower.lvapp import STATUS_LVAP
+from empower.lvapp.bench import LVAPP_PORT
+from empower.lvapp.bench import RuntimeClient
+from empower.lvapp.bench import hello_message
+from empower.lvapp.bench import ports_in_use
+from empower.lvapp.bench import runtime
+from empower.lvapp.bench import wtp_addr
+from empower.lvapp.bringup import DEFAULT_BURST
+from empower.lvapp.bringup import DEFAULT_MAX_ACTIVE
+from empower.lvapp.bringup import DEFAULT_RATE
+
+# period of the HELLO messages (in ms)
+HELLO_PERIOD = 1000
+
+# period of the scheduler polling (in ms)
+POLL_PERIOD = 50
+
+
+def _build(struct_type, msg):
+    """Build a message and fill in its length."""
+
+    raw = struct_type.build(msg)
+
+    return raw[:2] + struct.pack("!I", len(raw)) + raw[6:]
+
+
+def bucket_excess(admissions, rate, burst):
+    """Return the max number of admissions above the token bucket limit.
+
+    Args:
+        admissions: the admission times (in s), sorted
+        rate: the admission rate (WTPs per second)
+        burst: the token bucket size
+    """
+
+    excess = 0
+
+    for i, first in enumerate(admissions):
+        for j in range(i, len(admissions)):
+            count = j - i + 1
+            allowed = burst + rate * (admissions[j] - first)
+            excess = max(excess, count - allowed)
+
+    return excess
+
+
+class Agent:
+    """A fake LVAPP agent."""
+
+    def __init__(self, swarm, index, nb_stations):
+
+        self.swarm = swarm
+        self.index = index
+        self.nb_stations = nb_stations
+        self.wtp = wtp_addr(index)
+        self.hwaddr = bytes([0x04, 0xF0, 0x21, 0x00,
+                             index // 256, index % 256])
+        self.seq = 0
+        self.stream = None
+
+    @gen.coroutine
+    def run(self):
+        """Connect to the runtime and answer its requests."""
+
+        self.stream = yield TCPClient().connect("127.0.0.1", LVAPP_PORT)
+
+        IOLoop.current().spawn_callback(self.hello)
+
+        try:
+            while True:
+
+                data = yield self.stream.read_bytes(HEADER.sizeof())
+                header = HEADER.parse(data)
+                yield self.stream.read_bytes(header.length - len(data))
+
+                if header.type == PT_CAPS_REQUEST:
+                    self.swarm.admissions.append(time.time())
+                    self.send_caps_response()
+
+                elif header.type == PT_LVAP_STATUS_REQUEST:
+                    self.send_lvap_status()
+
+        except StreamClosedError:
+            if not self.swarm.done:
+                self.swarm.closed += 1
+
+    @gen.coroutine
+    def hello(self):
+        """Send a HELLO every HELLO_PERIOD ms."""
+
+        while not self.stream.closed():
+            self.seq += 1
+            self.stream.write(hello_message(self.index, self.seq,
+                                            HELLO_PERIOD))
+            yield gen.sleep(HELLO_PERIOD / 1000)
+
+    def send_caps_response(self):
+        """Send the capabilities: one resource block and one port."""
+
+        msg = Container(version=0,
+                        type=PT_CAPS_RESPONSE,
+                        length=0,
+                        seq=self.seq,
+                        wtp=self.wtp,
+                        dpid=b"\x00\x00" + self.wtp,
+                        nb_resources_elements=1,
+                        nb_ports_elements=1,
+                        blocks=[[self.hwaddr, 36, 1]],
+                        ports=[[self.wtp, 1, b"eth0".ljust(10, b"\x00")]])
+
+        self.stream.write(_build(CAPS_RESPONSE, msg))
+
+    def send_lvap_status(self):
+        """Send the status of the stations."""
+
+        for station in range(self.nb_stations):
+
+            sta = bytes([0x60, 0x00, 0x00, self.index // 256,
+                         self.index % 256, station])
+
+            msg = Container(version=0,
+                            type=PT_STATUS_LVAP,
+                            length=0,
+                            seq=self.seq,
+                            flags=Container(set_mask=1, associated=0,
+                                            authenticated=0),
+                            assoc_id=station,
+                            wtp=self.wtp,
+                            sta=sta,
+                            encap=b"\x00" * 6,
+                            hwaddr=self.hwaddr,
+                            channel=36,
+                            band=1,
+                            supported_band=1,
+                            bssid=b"\x00" * 6,
+                            ssid=SSID().to_raw(),
+                            networks=[])
+
+            self.stream.write(_build(STATUS_LVAP, msg))
+
+
+class Swarm(RuntimeClient):
+    """Connect a swarm of fake agents to a runtime."""
+
+    def __init__(self, pid, nb_wtps, nb_stations, timeout):
+
+        super().__init__(pid, nb_wtps)
+
+        self.nb_stations = nb_stations
+        self.timeout = timeout
+        self.admissions = []
+        self.closed = 0
+        self.done = False
+
+    @gen.coroutine
+    def run(self):
+        """Run the swarm until every WTP has been brought up."""
+
+        yield self.wait_runtime()
+        yield self.register_wtps()
+
+        agents = [Agent(self, index, self.nb_stations)
+                  for index in range(self.nb_wtps)]
+
+        start = time.time()
+
+        for agent in agents:
+            IOLoop.current().spawn_callback(agent.run)
+
+        max_active = 0
+
+        while time.time() - start < self.timeout:
+
+            yield gen.sleep(POLL_PERIOD / 1000)
+
+            bringup = yield self.api("bringup")
+            max_active = max(max_active, len(bringup['active']))
+
+            if bringup['completed'] >= self.nb_wtps and \
+                    not bringup['queued'] and not bringup['active']:
+                break
+
+        self.done = True
+
+        for agent in agents:
+            if agent.stream:
+                agent.stream.close()
+
+        bringup['max_active_seen'] = max_active
+        bringup['elapsed'] = time.time() - start
+
+        return bringup
+
+
+def swarm(nb_wtps=200, nb_stations=10, rate=DEFAULT_RATE, burst=DEFAULT_BURST,
+          max_active=DEFAULT_MAX_ACTIVE, timeout=60):
+    """Bring up a swarm of fake WTPs.
+
+    Returns:
+        The bring-up scheduler status at the end of the run, with the max
+        number of active WTPs seen, the bucket excess, and the elapsed time
+    """
+
+    with runtime("restserver.restserver",
+                 "lvapp.lvappserver",
+                 "--bringup_rate=%s" % rate,
+                 "--bringup_burst=%u" % burst,
+                 "--bringup_max=%u" % max_active) as process:
+
+        client = Swarm(process.pid, nb_wtps, nb_stations, timeout)
+        out = IOLoop.current().run_sync(client.run)
+
+    admissions = sorted(client.admissions)
+
+    out['caps_requests'] = len(admissions)
+    out['bucket_excess'] = bucket_excess(admissions, rate, burst)
+    out['closed'] = client.closed
+
+    return out
+
+
+def main():
+    """Check the bring-up scheduler with a swarm of fake WTPs."""
+
+    parser = argparse.ArgumentParser(description=main.__doc__)
+    parser.add_argument("--wtps", type=int, default=200)
+    parser.add_argument("--stations", type=int, default=10)
+    parser.add_argument("--rate", type=float, default=DEFAULT_RATE)
+    parser.add_argument("--burst", type=int, default=DEFAULT_BURST)
+    parser.add_argument("--max-active", type=int, default=DEFAULT_MAX_ACTIVE)
+    parser.add_argument("--timeout", type=int, default=60)
+    args = parser.parse_args()
+
+    busy = ports_in_use()
+
+    if busy:
+        parser.error("ports %s in use, stop the runtime" % busy)
+
+    out = swarm(args.wtps, args.stations, args.rate, args.burst,
+                args.max_active, args.timeout)
+
+    checks = {'bucket': out['bucket_excess'] <= 1,
+              'max_active': out['max_active_seen'] <= args.max_active,
+              'completed': out['completed'] >= args.wtps}
+
+    print("%u wtps x %u stations, rate %s/s, burst %u, max_active %u" %
+          (args.wtps, args.stations, args.rate, args.burst, args.max_active))
+
+    print("completed %u in %.1f s, %u caps requests, %u timeouts, "
+          "%u closed by the runtime" % (out['completed'], out['elapsed'],
+                         out['caps_requests'], out['timeouts'],
+                         out['closed']))
+
+    print("avg wait %u ms, max wait %u ms, avg bring-up %u ms" %
+          (out['avg_wait'], out['max_wait'], out['avg_bring_up']))
+
+    print("bucket: excess %.2f admissions %s" %
+          (out['bucket_excess'], "ok" if checks['bucket'] else "FAILED"))
+
+    print("max_active: %u seen %s" %
+          (out['max_active_seen'],
+           "ok" if checks['max_active'] else "FAILED"))
+
+    if not all(checks.values()):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -71,6 +71,11 @@ class TXPBinCounter(ModulePeriodic):
     MODULE_NAME = "txp_bin_counter"
     REQUIRED = ['module_type', 'worker', 'tenant_id', 'block']
 
+    # adaptive polling: compare the byte rates of every bin
+    ADAPTIVE_COUNTERS = True
+    ADAPTIVE_DELTA = 10000
+    ADAPTIVE_RATIO = 0.25
+
     def __init__(self):
 
         super().__init__()
@@ -175,6 +180,11 @@ class TXPBinCounter(ModulePeriodic):
 
             self._block = match[0]
 
+    def sample(self):
+        """Return the TX byte counters of every bin."""
+
+        return dict(enumerate(self.tx_bytes))
+
     def to_dict(self):
         """ Return a JSON-serializable dictionary representing the Stats """
 
@@ -227,6 +237,8 @@ class TXPBinCounter(ModulePeriodic):
         msg = TXP_BIN_COUNTER_REQUEST.build(stats_req)
         wtp.connection.stream.write(msg)
 
+        self.request_sent(wtp.addr)
+
     def fill_bytes_samples(self, data):
         """ Compute samples.
 
@@ -72,6 +72,9 @@ class WiFiStats(ModulePeriodic):
     MODULE_NAME = "wifi_stats"
     REQUIRED = ['module_type', 'worker', 'tenant_id', 'block']
 
+    # adaptive polling: compare the average utilization (in %)
+    ADAPTIVE_DELTA = 5
+
     def __init__(self):
 
         super().__init__()
@@ -139,6 +142,21 @@ class WiFiStats(ModulePeriodic):
 
             raise ValueError("Invalid block")
 
+    def sample(self):
+        """Return the average TX, RX, and ED channel utilization."""
+
+        sample = {}
+
+        for stat_type, samples in self.wifi_stats.items():
+
+            if not samples:
+                continue
+
+            values = [x['fields']['value'] for x in samples]
+            sample[stat_type] = sum(values) / len(values)
+
+        return sample
+
     def to_dict(self):
         """ Return a JSON-serializable dictionary. """
 
@@ -188,6 +206,8 @@ class WiFiStats(ModulePeriodic):
         msg = WIFI_STATS_REQUEST.build(req)
         wtp.connection.stream.write(msg)
 
+        self.request_sent(wtp.addr)
+
     def handle_response(self, response):
         """Handle an incoming poller response message.
         Args:
@@ -94,6 +94,8 @@ class LVNFStats(ModulePeriodic):
 
         lvnf.cpp.connection.send_message(PT_LVNF_STATS_REQUEST, stats)
 
+        self.request_sent(lvnf.cpp.addr)
+
     def handle_response(self, response):
         """Handle an incoming STATS_RESPONSE message.
         Args:
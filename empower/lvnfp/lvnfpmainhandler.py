@@ -43,6 +43,9 @@ from empower.core.lvnf import LVNF
 from empower.core.lvnf import PROCESS_RUNNING
 from empower.core.image import Image
 from empower.core.utils import get_xid
+from empower.core.metrics import M_MESSAGE
+from empower.core.eventbus import EV_CPP_DOWN
+from empower.core.eventbus import EV_CPP_UP
 
 from empower.main import RUNTIME
 
@@ -86,6 +89,8 @@ class LVNFPMainHandler(tornado.websocket.WebSocketHandler):
     def handle_message(self, msg):
         """Handle incoming message."""
 
+        start = time.perf_counter()
+
         msg_type = msg['type']
 
         if msg_type not in self.server.pt_types:
@@ -128,6 +133,9 @@ class LVNFPMainHandler(tornado.websocket.WebSocketHandler):
             for handler in self.server.pt_types_handlers[msg_type]:
                 handler(msg)
 
+        labels = (("protocol", "lvnfp"), ("type", msg_type))
+        RUNTIME.metrics.observe_since(M_MESSAGE, labels, start)
+
     def send_bye_message_to_self(self):
         """Send bye message to self."""
 
@@ -142,9 +150,7 @@ class LVNFPMainHandler(tornado.websocket.WebSocketHandler):
     def _handle_bye(self, _):
         """Handle bye message."""
 
-        for tenant in RUNTIME.tenants.values():
-            for app in tenant.components.values():
-                app.cpp_down(self.cpp)
+        RUNTIME.events.publish(EV_CPP_DOWN, self.cpp)
 
     def send_register_message_to_self(self):
         """Send register message to self."""
@@ -160,9 +166,7 @@ class LVNFPMainHandler(tornado.websocket.WebSocketHandler):
     def _handle_register(self, _):
         """Handle register message."""
 
-        for tenant in RUNTIME.tenants.values():
-            for app in tenant.components.values():
-                app.cpp_up(self.cpp)
+        RUNTIME.events.publish(EV_CPP_UP, self.cpp)
 
     def on_close(self):
         """ Handle PNFDev disconnection """
@@ -25,7 +25,9 @@ from empower.core.pnfpserver import PNFPServer
 from empower.restserver.restserver import RESTServer
 from empower.core.pnfpserver import BaseTenantPNFDevHandler
 from empower.core.pnfpserver import BasePNFDevHandler
+from empower.core.pnfpserver import BasePNFDevBatchHandler
 from empower.core.module import ModuleWorker
+from empower.datatypes.etheraddress import EtherAddress
 from empower.persistence.persistence import TblCPP
 from empower.lvnfp import PT_BYE
 from empower.lvnfp import PT_TYPES
@@ -37,6 +39,8 @@ from empower.lvnfp.tenantlvnfhandler import TenantLVNFHandler
 from empower.lvnfp.tenantlvnfporthandler import TenantLVNFPortHandler
 from empower.lvnfp.tenantlvnfnexthandler import TenantLVNFNextHandler
 from empower.core.cpp import CPP
+from empower.core.eventbus import EV_LVNF_LEAVE
+from empower.core.eventbus import EV_LVNF_JOIN
 
 from empower.main import RUNTIME
 
@@ -62,6 +66,12 @@ class CPPHandler(BasePNFDevHandler):
                 (r"/api/v1/cpps/([a-zA-Z0-9:]*)/?")]
 
 
+class CPPBatchHandler(BasePNFDevBatchHandler):
+    """CPP Batch Handler."""
+
+    HANDLERS = [r"/api/v1/batch/cpps/?"]
+
+
 class ModuleLVNFPWorker(ModuleWorker):
     """Module worker (LVNF Server version).
 
@@ -87,7 +97,8 @@ class ModuleLVNFPWorker(ModuleWorker):
         self.log.info("Received %s response (id=%u)", self.module.MODULE_NAME,
                       msg['module_id'])
 
-        module.handle_response(msg)
+        module.response_received(EtherAddress(msg['cpp']))
+        self.dispatch_response(module, msg)
 
 
 class LVNFPServer(PNFPServer, tornado.web.Application):
@@ -115,9 +126,7 @@ class LVNFPServer(PNFPServer, tornado.web.Application):
     def send_lvnf_leave_message_to_self(self, lvnf):
         """Send an LVNF_LEAVE message to self."""
 
-        for tenant in RUNTIME.tenants.values():
-            for app in tenant.components.values():
-                app.lvnf_leave(lvnf)
+        RUNTIME.events.publish(EV_LVNF_LEAVE, lvnf)
 
         for handler in self.pt_types_handlers[PT_LVNF_LEAVE]:
             handler(lvnf)
@@ -125,9 +134,7 @@ class LVNFPServer(PNFPServer, tornado.web.Application):
     def send_lvnf_join_message_to_self(self, lvnf):
         """Send an LVNF_JOIN message to self."""
 
-        for tenant in RUNTIME.tenants.values():
-            for app in tenant.components.values():
-                app.lvnf_join(lvnf)
+        RUNTIME.events.publish(EV_LVNF_JOIN, lvnf)
 
         for handler in self.pt_types_handlers[PT_LVNF_JOIN]:
             handler(lvnf)
@@ -141,6 +148,7 @@ def launch(port=DEFAULT_PORT):
     rest_server = RUNTIME.components[RESTServer.__module__]
     rest_server.add_handler_class(TenantCPPHandler, server)
     rest_server.add_handler_class(CPPHandler, server)
+    rest_server.add_handler_class(CPPBatchHandler, server)
     rest_server.add_handler_class(TenantLVNFHandler, server)
     rest_server.add_handler_class(TenantLVNFPortHandler, server)
     rest_server.add_handler_class(TenantLVNFNextHandler, server)
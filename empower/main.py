@@ -23,6 +23,7 @@ from ipaddress import ip_address
 import logging
 import logging.config
 import os
+import signal
 import sys
 import inspect
 import types
@@ -286,7 +287,17 @@ def _post_startup():
     smoothly in this method then the tornado loop is started.
     """
 
-    pass
+    # components launched from the command line are not saved in the
+    # runtime snapshot, only the ones launched afterwards are restored
+    RUNTIME.registrations.clear()
+    RUNTIME.snapshot.restore_components()
+
+
+def _on_signal(*_):
+    """Stop the tornado loop (the runtime is stopped by main)."""
+
+    loop = tornado.ioloop.IOLoop.instance()
+    loop.add_callback_from_signal(loop.stop)
 
 
 def main(argv=None):
@@ -308,8 +319,15 @@ def main(argv=None):
     else:
         raise RuntimeError()
 
+    signal.signal(signal.SIGTERM, _on_signal)
+
     # start tornado loop
-    tornado.ioloop.IOLoop.instance().start()
+    try:
+        tornado.ioloop.IOLoop.instance().start()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        RUNTIME.stop()
 
 
 if __name__ == "__main__":
@@ -21,15 +21,52 @@ from sqlalchemy import create_engine, event
 from sqlalchemy.orm import scoped_session, sessionmaker
 
 from empower.settings import CONFIGDB_ENGINE
+from empower.settings import CONFIGDB_PROFILE
 
-ENGINE = create_engine(CONFIGDB_ENGINE, pool_recycle=6000)
+# SQLite engine profiles. The "safe" profile uses a rollback journal and
+# fsyncs on every commit. The "wal" profile uses a write-ahead log (readers
+# do not block the writer), fsyncs only at checkpoints, memory-maps the
+# database file (256MB) and uses a 64MB page cache.
+PROFILES = {
+    "safe": ['pragma foreign_keys=ON',
+             'pragma journal_mode=DELETE',
+             'pragma synchronous=FULL'],
+    "wal": ['pragma foreign_keys=ON',
+            'pragma journal_mode=WAL',
+            'pragma synchronous=NORMAL',
+            'pragma mmap_size=268435456',
+            'pragma cache_size=-65536',
+            'pragma temp_store=MEMORY'],
+}
 
 
-def on_connect(conn, record):
-    conn.execute('pragma foreign_keys=ON')
+def create_profile_engine(url, profile=CONFIGDB_PROFILE):
+    """Return an engine applying a profile to every new connection."""
 
+    engine = create_engine(url, pool_recycle=6000)
 
-event.listen(ENGINE, 'connect', on_connect)
+    if engine.dialect.name != "sqlite":
+        return engine
+
+    if profile not in PROFILES:
+        raise ValueError("Invalid ConfigDB profile %s" % profile)
+
+    def on_connect(conn, _):
+        """Apply the engine profile to a new connection."""
+
+        cursor = conn.cursor()
+
+        for pragma in PROFILES[profile]:
+            cursor.execute(pragma)
+
+        cursor.close()
+
+    event.listen(engine, 'connect', on_connect)
+
+    return engine
+
+
+ENGINE = create_profile_engine(CONFIGDB_ENGINE)
 
 SESSION_FACTORY = sessionmaker(autoflush=True,
                                bind=ENGINE,
@@ -0,0 +1,152 @@
+#!/usr/bin/env python3
+#
+# Copyright (c) 2019 Roberto Riggio
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied. See the License for the
+# specific language governing permissions and limitations
+# under the License.
+
+"""Provisioning benchmark of the ConfigDB engine profiles.
+
+For every profile a fresh database is created in a temporary directory and
+filled through the persistence worker:
+
+    serial: ACL entries posted one at a time, waiting for every commit (as
+        the single-entry REST calls do)
+    bulk: ACL entries, tenants, and slices posted without waiting (as the
+        batch REST calls do), so that the worker groups them in a few
+        transactions
+
+Run this module to compare the profiles:
+
+    python3 -m empower.persistence.bench --acl 10000 --slices 500
+"""
+
+import argparse
+import os
+import tempfile
+import time
+import uuid
+
+from empower.datatypes.dscp import DSCP
+from empower.datatypes.etheraddress import EtherAddress
+from empower.persistence import PROFILES
+from empower.persistence import create_profile_engine
+from empower.persistence.persistence import Base
+from empower.persistence.persistence import TblAllow
+from empower.persistence.persistence import TblTenant
+from empower.persistence.persistence import TblSlice
+from empower.persistence.worker import Insert
+from empower.persistence.worker import PersistenceWorker
+
+# slices per tenant
+SLICES_PER_TENANT = 50
+
+
+def _acl(index):
+    """Return the intent adding an ACL entry."""
+
+    addr = EtherAddress(index.to_bytes(6, 'big'))
+
+    return Insert(TblAllow, [{'addr': addr, 'label': "bench"}])
+
+
+def benchmark(profile, nb_serial=1000, nb_acl=10000, nb_slices=500):
+    """Provision a fresh database with a profile.
+
+    Returns:
+        A dictionary with the time spent (in s) by the serial and by the bulk
+        provisioning, and the number of transactions of the bulk one
+    """
+
+    nb_tenants = max(1, nb_slices // SLICES_PER_TENANT)
+
+    with tempfile.TemporaryDirectory() as tmp:
+
+        engine = create_profile_engine(
+            "sqlite:///%s" % os.path.join(tmp, "bench.db"), profile)
+
+        Base.metadata.create_all(engine)
+
+        worker = PersistenceWorker(engine=engine)
+        worker.start()
+
+        out = {}
+
+        start = time.perf_counter()
+
+        for index in range(nb_serial):
+            worker.submit(_acl(index)).result()
+
+        out['serial'] = time.perf_counter() - start
+
+        transactions = worker.transactions
+        start = time.perf_counter()
+
+        futures = [worker.submit(_acl(nb_serial + index))
+                   for index in range(nb_acl)]
+
+        tenants = [uuid.uuid4() for _ in range(nb_tenants)]
+
+        futures.append(worker.submit(Insert(TblTenant, [
+            {'tenant_id': tenant_id,
+             'tenant_name': None,
+             'owner': "root",
+             'desc': "bench",
+             'bssid_type': "unique",
+             'plmn_id': None} for tenant_id in tenants])))
+
+        for index in range(nb_slices):
+            futures.append(worker.submit(Insert(TblSlice, [
+                {'tenant_id': tenants[index % nb_tenants],
+                 'dscp': DSCP(index // nb_tenants),
+                 'wifi': "{}",
+                 'lte': "{}"}])))
+
+        for future in futures:
+            future.result()
+
+        out['bulk'] = time.perf_counter() - start
+
+        worker.stop()
+        engine.dispose()
+
+        out['transactions'] = worker.transactions - transactions
+
+    return out
+
+
+def main():
+    """Compare the ConfigDB engine profiles."""
+
+    parser = argparse.ArgumentParser(description=main.__doc__)
+    parser.add_argument("--profiles", nargs="+", default=sorted(PROFILES))
+    parser.add_argument("--serial", type=int, default=1000)
+    parser.add_argument("--acl", type=int, default=10000)
+    parser.add_argument("--slices", type=int, default=500)
+    args = parser.parse_args()
+
+    print("serial: %u acl | bulk: %u acl + %u slices" %
+          (args.serial, args.acl, args.slices))
+
+    for profile in args.profiles:
+
+        out = benchmark(profile, args.serial, args.acl, args.slices)
+
+        print("%-5s serial: %.2f s (%.2f ms/entry) | bulk: %.2f s "
+              "(%u transactions)" %
+              (profile, out['serial'], out['serial'] * 1000 / args.serial,
+               out['bulk'], out['transactions']))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,338 @@
+#!/usr/bin/env python3
+#
+# Copyright (c) 2019 Roberto Riggio
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied. See the License for the
+# specific language governing permissions and limitations
+# under the License.
+
+"""Empower persistence worker.
+
+All the writes to the configuration database are executed by a dedicated
+thread with its own session. Callers post write intents (Insert, Upsert,
+Update, Delete) and get back a future which is resolved once the intents
+have been committed. Intents queued while the worker is busy are applied
+in a single transaction. The in-memory state of the runtime is always
+updated by the caller before the intent is posted and it is the
+authoritative copy.
+"""
+
+import queue
+import threading
+
+from concurrent.futures import Future
+from contextlib import contextmanager
+
+from sqlalchemy.exc import SQLAlchemyError
+
+import empower.logger
+
+from empower.persistence import ENGINE
+from empower.persistence import SESSION_FACTORY
+
+DEFAULT_BATCH_SIZE = 256
+
+
+def _insert(table, replace=False):
+    """Return the insert statement for a table.
+
+    The statement is compiled once and then reused from the statement
+    cache of the engine.
+    """
+
+    stmt = table.__table__.insert()
+
+    if replace:
+        stmt = stmt.prefix_with("OR REPLACE")
+
+    return stmt
+
+
+def _polymorphic(table, row):
+    """Add the polymorphic identity (if any) to a row."""
+
+    mapper = table.__mapper__
+
+    if mapper.polymorphic_on is None:
+        return row
+
+    row = dict(row)
+    row.setdefault(mapper.polymorphic_on.key, mapper.polymorphic_identity)
+
+    return row
+
+
+class Insert:
+    """Insert a list of rows in a table.
+
+    Fails if any of the rows is already present.
+    """
+
+    def __init__(self, table, rows):
+
+        self.table = table
+        self.rows = [_polymorphic(table, row) for row in rows]
+
+    def merge(self, other):
+        """Merge another intent into this one if possible."""
+
+        if type(other) is not type(self) or other.table is not self.table:
+            return False
+
+        self.rows += other.rows
+
+        return True
+
+    def apply(self, session):
+        """Apply intent."""
+
+        if not self.rows:
+            return
+
+        session.execute(_insert(self.table), self.rows)
+
+    def __repr__(self):
+        return "%s(%s, %u rows)" % (self.__class__.__name__,
+                                    self.table.__name__,
+                                    len(self.rows))
+
+
+class Upsert(Insert):
+    """Insert or replace a list of rows in a table."""
+
+    def apply(self, session):
+        """Apply intent."""
+
+        if not self.rows:
+            return
+
+        if session.bind.dialect.name == "sqlite":
+            session.execute(_insert(self.table, True), self.rows)
+            return
+
+        for row in self.rows:
+            session.merge(self.table(**row))
+
+
+class Update:
+    """Update the rows of a table matching the filters."""
+
+    def __init__(self, table, values, **filters):
+
+        self.table = table
+        self.values = values
+        self.filters = filters
+
+    @classmethod
+    def merge(cls, _):
+        """Updates are never merged."""
+
+        return False
+
+    def apply(self, session):
+        """Apply intent."""
+
+        query = session.query(self.table)
+
+        for key, value in self.filters.items():
+            query = query.filter(getattr(self.table, key) == value)
+
+        query.update(self.values, synchronize_session=False)
+
+    def __repr__(self):
+        return "Update(%s, %s)" % (self.table.__name__, self.filters)
+
+
+class Delete:
+    """Delete the rows of a table matching the filters."""
+
+    def __init__(self, table, **filters):
+
+        self.table = table
+        self.filters = filters
+
+    @classmethod
+    def merge(cls, _):
+        """Deletes are never merged."""
+
+        return False
+
+    def apply(self, session):
+        """Apply intent."""
+
+        query = session.query(self.table)
+
+        for key, value in self.filters.items():
+            query = query.filter(getattr(self.table, key) == value)
+
+        query.delete(synchronize_session=False)
+
+    def __repr__(self):
+        return "Delete(%s, %s)" % (self.table.__name__, self.filters)
+
+
+class PersistenceWorker(threading.Thread):
+    """Apply write intents to the configuration database.
+
+    Attributes:
+        batch_size: max number of requests grouped in a single transaction
+        engine: the database engine (default: the configuration database)
+    """
+
+    def __init__(self, batch_size=DEFAULT_BATCH_SIZE, engine=None):
+
+        super().__init__(name="persistence", daemon=True)
+
+        self.batch_size = batch_size
+        self.engine = engine if engine else ENGINE
+        self.requests = queue.Queue()
+        self.session = None
+        self.transactions = 0
+        self.log = empower.logger.get_logger()
+        self.__local = threading.local()
+
+    def submit(self, *intents):
+        """Post a group of intents.
+
+        The intents in a group are always committed (or rolled back)
+        together.
+
+        Returns:
+            A concurrent.futures.Future resolved when the intents have been
+            committed.
+        """
+
+        future = Future()
+        self.requests.put((intents, future))
+
+        collected = getattr(self.__local, 'collected', None)
+
+        if collected is not None:
+            collected.append(future)
+
+        return future
+
+    @contextmanager
+    def collect(self):
+        """Collect the futures of the intents posted in a block.
+
+        Used by the REST handlers to observe the writes of a request, also
+        when the runtime method does not return the future.
+
+        Yields:
+            The list of the futures, filled in as the intents are posted
+        """
+
+        outer = getattr(self.__local, 'collected', None)
+        collected = []
+
+        self.__local.collected = collected
+
+        try:
+            yield collected
+        finally:
+            self.__local.collected = outer
+            if outer is not None:
+                outer.extend(collected)
+
+    def flush(self):
+        """Return a future resolved when all pending intents are committed."""
+
+        return self.submit()
+
+    def stop(self):
+        """Apply pending intents and stop the worker."""
+
+        self.requests.put(None)
+        self.join()
+
+    def run(self):
+
+        self.session = SESSION_FACTORY(bind=self.engine)
+
+        running = True
+
+        while running:
+
+            batch = [self.requests.get()]
+
+            while len(batch) < self.batch_size:
+                try:
+                    batch.append(self.requests.get_nowait())
+                except queue.Empty:
+                    break
+
+            if None in batch:
+                running = False
+                batch = [request for request in batch if request]
+
+            if batch:
+                self.__process(batch)
+
+        self.session.close()
+
+    @classmethod
+    def __coalesce(cls, batch):
+        """Merge consecutive intents on the same table.
+
+        Intents are copied before merging, so that the original groups can
+        still be committed one by one if the merged transaction fails.
+        """
+
+        intents = []
+
+        for group, _ in batch:
+            for intent in group:
+                if intents and intents[-1].merge(intent):
+                    continue
+                intents.append(cls.__copy(intent))
+
+        return intents
+
+    @classmethod
+    def __copy(cls, intent):
+
+        if isinstance(intent, Insert):
+            clone = intent.__class__(intent.table, [])
+            clone.rows = list(intent.rows)
+            return clone
+
+        return intent
+
+    def __commit(self, intents):
+
+        try:
+            for intent in intents:
+                intent.apply(self.session)
+            self.session.commit()
+        except SQLAlchemyError:
+            self.session.rollback()
+            raise
+        finally:
+            self.transactions += 1
+
+    def __process(self, batch):
+
+        try:
+            self.__commit(self.__coalesce(batch))
+        except SQLAlchemyError as ex:
+            if len(batch) == 1:
+                self.log.error("Unable to commit %s: %s", batch[0][0], ex)
+                batch[0][1].set_exception(ex)
+                return
+            # one of the groups failed, commit them one by one
+            for request in batch:
+                self.__process([request])
+            return
+
+        for _, future in batch:
+            future.set_result(None)
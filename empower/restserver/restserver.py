@@ -39,6 +39,9 @@ from empower.datatypes.dpid import DPID
 from empower.datatypes.dscp import DSCP
 from empower.datatypes.match import Match
 from empower.restserver.validate import validate
+from empower.restserver.validate import apply_batch
+from empower.restserver.validate import batch_status
+from empower.restserver.validate import log_failures
 
 DEFAULT_PORT = 8888
 
@@ -185,6 +188,57 @@ class AllowHandler(EmpowerAPIHandler):
         RUNTIME.remove_allowed(EtherAddress(args[0]))
 
 
+class AllowBatchHandler(EmpowerAPIHandler):
+    """Allow batch handler. Used to add many allowed Wi-Fi clients at once."""
+
+    HANDLERS = [r"/api/v1/batch/allow/?"]
+
+    SCHEMA = {
+        "sta": {"type": EtherAddress, "mandatory": True},
+        "label": {"type": str, "mandatory": False}
+    }
+
+    @validate(returncode=200,
+              input_schema={
+                  "version": {"type": float, "mandatory": True},
+                  "entries": {"type": list, "mandatory": True}
+              },
+              wait=True)
+    def post(self, *args, **kwargs):
+        """Add a batch of entries to the ACL.
+
+        All the entries are validated first and then added in a single
+        transaction. One result is returned for each entry (in the same
+        order), with a status code and either the location of the new ACL
+        entry or an error message.
+
+        Request:
+            version: protocol version (1.0)
+            entries: the list of entries, each with the following fields
+                sta: the station address
+                label: a human readable description
+
+        Example URLs:
+            POST /api/v1/batch/allow
+            {
+                "version": 1.0,
+                "entries": [
+                    {"sta": "11:22:33:44:55:66", "label": "foo"},
+                    {"sta": "11:22:33:44:55:67"}
+                ]
+            }
+        """
+
+        def add_allowed(entries):
+            return RUNTIME.add_allowed_batch(
+                [(x['sta'], x.get('label')) for x in entries])
+
+        results = apply_batch(self.SCHEMA, kwargs['entries'], add_allowed)
+
+        return [batch_status(x, lambda y: "/api/v1/allow/%s" % y.addr)
+                for x in results]
+
+
 class AccountsHandler(EmpowerAPIHandler):
     """Accounts handler. Used to add/remove accounts."""
 
@@ -711,7 +765,7 @@ class TenantSliceHandler(EmpowerAPIHandlerUsers):
             if dscp in tenant.slices:
                 raise ValueError("slice already registered in this tenant")
 
-            tenant.add_slice(dscp, request)
+            log_failures(self, [tenant.add_slice(dscp, request)])
 
             url = "/api/v1/tenants/%s/slices/%s" % (tenant_id, dscp)
             self.set_header("Location", url)
@@ -754,7 +808,7 @@ class TenantSliceHandler(EmpowerAPIHandlerUsers):
 
             dscp = DSCP(args[1])
 
-            tenant.set_slice(dscp, request)
+            log_failures(self, [tenant.set_slice(dscp, request)])
 
         except TypeError as ex:
             self.send_error(400, message=ex)
@@ -790,7 +844,7 @@ class TenantSliceHandler(EmpowerAPIHandlerUsers):
             if dscp == DSCP("0x00"):
                 raise ValueError("Invalid Slice")
 
-            tenant.del_slice(dscp)
+            log_failures(self, [tenant.del_slice(dscp)])
 
         except ValueError as ex:
             self.send_error(400, message=ex)
@@ -800,6 +854,53 @@ class TenantSliceHandler(EmpowerAPIHandlerUsers):
         self.set_status(204, None)
 
 
+class TenantSliceBatchHandler(EmpowerAPIHandlerUsers):
+    """Tenant slice batch handler. Used to add many slices at once."""
+
+    HANDLERS = [r"/api/v1/tenants/([a-zA-Z0-9-]*)/batch/slices/?"]
+
+    @validate(returncode=200,
+              min_args=1,
+              max_args=1,
+              input_schema={
+                  "version": {"type": float, "mandatory": True},
+                  "entries": {"type": list, "mandatory": True}
+              },
+              wait=True)
+    def post(self, *args, **kwargs):
+        """Add a batch of slices.
+
+        Each entry is a slice descriptor (check Slice object documentation
+        for descriptors examples). All the descriptors are validated first
+        and then added in a single transaction. One result is returned for
+        each entry (in the same order), with a status code and either the
+        location of the new slice or an error message.
+
+        Args:
+            [0]: the tenant id
+
+        Example URLs:
+            POST /api/v1/tenants/52313ecb-9d00-4b7d-b873-b55d3d9ada26/
+                batch/slices
+            {
+                "version": 1.0,
+                "entries": [
+                    {"dscp": "0x42", "wifi": {...}, "lte": {...}},
+                    {"dscp": "0x43", "wifi": {...}, "lte": {...}}
+                ]
+            }
+        """
+
+        tenant_id = UUID(args[0])
+        tenant = RUNTIME.tenants[tenant_id]
+
+        results = tenant.add_slices(kwargs['entries'])
+
+        return [batch_status(x, lambda y: "/api/v1/tenants/%s/slices/%s" %
+                             (tenant_id, y.dscp))
+                for x in results]
+
+
 class TenantEndpointHandler(EmpowerAPIHandlerUsers):
     """TenantEndpointHandler Handler."""
 
@@ -1273,10 +1374,14 @@ class TenantTrafficRuleHandler(EmpowerAPIHandlerUsers):
             match = Match(request["match"])
 
             if "priority" in request:
-                tenant.add_traffic_rule(match, dscp, request["label"],
-                                        request["priority"])
+                future = tenant.add_traffic_rule(match, dscp,
+                                                 request["label"],
+                                                 request["priority"])
             else:
-                tenant.add_traffic_rule(match, dscp, request["label"])
+                future = tenant.add_traffic_rule(match, dscp,
+                                                 request["label"])
+
+            log_failures(self, [future])
 
             url = "/api/v1/tenants/%s/trs/%s" % (tenant_id, match)
             self.set_header("Location", url)
@@ -1313,7 +1418,7 @@ class TenantTrafficRuleHandler(EmpowerAPIHandlerUsers):
 
             match = Match(args[1])
 
-            tenant.del_traffic_rule(match)
+            log_failures(self, [tenant.del_traffic_rule(match)])
 
         except ValueError as ex:
             self.send_error(400, message=ex)
@@ -1345,6 +1450,7 @@ class TrafficRuleHandler(EmpowerAPIHandler):
 
             for rule in tenant.traffic_rules.values():
 
+                rule = dict(rule)
                 rule['tenant_id'] = tenant.tenant_id
                 traffic_rules.append(rule)
 
@@ -1534,6 +1640,123 @@ class ModuleHandler(EmpowerAPIHandlerUsers):
         self.set_status(204, None)
 
 
+class ModuleWorkerHandler(EmpowerAPIHandler):
+    """Module worker handler. Used to view the requests sent by the
+    modules."""
+
+    HANDLERS = [r"/api/v1/modules/?",
+                r"/api/v1/modules/([a-zA-Z_.]*)/?"]
+
+    @validate(max_args=1)
+    def get(self, *args, **kwargs):
+        """List the module workers with their request statistics.
+
+        The round-trip-time of the requests is reported per device (in ms).
+        Requests are skipped while the previous one is outstanding.
+
+        Args:
+
+            [0]: the module name (optional)
+
+        Example URLs:
+
+            GET /api/v1/modules
+            GET /api/v1/modules/wifi_stats
+
+            {
+                "module_type": "wifi_stats",
+                "modules": 2,
+                "sent": 1210,
+                "received": 1204,
+                "outstanding": 1,
+                "skipped": 31,
+                "timeouts": 5,
+                "rtt": {
+                    "00:0D:B9:2F:56:64": {
+                        "count": 602,
+                        "avg": 4.2,
+                        "p50": 3.1,
+                        "p90": 8.3,
+                        "p99": 19.2,
+                        ...
+                    }
+                }
+            }
+        """
+
+        workers = {value.module.MODULE_NAME: value
+                   for value in RUNTIME.components.values()
+                   if isinstance(value, ModuleWorker)}
+
+        return workers.values() if not args else workers[args[0]]
+
+
+class MetricsHandler(EmpowerAPIHandler):
+    """Metrics handler. Used to export the runtime performance metrics."""
+
+    HANDLERS = [r"/api/v1/metrics/?"]
+
+    def get(self, *args, **kwargs):
+        """Export the runtime performance metrics in the Prometheus text
+        format.
+
+        The time spent handling protocol messages (per protocol and message
+        type), module responses and callbacks (per module type), and app
+        control loops (per app and tenant), as well as the IOLoop lag and
+        stalls (per owning app or module), is reported as histograms (in
+        seconds).
+
+        Example URLs:
+            GET /api/v1/metrics
+
+            # HELP empower_message_duration_seconds Time spent handling ...
+            # TYPE empower_message_duration_seconds histogram
+            empower_message_duration_seconds_bucket{protocol="lvapp",
+                type="hello",le="5e-05"} 112
+            ...
+            empower_message_duration_seconds_sum{protocol="lvapp",
+                type="hello"} 0.0123
+            empower_message_duration_seconds_count{protocol="lvapp",
+                type="hello"} 120
+        """
+
+        self.set_header('Content-Type', 'text/plain; version=0.0.4')
+        self.write(RUNTIME.metrics.to_prometheus())
+
+
+class IOLoopHandler(EmpowerAPIHandler):
+    """IOLoop handler. Used to view the IOLoop lag and the recent stalls."""
+
+    HANDLERS = [r"/api/v1/metrics/ioloop/?"]
+
+    @validate()
+    def get(self, *args, **kwargs):
+        """Get the IOLoop scheduling lag and the recent stalls.
+
+        The lag is the delay in running a callback scheduled every interval
+        ms. A stall is reported when the IOLoop is blocked for more than
+        threshold ms, together with the stack of the blocking call and its
+        owning app or module (all times in ms).
+
+        Example URLs:
+            GET /api/v1/metrics/ioloop
+
+            {
+                "interval": 100,
+                "threshold": 250,
+                "lag": {"count": 6012, "p50": 0.3, "p90": 1.2, ...},
+                "stalls": [
+                    {"timestamp": 1556532915.2,
+                     "duration": 812,
+                     "owner": "empower.apps.survey.survey:Survey.loop",
+                     "stack": ["  File ...", ...]}
+                ]
+            }
+        """
+
+        return RUNTIME.loop_monitor
+
+
 class DocHandler(EmpowerAPIHandlerUsers):
     """Generates MD documentation."""
 
@@ -1607,11 +1830,14 @@ class RESTServer(tornado.web.Application):
         handler_classes = [BaseHandler, ModuleHandler, AuthLoginHandler,
                            AuthLogoutHandler, AccountsHandler,
                            ComponentsHandler, TenantComponentsHandler,
-                           TenantHandler, AllowHandler,
-                           TenantSliceHandler, TenantEndpointHandler,
+                           TenantHandler, AllowHandler, AllowBatchHandler,
+                           TenantSliceHandler, TenantSliceBatchHandler,
+                           TenantEndpointHandler,
                            TenantEndpointNextHandler, IndexHandler,
                            TenantEndpointPortHandler, TenantTrafficRuleHandler,
-                           TrafficRuleHandler, SliceHandler, DocHandler]
+                           TrafficRuleHandler, SliceHandler,
+                           ModuleWorkerHandler, MetricsHandler,
+                           IOLoopHandler, DocHandler]
 
         for handler_class in handler_classes:
             self.add_handler_class(handler_class, http_server)
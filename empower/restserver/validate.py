@@ -19,6 +19,10 @@
 
 import tornado
 
+from tornado import gen
+
+import empower.logger
+
 
 def _parse_schema(schema, data):
 
@@ -44,13 +48,44 @@ def _parse_schema(schema, data):
     return params
 
 
-def validate(returncode=200, min_args=0, max_args=0, input_schema=None):
-    """Validate REST method."""
+def log_failures(handler, futures):
+    """Log the persistence failures of a request, with the request context.
+
+    Args:
+        handler: the request handler
+        futures: the futures of the intents posted by the request
+    """
+
+    log = empower.logger.get_logger()
+    account = getattr(handler, 'account', None)
+
+    context = "%s %s (%s)" % (handler.request.method, handler.request.uri,
+                              account.username if account else None)
+
+    def done(future):
+        if future.exception():
+            log.error("Unable to persist %s: %s", context, future.exception())
+
+    for future in futures:
+        future.add_done_callback(done)
+
+
+def validate(returncode=200, min_args=0, max_args=0, input_schema=None,
+             wait=False):
+    """Validate REST method.
+
+    The failures of the db writes made by the method are logged. If wait is
+    True, the reply is also sent only once the writes are committed (and
+    is an error if they are not).
+    """
 
     def decorator(func):
 
+        @gen.coroutine
         def magic(self, *args):
 
+            from empower.main import RUNTIME
+
             try:
 
                 if len(args) < min_args or len(args) > max_args:
@@ -63,7 +98,18 @@ def validate(returncode=200, min_args=0, max_args=0, input_schema=None):
                     request = tornado.escape.json_decode(self.request.body)
                     params = _parse_schema(input_schema, request)
 
-                output = func(self, *args, **params)
+                with RUNTIME.persistence.collect() as futures:
+                    output = func(self, *args, **params)
+
+                log_failures(self, futures)
+
+                if wait:
+                    try:
+                        for future in futures:
+                            yield future
+                    except Exception as ex:  # the db error is returned
+                        self.send_error(500, message=ex)
+                        return
 
                 if returncode == 200:
                     self.write_as_json(output)
@@ -87,3 +133,48 @@ def validate(returncode=200, min_args=0, max_args=0, input_schema=None):
         return magic
 
     return decorator
+
+
+def apply_batch(schema, entries, func):
+    """Validate a list of entries and apply func to the valid ones.
+
+    All the entries are validated before func is called. func receives the
+    list of valid entries (as parsed dictionaries) and must return a list
+    with one result per entry, where a result is either the created object
+    or the exception raised while processing that entry.
+
+    Returns a list with one result for each of the incoming entries.
+    """
+
+    if not isinstance(entries, list):
+        raise ValueError("entries must be a list")
+
+    results = []
+
+    for entry in entries:
+        try:
+            if not isinstance(entry, dict):
+                raise ValueError("entry must be a dictionary")
+            results.append(_parse_schema(schema, entry))
+        except (KeyError, ValueError, TypeError) as ex:
+            results.append(ex)
+
+    valid = [i for i, x in enumerate(results) if not isinstance(x, Exception)]
+    applied = func([results[i] for i in valid])
+
+    for i, result in zip(valid, applied):
+        results[i] = result
+
+    return results
+
+
+def batch_status(result, location):
+    """Return the JSON-serializable status of a batch entry."""
+
+    if isinstance(result, KeyError):
+        return {"status": 404, "message": str(result)}
+
+    if isinstance(result, Exception):
+        return {"status": 400, "message": str(result)}
+
+    return {"status": 201, "location": location(result)}
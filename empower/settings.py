@@ -29,6 +29,17 @@ TEMPLATE_PATH = os.path.join(DIRNAME, 'templates')
 CONFIGDB_PATH = "%s/deploy/empower.db" % (ROOT_PATH,)
 CONFIGDB_ENGINE = "sqlite:///%s" % (CONFIGDB_PATH,)
 
+# ConfigDB engine profile (sqlite only), either "safe" (rollback journal and
+# full fsync on every commit) or "wal" (write-ahead log, see persistence)
+CONFIGDB_PROFILE = "wal"
+
+# Components manifest index, rebuilt when the components sources change
+MANIFEST_INDEX_PATH = "%s/deploy/manifests.json" % (ROOT_PATH,)
+
+# Runtime snapshot used for warm restarts (period in ms)
+SNAPSHOT_PATH = "%s/deploy/snapshot.bin" % (ROOT_PATH,)
+SNAPSHOT_PERIOD = 5000
+
 # import base64
 # import uuid
 # COOKIE_SECRET = base64.b64encode(uuid.uuid4().bytes + uuid.uuid4().bytes)
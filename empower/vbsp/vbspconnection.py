@@ -67,11 +67,17 @@ from empower.vbsp import SET_RAN_MAC_SLICE_REQUEST
 from empower.core.cellpool import Cell
 from empower.core.ue import UE
 from empower.core.utils import get_xid
+from empower.core.metrics import M_MESSAGE
+from empower.core.eventbus import EV_VBS_DOWN
+from empower.core.eventbus import EV_VBS_UP
 
 from empower.main import RUNTIME
 
 import empower.logger
 
+# slices are synced after the RAN MAC slice responses (in ms)
+SLICE_SYNC_DELAY = 500
+
 
 class VBSPConnection:
     """VBSP Connection.
@@ -150,6 +156,8 @@ class VBSPConnection:
 
     def _trigger_message(self, hdr):
 
+        start = time.perf_counter()
+
         if hdr.type == E_TYPE_SINGLE:
             event = E_SINGLE.parse(self.__buffer[HEADER.sizeof():])
             offset = HEADER.sizeof() + E_SINGLE.sizeof()
@@ -211,6 +219,9 @@ class VBSPConnection:
                 for handler in self.server.pt_types_handlers[msg_type]:
                     handler(vbs, hdr, event, msg)
 
+            labels = (("protocol", "vbsp"), ("type", msg_name))
+            RUNTIME.metrics.observe_since(M_MESSAGE, labels, start)
+
     def _wait(self):
         """ Wait for incoming packets on signalling channel """
 
@@ -242,9 +253,7 @@ class VBSPConnection:
     def send_bye_message_to_self(self):
         """Send a unsollicited BYE message to senf."""
 
-        for tenant in RUNTIME.tenants.values():
-            for app in tenant.components.values():
-                app.vbs_down(self.vbs)
+        RUNTIME.events.publish(EV_VBS_DOWN, self.vbs)
 
         for handler in self.server.pt_types_handlers[PT_BYE]:
             handler(self.vbs)
@@ -252,9 +261,7 @@ class VBSPConnection:
     def send_register_message_to_self(self):
         """Send a unsollicited REGISTER message to senf."""
 
-        for tenant in RUNTIME.tenants.values():
-            for app in tenant.components.values():
-                app.vbs_up(self.vbs)
+        RUNTIME.events.publish(EV_VBS_UP, self.vbs)
 
         for handler in self.server.pt_types_handlers[PT_REGISTER]:
             handler(self.vbs)
@@ -315,6 +322,8 @@ class VBSPConnection:
         # clear cells
         vbs.cells = {}
 
+        ran_caps = False
+
         # parse capabilities TLVs
         for raw_cap in caps.options:
 
@@ -375,15 +384,22 @@ class VBSPConnection:
                 # send slice request
                 self.send_ran_mac_slice_request(option.pci)
 
-                # send slices
-                self.update_slices()
+                ran_caps = True
 
         # transition to the online state
         vbs.set_online()
 
+        # send slices once the eNB has reported its current ones
+        if ran_caps:
+            tornado.ioloop.IOLoop.instance().call_later(
+                SLICE_SYNC_DELAY / 1000, self.update_slices)
+
     def update_slices(self):
         """Update active Slices."""
 
+        if not self.vbs or not self.vbs.is_online():
+            return
+
         for tenant in RUNTIME.tenants.values():
 
             # vbs not in this tenant
@@ -391,27 +407,64 @@ class VBSPConnection:
                 continue
 
             # send slices configuration
-            for slc in tenant.slices.values():
-
-                if not tenant.plmn_id:
-                    continue
+            for slc in list(tenant.slices.values()):
 
                 if not slc.lte['vbses'] or \
                     (slc.lte['vbses'] and self.vbs.addr in slc.lte['vbses']):
 
-                    for cell in self.vbs.cells.values():
+                    self.sync_slice(tenant, slc.dscp)
+
+    def sync_slice(self, tenant, dscp):
+        """Push a slice to the cells where its configuration differs.
+
+        Returns:
+            A (sent, skipped) tuple with the number of messages sent and the
+            number of cells already in sync
+        """
+
+        if not tenant.plmn_id:
+            return 0, 0
+
+        sent = 0
+        skipped = 0
+
+        key = (tenant.plmn_id, dscp)
+        slc = tenant.slices.get(dscp)
+
+        if slc:
+
+            rntis = [ue.rnti for ue in tenant.ues.values()
+                     if ue.vbs == self.vbs and ue.slice == dscp]
+
+            digest = slc.get_lte_digest(self.vbs.addr) + \
+                (tuple(sorted(rntis)),)
+
+        for cell in self.vbs.cells.values():
+
+            if slc:
+
+                if cell.slices.get(key) == digest:
+                    skipped += 1
+                    continue
+
+                opcode = \
+                    EP_OPERATION_SET if key in cell.slices else EP_OPERATION_ADD
+
+                self.send_add_set_ran_mac_slice_request(cell, slc, opcode,
+                                                        rntis)
 
-                        if self.vbs.addr not in slc.lte['vbses']:
+            else:
+
+                if key not in cell.slices:
+                    skipped += 1
+                    continue
 
-                            self.vbs.connection. \
-                                send_add_set_ran_mac_slice_request(cell,
-                                                                   slc,
-                                                                   EP_OPERATION_ADD)
-                        else:
-                            self.vbs.connection.\
-                                send_add_set_ran_mac_slice_request(cell,
-                                                                   slc,
-                                                                   EP_OPERATION_SET)
+                self.send_del_ran_mac_slice_request(cell, tenant.plmn_id,
+                                                    dscp)
+
+            sent += 1
+
+        return sent, skipped
 
     def _handle_ue_report_response(self, vbs, hdr, event, msg):
         """Handle an incoming UE_REPORT message.
@@ -581,6 +634,8 @@ class VBSPConnection:
 
         slc = tenant.slices[dscp]
 
+        reported = {}
+
         for raw_cap in msg.options:
 
             if raw_cap.type not in RAN_MAC_SLICE_TYPES:
@@ -592,49 +647,75 @@ class VBSPConnection:
 
             self.log.warning("Processing options %s", prop)
 
-            if raw_cap.type == EP_RAN_MAC_SLICE_SCHED_ID:
+            reported[raw_cap.type] = option
 
-                if option.sched_id != slc.lte['static-properties']['sched_id']:
+        # the configuration acknowledged by the eNB, recorded first so that
+        # the UE moves below do not send the slice back to the eNB
+        if hdr.cellid in vbs.cells:
 
-                    if vbs.addr not in slc.lte['vbses']:
-                        slc.lte['vbses'][vbs.addr] = {
-                            'static-properties': {}
-                        }
+            sched_id = slc.lte['static-properties']['sched_id']
+            rbgs = slc.lte['static-properties']['rbgs']
+            rntis = []
 
-                    slc.lte['vbses'][vbs.addr] \
-                        ['static-properties']['sched_id'] = option.sched_id
+            if EP_RAN_MAC_SLICE_SCHED_ID in reported:
+                sched_id = reported[EP_RAN_MAC_SLICE_SCHED_ID].sched_id
 
-            if raw_cap.type == EP_RAN_MAC_SLICE_RBGS:
+            if EP_RAN_MAC_SLICE_RBGS in reported:
+                rbgs = reported[EP_RAN_MAC_SLICE_RBGS].rbgs
 
-                if option.rbgs != slc.lte['static-properties']['rbgs']:
+            if EP_RAN_MAC_SLICE_RNTI_LIST in reported:
+                rntis = reported[EP_RAN_MAC_SLICE_RNTI_LIST].rntis
 
-                    if vbs.addr not in slc.lte['vbses']:
-                        slc.lte['vbses'][vbs.addr] = {
-                            'static-properties': {}
-                        }
+            vbs.cells[hdr.cellid].slices[(plmn_id, dscp)] = \
+                (sched_id, rbgs, tuple(sorted(rntis)))
 
-                    slc.lte['vbses'][vbs.addr] \
-                        ['static-properties']['rbgs'] = option.rbgs
+        if EP_RAN_MAC_SLICE_SCHED_ID in reported:
 
-            if raw_cap.type == EP_RAN_MAC_SLICE_RNTI_LIST:
+            option = reported[EP_RAN_MAC_SLICE_SCHED_ID]
 
-                rntis = option.rntis
+            if option.sched_id != slc.lte['static-properties']['sched_id']:
 
-                for ue in list(tenant.ues.values()):
+                if vbs.addr not in slc.lte['vbses']:
+                    slc.lte['vbses'][vbs.addr] = {
+                        'static-properties': {}
+                    }
 
-                    if ue.vbs != vbs:
-                        continue
+                slc.lte['vbses'][vbs.addr] \
+                    ['static-properties']['sched_id'] = option.sched_id
+
+        if EP_RAN_MAC_SLICE_RBGS in reported:
+
+            option = reported[EP_RAN_MAC_SLICE_RBGS]
+
+            if option.rbgs != slc.lte['static-properties']['rbgs']:
+
+                if vbs.addr not in slc.lte['vbses']:
+                    slc.lte['vbses'][vbs.addr] = {
+                        'static-properties': {}
+                    }
+
+                slc.lte['vbses'][vbs.addr] \
+                    ['static-properties']['rbgs'] = option.rbgs
 
-                    # if the UE was attached to this slice, but it is not
-                    # in the information given by the eNB, it should be
-                    # deleted.
-                    if slc.dscp == ue.slice and ue.rnti not in rntis:
-                        ue.slice = DSCP("0x00")
+        if EP_RAN_MAC_SLICE_RNTI_LIST in reported:
 
-                    # if the UE was not attached to this slice, but its RNTI
-                    # is provided by the eNB for this slice, it should added.
-                    elif slc.dscp != ue.slice and ue.rnti in rntis:
-                        ue.slice = slc.dscp
+            rntis = reported[EP_RAN_MAC_SLICE_RNTI_LIST].rntis
+
+            for ue in list(tenant.ues.values()):
+
+                if ue.vbs != vbs:
+                    continue
+
+                # if the UE was attached to this slice, but it is not
+                # in the information given by the eNB, it should be
+                # deleted.
+                if slc.dscp == ue.slice and ue.rnti not in rntis:
+                    ue.slice = DSCP("0x00")
+
+                # if the UE was not attached to this slice, but its RNTI
+                # is provided by the eNB for this slice, it should added.
+                elif slc.dscp != ue.slice and ue.rnti in rntis:
+                    ue.slice = slc.dscp
 
         self.log.info("Slice %s updated", slc)
 
@@ -725,20 +806,10 @@ class VBSPConnection:
             None
         """
 
-        sched_id = slc.lte['static-properties']['sched_id']
-        rbgs = slc.lte['static-properties']['rbgs']
+        properties = slc.get_lte_properties(self.vbs.addr)
 
-        if self.vbs.addr in slc.lte['vbses']:
-
-            if 'static-properties' in slc.lte['vbses'][self.vbs.addr]:
-
-                static = slc.lte['vbses'][self.vbs.addr]['static-properties']
-
-                if 'sched_id' in static:
-                    sched_id = static['sched_id']
-
-                if 'rbgs' in static:
-                    rbgs = static['rbgs']
+        sched_id = properties['sched_id']
+        rbgs = properties['rbgs']
 
         msg = Container(plmn_id=slc.tenant.plmn_id.to_raw(),
                         dscp=slc.dscp.to_raw(),
@@ -768,6 +839,9 @@ class VBSPConnection:
 
         msg.options = [opt_rbgs, opt_sched_id, opt_rntis]
 
+        cell.slices[(slc.tenant.plmn_id, slc.dscp)] = \
+            (sched_id, rbgs, tuple(sorted(rntis)))
+
         msg.length = RAN_MAC_SLICE_REQUEST.sizeof() + \
             opt_rbgs.length + 4 + \
             opt_sched_id.length + 4 + \
@@ -801,6 +875,8 @@ class VBSPConnection:
         else:
             self.log.warning("DSCP %s not found. Removing slice.", dscp)
 
+        cell.slices.pop((plmn_id, dscp), None)
+
         # Then proceed to remove the current slice
         msg = Container(plmn_id=plmn_id.to_raw(),
                         dscp=dscp.to_raw(),
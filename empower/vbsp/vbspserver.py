@@ -21,12 +21,15 @@ from tornado.tcpserver import TCPServer
 
 from empower.core.pnfpserver import BaseTenantPNFDevHandler
 from empower.core.pnfpserver import BasePNFDevHandler
+from empower.core.pnfpserver import BasePNFDevBatchHandler
 from empower.restserver.restserver import RESTServer
 from empower.core.pnfpserver import PNFPServer
 from empower.core.module import ModuleWorker
 from empower.vbsp.vbspconnection import VBSPConnection
 from empower.persistence.persistence import TblVBS
 from empower.core.vbs import VBS
+from empower.core.eventbus import EV_UE_LEAVE
+from empower.core.eventbus import EV_UE_JOIN
 
 from empower.vbsp import PT_BYE
 from empower.vbsp import PT_UE_LEAVE
@@ -55,6 +58,12 @@ class VBSHandler(BasePNFDevHandler):
                 (r"/api/v1/vbses/([a-zA-Z0-9:]*)/?")]
 
 
+class VBSBatchHandler(BasePNFDevBatchHandler):
+    """VBS Batch Handler."""
+
+    HANDLERS = [r"/api/v1/batch/vbses/?"]
+
+
 class ModuleVBSPWorker(ModuleWorker):
     """Module worker (VBSP Server version).
 
@@ -81,7 +90,8 @@ class ModuleVBSPWorker(ModuleWorker):
                       self.module.MODULE_NAME, vbs.addr, hdr.xid, hdr.seq)
 
         if event.opcode == 1:
-            module.handle_response(msg)
+            module.response_received(vbs.addr)
+            self.dispatch_response(module, msg)
 
 
 class VBSPServer(PNFPServer, TCPServer):
@@ -106,9 +116,7 @@ class VBSPServer(PNFPServer, TCPServer):
     def send_ue_leave_message_to_self(self, ue):
         """Send an UE_LEAVE message to self."""
 
-        for tenant in RUNTIME.tenants.values():
-            for app in tenant.components.values():
-                app.ue_leave(ue)
+        RUNTIME.events.publish(EV_UE_LEAVE, ue)
 
         for handler in self.pt_types_handlers[PT_UE_LEAVE]:
             handler(ue)
@@ -116,9 +124,7 @@ class VBSPServer(PNFPServer, TCPServer):
     def send_ue_join_message_to_self(self, ue):
         """Send an UE_JOIN message to self."""
 
-        for tenant in RUNTIME.tenants.values():
-            for app in tenant.components.values():
-                app.ue_join(ue)
+        RUNTIME.events.publish(EV_UE_JOIN, ue)
 
         for handler in self.pt_types_handlers[PT_UE_JOIN]:
             handler(ue)
@@ -132,6 +138,7 @@ def launch(port=DEFAULT_PORT):
     rest_server = RUNTIME.components[RESTServer.__module__]
     rest_server.add_handler_class(TenantVBSHandler, server)
     rest_server.add_handler_class(VBSHandler, server)
+    rest_server.add_handler_class(VBSBatchHandler, server)
     rest_server.add_handler_class(UEHandler, server)
     rest_server.add_handler_class(TenantUEHandler, server)
 
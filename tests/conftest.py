@@ -0,0 +1,70 @@
+#!/usr/bin/env python3
+#
+# Copyright (c) 2019 Roberto Riggio
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied. See the License for the
+# specific language governing permissions and limitations
+# under the License.
+
+"""Test fixtures.
+
+The config db, the manifest index, and the snapshot are moved to a temporary
+directory before the persistence layer is imported, so that the tests never
+touch the deploy directory.
+"""
+
+import os
+import sys
+import tempfile
+
+from types import SimpleNamespace
+
+import pytest
+
+import empower.settings as settings
+
+DEPLOY = tempfile.mkdtemp(prefix="empower-tests-")
+
+settings.CONFIGDB_PATH = os.path.join(DEPLOY, "empower.db")
+settings.CONFIGDB_ENGINE = "sqlite:///%s" % settings.CONFIGDB_PATH
+settings.MANIFEST_INDEX_PATH = os.path.join(DEPLOY, "manifests.json")
+settings.SNAPSHOT_PATH = os.path.join(DEPLOY, "snapshot.bin")
+
+
+def _set_runtime(runtime):
+    """Set the global RUNTIME, also in the modules that imported it."""
+
+    for name, module in list(sys.modules.items()):
+        if name.startswith("empower") and hasattr(module, "RUNTIME"):
+            module.RUNTIME = runtime
+
+
+@pytest.fixture
+def runtime():
+    """Return a runtime with no components, set as the global RUNTIME."""
+
+    import empower.main
+
+    from empower.core.core import EmpowerRuntime
+
+    if os.path.exists(settings.SNAPSHOT_PATH):
+        os.remove(settings.SNAPSHOT_PATH)
+
+    out = EmpowerRuntime(SimpleNamespace(ctrl_adv=False))
+
+    _set_runtime(out)
+
+    yield out
+
+    out.stop()
+
+    _set_runtime(None)
@@ -0,0 +1,70 @@
+#!/usr/bin/env python3
+#
+# Copyright (c) 2019 Roberto Riggio
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied. See the License for the
+# specific language governing permissions and limitations
+# under the License.
+
+"""LVAPP shard tests."""
+
+import signal
+import socket
+import time
+
+from unittest.mock import Mock
+
+from tornado import gen
+from tornado.ioloop import IOLoop
+
+import empower.lvapp.lvappshard as lvappshard
+
+
+def _free_port():
+    """Return a free TCP port."""
+
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def test_worker_is_restarted(monkeypatch):
+    """A worker that is killed is reaped and replaced."""
+
+    monkeypatch.setattr(lvappshard, "RESTART_DELAY", 0.1)
+
+    shard = lvappshard.LVAPPShard(Mock(port=_free_port()), 0)
+
+    try:
+
+        killed = shard.process
+
+        @gen.coroutine
+        def kill_and_wait():
+            killed.send_signal(signal.SIGKILL)
+            deadline = time.time() + 10
+            while shard.restarts == 0 and time.time() < deadline:
+                yield gen.sleep(0.05)
+
+        IOLoop.current().run_sync(kill_and_wait)
+
+        # the killed worker has been reaped, not left as a zombie
+        assert killed.returncode == -signal.SIGKILL
+
+        assert shard.restarts == 1
+        assert shard.process is not killed
+        assert shard.process.poll() is None
+
+    finally:
+        shard.stop()
+
+    assert shard.process.poll() is not None
@@ -0,0 +1,68 @@
+#!/usr/bin/env python3
+#
+# Copyright (c) 2019 Roberto Riggio
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied. See the License for the
+# specific language governing permissions and limitations
+# under the License.
+
+"""Columnar recorder tests."""
+
+import logging
+
+from empower.core.recorder import EXPORTER
+from empower.core.recorder import Recorder
+
+
+def _recorder():
+    """Return a recorder with two samples."""
+
+    recorder = Recorder([("value", 'i')])
+    recorder.append(1000000, 1)
+    recorder.append(2000000, 2)
+
+    return recorder
+
+
+def test_export(tmp_path):
+    """The exported samples are written to the file."""
+
+    path = str(tmp_path / "samples.csv")
+
+    _recorder().export(path, fields=["value", "wtp"], fmt="%d,%s",
+                       constants={'wtp': "wtp0"}).result()
+
+    with open(path) as samples:
+        assert samples.read() == "1,wtp0\n2,wtp0\n"
+
+
+def test_export_failure_is_logged(tmp_path, caplog):
+    """A failed export is logged."""
+
+    path = str(tmp_path / "samples.csv")
+
+    with caplog.at_level(logging.ERROR):
+
+        future = _recorder().export(path, fields=["value", "wtp"],
+                                    fmt="%d,%d", constants={'wtp': None})
+
+        assert isinstance(future.exception(), TypeError)
+
+        # the callbacks of a task run before the next task is started
+        EXPORTER.submit(lambda: None).result()
+
+    errors = [record for record in caplog.records
+              if record.levelno == logging.ERROR]
+
+    assert len(errors) == 1
+    assert path in errors[0].getMessage()
+    assert "%d format" in errors[0].getMessage()
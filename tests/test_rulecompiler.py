@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+#
+# Copyright (c) 2019 Roberto Riggio
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied. See the License for the
+# specific language governing permissions and limitations
+# under the License.
+
+"""Traffic rule compiler tests."""
+
+from types import SimpleNamespace
+
+from empower.datatypes.dscp import DSCP
+from empower.datatypes.etheraddress import EtherAddress
+from empower.datatypes.match import Match
+from empower.ibnp.rulecompiler import RuleCompiler
+
+DP1 = "00:00:00:0D:B9:2F:56:64"
+DP2 = "00:00:00:0D:B9:2F:56:65"
+
+STA1 = EtherAddress("60:F4:45:D0:3B:FC")
+STA2 = EtherAddress("60:F4:45:D0:3B:FD")
+
+TENANT = "tenant"
+
+
+def _rule(match):
+    """Return a traffic rule of TENANT."""
+
+    match = Match(match)
+
+    return match, SimpleNamespace(match=match, dscp=DSCP("0x28"),
+                                  priority=100)
+
+
+def _commit(compiler, dpid, rules):
+    """Install the rules needed by a datapath, return the changes."""
+
+    add, remove = compiler.diff(dpid, rules)
+    compiler.commit(dpid, {rule: len(add) for rule in add}, remove)
+
+    return add, remove
+
+
+def test_single_tenant_rules_select_the_stations():
+    """The rules of a tenant only select the traffic of its stations."""
+
+    match, tr = _rule("tp_dst=80")
+    rules = {TENANT: {match: tr}}
+
+    compiler = RuleCompiler()
+    compiler.add_station(DP1, STA1, TENANT)
+    compiler.add_station(DP1, STA2, TENANT)
+
+    compiled = compiler.compile(DP1, rules)
+
+    assert {rule[-1] for rule in compiled} == {STA1, STA2}
+
+
+def test_dl_dst_rules_are_installed_as_they_are():
+    """A rule with a destination is only installed on its station datapath."""
+
+    match, tr = _rule("dl_dst=%s,tp_dst=80" % STA1)
+    rules = {TENANT: {match: tr}}
+
+    compiler = RuleCompiler()
+    compiler.add_station(DP1, STA1, TENANT)
+    compiler.add_station(DP2, STA2, TENANT)
+
+    assert [rule[-1] for rule in compiler.compile(DP1, rules)] == [None]
+    assert not compiler.compile(DP2, rules)
+
+
+def test_handover_moves_the_station_rules():
+    """A handover only moves the rules of the station."""
+
+    match, tr = _rule("tp_dst=80")
+    rules = {TENANT: {match: tr}}
+
+    compiler = RuleCompiler()
+    compiler.add_station(DP1, STA1, TENANT)
+    compiler.add_station(DP1, STA2, TENANT)
+
+    _commit(compiler, DP1, rules)
+
+    assert compiler.add_station(DP2, STA1, TENANT) == {DP1, DP2}
+
+    add, remove = _commit(compiler, DP1, rules)
+
+    assert not add
+    assert [rule[-1] for rule in remove] == [STA1]
+
+    add, remove = _commit(compiler, DP2, rules)
+
+    assert [rule[-1] for rule in add] == [STA1]
+    assert not remove
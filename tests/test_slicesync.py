@@ -0,0 +1,111 @@
+#!/usr/bin/env python3
+#
+# Copyright (c) 2019 Roberto Riggio
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#    http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing,
+# software distributed under the License is distributed on an
+# "AS IS" BASIS, WITHOUT WARRANTIES OR CONDITIONS OF ANY
+# KIND, either express or implied. See the License for the
+# specific language governing permissions and limitations
+# under the License.
+
+"""Slice propagation tests."""
+
+from collections import defaultdict
+from unittest.mock import Mock
+
+from tornado import gen
+from tornado.ioloop import IOLoop
+
+from empower.core.resourcepool import BT_L20
+from empower.core.resourcepool import ResourceBlock
+from empower.core.wtp import WTP
+from empower.datatypes.etheraddress import EtherAddress
+from empower.datatypes.ssid import SSID
+from empower.lvapp import DEL_SLICE
+from empower.lvapp import HEADER
+from empower.lvapp import PT_DEL_SLICE
+from empower.lvapp import PT_SET_SLICE
+from empower.lvapp.lvappconnection import LVAPPConnection
+
+
+def _online_wtp(runtime):
+    """Add an online WTP with one block, whose messages are recorded."""
+
+    wtp = WTP(EtherAddress("00:0D:B9:2F:56:64"), "wtp")
+    block = ResourceBlock(wtp, EtherAddress("04:F0:21:09:F9:93"), 36, BT_L20)
+    wtp.supports.add(block)
+
+    stream = Mock()
+    stream.closed.return_value = False
+
+    server = Mock(pt_types_handlers=defaultdict(list))
+
+    connection = LVAPPConnection(stream, ("127.0.0.1", 4433), server)
+    connection.wtp = wtp
+
+    wtp.connection = connection
+    wtp.set_connected()
+    wtp.set_online()
+
+    runtime.wtps[wtp.addr] = wtp
+
+    return wtp, block, stream
+
+
+def _sent(stream):
+    """Return and clear the (type, raw message) written to a stream."""
+
+    out = [(HEADER.parse(call[0][0]).type, call[0][0])
+           for call in stream.write.call_args_list]
+
+    stream.write.reset_mock()
+
+    return out
+
+
+def _sync():
+    """Run the IOLoop until the slice propagation queue has been processed."""
+
+    IOLoop.current().run_sync(lambda: gen.sleep(0.05))
+
+
+def test_remove_tenant_deletes_slices(runtime):
+    """Removing a tenant sends a DEL_SLICE for each of its slices."""
+
+    wtp, block, stream = _online_wtp(runtime)
+
+    try:
+
+        ssid = SSID("slicesync")
+        tenant_id = runtime.add_tenant("root", "test", ssid, "unique")
+        tenant = runtime.tenants[tenant_id]
+        dscp = list(tenant.slices)[0]
+
+        _sync()
+
+        assert [msg_type for msg_type, _ in _sent(stream)] == [PT_SET_SLICE]
+        assert (ssid, dscp) in block.slices
+
+        runtime.remove_tenant(tenant_id)
+
+        _sync()
+
+        sent = _sent(stream)
+
+        assert [msg_type for msg_type, _ in sent] == [PT_DEL_SLICE]
+
+        msg = DEL_SLICE.parse(sent[0][1])
+
+        assert SSID(msg.ssid) == ssid
+        assert msg.dscp == dscp.to_raw()
+        assert not block.slices
+
+    finally:
+        wtp.connection._hb_worker.stop()